@@ -0,0 +1,89 @@
+"""
+Chord extraction benchmark.
+
+Compares pulling every chord out of a corpus of songs with a full parse
+(`HibikiParser` and `Line.split_chords_and_lyrics`) against pulling them out
+of the events (`hibiki.events.iter_events`). Both preprocess each song in
+full, so the difference is the stanzas and lines the parser builds.
+
+    python benchmarks/events.py --songs 200
+"""
+from __future__ import annotations
+import argparse
+import collections
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hibiki import Chord, HibikiParser  # noqa: E402
+from hibiki.events import iter_events  # noqa: E402
+
+from memory import generate  # noqa: E402
+
+
+def with_parser(corpus: list[str]) -> collections.Counter:
+    counts: collections.Counter = collections.Counter()
+    for song in corpus:
+        for stanza in HibikiParser().parse(song):
+            for line in stanza.lines:
+                chords, _ = line.split_chords_and_lyrics()
+                counts.update(chord.symbol for chord in chords if isinstance(chord, Chord))
+    return counts
+
+
+def with_events(corpus: list[str]) -> collections.Counter:
+    counts: collections.Counter = collections.Counter()
+    for song in corpus:
+        repeat = 1
+        for event in iter_events(song):
+            if event[0] == "stanza_start":
+                repeat = max(event[2], 1)
+            elif event[0] == "chord":
+                counts[event[1].symbol] += repeat
+    return counts
+
+
+def measure(function: collections.abc.Callable, corpus: list[str]) -> tuple[float, int, collections.Counter]:
+    """Get the time taken, the peak memory, and the result of a function."""
+    gc.collect()
+    start = time.perf_counter()
+    result = function(corpus)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        function(corpus)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare chord extraction with a full parse and with events.")
+    parser.add_argument("--songs", type=int, default=200, help="Number of songs in the corpus.")
+    parser.add_argument("--stanzas", type=int, default=12, help="Number of stanzas in each song.")
+    args = parser.parse_args()
+
+    corpus = [generate(args.stanzas, seed=i) for i in range(args.songs)]
+    print(f"Corpus: {args.songs} songs, {sum(map(len, corpus)) / 1e6:.2f} MB")
+    print(f"{'method':<10}{'seconds':>10}{'peak MB':>10}")
+
+    results = []
+    for name, function in (("parser", with_parser), ("events", with_events)):
+        elapsed, peak, counts = measure(function, corpus)
+        results.append(counts)
+        print(f"{name:<10}{elapsed:>10.3f}{peak / 1e6:>10.2f}")
+
+    if results[0] != results[1]:
+        print("Chord counts differ!")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Memory benchmark for parsing.
+
+Compares the peak and retained memory of a regular parse against a compact
+one (`HibikiParser(compact=True)`), for a large generated document. Retained
+memory is what the parsed stanzas keep alive once parsing is done, after
+every line has been rendered once.
+
+    python benchmarks/memory.py --stanzas 5000
+"""
+from __future__ import annotations
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hibiki import HibikiParser  # noqa: E402
+
+
+CHORDS = ["C", "Am", "G7", "F#m", "Bbadd9", "Csus4", "D/F#", "Em"]
+WORDS = ["midnight", "train", "going", "anywhere", "just a", "small town", "girl", "living in a", "lonely world"]
+
+
+def generate(stanzas: int, seed: int=0) -> str:
+    """Generate a document with the given number of stanza definitions."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(stanzas):
+        out.append(f"[Verse {i}]")
+        for _ in range(rng.randint(2, 8)):
+            parts = []
+            for _ in range(rng.randint(2, 6)):
+                parts.append(f"{{{rng.choice(CHORDS)}}}{rng.choice(WORDS)} ")
+            out.append("".join(parts).rstrip())
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def measure(text: str, compact: bool) -> tuple[int, int]:
+    """Get the peak and retained memory of parsing and rendering a document."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        stanzas = HibikiParser(compact=compact).parse(text)
+        for stanza in stanzas:
+            for line in stanza.lines:
+                line.render()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del stanzas
+    return peak, retained
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare memory use of regular and compact parses.")
+    parser.add_argument("--stanzas", type=int, default=2000, help="Number of stanzas in the generated document.")
+    args = parser.parse_args()
+
+    text = generate(args.stanzas)
+    size = len(text.encode("utf-8"))
+    print(f"Document: {args.stanzas} stanzas, {size / 1e6:.2f} MB")
+    print(f"{'mode':<10}{'peak MB':>10}{'x input':>10}{'retained MB':>14}{'x input':>10}")
+
+    for name, compact in (("regular", False), ("compact", True)):
+        peak, retained = measure(text, compact)
+        print(f"{name:<10}{peak / 1e6:>10.2f}{peak / size:>10.1f}{retained / 1e6:>14.2f}{retained / size:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Parallel rendering benchmark.
+
+Renders a large generated document serially, then with increasing numbers
+of worker processes, and checks that every render is identical.
+
+    python benchmarks/parallel.py --stanzas 5000 --jobs 2 4
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hibiki import HibikiParser, HibikiRenderer  # noqa: E402
+
+from memory import generate  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare rendering a large document serially and in parallel.")
+    parser.add_argument("--stanzas", type=int, default=5000, help="Number of stanzas in the document.")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[2, 4], help="Numbers of worker processes to try.")
+    args = parser.parse_args()
+
+    text = generate(args.stanzas)
+    print(f"Document: {args.stanzas} stanzas, {len(text) / 1e6:.2f} MB, {os.cpu_count()} CPUs")
+
+    expected = None
+    for jobs in [1] + args.jobs:
+        # Parsed fresh each time, since parsed lines cache their layout.
+        start = time.perf_counter()
+        stanzas = HibikiParser().parse(text)
+        parsed = time.perf_counter()
+        output = HibikiRenderer(jobs=jobs).render(stanzas)
+        done = time.perf_counter()
+        print(f"jobs={jobs}: parse {parsed - start:.2f} s, render {done - parsed:.2f} s")
+
+        if expected is None:
+            expected = output
+        elif output != expected:
+            print("Output differs!")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
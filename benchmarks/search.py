@@ -0,0 +1,86 @@
+"""
+Search benchmark.
+
+Indexes a generated corpus of songs, then compares answering a chord query
+and a lyric query from the index against parsing every song to answer them.
+
+    python benchmarks/search.py --songs 2000
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import time
+import typing as t
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hibiki.events import iter_events  # noqa: E402
+from hibiki.search import SearchIndex, normalize_chord  # noqa: E402
+
+from memory import generate  # noqa: E402
+
+
+def scan(paths: list[str], chords: set[str], phrase: str) -> list[str]:
+    """Answer a query by parsing every song."""
+    found = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as infile:
+            src = infile.read()
+        used: set[str] = set()
+        line: list[str] = []
+        has_phrase = False
+        for event in iter_events(src):
+            if event[0] == "chord":
+                used.add(t.cast(str, normalize_chord(event[1])))
+            elif event[0] == "lyric":
+                line.append(event[1])
+            elif event[0] == "line_end":
+                has_phrase = has_phrase or phrase in "".join(line).lower()
+                line = []
+        if chords <= used and has_phrase:
+            found.append(path)
+    return sorted(found)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare searching an index with parsing every song.")
+    parser.add_argument("--songs", type=int, default=2000, help="Number of songs in the corpus.")
+    parser.add_argument("--stanzas", type=int, default=8, help="Number of stanzas in each song.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i in range(args.songs):
+            path = os.path.join(directory, f"song{i:05}.hb")
+            with open(path, "w", encoding="utf-8") as outfile:
+                outfile.write(generate(args.stanzas, seed=i))
+            paths.append(path)
+
+        with SearchIndex(os.path.join(directory, "index.db")) as index:
+            start = time.perf_counter()
+            index.update([directory])
+            print(f"Indexing {args.songs} songs: {time.perf_counter() - start:.2f} s")
+
+            start = time.perf_counter()
+            update = index.update([directory])
+            print(f"Updating with nothing changed: {(time.perf_counter() - start) * 1000:.1f} ms ({update.unchanged} unchanged)")
+
+            chords, phrase = ["F#m", "Bbadd9"], "lonely world midnight"
+            start = time.perf_counter()
+            found = index.search(chords, phrase)
+            print(f"Indexed query: {(time.perf_counter() - start) * 1000:.1f} ms, {len(found)} songs")
+
+        start = time.perf_counter()
+        scanned = scan(paths, {normalize_chord(chord) for chord in chords}, phrase)
+        print(f"Full scan: {(time.perf_counter() - start) * 1000:.1f} ms, {len(scanned)} songs")
+
+    if found != scanned:
+        print("Results differ!")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
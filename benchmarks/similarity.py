@@ -0,0 +1,92 @@
+"""
+Similarity benchmark.
+
+Indexes generated corpora of increasing size, each with a transposed copy of
+one of its songs, then compares finding that copy through the index against
+comparing the song with every other one.
+
+    python benchmarks/similarity.py --songs 500 1000 2000
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hibiki.similarity import SimilarityIndex, signature  # noqa: E402
+from hibiki.transpose import transpose_chord  # noqa: E402
+
+from memory import CHORDS  # noqa: E402
+
+
+# Real lyrics are drawn from far more words than memory.py's generator uses,
+# which would make every generated song look alike.
+SYLLABLES = ["ka", "lo", "mi", "ren", "su", "ta", "vel", "do", "ne", "ri", "sha", "mon"]
+VOCABULARY = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in ("", "n", "s")]
+
+
+def generate(stanzas: int, seed: int=0) -> str:
+    """Generate a song with the given number of stanzas."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(stanzas):
+        out.append(f"[Verse {i}]")
+        for _ in range(rng.randint(2, 8)):
+            out.append(" ".join(f"{{{rng.choice(CHORDS)}}}{rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}" for _ in range(rng.randint(2, 6))))
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def transpose_source(text: str, semitones: int) -> str:
+    """Transpose every chord written in some source."""
+    return re.sub(r"\{([^}]*)\}", lambda match: "{" + transpose_chord(match.group(1), semitones).text + "}", text)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare finding similar songs with an index against comparing every pair.")
+    parser.add_argument("--songs", type=int, nargs="+", default=[500, 1000, 2000], help="Sizes of corpus to try.")
+    parser.add_argument("--stanzas", type=int, default=8, help="Number of stanzas in each song.")
+    args = parser.parse_args()
+
+    for songs in args.songs:
+        with tempfile.TemporaryDirectory() as directory:
+            for i in range(songs):
+                with open(os.path.join(directory, f"song{i:05}.hb"), "w", encoding="utf-8") as outfile:
+                    outfile.write(generate(args.stanzas, seed=i))
+            target = os.path.join(directory, "song00000.hb")
+            with open(target, "r", encoding="utf-8") as infile:
+                copy = transpose_source(infile.read(), 3)
+            with open(os.path.join(directory, "copy.hb"), "w", encoding="utf-8") as outfile:
+                outfile.write(copy)
+
+            with SimilarityIndex(os.path.join(directory, "similar.db")) as index:
+                start = time.perf_counter()
+                index.update([directory])
+                indexing = time.perf_counter() - start
+
+                start = time.perf_counter()
+                matches = index.similar(target, threshold=0.8)
+                query = time.perf_counter() - start
+
+                # Comparing against every song, with signatures already worked out.
+                rows = index.db.execute("SELECT id FROM songs").fetchall()
+                mine = signature(open(target, encoding="utf-8").read())
+                start = time.perf_counter()
+                for (song,) in rows:
+                    mine.similarity(index._signature_of(song))
+                scan = time.perf_counter() - start
+
+            print(
+                f"{songs} songs: indexed in {indexing:.2f} s, query {query * 1000:.1f} ms, "
+                f"every pair {scan * 1000:.1f} ms, found {[os.path.basename(match.path) for match in matches]}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Work queue benchmark.
+
+Queues a generated corpus of songs, then renders it with increasing numbers
+of worker processes on this machine, reporting the throughput of each.
+
+    python benchmarks/workqueue.py --songs 500 --workers 1 2 4
+"""
+from __future__ import annotations
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from hibiki.workqueue import WorkQueue  # noqa: E402
+
+from memory import generate  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure work queue throughput against the number of workers.")
+    parser.add_argument("--songs", type=int, default=500, help="Number of songs to render.")
+    parser.add_argument("--stanzas", type=int, default=8, help="Number of stanzas in each song.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Numbers of workers to try.")
+    args = parser.parse_args()
+
+    print(f"{args.songs} songs, {os.cpu_count()} CPUs")
+    with tempfile.TemporaryDirectory() as directory:
+        songs = os.path.join(directory, "songs")
+        os.makedirs(songs)
+        for i in range(args.songs):
+            with open(os.path.join(songs, f"song{i:05}.hb"), "w", encoding="utf-8") as outfile:
+                outfile.write(generate(args.stanzas, seed=i))
+
+        for workers in args.workers:
+            path = os.path.join(directory, f"jobs{workers}.db")
+            with WorkQueue(path) as queue:
+                queue.enqueue([songs], os.path.join(directory, f"out{workers}"))
+
+            start = time.perf_counter()
+            processes = [
+                subprocess.Popen(
+                    [sys.executable, "-m", "hibiki", "worker", path, "--exit-when-empty", "--quiet", "--poll", "0.05"],
+                    cwd=ROOT, stdout=subprocess.DEVNULL
+                )
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.wait()
+            elapsed = time.perf_counter() - start
+
+            with WorkQueue(path) as queue:
+                progress = queue.progress()
+            print(f"{workers} worker(s): {elapsed:.2f} s, {progress.done / elapsed:.1f} songs/s ({progress})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,17 @@
 from .chord import Chord
-from .errors import HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall
-from .stanza import Stanza, Space, Line
+from .modifiers import Modifier, register_modifier
+from .errors import HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall, RecallCycle, RecallTooLarge, IncludeError, IncludeCycle, ResourceLimitExceeded
+from .stanza import Stanza, RecalledStanza, SpanStanza, Space, Line, SpanLine
 from .lexer import hibiki_lexer
 from .parser import HibikiParser
-from .renderer import HibikiRenderer, render, render_file
+from .song import Song, Occurrence
+from .renderer import HibikiRenderer, render, render_file, render_formats, render_stanza, render_range
+from .outline import Outline, OutlineEntry, outline
+from .events import EventHandler, iter_events, walk
+from .layout import SongLayout, StanzaLayout, LineLayout, Segment
+from .emitters import Emitter, register_emitter
+from .limits import Limits
+from .profiling import profile
 
 
 __VERSION__ = "1.0.3"
@@ -12,10 +20,18 @@ __AUTHOR__ = "taira"
 
 __all__ = [
     Chord,
-    HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall,
-    Stanza, Space, Line,
-    HibikiRenderer, render, render_file,
+    Modifier, register_modifier,
+    HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall, RecallCycle, RecallTooLarge, IncludeError, IncludeCycle, ResourceLimitExceeded,
+    Stanza, RecalledStanza, SpanStanza, Space, Line, SpanLine,
+    HibikiRenderer, render, render_file, render_formats, render_stanza, render_range,
+    Outline, OutlineEntry, outline,
+    EventHandler, iter_events, walk,
+    SongLayout, StanzaLayout, LineLayout, Segment,
+    Emitter, register_emitter,
+    Limits,
+    profile,
     HibikiParser,
+    Song, Occurrence,
     hibiki_lexer,
     __VERSION__,
     __AUTHOR__
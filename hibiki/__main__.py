@@ -1,22 +1,68 @@
 from hibiki import render_file
+from hibiki.profiling import profile
+from hibiki.check import main as check_main
+from hibiki.bundle import main as pack_main
+from hibiki.book import main as book_main
+from hibiki.search import index_main, main as search_main
+from hibiki.similarity import main as similar_main
+from hibiki.workqueue import main as queue_main, worker_main
+import os
 import sys
 
 
-def main() -> int:
-    if len(sys.argv) == 1:
-        print("Missing argument: file path\nUsage: hibiki /path/to/file.hb")
-        return 1
+# Subcommands, ex `hibiki check`. Anything else is treated as a file to render.
+COMMANDS = {
+    "check": check_main,
+    "pack": pack_main,
+    "book": book_main,
+    "index": index_main,
+    "search": search_main,
+    "similar": similar_main,
+    "queue": queue_main,
+    "worker": worker_main,
+}
 
+
+def render(path: str, profile_prefix: str | None=None) -> int:
     try:
-        print(render_file(sys.argv[1]))
+        if profile_prefix is None:
+            print(render_file(path))
+        else:
+            with profile(profile_prefix):
+                output = render_file(path)
+            print(output)
         return 0
     except FileNotFoundError:
-        print(f"'{sys.argv[1]}' file does not exist.")
+        print(f"'{path}' file does not exist.")
         return 2
     except PermissionError:
-        print(f"Permission denied when opening '{sys.argv[1]}'")
+        print(f"Permission denied when opening '{path}'")
         return 3
 
 
+def main() -> int:
+    if len(sys.argv) == 1:
+        print("Missing argument: file path\nUsage: hibiki /path/to/file.hb")
+        return 1
+
+    if sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
+    # `--profile` writes the profile to the current directory, named after
+    # the song, unless given a path with `--profile=PATH`.
+    args = sys.argv[1:]
+    profile_prefix = None
+    for arg in list(args):
+        if arg == "--profile" or arg.startswith("--profile="):
+            args.remove(arg)
+            profile_prefix = arg.partition("=")[2] or None
+            if profile_prefix is None and args:
+                profile_prefix = os.path.splitext(os.path.basename(args[0]))[0]
+    if not args:
+        print("Missing argument: file path\nUsage: hibiki /path/to/file.hb [--profile[=PATH]]")
+        return 1
+    return render(args[0], profile_prefix)
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
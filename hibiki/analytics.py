@@ -0,0 +1,424 @@
+"""
+Chord analytics over a corpus of songs.
+
+Chords are read straight off of the event stream, normalized the same way
+`hibiki.search` normalizes them, and encoded as integers. Statistics for a
+whole corpus are then worked out in one go with NumPy: how often each chord
+is played, the pitch classes each song spends its time on, the key each song
+is most likely in, and the most common progressions.
+
+Songs are analyzed in the order they're played. Repeated stanzas and lines
+with a multiplier count once per repeat, the chord a hammer-on lands on is
+played right after the chord it starts from, and N.C. breaks progressions
+without counting as a chord.
+
+The features of each song only depend on its source and the libraries it
+includes, so they're cached by a hash of those, in memory and optionally on
+disk.
+
+This module requires NumPy, installed with `pip install hibiki[analytics]`.
+"""
+from __future__ import annotations
+import os
+import tempfile
+import typing as t
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("hibiki.analytics requires NumPy. Install it with `pip install hibiki[analytics]`.") from e
+
+from .events import iter_events
+from .include import source_fingerprint
+from .search import NORMALIZED_REGEX, normalize_chord
+from .transpose import PITCH_CLASSES, SHARP_NAMES
+
+
+# Marks a break in a progression, like N.C., in encoded chords.
+BREAK = -1
+
+# The intervals above the root of each chord quality Hibiki recognizes.
+# Qualities are matched by their longest prefix, so "m7b5" isn't mistaken
+# for "m7", and anything unrecognized after a quality is ignored.
+QUALITIES: dict[str, tuple[int, ...]] = {
+    "": (0, 4, 7), "maj": (0, 4, 7), "M": (0, 4, 7),
+    "m": (0, 3, 7), "min": (0, 3, 7), "-": (0, 3, 7),
+    "5": (0, 7),
+    "6": (0, 4, 7, 9), "m6": (0, 3, 7, 9),
+    "7": (0, 4, 7, 10), "maj7": (0, 4, 7, 11), "M7": (0, 4, 7, 11),
+    "m7": (0, 3, 7, 10), "min7": (0, 3, 7, 10), "mmaj7": (0, 3, 7, 11), "mM7": (0, 3, 7, 11),
+    "9": (0, 2, 4, 7, 10), "maj9": (0, 2, 4, 7, 11), "m9": (0, 2, 3, 7, 10),
+    "11": (0, 2, 4, 5, 7, 10), "13": (0, 2, 4, 7, 9, 10),
+    "add9": (0, 2, 4, 7), "madd9": (0, 2, 3, 7), "add2": (0, 2, 4, 7),
+    "sus": (0, 5, 7), "sus2": (0, 2, 7), "sus4": (0, 5, 7), "7sus4": (0, 5, 7, 10),
+    "dim": (0, 3, 6), "dim7": (0, 3, 6, 9), "m7b5": (0, 3, 6, 10),
+    "aug": (0, 4, 8), "+": (0, 4, 8),
+}
+
+# Krumhansl-Kessler key profiles, starting from the tonic.
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# Every key's profile, major keys from C followed by minor keys from C.
+KEY_NAMES = [f"{name} major" for name in SHARP_NAMES] + [f"{name} minor" for name in SHARP_NAMES]
+KEY_PROFILES = np.array(
+    [np.roll(MAJOR_PROFILE, tonic) for tonic in range(12)]
+    + [np.roll(MINOR_PROFILE, tonic) for tonic in range(12)]
+)
+
+
+def chord_pitch_classes(chord: str) -> tuple[int, ...]:
+    """
+    Get the pitch classes making up a normalized chord.
+
+    Parameters
+    ----------
+    chord: str
+        The chord, as normalized by `hibiki.search.normalize_chord`.
+
+    Returns
+    -------
+    tuple[int, ...]
+        The pitch classes of the chord's tones, bass note included, or
+        nothing if the chord doesn't have a recognizable root.
+    """
+    match = NORMALIZED_REGEX.match(chord)
+    if match is None:
+        return ()
+
+    root, quality, bass = match.groups()
+    intervals = next(QUALITIES[quality[:i]] for i in range(len(quality), -1, -1) if quality[:i] in QUALITIES)
+    tones = [(PITCH_CLASSES[root] + interval) % 12 for interval in intervals]
+    if bass is not None and PITCH_CLASSES[bass] not in tones:
+        tones.append(PITCH_CLASSES[bass])
+    return tuple(tones)
+
+
+def song_chords(text: str, path: str | None=None) -> list[str | None]:
+    """
+    Get the chords of a song in the order they're played.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code of the song.
+    path: str | None
+        The path of the file the source came from, if any.
+
+    Returns
+    -------
+    list[str | None]
+        The normalized chords, with None wherever a progression breaks.
+    """
+    played: list[str | None] = []
+    stanza: list[str | None] = []
+    line: list[str | None] = []
+    repeat_count = 1
+
+    for event in iter_events(text, path=path):
+        kind = event[0]
+        if kind == "chord":
+            chord = event[1]
+            line.append(normalize_chord(chord))
+            if chord.hammer_into is not None:
+                line.append(normalize_chord(chord.hammer_into))
+        elif kind == "line_end":
+            stanza.extend(line * event[2])
+            line = []
+        elif kind == "stanza_start":
+            repeat_count = max(event[2], 1)
+        elif kind == "stanza_end":
+            played.extend(stanza * repeat_count)
+            stanza = []
+    return played
+
+
+class SongFeatures:
+    """
+    The chord features of a single song.
+
+    Attributes
+    ----------
+    chords: list[str | None]
+        The song's normalized chords in the order they're played, with None
+        wherever a progression breaks.
+    pitch_classes: np.ndarray
+        How often each of the 12 pitch classes is played, counting every tone
+        of every chord.
+    roots: np.ndarray
+        How often a chord is played on each of the 12 pitch classes.
+    """
+    def __init__(self, chords: list[str | None], pitch_classes: np.ndarray | None=None, roots: np.ndarray | None=None):
+        self.chords = chords
+        if pitch_classes is not None and roots is not None:
+            self.pitch_classes = pitch_classes
+            self.roots = roots
+            return
+
+        self.pitch_classes = np.zeros(12)
+        self.roots = np.zeros(12)
+        names, counts = np.unique(np.array([chord for chord in chords if chord is not None], dtype=str), return_counts=True)
+        for name, count in zip(names, counts):
+            tones = chord_pitch_classes(str(name))
+            if tones:
+                self.pitch_classes[list(tones)] += count
+                self.roots[tones[0]] += count
+
+    def __repr__(self) -> str:
+        return f"<SongFeatures: {len(self.chords)} chords>"
+
+    @property
+    def vector(self) -> np.ndarray:
+        """The song's pitch class and root histograms, each scaled to sum to 1."""
+        return np.concatenate([_scaled(self.pitch_classes), _scaled(self.roots)])
+
+
+def _scaled(histogram: np.ndarray) -> np.ndarray:
+    total = histogram.sum()
+    return histogram / total if total else histogram
+
+
+class FeatureCache:
+    """
+    A cache of song features, keyed by a hash of each song's source.
+
+    Features saved to disk are shared between processes and runs, so a
+    dashboard rebuilt every night only analyzes the songs which changed.
+
+    Attributes
+    ----------
+    directory: str | None
+        Where features are saved on disk, if anywhere. Without one, features
+        are only cached in memory.
+    """
+    def __init__(self, directory: str | None=None):
+        self.directory = directory
+        self._features: dict[str, SongFeatures] = {}
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"<FeatureCache: {len(self._features)} songs>"
+
+    def get(self, text: str, path: str | None=None) -> SongFeatures:
+        """
+        Get the features of a song, working them out only if they aren't cached.
+
+        Parameters
+        ----------
+        text: str
+            The Hibiki source code of the song.
+        path: str | None
+            The path of the file the source came from, if any.
+
+        Returns
+        -------
+        SongFeatures
+            The song's features.
+        """
+        # Songs have to be analyzed again whenever a library they include
+        # changes, so the key covers those too.
+        key, _ = source_fingerprint(text.encode("utf-8"), path)
+        features = self._features.get(key)
+        if features is not None:
+            return features
+
+        cached = os.path.join(self.directory, f"{key}.npz") if self.directory is not None else None
+        if cached is not None and os.path.exists(cached):
+            with np.load(cached, allow_pickle=False) as data:
+                chords = [str(chord) or None for chord in data["chords"]]
+                features = SongFeatures(chords, data["pitch_classes"], data["roots"])
+        else:
+            features = SongFeatures(song_chords(text, path))
+            if cached is not None:
+                # Saved to a temporary file first so a half-written file is
+                # never mistaken for a cached one.
+                fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+                with os.fdopen(fd, "wb") as outfile:
+                    np.savez(
+                        outfile,
+                        chords=np.array([chord or "" for chord in features.chords], dtype=str),
+                        pitch_classes=features.pitch_classes,
+                        roots=features.roots
+                    )
+                os.replace(temp, cached)
+
+        self._features[key] = features
+        return features
+
+
+class CorpusAnalysis:
+    """
+    Chord statistics for a corpus of songs.
+
+    Attributes
+    ----------
+    songs: list[str]
+        The name of each song, in the order they were given.
+    vocabulary: list[str]
+        Every chord played in the corpus. Chords are encoded as indices into
+        this list.
+    sequences: np.ndarray
+        Every song's encoded chords one after another, in the order they're
+        played, with a `BREAK` after each song and wherever its progressions
+        break.
+    counts: np.ndarray
+        How often each song plays each chord, as a (songs, chords) array.
+    pitch_classes: np.ndarray
+        How often each song plays each pitch class, as a (songs, 12) array.
+    features: np.ndarray
+        Each song's feature vector, as a (songs, 24) array.
+    """
+    def __init__(self, songs: list[str], features: list[SongFeatures]):
+        self.songs = songs
+
+        chords = [chord for song in features for chord in song.chords if chord is not None]
+        self.vocabulary: list[str] = sorted(set(chords))
+        ids = {chord: i for i, chord in enumerate(self.vocabulary)}
+
+        encoded: list[int] = []
+        song_of: list[int] = []
+        for i, song in enumerate(features):
+            encoded.extend(BREAK if chord is None else ids[chord] for chord in song.chords)
+            encoded.append(BREAK)
+            song_of.extend([i] * (len(song.chords) + 1))
+        self.sequences = np.array(encoded, dtype=np.int32)
+        self._song_of = np.array(song_of, dtype=np.int32)
+
+        played = self.sequences != BREAK
+        size = len(self.vocabulary)
+        self.counts = np.bincount(
+            self._song_of[played] * size + self.sequences[played],
+            minlength=len(songs) * size
+        ).reshape(len(songs), size)
+
+        self.pitch_classes = np.array([song.pitch_classes for song in features]).reshape(len(songs), 12)
+        self.features = np.array([song.vector for song in features]).reshape(len(songs), 24)
+
+    def __repr__(self) -> str:
+        return f"<CorpusAnalysis: {len(self.songs)} songs, {len(self.vocabulary)} chords>"
+
+    def chord_frequency(self, top: int | None=None) -> list[tuple[str, int]]:
+        """
+        Get how often each chord is played across the corpus.
+
+        Parameters
+        ----------
+        top: int | None
+            How many of the most played chords to return. Defaults to all.
+
+        Returns
+        -------
+        list[tuple[str, int]]
+            Pairs of (chord, times played), most played first.
+        """
+        totals = self.counts.sum(axis=0)
+        order = np.argsort(-totals, kind="stable")[:top]
+        return [(self.vocabulary[i], int(totals[i])) for i in order]
+
+    @property
+    def corpus_pitch_classes(self) -> np.ndarray:
+        """How often each pitch class is played across the whole corpus."""
+        return self.pitch_classes.sum(axis=0)
+
+    def key_scores(self) -> np.ndarray:
+        """
+        Correlate every song with every key's profile.
+
+        Returns
+        -------
+        np.ndarray
+            A (songs, 24) array of correlations, with keys ordered as in
+            `KEY_NAMES`. Songs without any recognizable chords score 0.
+        """
+        histograms = self.pitch_classes - self.pitch_classes.mean(axis=1, keepdims=True)
+        profiles = KEY_PROFILES - KEY_PROFILES.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(histograms, axis=1, keepdims=True) * np.linalg.norm(profiles, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = (histograms @ profiles.T) / norms
+        return np.nan_to_num(scores)
+
+    @property
+    def keys(self) -> list[str | None]:
+        """The most likely key of each song, or None if it has no recognizable chords."""
+        scores = self.key_scores()
+        best = scores.argmax(axis=1)
+        return [KEY_NAMES[key] if self.pitch_classes[i].any() else None for i, key in enumerate(best)]
+
+    def progressions(self, n: int, top: int | None=10, song: int | None=None) -> list[tuple[tuple[str, ...], int]]:
+        """
+        Get the most common progressions of a given length.
+
+        Parameters
+        ----------
+        n: int
+            The number of chords in a progression.
+        top: int | None
+            How many of the most common progressions to return. Defaults to 10,
+            and None returns all of them.
+        song: int | None
+            The index of a single song to look at. Defaults to the whole corpus.
+
+        Returns
+        -------
+        list[tuple[tuple[str, ...], int]]
+            Pairs of (progression, times played), most common first.
+        """
+        sequences = self.sequences if song is None else self.sequences[self._song_of == song]
+        if n < 1 or len(sequences) < n:
+            return []
+
+        windows = np.lib.stride_tricks.sliding_window_view(sequences, n)
+        windows = windows[(windows != BREAK).all(axis=1)]
+        if len(windows) == 0:
+            return []
+
+        # Each progression becomes a single number, so they can be counted
+        # with one call to unique.
+        base = np.int64(len(self.vocabulary))
+        codes = windows.astype(np.int64) @ (base ** np.arange(n - 1, -1, -1, dtype=np.int64))
+        unique, counts = np.unique(codes, return_counts=True)
+        order = np.argsort(-counts, kind="stable")[:top]
+
+        out = []
+        for code, count in zip(unique[order], counts[order]):
+            chords = []
+            for _ in range(n):
+                code, chord = divmod(int(code), int(base))
+                chords.append(self.vocabulary[chord])
+            out.append((tuple(reversed(chords)), int(count)))
+        return out
+
+
+def analyze(songs: t.Mapping[str, str] | t.Iterable[str], cache: FeatureCache | None=None) -> CorpusAnalysis:
+    """
+    Analyze the chords of a corpus of songs.
+
+    Parameters
+    ----------
+    songs: t.Mapping[str, str] | t.Iterable[str]
+        Either a mapping of song names to source, or the paths of files to
+        read.
+    cache: FeatureCache | None
+        Where to cache the features of each song. Defaults to a cache which
+        lasts as long as this call.
+
+    Returns
+    -------
+    CorpusAnalysis
+        Statistics for the corpus.
+    """
+    cache = cache or FeatureCache()
+    names: list[str] = []
+    features: list[SongFeatures] = []
+
+    if isinstance(songs, t.Mapping):
+        for name, text in songs.items():
+            names.append(name)
+            features.append(cache.get(text))
+    else:
+        for path in songs:
+            with open(path, "r", encoding="utf-8") as infile:
+                names.append(path)
+                features.append(cache.get(infile.read(), path))
+    return CorpusAnalysis(names, features)
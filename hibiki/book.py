@@ -0,0 +1,260 @@
+"""
+Songbook compilation.
+
+Builds a single document out of an ordered manifest of songs, complete with a
+table of contents. Songs are rendered in parallel, and each rendered song is
+kept in a cache on disk keyed by its source, so rebuilding a book only renders
+the songs which changed. The book itself is streamed to disk from the cache,
+so memory use doesn't grow with the size of the book.
+
+A manifest is a text file listing one song per line, relative to the
+manifest. Blank lines and lines starting with # are ignored, and a title can
+be given after a | to use in place of the file's name:
+
+    # Friday setlist
+    songs/dont_stop_believin.hb | Don't Stop Believin'
+    songs/bohemian_rhapsody.hb
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+from .errors import HibikiError
+from .include import source_fingerprint
+from .parser import HibikiParser
+from .renderer import HibikiRenderer
+from .modifiers import MODIFIERS, restore_modifiers
+
+
+class BookError(HibikiError):
+    """
+    Thrown when a book can't be built because songs in it failed.
+
+    Attributes
+    ----------
+    failures: list[tuple[str, str]]
+        Pairs of (song path, reason) for every song which failed.
+    """
+    def __init__(self, failures: list[tuple[str, str]]):
+        self.failures = failures
+        details = "\n".join(f"  {path}: {reason}" for path, reason in failures)
+        super().__init__(f"{len(failures)} song(s) could not be rendered:\n{details}")
+
+
+class BookEntry:
+    """
+    A song within a book.
+
+    Attributes
+    ----------
+    path: str
+        The path to the song's source.
+    title: str
+        The title shown in the table of contents.
+    line: int
+        The line of the book the song starts on. (1 indexed)
+    page: int
+        The page of the book the song starts on. (1 indexed)
+    length: int
+        The number of lines the song takes up in the book.
+    """
+    def __init__(self, path: str, title: str):
+        self.path = path
+        self.title = title
+        self.line: int = 0
+        self.page: int = 0
+        self.length: int = 0
+
+    def __repr__(self) -> str:
+        return f"<BookEntry: {self.title} @ line {self.line}>"
+
+
+def read_manifest(path: str) -> list[BookEntry]:
+    """
+    Read a book manifest.
+
+    Parameters
+    ----------
+    path: str
+        The path to the manifest.
+
+    Returns
+    -------
+    list[BookEntry]
+        The songs in the book, in order.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    entries: list[BookEntry] = []
+
+    with open(path, "r", encoding="utf-8") as infile:
+        for line in infile:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            song, _, title = line.partition("|")
+            song = os.path.join(base, song.strip())
+            title = title.strip() or os.path.splitext(os.path.basename(song))[0]
+            entries.append(BookEntry(song, title))
+    return entries
+
+
+def _render_to_cache(job: tuple[str, str, dict[str, t.Any]]) -> tuple[str | None, int, str | None]:
+    """
+    Render a song into the cache, unless it's already there.
+
+    Returns the cached file, the number of lines in it, and why the song
+    failed if it did. Only this small summary goes back to the main process;
+    the rendered song itself stays on disk.
+    """
+    path, cache_dir, options = job
+
+    try:
+        with open(path, "rb") as infile:
+            data = infile.read()
+    except OSError as e:
+        return None, 0, str(e)
+
+    try:
+        src = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return None, 0, f"Not valid UTF-8: {e}"
+
+    # Songs which include libraries have to be rendered again whenever one of
+    # those libraries changes, so the key covers them as well as the song.
+    digest, _ = source_fingerprint(data, path)
+    key = hashlib.sha256(repr((sorted(options.items()), digest)).encode("utf-8")).hexdigest()
+    cached = os.path.join(cache_dir, f"{key}.txt")
+
+    # Songs which fail are never cached, so a cached song is always current.
+    if not os.path.exists(cached):
+        try:
+            renderer = HibikiRenderer(**options)
+            output = renderer.render(HibikiParser(path=path, limits=renderer.limits).parse(src))
+        except (HibikiError, SyntaxError) as e:
+            return None, 0, str(e)
+
+        # Written to a temporary file first so a half-written song is never
+        # mistaken for a cached one.
+        fd, temp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+            outfile.write(output)
+        os.replace(temp, cached)
+
+    with open(cached, "rb") as infile:
+        lines = sum(chunk.count(b"\n") for chunk in iter(lambda: infile.read(1 << 16), b""))
+    return cached, lines, None
+
+
+def build_book(
+        entries: list[BookEntry],
+        out_path: str,
+        cache_dir: str,
+        title: str="Songbook",
+        lines_per_page: int=60,
+        jobs: int | None=None,
+        **options: t.Any
+    ) -> list[BookEntry]:
+    """
+    Build a book out of a list of songs.
+
+    Parameters
+    ----------
+    entries: list[BookEntry]
+        The songs in the book, in order.
+    out_path: str
+        Where to write the book.
+    cache_dir: str
+        The directory rendered songs are cached in.
+    title: str
+        The title at the top of the table of contents.
+    lines_per_page: int
+        The number of lines on a page, used to work out page numbers.
+    jobs: int | None
+        The number of worker processes to render with. Defaults to the number
+        of CPUs. With 1, songs are rendered in this process.
+    **options: t.Any
+        Options passed to HibikiRenderer, ex `transpose=2`.
+
+    Returns
+    -------
+    list[BookEntry]
+        The entries, with their positions in the book filled in.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    work = [(entry.path, cache_dir, options) for entry in entries]
+
+    if jobs == 1 or len(work) < 2:
+        results = [_render_to_cache(job) for job in work]
+    else:
+        jobs = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=jobs, initializer=restore_modifiers, initargs=(list(MODIFIERS.values()),)) as pool:
+            results = list(pool.map(_render_to_cache, work, chunksize=max(1, len(work) // (jobs * 4))))
+
+    failures = [(entry.path, error) for entry, (_, _, error) in zip(entries, results) if error is not None]
+    if failures:
+        raise BookError(failures)
+
+    # The table of contents is a title, one line per song, and a blank line.
+    # Knowing its size up front means every song's position can be worked
+    # out before anything is written.
+    line = len(entries) + 3
+    for entry, (_, length, _) in zip(entries, results):
+        # Each song gets a title line, its rendered lines, and a blank line.
+        entry.line = line
+        entry.page = (line - 1) // lines_per_page + 1
+        entry.length = length + 2
+        line += entry.length
+
+    width = len(str(len(entries)))
+    with open(out_path, "w", encoding="utf-8") as outfile:
+        outfile.write(f"{title}\n")
+        for i, entry in enumerate(entries, start=1):
+            outfile.write(f"{i:>{width}}. {entry.title} (line {entry.line}, page {entry.page})\n")
+        outfile.write("\n")
+
+        for entry, (cached, _, _) in zip(entries, results):
+            outfile.write(f"== {entry.title} ==\n")
+            with open(t.cast(str, cached), "r", encoding="utf-8") as infile:
+                shutil.copyfileobj(infile, outfile)
+            outfile.write("\n")
+
+    return entries
+
+
+def main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki book`."""
+    parser = argparse.ArgumentParser(prog="hibiki book", description="Compile a manifest of Hibiki songs into a single book.")
+    parser.add_argument("manifest", help="The manifest listing the songs in the book.")
+    parser.add_argument("output", help="Where to write the book.")
+    parser.add_argument("--title", default="Songbook", help="The title of the book.")
+    parser.add_argument("--cache", default=None, help="Where to cache rendered songs. Defaults to .hibiki-cache beside the manifest.")
+    parser.add_argument("--lines-per-page", type=int, default=60, help="Lines per page, for page numbers.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args(argv)
+
+    cache_dir = args.cache or os.path.join(os.path.dirname(os.path.abspath(args.manifest)), ".hibiki-cache")
+
+    try:
+        entries = build_book(
+            read_manifest(args.manifest),
+            args.output,
+            cache_dir,
+            title=args.title,
+            lines_per_page=args.lines_per_page,
+            jobs=args.jobs,
+        )
+    except FileNotFoundError:
+        print(f"'{args.manifest}' file does not exist.")
+        return 2
+    except BookError as e:
+        print(e)
+        return 1
+
+    print(f"Wrote {len(entries)} song(s) to '{args.output}'.")
+    return 0
@@ -0,0 +1,413 @@
+"""
+Songbook bundles.
+
+A bundle packs many Hibiki sources into a single file so that large
+catalogues can be read without opening every song separately. The layout of
+a bundle is:
+
+    header   magic, version, flags, and where the index is
+    data     every song's UTF-8 source, one after another, each optionally
+             followed by its cached parse data
+    index    JSON mapping each song's id to where its data lives, and the
+             path it was packed from
+
+Bundles are memory-mapped when read, so getting at a single song only touches
+the header, the index and that song's bytes.
+"""
+from __future__ import annotations
+import argparse
+import json
+import mmap
+import os
+import struct
+import typing as t
+
+from .errors import HibikiError, RecallTooLarge
+from .limits import DEFAULT_LIMITS, Budget, Limits
+from .parser import RECALL_REGEX, HibikiParser
+from .renderer import HibikiRenderer
+from .source import SourceIndex
+from .stanza import Stanza, RecalledStanza, document_source
+
+
+MAGIC = b"HBKB"
+VERSION = 1
+
+# magic, version, flags, index offset, index length, song count
+HEADER = struct.Struct("<4sHHQQI")
+
+# Flags
+FLAG_PARSE_CACHE = 1
+
+
+class BundleError(HibikiError):
+    """
+    Thrown when a bundle can't be read or written.
+
+    Attributes
+    ----------
+    path: str
+        The path of the bundle.
+    reason: str
+        Why the bundle couldn't be read or written.
+    """
+    def __init__(self, path: str, reason: str):
+        self.path = path
+        self.reason = reason
+        super().__init__(f"Bundle '{path}': {reason}")
+
+
+def _dump_stanzas(stanzas: list[Stanza], parser: HibikiParser, src: str) -> bytes:
+    """
+    Serialize parsed stanzas, keeping repeats and recalls as references.
+
+    Along with the stanzas goes how far the parser expanded the source, so
+    that loading them can be held to the same limits as parsing them.
+    """
+    document = document_source(stanzas)
+    unique: dict[int, int] = {}
+    definitions: list[t.Any] = []
+
+    def add(stanza: Stanza) -> int:
+        if id(stanza) not in unique:
+            if isinstance(stanza, RecalledStanza):
+                entry: t.Any = {
+                    "recalls": add(stanza.definition),
+                    "repeat_count": stanza.repeat_count,
+                    "line": stanza.recall_line,
+                    "offset": stanza.recall_offset,
+                }
+            else:
+                # Stanzas from included libraries have no offset in this one.
+                offset = stanza.offset if stanza.source is document else None
+                entry = [stanza.heading, stanza.text, stanza.starting_line, stanza.repeat_count, offset]
+            unique[id(stanza)] = len(definitions)
+            definitions.append(entry)
+        return unique[id(stanza)]
+
+    order = [add(stanza) for stanza in stanzas]
+
+    # The largest line recalls expanded, as (line, size), and the size of the
+    # source as a whole with recalls substituted.
+    processed = parser.buffer.split("\n")
+    largest = max(
+        ((i + 1, len(line)) for i, (written, line) in enumerate(zip(src.split("\n"), processed)) if RECALL_REGEX.search(written)),
+        key=lambda recall: recall[1],
+        default=(0, 0)
+    )
+    expansion = {
+        "expanded": parser.budget.expanded,
+        "output_bytes": sum(len(line.encode("utf-8")) for line in processed),
+        "largest_recall": largest,
+    }
+    return json.dumps({"stanzas": definitions, "order": order, "expansion": expansion}, ensure_ascii=False).encode("utf-8")
+
+
+def _load_stanzas(data: bytes, src: str, budget: Budget) -> list[Stanza]:
+    """Rebuild parsed stanzas serialized by `_dump_stanzas`, counting them towards a budget."""
+    cached = json.loads(data.decode("utf-8"))
+    source = SourceIndex(src if src.endswith("\n\n") else src + "\n\n")
+    definitions: list[Stanza] = []
+
+    # The same limits the parser would have checked while expanding recalls.
+    expansion = cached["expansion"]
+    line_no, size = expansion["largest_recall"]
+    if size > budget.limits.max_recall_size:
+        raise RecallTooLarge(line_no, size, budget.limits.max_recall_size)
+    budget.add_expanded(expansion["expanded"])
+    budget.add_output_bytes(expansion["output_bytes"])
+
+    # Recalls always come after what they recall.
+    for entry in cached["stanzas"]:
+        if isinstance(entry, dict):
+            definitions.append(RecalledStanza(
+                definitions[entry["recalls"]],
+                repeat_count=entry["repeat_count"],
+                recall_line=entry["line"],
+                recall_offset=entry["offset"],
+                recall_source=source
+            ))
+        else:
+            heading, text, starting_line, repeat_count, offset = entry
+            definitions.append(Stanza(
+                heading, text, starting_line,
+                repeat_count=repeat_count,
+                offset=offset,
+                source=source if offset is not None else None
+            ))
+
+    stanzas = [definitions[i] for i in cached["order"]]
+    count_lines = budget.limits.max_lines is not None
+    for stanza in stanzas:
+        budget.add_stanzas()
+        if count_lines:
+            budget.add_lines(len(stanza.lines))
+    return stanzas
+
+
+def pack(sources: t.Iterable[tuple[str, str]], out_path: str, cache_parse: bool=False) -> int:
+    """
+    Pack Hibiki sources into a bundle.
+
+    Sources are written out one at a time, so only the index is held in
+    memory while packing. Each song's path is stored with it, so that songs
+    parsed from the bundle resolve includes the same way they did here.
+
+    Parameters
+    ----------
+    sources: t.Iterable[tuple[str, str]]
+        Pairs of (song id, path to the song's source file).
+    out_path: str
+        Where to write the bundle.
+    cache_parse: bool
+        Whether to store each song's parsed stanzas alongside its source.
+        Songs which fail to parse are stored without any.
+
+    Returns
+    -------
+    int
+        The number of songs packed.
+
+    Raises
+    ------
+    BundleError
+        If a source isn't valid UTF-8.
+    """
+    index: dict[str, list] = {}
+
+    with open(out_path, "wb") as outfile:
+        outfile.write(b"\0" * HEADER.size)
+
+        for song_id, path in sources:
+            with open(path, "rb") as infile:
+                data = infile.read()
+
+            try:
+                src = data.decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise BundleError(out_path, f"'{path}' is not valid UTF-8: {e}")
+
+            offset = outfile.tell()
+            outfile.write(data)
+            path = os.path.abspath(path)
+            entry: list = [offset, len(data), path]
+
+            if cache_parse:
+                try:
+                    parser = HibikiParser(path=path)
+                    parsed = _dump_stanzas(parser.parse(src), parser, src)
+                    entry += [outfile.tell(), len(parsed)]
+                    outfile.write(parsed)
+                except (HibikiError, SyntaxError, ValueError):
+                    pass
+
+            index[song_id] = entry
+
+        index_data = json.dumps(index, ensure_ascii=False).encode("utf-8")
+        index_offset = outfile.tell()
+        outfile.write(index_data)
+
+        flags = FLAG_PARSE_CACHE if cache_parse else 0
+        outfile.seek(0)
+        outfile.write(HEADER.pack(MAGIC, VERSION, flags, index_offset, len(index_data), len(index)))
+
+    return len(index)
+
+
+def pack_directory(directory: str, out_path: str, cache_parse: bool=False) -> int:
+    """
+    Pack every .hb file within a directory into a bundle.
+
+    Songs are identified by their path relative to the directory, using
+    forward slashes regardless of platform.
+
+    Parameters
+    ----------
+    directory: str
+        The directory to search, recursively.
+    out_path: str
+        Where to write the bundle.
+    cache_parse: bool
+        Whether to store each song's parsed stanzas alongside its source.
+
+    Returns
+    -------
+    int
+        The number of songs packed.
+    """
+    def sources() -> t.Iterator[tuple[str, str]]:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(".hb"):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, directory).replace(os.sep, "/"), path
+
+    return pack(sources(), out_path, cache_parse=cache_parse)
+
+
+class Bundle:
+    """
+    A memory-mapped songbook bundle.
+
+    Can be used as a context manager, which closes the bundle on exit.
+
+    Attributes
+    ----------
+    path: str
+        The path of the bundle.
+    index: dict[str, list]
+        Where each song's data lives within the bundle, by song id.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BundleError(path, "file is empty.")
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise BundleError(path, "file is too short to be a bundle.")
+
+        magic, version, self.flags, index_offset, index_length, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise BundleError(path, "not a Hibiki bundle.")
+        if version > VERSION:
+            self.close()
+            raise BundleError(path, f"unsupported bundle version {version}.")
+
+        self.index: dict[str, list] = json.loads(self._map[index_offset:index_offset + index_length].decode("utf-8"))
+
+    def __repr__(self) -> str:
+        return f"<Bundle: {self.path} ({len(self)} songs)>"
+
+    def __enter__(self) -> Bundle:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self.index)
+
+    def __contains__(self, song_id: object) -> bool:
+        return song_id in self.index
+
+    def close(self) -> None:
+        if hasattr(self, "_map"):
+            self._map.close()
+        self._file.close()
+
+    def _entry(self, song_id: str) -> list:
+        try:
+            return self.index[song_id]
+        except KeyError:
+            raise KeyError(f"No song '{song_id}' in bundle '{self.path}'.")
+
+    def source(self, song_id: str) -> str:
+        """
+        Get the source of a single song.
+
+        Parameters
+        ----------
+        song_id: str
+            The id of the song.
+
+        Returns
+        -------
+        str
+            The song's Hibiki source code.
+        """
+        offset, length = self._entry(song_id)[:2]
+        return self._map[offset:offset + length].decode("utf-8")
+
+    def parse(self, song_id: str, limits: Limits | None=None) -> list[Stanza]:
+        """
+        Parse a single song, using its cached parse data if there is any.
+
+        Parameters
+        ----------
+        song_id: str
+            The id of the song.
+        limits: Limits | None
+            The limits to parse within. Cached parse data is held to them as
+            well, as though it had just been parsed.
+
+        Returns
+        -------
+        list[Stanza]
+            The song's parsed stanzas.
+        """
+        entry = self._entry(song_id)
+        src = self.source(song_id)
+
+        limits = limits or DEFAULT_LIMITS
+        path = entry[2]
+        if len(entry) == 5:
+            offset, length = entry[3:]
+            return _load_stanzas(self._map[offset:offset + length], src, limits.budget())
+        return HibikiParser(path=path, limits=limits).parse(src)
+
+    def render(self, song_id: str, renderer: HibikiRenderer | None=None) -> str:
+        """
+        Render a single song.
+
+        Parameters
+        ----------
+        song_id: str
+            The id of the song.
+        renderer: HibikiRenderer | None
+            The renderer to use. Defaults to a plain HibikiRenderer.
+
+        Returns
+        -------
+        str
+            The rendered song.
+        """
+        renderer = renderer or HibikiRenderer()
+        return renderer.render(self.parse(song_id, renderer.limits))
+
+    def iter_render(self, renderer: HibikiRenderer | None=None) -> t.Iterator[tuple[str, str]]:
+        """
+        Render every song in the bundle, one at a time.
+
+        Songs come out in the order they're stored, so the bundle is read from
+        front to back.
+
+        Parameters
+        ----------
+        renderer: HibikiRenderer | None
+            The renderer to use. Defaults to a plain HibikiRenderer.
+
+        Yields
+        ------
+        tuple[str, str]
+            Pairs of (song id, rendered song).
+        """
+        renderer = renderer or HibikiRenderer()
+        for song_id in sorted(self.index, key=lambda song_id: self.index[song_id][0]):
+            yield song_id, self.render(song_id, renderer)
+
+
+def main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki pack`."""
+    parser = argparse.ArgumentParser(prog="hibiki pack", description="Pack a directory of Hibiki files into a bundle.")
+    parser.add_argument("directory", help="The directory to pack.")
+    parser.add_argument("output", help="Where to write the bundle.")
+    parser.add_argument("--cache-parse", action="store_true", help="Store parsed stanzas alongside each song.")
+    args = parser.parse_args(argv)
+
+    try:
+        count = pack_directory(args.directory, args.output, cache_parse=args.cache_parse)
+    except BundleError as e:
+        print(e)
+        return 1
+    print(f"Packed {count} song(s) into '{args.output}'.")
+    return 0
@@ -0,0 +1,205 @@
+"""
+Validate-only checking of Hibiki files.
+
+Runs recall resolution, heading recall/redefinition checks, the lexer and
+chord checks over a set of files without laying out any chords or lyrics,
+reporting every error found in each file. Files are checked in parallel.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+from .diagnostics import Diagnostic, Validator
+from .modifiers import MODIFIERS, restore_modifiers
+
+
+class CheckResult:
+    """
+    The outcome of checking a single file.
+
+    Attributes
+    ----------
+    path: str
+        The path of the file which was checked.
+    diagnostics: list[Diagnostic]
+        Every problem found in the file.
+    failure: str | None
+        Why the file couldn't be read, if it couldn't.
+    """
+    def __init__(self, path: str, diagnostics: list[Diagnostic] | None=None, failure: str | None=None):
+        self.path = path
+        self.diagnostics = diagnostics or []
+        self.failure = failure
+
+    def __repr__(self) -> str:
+        return f"<CheckResult: {self.path} ({len(self.diagnostics)} errors)>"
+
+    @property
+    def ok(self) -> bool:
+        """Whether or not the file is valid."""
+        return self.failure is None and not self.diagnostics
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            "path": self.path,
+            "valid": self.ok,
+            "failure": self.failure,
+            "errors": [
+                {
+                    "type": diagnostic.kind,
+                    "line": diagnostic.line,
+                    "column": diagnostic.column,
+                    "end_column": diagnostic.end_column,
+                    "message": diagnostic.message,
+                }
+                for diagnostic in self.diagnostics
+            ],
+        }
+
+
+def check(text: str, path: str | None=None) -> list[Diagnostic]:
+    """
+    Check Hibiki source code for errors without rendering it.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code to check.
+    path: str | None
+        The path of the file the source came from, if any. Includes are
+        resolved relative to it.
+
+    Returns
+    -------
+    list[Diagnostic]
+        Every problem found, ordered by line.
+    """
+    return Validator(path).validate(text)
+
+
+def check_file(path: str) -> CheckResult:
+    """
+    Check a single Hibiki file.
+
+    Parameters
+    ----------
+    path: str
+        The path to the file.
+
+    Returns
+    -------
+    CheckResult
+        The outcome of the check.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as infile:
+            src = infile.read()
+    except FileNotFoundError:
+        return CheckResult(path, failure=f"'{path}' file does not exist.")
+    except PermissionError:
+        return CheckResult(path, failure=f"Permission denied when opening '{path}'")
+    except UnicodeDecodeError as e:
+        return CheckResult(path, failure=f"'{path}' isn't valid UTF-8: {e.reason} at byte {e.start}.")
+    except OSError as e:
+        return CheckResult(path, failure=f"Could not read '{path}': {e.strerror or e}")
+
+    return CheckResult(path, check(src, path))
+
+
+def check_files(paths: t.Sequence[str], jobs: int | None=None) -> list[CheckResult]:
+    """
+    Check many Hibiki files in parallel.
+
+    Parameters
+    ----------
+    paths: t.Sequence[str]
+        The paths of the files to check.
+    jobs: int | None
+        The number of worker processes to use. Defaults to the number of CPUs.
+        With 1, files are checked in this process.
+
+    Returns
+    -------
+    list[CheckResult]
+        The outcome of each check, in the same order as `paths`.
+    """
+    if jobs == 1 or len(paths) < 2:
+        return [check_file(path) for path in paths]
+
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=jobs, initializer=restore_modifiers, initargs=(list(MODIFIERS.values()),)) as pool:
+        chunksize = max(1, len(paths) // (jobs * 4))
+        return list(pool.map(check_file, paths, chunksize=chunksize))
+
+
+def find_sources(paths: t.Iterable[str]) -> list[str]:
+    """
+    Expand directories into the .hb files found within them.
+
+    Parameters
+    ----------
+    paths: t.Iterable[str]
+        Files and directories.
+
+    Returns
+    -------
+    list[str]
+        Every file path, with directories searched recursively.
+    """
+    out: list[str] = []
+    for path in paths:
+        if not os.path.isdir(path):
+            out.append(path)
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            out.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".hb"))
+    return out
+
+
+def format_human(results: t.Iterable[CheckResult]) -> str:
+    """Format check results for people to read."""
+    lines: list[str] = []
+    checked = failed = errors = 0
+
+    for result in results:
+        checked += 1
+        if result.ok:
+            continue
+
+        failed += 1
+        if result.failure is not None:
+            errors += 1
+            lines.append(f"{result.path}: {result.failure}")
+        for diagnostic in result.diagnostics:
+            errors += 1
+            lines.append(f"{result.path}: {diagnostic}")
+
+    lines.append(f"{checked} file(s) checked, {failed} invalid, {errors} error(s).")
+    return "\n".join(lines)
+
+
+def format_json(results: t.Iterable[CheckResult]) -> str:
+    """Format check results as JSON."""
+    return json.dumps([result.to_dict() for result in results], indent=2)
+
+
+def main(argv: t.Sequence[str]) -> int:
+    """
+    Entry point for `hibiki check`.
+
+    Returns 0 if every file is valid, and 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(prog="hibiki check", description="Check Hibiki files for errors without rendering them.")
+    parser.add_argument("paths", nargs="+", help="Files or directories to check.")
+    parser.add_argument("--json", action="store_true", help="Output results as JSON.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args(argv)
+
+    results = check_files(find_sources(args.paths), jobs=args.jobs)
+    print(format_json(results) if args.json else format_human(results))
+    return 0 if all(result.ok for result in results) else 1
@@ -1,5 +1,8 @@
 import typing as t
 
+from .modifiers import compile_modifiers
+
+
 class Chord:
     """
     A chord found within a Line.
@@ -31,6 +34,9 @@ class Chord:
     hammer_into: t.Optional[Chord]
         A chord which this chord is hammered into. None if it's not a hammered
         chord.
+    modifiers: t.Tuple[str, ...]
+        The names of the modifiers applied to the chord, including any
+        registered with `hibiki.register_modifier`.
     """
     def __init__(self, text: str):
         self.text: str = text
@@ -41,6 +47,8 @@ class Chord:
         self.non_chord: bool = False
         self.palm_muted: bool = False
         self.hammer_into: t.Optional[Chord] = None
+        self.modifiers: t.Tuple[str, ...] = ()
+        self._note: t.Optional[str] = None
 
         self.apply_modifiers()
     
@@ -49,41 +57,20 @@ class Chord:
     
     @property
     def note(self) -> str:
-        if self.chucked or self.palm_muted:
-            return self.symbol[:-1]
-        elif self.sustained:
-            return self.symbol[1:-1]
-        elif self.non_chord:
-            return "N.C."
-        elif self.hammer_into:
-            return self.symbol.split("h")[0]
-        else:
-            return self.symbol
+        """The chord's note, without modifiers."""
+        return self._note if self._note is not None else self.symbol
 
     def apply_modifiers(self) -> None:
         """
         Apply modifiers.
 
         Here we're checking for different chord modifiers and applying
-        properties based on them.
+        properties based on them. The modifiers are those registered in
+        `hibiki.modifiers`, and chords with the same text are only checked
+        once.
         """
-        if self.text.startswith("(") and self.text.endswith(")"):
-            self.sustained = True
-            self.symbol = f"({self.text[1:-1]})"
-        if self.text.endswith("|"):
-            self.chucked = True
-            self.symbol = f"{self.text[:-1]}|"
-        if self.text.replace(".", "") == "NC":
-            self.non_chord = True
-            self.symbol = "N.C."
-        if self.text.endswith("_"):
-            self.palm_muted = True
-            self.symbol = f"{self.text[:-1]}_"
-        if "h" in self.text:
-            pre, post = tuple(self.text.split("h"))
-            self.hammer_into = Chord(post)
-            self.symbol = f"{pre}h{self.hammer_into.symbol}"
-        
+        compile_modifiers().apply(self)
+
     @property
     def tab_repr(self) -> str:
         """
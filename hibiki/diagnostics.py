@@ -0,0 +1,497 @@
+"""
+Diagnostics for the Hibiki Language.
+
+Validates Hibiki source without laying out any chords or lyrics, collecting
+every problem found instead of stopping at the first one. Source goes through
+the parser itself, which reports its errors and carries on past them, so the
+problems found are exactly the ones which would stop a document rendering.
+
+Lexing is the most expensive part of parsing, so a `Validator` keeps the
+tokens from its last run. Revalidating an edited document only lexes from the
+first change until the tokens line back up with the ones from before, and
+only the stanzas which changed have their lines checked again.
+"""
+from __future__ import annotations
+import bisect
+import os
+import re
+import typing as t
+
+from .chord import Chord
+from .errors import HibikiError, ChordSyntaxError, StanzaSyntaxError
+from .include import default_root
+from .lexer import hibiki_lexer, LexerError
+from .limits import Limits, DEFAULT_LIMITS
+from .parser import HibikiParser
+from .source import SourceIndex
+from .stanza import Stanza, RecalledStanza
+
+
+# A token, as (type, value, start, end, reach). The reach is the offset just
+# past the furthest character the lexer looked at to find the token, which can
+# be past its end.
+_Token = t.Tuple[str, t.Any, int, int, int]
+
+# A heading looks ahead for a repeat count, even on the lines after it, so it
+# can look as far as a run of the characters a repeat count is made of.
+_REPEAT_CHARS_REGEX = re.compile(r"[\s()x\d]*")
+
+# A chord within a line of a stanza.
+_CHORD_REGEX = re.compile(r"\{([^{}]+)\}")
+
+
+class Diagnostic:
+    """
+    A single problem found in Hibiki source.
+
+    Attributes
+    ----------
+    error: HibikiError
+        The error describing the problem.
+    line: int
+        The line the problem was found on. (1 indexed)
+    column: int
+        The column the problem starts in. (1 indexed)
+    end_column: int
+        The column just past the end of the problem. (1 indexed)
+    """
+    def __init__(self, error: HibikiError, line: int, column: int=1, end_column: int | None=None):
+        self.error = error
+        self.line = line
+        self.column = column
+        self.end_column = end_column if end_column is not None else column + 1
+
+    def __repr__(self) -> str:
+        return f"<Diagnostic: {self.kind} on line {self.line}>"
+
+    def __str__(self) -> str:
+        return str(self.error)
+
+    @property
+    def kind(self) -> str:
+        """The name of the error, ex 'UndefinedRecall'."""
+        return type(self.error).__name__
+
+    @property
+    def message(self) -> str:
+        return self.error.message
+
+
+class Block:
+    """
+    A stanza, where the parser finds it in the source.
+
+    Attributes
+    ----------
+    stanza: Stanza
+        The stanza, as parsed before heading recalls are resolved.
+    heading: str
+        The heading of the stanza.
+    repeat_count: int
+        The stanza's repeat count.
+    start: int
+        The line the stanza's heading is on. (1 indexed)
+    end: int
+        The last line of the stanza. (1 indexed)
+    """
+    def __init__(self, stanza: Stanza, end: int):
+        self.stanza = stanza
+        self.heading = stanza.heading
+        self.repeat_count = stanza.repeat_count
+        self.start = stanza.starting_line
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f"<Block: {self.heading} on line {self.start}>"
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether or not the stanza has nothing but a heading."""
+        return self.stanza.is_empty
+
+
+def _reach(text: str, kind: str, value: t.Any, start: int, end: int) -> int:
+    """Work out how far the lexer may have looked to find a token."""
+    if kind == "HEADING":
+        return _REPEAT_CHARS_REGEX.match(text, end).end() + 1  # type: ignore[union-attr]
+    if kind == "CHORD":
+        return end
+    if kind == "error" and value in "[{":
+        # The heading or chord it could have started was looked for up to
+        # the first bracket closing it.
+        close = text.find("]" if value == "[" else "}", start)
+        if close == -1:
+            return len(text) + 1
+        if value == "[":
+            return _REPEAT_CHARS_REGEX.match(text, close + 1).end() + 1  # type: ignore[union-attr]
+        return close + 1
+    return end + 1
+
+
+def _lex(text: str, start: int=0) -> t.Iterator[_Token]:
+    """
+    Lex processed source from an offset, carrying on past any errors.
+
+    Characters the lexer can't make sense of are given as tokens of type
+    'error', and skipped.
+    """
+    lexer = hibiki_lexer.clone()
+    lexer.input(text)
+    lexer.lexpos = start
+    while True:
+        try:
+            tok = lexer.token()
+        except LexerError as e:
+            lexer.lexpos = e.lexpos + 1
+            yield "error", e.char, e.lexpos, e.lexpos + 1, _reach(text, "error", e.char, e.lexpos, e.lexpos + 1)
+            continue
+        if tok is None:
+            return
+        yield tok.type, tok.value, tok.lexpos, lexer.lexpos, _reach(text, tok.type, tok.value, tok.lexpos, lexer.lexpos)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """Get the length of the longest prefix two strings share."""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """Get the length of the longest suffix two strings share, up to a limit."""
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid:len(a) - low] == b[len(b) - mid:len(b) - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class _Collector(HibikiParser):
+    """
+    A parser which collects the errors it finds and carries on past them.
+
+    Attributes
+    ----------
+    errors: list[Diagnostic]
+        The errors found, in the order they were found.
+    blocks: list[Block]
+        The stanzas found, in order.
+    """
+    def __init__(self, **kwargs: t.Any):
+        super().__init__(**kwargs)
+        self.errors: list[Diagnostic] = []
+        self.blocks: list[Block] = []
+        self._index: SourceIndex | None = None
+
+    def _error(self, error: HibikiError, line_no: int, column: int=1, end_column: int | None=None) -> None:
+        if end_column is None:
+            column, end_column = 1, len(self._line(line_no)) + 1
+        self.errors.append(Diagnostic(error, line_no, column, end_column))
+
+    def _line(self, line_no: int) -> str:
+        """Get a line of the source, as it's written."""
+        index = t.cast(SourceIndex, self.source)
+        if line_no > len(index):
+            return ""
+        return index.text[index.line_start(line_no):index.line_end(line_no)]
+
+    def _finish_stanza(self, end: int) -> None:
+        count = len(self.stanzas)
+        super()._finish_stanza(end)
+        if len(self.stanzas) > count:
+            # Stanzas end on a blank line, so their last line is before it.
+            last = t.cast(SourceIndex, self._index).line_of(max(end - 2, 0))
+            self.blocks.append(Block(self.stanzas[-1], max(last, self.current_stanza_line)))
+
+    def _lexer_error(self, char: str, offset: int) -> None:
+        """Report a character the lexer couldn't make sense of."""
+        index = t.cast(SourceIndex, self._index)
+        line_no, column = index.position(offset)
+        reason = f"Illegal character '{char}' in column {column}"
+        if char in "{}":
+            error: HibikiError = ChordSyntaxError(line_num=line_no, stanza_name=self.current_heading or "unknown", reason=reason)
+        else:
+            error = StanzaSyntaxError(line_no, reason)
+
+        # Columns past where recalls were substituted no longer line up with
+        # the source, so the whole line gets marked instead.
+        processed = index.text[index.line_start(line_no):offset + 1]
+        if self._line(line_no).startswith(processed):
+            self._error(error, line_no, column, column + 1)
+        else:
+            self._error(error, line_no)
+
+    def read(self, text: str, lex: t.Callable[[str], t.Iterable[_Token]]) -> list[Stanza]:
+        """
+        Parse source, collecting errors along the way.
+
+        Parameters
+        ----------
+        text: str
+            The Hibiki source code to parse.
+        lex: t.Callable[[str], t.Iterable[_Token]]
+            Lexes the processed source.
+
+        Returns
+        -------
+        list[Stanza]
+            The stanzas, with heading recalls resolved but not repeated.
+        """
+        processed, self._index = self._prepare(text)
+        for kind, value, start, end, _ in lex(processed):
+            if kind == "error":
+                self._lexer_error(value, start)
+            else:
+                self._read_token(kind, value, start, end, self._index)
+
+        if self.current_heading is not None:
+            self._finish_stanza(len(processed))
+        return self._postprocess_heading_recalls(list(self.stanzas))
+
+
+def split_blocks(text: str, path: str | None=None) -> list[Block]:
+    """
+    Split Hibiki source into its stanzas, as the parser does.
+
+    Errors in the source don't stop it being split.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code to split.
+    path: str | None
+        The path of the file the source came from, if any. Includes are
+        followed relative to it, and only with one.
+
+    Returns
+    -------
+    list[Block]
+        The stanzas, in the order they appear.
+    """
+    parser = _Collector(path=path)
+    parser.read(text, _lex)
+    return parser.blocks
+
+
+def _invalid_chord(text: str) -> str:
+    """Find the chord in a line which can't be made."""
+    for match in _CHORD_REGEX.finditer(text):
+        try:
+            Chord(match.group(1))
+        except Exception:
+            return f"Invalid chord '{match.group(1)}' in column {match.start() + 1}"
+    return "Invalid chord"
+
+
+def _check_lines(stanza: Stanza) -> list[tuple[int, str]]:
+    """
+    Check that every line of a stanza can be split into chords and lyrics.
+
+    Returns the line of each problem, relative to the stanza's heading, and
+    the reason for it.
+    """
+    problems: list[tuple[int, str]] = []
+    checked: set[int] = set()
+    for line in stanza.lines:
+        # Multipliers repeat the same line.
+        if line.line_num in checked:
+            continue
+        checked.add(line.line_num)
+        try:
+            line.split_chords_and_lyrics()
+        except ChordSyntaxError as e:
+            problems.append((line.line_num - stanza.starting_line, e.reason))
+        except Exception:
+            # Modifiers can fail on chords they can't make sense of.
+            problems.append((line.line_num - stanza.starting_line, _invalid_chord(line.text)))
+    return problems
+
+
+class Validator:
+    """
+    Validates Hibiki source, caching results between runs.
+
+    Keeping a Validator around and feeding it successive versions of the same
+    document means only the parts which changed are lexed again, and only the
+    stanzas which changed have their lines checked again.
+
+    Attributes
+    ----------
+    path: str | None
+        The path of the document, if it has one. Includes are resolved
+        relative to it.
+    allow_includes: bool
+        Whether the document may include libraries. By default, only
+        documents with a path may.
+    include_root: str
+        The directory includes have to stay within. Defaults to the
+        directory of `path`.
+    limits: Limits
+        The limits to check against. Only `max_recall_size` applies, since
+        nothing is expanded any further than that.
+    blocks: list[Block]
+        The stanzas of the most recently validated source.
+    diagnostics: list[Diagnostic]
+        The problems found in the most recently validated source.
+    revalidated: int
+        How many stanzas had their lines checked on the last run, rather
+        than reusing what was found the run before.
+    lexed: int
+        How many characters were lexed on the last run, rather than reusing
+        the tokens from the run before.
+    """
+    def __init__(self, path: str | None=None, limits: Limits | None=None, allow_includes: bool | None=None, include_root: str | None=None):
+        self.path = path
+        self.allow_includes = path is not None if allow_includes is None else allow_includes
+        self.include_root = os.path.abspath(include_root) if include_root is not None else default_root(path)
+        self.limits = limits or DEFAULT_LIMITS
+        self.blocks: list[Block] = []
+        self.diagnostics: list[Diagnostic] = []
+        self.revalidated: int = 0
+        self.lexed: int = 0
+        self._stanzas: list[Stanza] = []
+        self._problems: dict[str, list[tuple[int, str]]] = {}
+        # The processed source last lexed, and its tokens. Tokens are kept
+        # alongside where they start, and the furthest any token up to them
+        # reaches, so both can be searched.
+        self._text: str = ""
+        self._tokens: list[_Token] = []
+        self._starts: list[int] = []
+        self._reaches: list[int] = []
+
+    def _lex(self, text: str) -> list[_Token]:
+        """
+        Lex processed source, reusing the tokens from the last run.
+
+        Tokens before the first change are kept, as long as the lexer didn't
+        look as far as the change to find them. Lexing then carries on until
+        it reaches the start of an old token after the last change, where
+        the rest of the tokens can be kept too.
+        """
+        old, tokens, starts = self._text, self._tokens, self._starts
+        if text == old:
+            self.lexed = 0
+            return tokens
+
+        prefix = _common_prefix(old, text)
+        tail = len(text) - _common_suffix(old, text, min(len(old), len(text)) - prefix)
+        shift = len(text) - len(old)
+
+        keep = bisect.bisect_right(self._reaches, prefix)
+        restart = starts[keep] if keep < len(tokens) else 0
+
+        out, out_starts, out_reaches = tokens[:keep], starts[:keep], self._reaches[:keep]
+        reach = out_reaches[-1] if out_reaches else 0
+        self.lexed = len(text) - restart
+        for token in _lex(text, restart):
+            start = token[2]
+            if start >= tail:
+                i = bisect.bisect_left(starts, start - shift, keep)
+                if i < len(tokens) and starts[i] == start - shift:
+                    self.lexed = start - restart
+                    for kind, value, old_start, old_end, old_reach in tokens[i:]:
+                        reach = max(reach, old_reach + shift)
+                        out.append((kind, value, old_start + shift, old_end + shift, old_reach + shift))
+                        out_starts.append(old_start + shift)
+                        out_reaches.append(reach)
+                    break
+
+            reach = max(reach, token[4])
+            out.append(token)
+            out_starts.append(start)
+            out_reaches.append(reach)
+
+        self._text, self._tokens, self._starts, self._reaches = text, out, out_starts, out_reaches
+        return out
+
+    def validate(self, text: str) -> list[Diagnostic]:
+        """
+        Validate Hibiki source code.
+
+        Parameters
+        ----------
+        text: str
+            The Hibiki source code to validate.
+
+        Returns
+        -------
+        list[Diagnostic]
+            Every problem found, ordered by line.
+        """
+        parser = _Collector(
+            path=self.path,
+            limits=Limits(max_recall_size=self.limits.max_recall_size, max_expanded_size=None),
+            allow_includes=self.allow_includes,
+            include_root=self.include_root
+        )
+        self._stanzas = parser.read(text, self._lex)
+        self.blocks = parser.blocks
+        self.revalidated = 0
+
+        diagnostics = parser.errors
+        problems: dict[str, list[tuple[int, str]]] = {}
+        for block, stanza in zip(self.blocks, self._stanzas):
+            if isinstance(stanza, RecalledStanza):
+                # Stanzas from libraries have never been checked, and their
+                # problems can only be pointed out where they're recalled.
+                definition = stanza.definition
+                if definition.source is not parser.source:
+                    for offset, reason in _check_lines(definition):
+                        error = ChordSyntaxError(line_num=definition.starting_line + offset, stanza_name=definition.name, reason=reason)
+                        parser._error(error, block.start)
+                continue
+
+            if stanza.is_empty:
+                continue
+
+            # Lines are numbered from the heading, so the same text always
+            # has the same problems, wherever it's moved to.
+            found = problems.get(stanza.text)
+            if found is None:
+                found = self._problems.get(stanza.text)
+            if found is None:
+                found = _check_lines(stanza)
+                self.revalidated += 1
+            problems[stanza.text] = found
+
+            for offset, reason in found:
+                line_no = stanza.starting_line + offset
+                parser._error(ChordSyntaxError(line_num=line_no, stanza_name=stanza.name, reason=reason), line_no)
+
+        self._problems = problems
+        self.diagnostics = sorted(diagnostics, key=lambda d: (d.line, d.column))
+        return self.diagnostics
+
+    @property
+    def outline(self) -> list[Block]:
+        """The stanzas of the most recently validated source."""
+        return self.blocks
+
+    def stanza_at(self, line: int) -> Stanza | None:
+        """
+        Get the stanza found on a given line, with recalls substituted.
+
+        Heading recalls resolve to the stanza they recall.
+
+        Parameters
+        ----------
+        line: int
+            The line number to look at. (1 indexed)
+
+        Returns
+        -------
+        Stanza | None
+            The stanza, or None if the line isn't part of one.
+        """
+        for block, stanza in zip(self.blocks, self._stanzas):
+            if block.start <= line <= block.end:
+                return None if stanza.is_empty else stanza
+        return None
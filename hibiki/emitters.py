@@ -0,0 +1,207 @@
+"""
+Emitters for Hibiki layouts.
+
+Each emitter turns a `SongLayout` into a single output format. Since every
+emitter works from the same layout, writing several formats from a document
+only parses and lays it out once. Emitters write their output a piece at a
+time, so it can be held to an output budget while it's being written.
+"""
+from __future__ import annotations
+import html
+import json
+import typing as t
+
+from .layout import SongLayout, StanzaLayout, LineLayout
+
+if t.TYPE_CHECKING:
+    from .limits import Budget
+
+
+class Emitter:
+    """
+    Base class for emitters.
+
+    Subclasses set `name`, which is what the format is requested by, and
+    implement `write`. Emitters which can only produce their output all at
+    once can implement `emit` instead.
+    """
+    name: str = ""
+
+    def write(self, layout: SongLayout) -> t.Iterator[str]:
+        """
+        Write a layout in this emitter's format, a piece at a time.
+
+        Parameters
+        ----------
+        layout: SongLayout
+            The layout to write.
+
+        Yields
+        ------
+        str
+            Consecutive pieces of the formatted output.
+        """
+        if type(self).emit is Emitter.emit:
+            raise NotImplementedError(f"{type(self).__name__} must implement write or emit.")
+        yield self.emit(layout)
+
+    def emit(self, layout: SongLayout) -> str:
+        """
+        Write a layout in this emitter's format.
+
+        Parameters
+        ----------
+        layout: SongLayout
+            The layout to write.
+
+        Returns
+        -------
+        str
+            The formatted output.
+        """
+        return "".join(self.write(layout))
+
+
+class TextEmitter(Emitter):
+    """Plain monospaced text, identical to `HibikiRenderer.render`."""
+    name = "text"
+
+    def __init__(self, breaks_between_sections: int=2):
+        self.breaks_between_sections = breaks_between_sections
+
+    def write(self, layout: SongLayout) -> t.Iterator[str]:
+        for stanza in layout.stanzas:
+            yield f"[{stanza.name}]\n"
+            for line in stanza.lines:
+                yield f"{line.chord_line()}\n{line.lyric_line()}\n"
+            yield "\n" * self.breaks_between_sections
+
+
+class ChordProEmitter(Emitter):
+    """ChordPro, with chords written inline in [brackets]."""
+    name = "chordpro"
+
+    def write(self, layout: SongLayout) -> t.Iterator[str]:
+        for stanza in layout.stanzas:
+            yield f"{{comment: {stanza.name}}}\n"
+            for line in stanza.lines:
+                text = "".join(
+                    f"[{segment.chord.symbol}]{segment.lyric}" if segment.chord is not None else segment.lyric
+                    for segment in line.segments
+                )
+                yield f"{text.rstrip()}\n"
+            yield "\n"
+
+
+class HTMLEmitter(Emitter):
+    """An HTML fragment, with each chord in a span alongside its lyrics."""
+    name = "html"
+
+    def _line(self, line: LineLayout) -> str:
+        segments = []
+        for segment in line.segments:
+            chord = html.escape(segment.chord.symbol) if segment.chord is not None else ""
+            segments.append(
+                f'<span class="segment"><span class="chord">{chord}</span>'
+                f'<span class="lyric">{html.escape(segment.lyric)}</span></span>'
+            )
+        return f'<div class="line">{"".join(segments)}</div>'
+
+    def write(self, layout: SongLayout) -> t.Iterator[str]:
+        yield '<div class="song">'
+        for stanza in layout.stanzas:
+            yield f'\n<section class="stanza"><h2>{html.escape(stanza.name)}</h2>'
+            for line in stanza.lines:
+                yield f"\n{self._line(line)}"
+            yield "\n</section>"
+        yield "\n</div>\n"
+
+
+class JSONEmitter(Emitter):
+    """JSON describing every stanza, line and segment."""
+    name = "json"
+
+    def _stanza(self, stanza: StanzaLayout) -> dict[str, t.Any]:
+        return {
+            "name": stanza.name,
+            "starting_line": stanza.starting_line,
+            "lines": [
+                {
+                    "line_num": line.line_num,
+                    "segments": [
+                        {
+                            "chord": segment.chord.symbol if segment.chord is not None else None,
+                            "note": segment.chord.note if segment.chord is not None else None,
+                            "lyric": segment.lyric,
+                            "column": segment.column,
+                        }
+                        for segment in line.segments
+                    ],
+                }
+                for line in stanza.lines
+            ],
+        }
+
+    def write(self, layout: SongLayout) -> t.Iterator[str]:
+        # Written a stanza at a time, with the same separators as json.dumps.
+        # Repeated stanzas share a layout, so each is only converted once.
+        converted: dict[int, str] = {}
+        yield '{"stanzas": ['
+        for i, stanza in enumerate(layout.stanzas):
+            if id(stanza) not in converted:
+                converted[id(stanza)] = json.dumps(self._stanza(stanza), ensure_ascii=False)
+            yield converted[id(stanza)] if i == 0 else f", {converted[id(stanza)]}"
+        yield "]}"
+
+
+# Every emitter, by the name of its format.
+EMITTERS: dict[str, type[Emitter]] = {}
+
+
+def register_emitter(emitter: type[Emitter]) -> type[Emitter]:
+    """
+    Register an emitter so its format can be requested by name.
+
+    Can be used as a class decorator.
+    """
+    EMITTERS[emitter.name] = emitter
+    return emitter
+
+
+for _emitter in (TextEmitter, ChordProEmitter, HTMLEmitter, JSONEmitter):
+    register_emitter(_emitter)
+
+
+def emit(layout: SongLayout, formats: t.Iterable[str | Emitter], budget: Budget | None=None) -> dict[str, str]:
+    """
+    Write a layout in several formats.
+
+    Parameters
+    ----------
+    layout: SongLayout
+        The layout to write.
+    formats: t.Iterable[str | Emitter]
+        The formats to write, either by name or as emitter instances.
+    budget: Budget | None
+        A budget to count every format's output towards as it's written.
+
+    Returns
+    -------
+    dict[str, str]
+        The output of each format, by the format's name.
+    """
+    out: dict[str, str] = {}
+    for format in formats:
+        if isinstance(format, str):
+            if format not in EMITTERS:
+                raise ValueError(f"Unknown output format '{format}'.")
+            emitter = EMITTERS[format]()
+        else:
+            emitter = format
+        pieces: list[str] = []
+        for piece in emitter.write(layout):
+            if budget is not None:
+                budget.add_output(piece)
+            pieces.append(piece)
+        out[emitter.name] = "".join(pieces)
+    return out
@@ -16,6 +16,19 @@ class HibikiError(Exception):
         self.message = message
         super().__init__(message)
 
+    def __reduce__(self):
+        # Subclasses take different arguments than the message they pass up,
+        # so errors are rebuilt from their attributes when unpickled, ex when
+        # they come back from a worker process.
+        return _restore_error, (type(self), self.args, self.__dict__)
+
+
+def _restore_error(cls: type[HibikiError], args: tuple, state: dict) -> HibikiError:
+    error = cls.__new__(cls)
+    Exception.__init__(error, *args)
+    error.__dict__.update(state)
+    return error
+
 
 class EmptyStanza(HibikiError):
     """
@@ -65,6 +78,109 @@ class UndefinedRecall(HibikiError):
         super().__init__(f"Line #{line_no}: Undefined recall variable '{var_name}'.")
 
 
+class RecallCycle(HibikiError):
+    """
+    Thrown when a recall is saved in terms of itself, without having had a
+    value before.
+
+    Recalling a name while saving it is fine if it was saved before, since
+    the earlier value is used, ex to build a line up bit by bit. Otherwise
+    there's nothing for the recall to expand to.
+
+    Attributes
+    ----------
+    line_no: int
+        The line the recall is saved on.
+    var_name: str
+        The name of the recall.
+    """
+    def __init__(self, line_no: int, var_name: str):
+        self.line_no = line_no
+        self.var_name = var_name
+        super().__init__(f"Line #{line_no}: Recall variable '{var_name}' refers to itself before it has a value.")
+
+
+class ResourceLimitExceeded(HibikiError):
+    """
+    Thrown when a document needs more resources than its limits allow.
+
+    See `hibiki.limits.Limits`.
+
+    Attributes
+    ----------
+    limit: str
+        The name of the limit which was exceeded, ex "max_stanzas".
+    maximum: int | float
+        The value of the limit.
+    """
+    def __init__(self, limit: str, maximum: int | float, message: str):
+        self.limit = limit
+        self.maximum = maximum
+        super().__init__(message)
+
+
+class RecallTooLarge(ResourceLimitExceeded):
+    """
+    Thrown when substituting recalls would make a line too large.
+
+    Recalls can contain other recalls, so each level of nesting can double
+    the size of a line. The size is worked out before anything is actually
+    substituted, so hitting the limit is cheap.
+
+    Attributes
+    ----------
+    line_no: int
+        The line being expanded.
+    size: int
+        The number of characters the line would expand to.
+    """
+    def __init__(self, line_no: int, size: int, maximum: int):
+        self.line_no = line_no
+        self.size = size
+        super().__init__(
+            "max_recall_size", maximum,
+            f"Line #{line_no}: Recalls would expand the line to {size} characters, more than the limit of {maximum}."
+        )
+
+
+class IncludeError(HibikiError):
+    """
+    Thrown when a file can't be included.
+
+    Errors within the included file are reported with line numbers in that
+    file, as the reason for this one.
+
+    Attributes
+    ----------
+    line_no: int
+        The line the include is on.
+    path: str
+        The path being included, as written.
+    reason: str
+        Why the file couldn't be included.
+    """
+    def __init__(self, line_no: int, path: str, reason: str):
+        self.line_no = line_no
+        self.path = path
+        self.reason = reason
+        super().__init__(f"Line #{line_no}: Could not include '{path}': {reason}")
+
+
+class IncludeCycle(IncludeError):
+    """
+    Thrown when files include each other in a loop.
+
+    Attributes
+    ----------
+    chain: list[str]
+        The paths of the files making up the loop, starting and ending with
+        the same file.
+    """
+    def __init__(self, line_no: int, path: str, chain: list[str]):
+        self.chain = chain
+        super().__init__(line_no, path, f"Include cycle {' -> '.join(chain)}.")
+
+
 class ChordSyntaxError(HibikiError):
     """
     This error is thrown when some syntax error occurs with a chord. This is
@@ -84,6 +200,7 @@ class ChordSyntaxError(HibikiError):
     def __init__(self, line: "Line | None" = None, reason: str = "", line_num: int | None = None, stanza_name: str | None = None):
         self.line = line
         self.reason = reason
+        self.line_num = line.line_num if line is not None else line_num
 
         if line is not None:
             message = f"Line #{line.line_num}, Syntax Error in '{line.stanza.name}': {reason}"
@@ -0,0 +1,261 @@
+"""
+Event-driven parsing for the Hibiki Language.
+
+Some tools only care about what's in a song, not how it looks: which chords
+it uses, how often, and where. Building stanzas and lines, and rendering
+them, is wasted work for those. Events are read straight off the lexer
+instead, and no stanzas or lines are built along the way.
+
+This isn't a streaming parser. Line recalls and includes are resolved
+exactly as the parser resolves them, over the whole document before the
+first event, so the expanded source is held in memory for as long as
+events are being read. What's saved is everything the parser would build
+on top of it.
+
+A document produces these events, in order:
+
+    ("stanza_start", heading, repeat_count, line)
+    ("chord", chord, line, column)
+    ("lyric", text, line, column)
+    ("line_end", line, repeat_count, source)
+    ("stanza_end", heading)
+
+Stanzas are reported once, along with their repeat count, rather than once
+per repeat. The same goes for lines with a multiplier like "(x2)", whose
+multiplier is reported in `line_end` and left out of the lyrics. Heading
+recalls report the events of the stanza they recall, at the lines that
+stanza is written on. The `source` of a line says where that is: None for
+the document itself, or the path of the library a stanza was included from.
+Columns are within the line with recalls substituted.
+
+Events can be iterated over with `iter_events`, or handed to the methods of
+an `EventHandler` with `walk`.
+"""
+from __future__ import annotations
+import re
+import typing as t
+
+from .chord import Chord
+from .errors import ChordSyntaxError, EmptyStanza, RedefinedStanza
+from .lexer import LexerError, hibiki_lexer
+from .limits import Budget, Limits
+from .parser import HibikiParser
+from .source import SourceIndex
+from .stanza import Stanza
+
+if t.TYPE_CHECKING:
+    from ply.lex import Lexer, LexToken
+
+
+# A multiplier at the end of a line, ex "(x2)"
+LINE_MULTIPLIER_REGEX = re.compile(r"\(x(\d)\)$")
+
+Event = t.Tuple[t.Any, ...]
+
+
+class EventHandler:
+    """
+    Receives the events of a document from `walk`.
+
+    Every method does nothing by default, so subclasses only need to
+    implement the events they're interested in.
+    """
+    def stanza_start(self, heading: str, repeat_count: int, line: int) -> None:
+        """Called when a stanza starts."""
+
+    def chord(self, chord: Chord, line: int, column: int) -> None:
+        """Called for every chord in a stanza."""
+
+    def lyric(self, text: str, line: int, column: int) -> None:
+        """Called for every run of lyrics in a stanza."""
+
+    def line_end(self, line: int, repeat_count: int, source: str | None) -> None:
+        """Called at the end of every line in a stanza."""
+
+    def stanza_end(self, heading: str) -> None:
+        """Called when a stanza ends."""
+
+
+def _body(lexer: Lexer, line: int, repeat_count: int, budget: Budget, source: str | None=None) -> t.Generator[Event, None, tuple[int, LexToken | None, bool]]:
+    """
+    Produce the events of a stanza body, starting from the lexer's position.
+    `source` is the path of the library the body is written in, if it isn't
+    in the document.
+
+    Returns the line after the body, the heading token which ended the body
+    if one did, and whether the body was empty.
+    """
+    buffer = lexer.lexdata
+    line_start = lexer.lexpos
+    content = False
+    empty = True
+    multiplier = 1
+
+    while True:
+        tok = lexer.token()
+
+        if tok is None or tok.type == "HEADING":
+            if content:
+                budget.add_lines(repeat_count)
+                yield ("line_end", line, multiplier, source)
+            return line + (1 if content else 0), tok, empty
+
+        if tok.type == "NEWLINE":
+            if content:
+                budget.add_lines(repeat_count)
+                yield ("line_end", line, multiplier, source)
+
+            # A blank line ends the stanza.
+            if not content or len(tok.value) > 1:
+                return line + len(tok.value), None, empty
+
+            line += 1
+            line_start = tok.lexpos + 1
+            content = False
+            continue
+
+        if not content:
+            content = True
+            empty = False
+            multiplier = 1
+
+        column = tok.lexpos - line_start + 1
+        if tok.type == "CHORD":
+            yield ("chord", Chord(tok.value), line, column)
+            continue
+
+        # Lines are stripped, and any multiplier is taken off of the end.
+        text = tok.value
+        if tok.lexpos == line_start:
+            text = text.lstrip()
+            column += len(tok.value) - len(text)
+        end = tok.lexpos + len(tok.value)
+        if end == len(buffer) or buffer[end] == "\n":
+            text = text.rstrip()
+            match = LINE_MULTIPLIER_REGEX.search(text)
+            if match:
+                multiplier = int(match.group(1))
+                text = text[:match.start()]
+        if text:
+            yield ("lyric", text, line, column)
+
+
+def iter_events(text: str, path: str | None=None, limits: Limits | None=None) -> t.Iterator[Event]:
+    """
+    Parse Hibiki source into a sequence of events.
+
+    The whole document is preprocessed before the first event is produced,
+    just as it is by `HibikiParser`.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code to parse.
+    path: str | None
+        The path of the file the source came from, if any. Includes are
+        resolved relative to it.
+    limits: Limits | None
+        The limits on how far the source is allowed to expand.
+
+    Yields
+    ------
+    Event
+        Each event, as a tuple of its name followed by its arguments.
+    """
+    # Recalls and includes are handled exactly as the parser handles them.
+    parser = HibikiParser(path=path, limits=limits)
+    if not text.endswith("\n\n"):
+        text += "\n\n"
+    processed = parser._preprocess(text)
+    budget = parser.budget
+
+    lexer = hibiki_lexer.clone()
+    lexer.input(processed)
+
+    # Where the body of each stanza starts, and the line it starts on.
+    definitions: dict[str, tuple[int, int]] = {}
+    line = 1
+    pending: LexToken | None = None
+
+    try:
+        while True:
+            tok, pending = pending or lexer.token(), None
+            if tok is None:
+                break
+
+            if tok.type == "NEWLINE":
+                line += len(tok.value)
+                continue
+            if tok.type != "HEADING":
+                # Anything outside of a stanza is ignored.
+                continue
+
+            heading, repeat_count = tok.value
+            budget.add_stanzas(max(repeat_count, 1))
+            yield ("stanza_start", heading, repeat_count, line)
+
+            start = lexer.lexpos
+            next_line, pending, empty = yield from _body(lexer, line + 1, repeat_count, budget)
+
+            if empty:
+                yield from _recall(heading, repeat_count, line, processed, definitions, parser, budget)
+            elif heading in definitions:
+                existing = Stanza(heading, f"[{heading}]\n", definitions[heading][1] - 1)
+                raise RedefinedStanza(Stanza(heading, f"[{heading}]\n", line, repeat_count), existing)
+            else:
+                definitions[heading] = (start, line + 1)
+
+            yield ("stanza_end", heading)
+            line = next_line
+    except LexerError as e:
+        line_num, column = SourceIndex(processed).position(e.lexpos)
+        reason = f"Illegal character '{e.char}' in column {column}"
+        if e.char in "{}":
+            raise ChordSyntaxError(line_num=line_num, stanza_name="unknown", reason=reason)
+        raise SyntaxError(f"Line #{line_num}: {reason}") from e
+
+
+def _recall(heading: str, repeat_count: int, line: int, processed: str, definitions: dict[str, tuple[int, int]], parser: HibikiParser, budget: Budget) -> t.Iterator[Event]:
+    """Produce the events of the stanza a heading recall recalls."""
+    lexer = hibiki_lexer.clone()
+    source: str | None = None
+
+    if heading in definitions:
+        start, body_line = definitions[heading]
+        lexer.input(processed)
+    elif heading in parser.included_stanzas:
+        included = parser.included_stanzas[heading]
+        lexer.input(included.text)
+        start, body_line = included.text.index("\n") + 1, included.starting_line + 1
+        source = included.source.path if included.source is not None else None
+    else:
+        raise EmptyStanza(Stanza(heading, f"[{heading}]\n", line, repeat_count))
+
+    lexer.lexpos = start
+    yield from _body(lexer, body_line, repeat_count, budget, source)
+
+
+def walk(text: str, handler: EventHandler, path: str | None=None, limits: Limits | None=None) -> None:
+    """
+    Parse Hibiki source, handing each event to a handler.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code to parse.
+    handler: EventHandler
+        The handler to call for each event.
+    path: str | None
+        The path of the file the source came from, if any.
+    limits: Limits | None
+        The limits on how far the source is allowed to expand.
+    """
+    methods = {
+        "stanza_start": handler.stanza_start,
+        "chord": handler.chord,
+        "lyric": handler.lyric,
+        "line_end": handler.line_end,
+        "stanza_end": handler.stanza_end,
+    }
+    for event in iter_events(text, path=path, limits=limits):
+        methods[event[0]](*event[1:])
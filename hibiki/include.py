@@ -0,0 +1,300 @@
+"""
+Includes for the Hibiki Language.
+
+A line consisting of nothing but `(+path)`, sitting outside of any stanza,
+includes another Hibiki file as a library. Every line recall the library
+saves becomes available from that point on, and its stanzas can be recalled
+by heading as though they'd been defined in the including file. Library
+stanzas are only ever a fallback: they're never rendered unless recalled,
+and a file is free to define a stanza with the same heading itself.
+
+Paths are resolved relative to the including file, and have to stay within
+a root directory, which is the directory of the file being parsed unless
+another is given. Absolute paths, and paths which lead out of the root, are
+rejected. Since includes read files off the local disk, they're only allowed
+when parsing a file, or when asked for with `allow_includes`. Source from
+anywhere else, ex a string handed to `hibiki.render`, can't include anything.
+
+Parsed libraries are cached for the life of the process, keyed by their
+absolute path, so a batch of songs all including the same library only
+parses it once. A cached library is reused for as long as the file's
+modification time and size are unchanged, or, if they have changed, for as
+long as its contents hash the same.
+"""
+from __future__ import annotations
+import hashlib
+import os
+import re
+import typing as t
+
+from .errors import HibikiError, IncludeError, IncludeCycle
+
+if t.TYPE_CHECKING:
+    from .stanza import Stanza
+
+
+# A line which consists of nothing but an include, ex "(+common/intros.hb)"
+INCLUDE_REGEX = re.compile(r'^\(\+([^)]+)\)[ \t]*$')
+
+# Why an include was refused when includes aren't allowed.
+NOT_ALLOWED = "Includes are only allowed when parsing a file, or with allow_includes."
+
+
+class Library:
+    """
+    A parsed Hibiki file, as seen by the files which include it.
+
+    Attributes
+    ----------
+    path: str
+        The absolute path of the file.
+    recalls: dict[str, str]
+        Every line recall the library saves, including those it got from its
+        own includes.
+    stanzas: dict[str, Stanza]
+        The stanzas which can be recalled from the library, by heading.
+    fingerprint: str
+        A hash of the library's source along with the sources of everything
+        it includes. It changes whenever anything the library is built from
+        does.
+    """
+    def __init__(self, path: str, recalls: dict[str, str], stanzas: dict[str, Stanza], fingerprint: str):
+        self.path = path
+        self.recalls = recalls
+        self.stanzas = stanzas
+        self.fingerprint = fingerprint
+        self._digest: str = ""
+        self._stat: tuple[int, int] = (0, 0)
+        self._dependencies: list[tuple[str, str]] = []
+
+    def __repr__(self) -> str:
+        return f"<Library: {self.path}>"
+
+
+# Parsed libraries by absolute path. This lives for the life of the process.
+_cache: dict[str, Library] = {}
+
+
+def default_root(including_path: str | None) -> str:
+    """The directory includes are confined to, unless another is given."""
+    return os.path.dirname(os.path.abspath(including_path)) if including_path is not None else os.getcwd()
+
+
+def within(path: str, root: str) -> bool:
+    """Whether a path is inside a directory, once symlinks are followed."""
+    path, root = os.path.realpath(path), os.path.realpath(root)
+    return os.path.commonpath([path, root]) == root
+
+
+def resolve(target: str, including_path: str | None, root: str | None=None) -> str:
+    """
+    Work out the absolute path of an include.
+
+    Parameters
+    ----------
+    target: str
+        The path as written in the include.
+    including_path: str | None
+        The path of the file the include appears in, if it has one. Without
+        one, includes are resolved relative to the root.
+    root: str | None
+        The directory includes have to stay within. Defaults to the directory
+        of `including_path`, or the working directory without one.
+
+    Returns
+    -------
+    str
+        The absolute path of the included file.
+
+    Raises
+    ------
+    ValueError
+        If the path is absolute, or leads outside of the root.
+    """
+    if os.path.isabs(target):
+        raise ValueError("Includes can't use absolute paths.")
+
+    base = default_root(including_path) if including_path is not None or root is None else root
+    path = os.path.normpath(os.path.join(base, target))
+    if not within(path, root if root is not None else base):
+        raise ValueError("Includes can't lead outside of the directory being rendered.")
+    return path
+
+
+def load_library(path: str, including: tuple[str, ...]=(), root: str | None=None) -> Library:
+    """
+    Load a library, parsing it only if it isn't cached or has changed.
+
+    Parameters
+    ----------
+    path: str
+        The absolute path of the library.
+    including: tuple[str, ...]
+        The paths of the files in the middle of including this one, used to
+        detect include cycles.
+    root: str | None
+        The directory the library's own includes have to stay within.
+        Defaults to the library's directory.
+
+    Returns
+    -------
+    Library
+        The parsed library.
+
+    Raises
+    ------
+    OSError
+        If the file can't be read.
+    HibikiError
+        If the library doesn't parse.
+    """
+    # Imported here, since the parser imports this module.
+    from .parser import HibikiParser
+
+    stat = os.stat(path)
+    cached = _cache.get(path)
+    if cached is not None and _is_current(cached, (stat.st_mtime_ns, stat.st_size), including, root):
+        return cached
+
+    with open(path, "rb") as infile:
+        data = infile.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    # Touched, but not actually changed.
+    if cached is not None and cached._digest == digest and _is_current(cached, cached._stat, including, root):
+        cached._stat = (stat.st_mtime_ns, stat.st_size)
+        return cached
+
+    parser = HibikiParser(path=path, including=including, include_root=root)
+    parsed = parser.parse(data.decode("utf-8"))
+
+    # Stanzas the library defines itself take priority over anything it
+    # includes. Recalled stanzas come after their definitions, so only the
+    # first stanza with each heading is kept.
+    stanzas: dict[str, Stanza] = dict(parser.included_stanzas)
+    own: dict[str, Stanza] = {}
+    for stanza in parsed:
+        own.setdefault(stanza.heading, stanza)
+    stanzas.update(own)
+
+    fingerprint = hashlib.sha256("\0".join([digest, *(library.fingerprint for library in parser.libraries)]).encode("utf-8")).hexdigest()
+
+    library = Library(path, dict(parser.recalls), stanzas, fingerprint)
+    library._digest = digest
+    library._stat = (stat.st_mtime_ns, stat.st_size)
+    library._dependencies = [(dependency.path, dependency.fingerprint) for dependency in parser.libraries]
+    _cache[path] = library
+    return library
+
+
+def _is_current(library: Library, stat: tuple[int, int], including: tuple[str, ...], root: str | None) -> bool:
+    """Whether a cached library and everything it includes is unchanged."""
+    if library._stat != stat:
+        return False
+
+    for path, fingerprint in library._dependencies:
+        # The library may have been cached while including from a wider
+        # root than this one.
+        if root is not None and not within(path, root):
+            return False
+        try:
+            if load_library(path, (*including, library.path), root).fingerprint != fingerprint:
+                return False
+        except (OSError, HibikiError, SyntaxError):
+            # Whatever went wrong will come up again when the library is
+            # parsed, this time with a proper error.
+            return False
+    return True
+
+
+def include(line_no: int, target: str, including_path: str | None, including: tuple[str, ...]=(), root: str | None=None) -> Library:
+    """
+    Load the library an include refers to.
+
+    Parameters
+    ----------
+    line_no: int
+        The line the include is on.
+    target: str
+        The path being included, as written.
+    including_path: str | None
+        The path of the file the include appears in, if it has one.
+    including: tuple[str, ...]
+        The paths of the files in the middle of including that file.
+    root: str | None
+        The directory includes have to stay within. Defaults to the
+        directory of `including_path`.
+
+    Returns
+    -------
+    Library
+        The included library.
+
+    Raises
+    ------
+    IncludeCycle
+        If the library is already in the middle of being included.
+    IncludeError
+        If the path isn't allowed, or the library can't be read, or has
+        errors of its own.
+    """
+    try:
+        path = resolve(target, including_path, root)
+    except ValueError as e:
+        raise IncludeError(line_no, target, str(e)) from e
+    chain = (*including, os.path.abspath(including_path)) if including_path is not None else including
+
+    if path in chain:
+        loop = [*chain[chain.index(path):], path]
+        raise IncludeCycle(line_no, target, [os.path.relpath(p) for p in loop])
+
+    try:
+        return load_library(path, chain, root)
+    except OSError as e:
+        raise IncludeError(line_no, target, e.strerror or str(e)) from e
+    except (HibikiError, SyntaxError) as e:
+        raise IncludeError(line_no, target, str(e)) from e
+
+
+def source_fingerprint(data: bytes, path: str | None=None, root: str | None=None) -> tuple[str, bool]:
+    """
+    Hash a file's source along with the libraries it includes.
+
+    Anything worked out from a file which includes libraries has to be worked
+    out again whenever one of those libraries changes. Keying it by this
+    hash, rather than by the file's source alone, takes care of that.
+
+    Parameters
+    ----------
+    data: bytes
+        The file's source.
+    path: str | None
+        The path of the file, if it has one. Includes are resolved relative
+        to it, and aren't followed without one.
+    root: str | None
+        The directory includes have to stay within. Defaults to the
+        directory of `path`.
+
+    Returns
+    -------
+    tuple[str, bool]
+        The hash, and whether or not the file includes anything.
+    """
+    digest = hashlib.sha256(data)
+    includes = False
+    for match in map(INCLUDE_REGEX.match, data.decode("utf-8").split("\n")):
+        if match:
+            includes = True
+            try:
+                if path is None:
+                    raise ValueError("Includes are only followed from files.")
+                digest.update(load_library(resolve(match.group(1), path, root), root=root).fingerprint.encode("utf-8"))
+            except (OSError, ValueError, HibikiError, SyntaxError):
+                # The file won't parse either way, so any hash will do.
+                digest.update(b"\0")
+    return digest.hexdigest(), includes
+
+
+def clear_cache() -> None:
+    """Forget every cached library."""
+    _cache.clear()
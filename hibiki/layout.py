@@ -0,0 +1,230 @@
+"""
+Format-neutral layout for Hibiki tablature.
+
+A layout is computed once per document and records where every chord and
+lyric segment sits, without committing to any particular output format.
+Emitters (see `hibiki.emitters`) then turn a layout into text, HTML, JSON and
+so on, so producing several formats only costs one parse and one layout.
+"""
+from __future__ import annotations
+import typing as t
+
+from .chord import Chord
+from .width import display_width, pad
+
+if t.TYPE_CHECKING:
+    from .stanza import Stanza, Line, Space
+    from .transpose import Transposer
+    from .limits import Budget
+
+
+class Segment:
+    """
+    A chord and the lyrical segment assigned to it.
+
+    Attributes
+    ----------
+    chord: Chord | None
+        The chord, or None if the segment is lyrics with no chord above them.
+    lyric: str
+        The lyrical segment.
+    column: int
+        The display column both the chord and lyrics start in. (0 indexed)
+    width: int
+        The number of display columns the segment takes up.
+    """
+    __slots__ = ("chord", "lyric", "column", "width")
+
+    def __init__(self, chord: Chord | None, lyric: str, column: int, width: int):
+        self.chord = chord
+        self.lyric = lyric
+        self.column = column
+        self.width = width
+
+    def __repr__(self) -> str:
+        return f"<Segment: {self.chord} {repr(self.lyric)} @ {self.column}>"
+
+    @property
+    def chord_text(self) -> str:
+        """The chord as it appears in text, or an empty string."""
+        return self.chord.tab_repr if self.chord is not None else ""
+
+
+class LineLayout:
+    """
+    The layout of a single line.
+
+    Attributes
+    ----------
+    segments: list[Segment]
+        The line's segments, from left to right.
+    line_num: int
+        The line number the line was defined on.
+    """
+    __slots__ = ("segments", "line_num")
+
+    def __init__(self, segments: list[Segment], line_num: int):
+        self.segments = segments
+        self.line_num = line_num
+
+    def __repr__(self) -> str:
+        return f"<LineLayout: {repr(self.lyric_line())}>"
+
+    @property
+    def chords(self) -> list[Chord]:
+        return [segment.chord for segment in self.segments if segment.chord is not None]
+
+    def chord_line(self) -> str:
+        """The chords laid out as monospaced text."""
+        return "".join(pad(segment.chord_text, segment.width) for segment in self.segments).rstrip()
+
+    def lyric_line(self) -> str:
+        """The lyrics laid out as monospaced text."""
+        return "".join(pad(segment.lyric, segment.width) for segment in self.segments).rstrip()
+
+
+class StanzaLayout:
+    """
+    The layout of a single stanza.
+
+    Attributes
+    ----------
+    name: str
+        The name of the stanza.
+    starting_line: int
+        The line number the stanza was defined on.
+    lines: list[LineLayout]
+        The layouts of the stanza's lines.
+    """
+    __slots__ = ("name", "starting_line", "lines")
+
+    def __init__(self, name: str, starting_line: int, lines: list[LineLayout]):
+        self.name = name
+        self.starting_line = starting_line
+        self.lines = lines
+
+    def __repr__(self) -> str:
+        return f"<StanzaLayout: {self.name}>"
+
+
+class SongLayout:
+    """
+    The layout of an entire document.
+
+    Repeated and recalled stanzas share a single StanzaLayout.
+
+    Attributes
+    ----------
+    stanzas: list[StanzaLayout]
+        The stanzas in the order they're rendered.
+    """
+    __slots__ = ("stanzas",)
+
+    def __init__(self, stanzas: list[StanzaLayout]):
+        self.stanzas = stanzas
+
+    def __repr__(self) -> str:
+        return f"<SongLayout: {len(self.stanzas)} stanzas>"
+
+
+def align(chords: t.Sequence[Chord | Space], lyrics: t.Sequence[str]) -> list[Segment]:
+    """
+    Work out the columns of a line's chords and lyrical segments.
+
+    Each chord goes directly above the first character of its segment, and
+    whichever of the two is wider decides how much room the pair takes up.
+    Widths are display widths (see `hibiki.width`), so chords stay over the
+    right syllables of lyrics with wide or combining characters.
+
+    Parameters
+    ----------
+    chords: t.Sequence[Chord | Space]
+        The chords, as split by `Line.split_chords_and_lyrics`.
+    lyrics: t.Sequence[str]
+        The lyrical segments paired with each chord.
+
+    Returns
+    -------
+    list[Segment]
+        The aligned segments.
+    """
+    segments: list[Segment] = []
+    column = 0
+
+    for chord, lyric in zip(chords, lyrics):
+        width = max(display_width(chord.tab_repr), display_width(lyric))
+        # The last lyrical segment holds the line's newline. It still counts
+        # towards the width, but it's only ever trailing whitespace, so it's
+        # not kept in the segment itself.
+        segments.append(Segment(chord if isinstance(chord, Chord) else None, lyric.rstrip("\n"), column, width))
+        column += width
+    return segments
+
+
+def layout_line(line: Line, transposer: Transposer | None=None) -> LineLayout:
+    """
+    Lay out a single line.
+
+    Parameters
+    ----------
+    line: Line
+        The line to lay out.
+    transposer: Transposer | None
+        Transposes the line's chords before they're aligned, if given.
+
+    Returns
+    -------
+    LineLayout
+        The layout of the line.
+    """
+    chords, lyrics = line.split_chords_and_lyrics()
+    if transposer is not None:
+        chords = [transposer(chord) for chord in chords]
+    return LineLayout(align(chords, lyrics), line.line_num)
+
+
+def layout_stanzas(stanzas: t.Iterable[Stanza], transposer: Transposer | None=None, budget: Budget | None=None) -> SongLayout:
+    """
+    Lay out a list of parsed stanzas.
+
+    Parameters
+    ----------
+    stanzas: t.Iterable[Stanza]
+        The stanzas, as returned by the parser.
+    transposer: Transposer | None
+        Transposes every chord before it's aligned, if given.
+    budget: Budget | None
+        Counts the stanzas and lines laid out against their limits, if given.
+
+    Returns
+    -------
+    SongLayout
+        The layout of the document.
+    """
+    # Repeats are the same Stanza object appearing more than once, and
+    # recalls share the body of the stanza they recall, so each body only
+    # needs laying out the first time it's seen.
+    seen: dict[int, StanzaLayout] = {}
+    out: list[StanzaLayout] = []
+
+    for stanza in stanzas:
+        if budget is not None:
+            budget.add_stanzas()
+
+        # RecalledStanza can't be imported here, since stanza imports this module.
+        body = getattr(stanza, "definition", stanza)
+        stanza_layout = seen.get(id(body))
+        if stanza_layout is None:
+            # Lines are counted as they're laid out, so a single huge stanza
+            # can't run far past the time budget.
+            lines: list[LineLayout] = []
+            for line in stanza.lines:
+                if budget is not None:
+                    budget.add_lines()
+                lines.append(layout_line(line, transposer))
+            stanza_layout = StanzaLayout(stanza.name, stanza.starting_line, lines)
+            seen[id(body)] = stanza_layout
+        elif budget is not None:
+            budget.add_lines(len(stanza.lines))
+        out.append(stanza_layout)
+    return SongLayout(out)
@@ -22,11 +22,21 @@ tokens = (
 )
 
 
-# The heading of a stanza
-def t_HEADING(t):
-    r'\[[^\]]+\](?:\s*\(\s*x\s*\d+\s*\))?[ \t]*\n'
-
-    raw = t.value.strip('\n').strip()
+def split_heading(raw: str) -> tuple[str, int]:
+    """
+    Split the raw text of a heading into its name and repeat count.
+
+    Parameters
+    ----------
+    raw: str
+        The heading as it appears in source, ex "[Chorus] (x2)".
+
+    Returns
+    -------
+    tuple[str, int]
+        The heading's name and the number of times it repeats.
+    """
+    raw = raw.strip('\n').strip()
 
     # Extract repeat count if present (e.g., "(x2)")
     repeat_match = re.search(r'\(\s*x\s*(\d+)\s*\)', raw)
@@ -37,6 +47,15 @@ def t_HEADING(t):
         repeat_count = 1
         heading = raw.strip('[]').strip()
 
+    return heading, repeat_count
+
+
+# The heading of a stanza
+def t_HEADING(t):
+    r'\[[^\]]+\](?:\s*\(\s*x\s*\d+\s*\))?[ \t]*\n'
+
+    heading, repeat_count = split_heading(t.value)
+
     t.value = (heading, repeat_count)
     t.name = heading.replace("[", "").replace("]", "").strip()
     t.lexer.lineno += 1
@@ -59,8 +78,25 @@ def t_NEWLINE(t):
     t.lexer.lineno += len(t.value)
     return t
 
+class LexerError(SyntaxError):
+    """
+    Raised when the lexer finds a character it can't tokenize.
+
+    Attributes
+    ----------
+    char: str
+        The offending character.
+    lexpos: int
+        The offset of the character in the lexer's input.
+    """
+    def __init__(self, char: str, lexpos: int):
+        self.char = char
+        self.lexpos = lexpos
+        super().__init__(f"Illegal character '{char}' at position {lexpos}")
+
+
 def t_error(t):
-    raise SyntaxError(f"Illegal character '{t.value[0]}' at line {t.lineno}")
+    raise LexerError(t.value[0], t.lexpos)
 
 
 hibiki_lexer = lex.lex()
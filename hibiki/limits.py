@@ -0,0 +1,166 @@
+"""
+Resource limits for the Hibiki Language.
+
+Hibiki source is small, but the output it describes doesn't have to be. A
+heading repeated tens of thousands of times, or recalls nested inside one
+another, can make a tiny file expand into something enormous. When rendering
+source you don't trust, `Limits` caps how far a document is allowed to go.
+
+Limits are checked as a document is expanded and rendered, rather than once
+everything has been built, so hitting one costs little more than the work
+done up to that point.
+"""
+from __future__ import annotations
+import time
+
+from .errors import ResourceLimitExceeded
+
+
+# The default limit on how large a line can get once recalls are substituted.
+MAX_RECALL_SIZE = 1 << 16
+
+# The default limit on how large a whole document can get once recalls are
+# substituted, since many lines each within MAX_RECALL_SIZE can still add up.
+MAX_EXPANDED_SIZE = 1 << 24
+
+
+class Limits:
+    """
+    Limits on the resources a document may use.
+
+    Any limit which is None isn't enforced. By default, only the size of
+    lines and documents with recalls substituted is limited.
+
+    Attributes
+    ----------
+    max_stanzas: int | None
+        The most stanzas a document may have once repeats and recalls are
+        expanded.
+    max_lines: int | None
+        The most lines a document may have once repeats and recalls are
+        expanded.
+    max_output_bytes: int | None
+        The most bytes of UTF-8 a document may render to. This also limits the
+        size of the source once recalls are substituted.
+    time_budget: float | None
+        The most seconds parsing or rendering a document may take.
+    max_recall_size: int
+        The most characters a single line may expand to once its recalls are
+        substituted.
+    max_expanded_size: int | None
+        The most characters a whole document may expand to once its recalls
+        are substituted.
+    """
+    def __init__(
+            self,
+            max_stanzas: int | None=None,
+            max_lines: int | None=None,
+            max_output_bytes: int | None=None,
+            time_budget: float | None=None,
+            max_recall_size: int=MAX_RECALL_SIZE,
+            max_expanded_size: int | None=MAX_EXPANDED_SIZE
+        ):
+        self.max_stanzas = max_stanzas
+        self.max_lines = max_lines
+        self.max_output_bytes = max_output_bytes
+        self.time_budget = time_budget
+        self.max_recall_size = max_recall_size
+        self.max_expanded_size = max_expanded_size
+
+    def __repr__(self) -> str:
+        return (
+            f"<Limits: stanzas={self.max_stanzas} lines={self.max_lines} "
+            f"output={self.max_output_bytes} time={self.time_budget} recall={self.max_recall_size} "
+            f"expanded={self.max_expanded_size}>"
+        )
+
+    def budget(self) -> Budget:
+        """Start keeping track of a single parse or render against these limits."""
+        return Budget(self)
+
+
+class Budget:
+    """
+    What a single parse or render has used so far.
+
+    The clock for the time budget starts when the budget is created.
+
+    Attributes
+    ----------
+    limits: Limits
+        The limits being enforced.
+    stanzas: int
+        The number of stanzas counted so far.
+    lines: int
+        The number of lines counted so far.
+    output_bytes: int
+        The number of bytes of output counted so far.
+    expanded: int
+        The number of characters of source counted so far, with recalls
+        substituted.
+    deadline: float | None
+        The `time.monotonic()` time the work has to be done by.
+    """
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        self.stanzas: int = 0
+        self.lines: int = 0
+        self.output_bytes: int = 0
+        self.expanded: int = 0
+        self.deadline: float | None = None
+        if limits.time_budget is not None:
+            self.deadline = time.monotonic() + limits.time_budget
+
+    def __repr__(self) -> str:
+        return f"<Budget: {self.stanzas} stanzas, {self.lines} lines, {self.output_bytes} bytes>"
+
+    def check_time(self) -> None:
+        """Make sure the time budget hasn't run out."""
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise ResourceLimitExceeded(
+                "time_budget", self.limits.time_budget,  # type: ignore[arg-type]
+                f"Took longer than the time budget of {self.limits.time_budget} seconds."
+            )
+
+    def add_stanzas(self, count: int=1) -> None:
+        """Count stanzas towards `max_stanzas`."""
+        self.stanzas += count
+        maximum = self.limits.max_stanzas
+        if maximum is not None and self.stanzas > maximum:
+            raise ResourceLimitExceeded("max_stanzas", maximum, f"Document expands to more than {maximum} stanzas.")
+        self.check_time()
+
+    def add_lines(self, count: int=1) -> None:
+        """Count lines towards `max_lines`."""
+        self.lines += count
+        maximum = self.limits.max_lines
+        if maximum is not None and self.lines > maximum:
+            raise ResourceLimitExceeded("max_lines", maximum, f"Document expands to more than {maximum} lines.")
+        self.check_time()
+
+    def add_expanded(self, size: int) -> None:
+        """Count characters of source towards `max_expanded_size`."""
+        self.expanded += size
+        maximum = self.limits.max_expanded_size
+        if maximum is not None and self.expanded > maximum:
+            raise ResourceLimitExceeded("max_expanded_size", maximum, f"Recalls expand the document to more than {maximum} characters.")
+
+    def add_output(self, text: str) -> None:
+        """Count text towards `max_output_bytes`."""
+        self.check_time()
+        if self.limits.max_output_bytes is not None:
+            self.add_output_bytes(len(text.encode("utf-8")))
+
+    def add_output_bytes(self, size: int) -> None:
+        """Count a number of bytes towards `max_output_bytes`."""
+        maximum = self.limits.max_output_bytes
+        if maximum is None:
+            return
+
+        self.output_bytes += size
+        if self.output_bytes > maximum:
+            raise ResourceLimitExceeded("max_output_bytes", maximum, f"Output is larger than {maximum} bytes.")
+
+
+# Used whenever no limits are given.
+DEFAULT_LIMITS = Limits()
@@ -0,0 +1,347 @@
+"""
+Language server for the Hibiki Language.
+
+Implements enough of the Language Server Protocol over stdio for editors to
+show diagnostics while typing, preview the rendered output of a stanza on
+hover, and list stanza headings as document symbols. Documents are synced
+incrementally, and each open document keeps its own Validator around so that
+an edit only revalidates what it affected.
+"""
+from __future__ import annotations
+import json
+import sys
+import traceback
+import typing as t
+import urllib.parse
+import urllib.request
+
+from .diagnostics import Diagnostic, Validator
+from .errors import HibikiError
+from .renderer import HibikiRenderer
+from .source import SourceIndex
+
+
+# LSP constants used by the server.
+TEXT_DOCUMENT_SYNC_INCREMENTAL = 2
+SEVERITY_ERROR = 1
+SYMBOL_KIND_NAMESPACE = 3
+MESSAGE_TYPE_ERROR = 1
+
+ERROR_METHOD_NOT_FOUND = -32601
+ERROR_INTERNAL = -32603
+
+
+def _utf16_to_index(line: str, character: int) -> int:
+    """Convert a UTF-16 offset within a line, as LSP uses, to a str index."""
+    units = 0
+    for i, char in enumerate(line):
+        if units >= character:
+            return i
+        units += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+
+def _index_to_utf16(line: str, index: int) -> int:
+    """Convert a str index within a line to a UTF-16 offset."""
+    return sum(2 if ord(char) > 0xFFFF else 1 for char in line[:index])
+
+
+class Document:
+    """
+    An open Hibiki document.
+
+    Attributes
+    ----------
+    uri: str
+        The URI the editor knows the document by.
+    version: int
+        The version of the document, as reported by the editor.
+    text: str
+        The current contents of the document.
+    validator: Validator
+        The document's validator, which caches results between edits.
+    """
+    def __init__(self, uri: str, text: str, version: int=0):
+        self.uri = uri
+        self.text = text
+        self.version = version
+        self.validator = Validator(self.path)
+        self._index: SourceIndex | None = None
+
+    @property
+    def index(self) -> SourceIndex:
+        """An index of where each line of the text starts, built once per change."""
+        if self._index is None or self._index.text is not self.text:
+            self._index = SourceIndex(self.text)
+        return self._index
+
+    @property
+    def path(self) -> str | None:
+        """The path of the document on disk, if it's a file."""
+        parsed = urllib.parse.urlparse(self.uri)
+        if parsed.scheme != "file":
+            return None
+        return urllib.request.url2pathname(parsed.path)
+
+    def _offset(self, position: dict) -> int:
+        """Convert an LSP position into an offset within the text."""
+        index = self.index
+        line = position["line"] + 1
+        if line > len(index):
+            return len(self.text)
+
+        start, end = index.line_span(line)
+        return start + _utf16_to_index(self.text[start:end], position["character"])
+
+    def apply_change(self, change: dict) -> None:
+        """
+        Apply a single content change sent by the editor.
+
+        Parameters
+        ----------
+        change: dict
+            A TextDocumentContentChangeEvent. Changes without a range replace
+            the entire document.
+        """
+        if "range" not in change:
+            self.text = change["text"]
+            return
+
+        start = self._offset(change["range"]["start"])
+        end = self._offset(change["range"]["end"])
+        self.text = self.text[:start] + change["text"] + self.text[end:]
+
+    def validate(self) -> list[Diagnostic]:
+        return self.validator.validate(self.text)
+
+
+class HibikiLanguageServer:
+    """
+    A language server for Hibiki.
+
+    The server itself knows nothing about stdio; `handle` takes a decoded
+    JSON-RPC message and returns the messages to send back, which makes it
+    easy to drive from tests. `serve` wires it up to a pair of streams.
+
+    Attributes
+    ----------
+    documents: dict[str, Document]
+        Every open document, by URI.
+    """
+    def __init__(self):
+        self.documents: dict[str, Document] = {}
+        self.shutdown_requested: bool = False
+        self.exited: bool = False
+
+    def _publish(self, document: Document) -> dict:
+        """Build a publishDiagnostics notification for a document."""
+        lines = document.text.split("\n")
+        diagnostics = []
+
+        for diagnostic in document.validate():
+            line = lines[diagnostic.line - 1] if diagnostic.line <= len(lines) else ""
+            diagnostics.append({
+                "range": {
+                    "start": {"line": diagnostic.line - 1, "character": _index_to_utf16(line, diagnostic.column - 1)},
+                    "end": {"line": diagnostic.line - 1, "character": _index_to_utf16(line, diagnostic.end_column - 1)},
+                },
+                "severity": SEVERITY_ERROR,
+                "source": "hibiki",
+                "code": diagnostic.kind,
+                "message": diagnostic.message,
+            })
+
+        return {
+            "jsonrpc": "2.0",
+            "method": "textDocument/publishDiagnostics",
+            "params": {"uri": document.uri, "version": document.version, "diagnostics": diagnostics},
+        }
+
+    def initialize(self, params: dict) -> dict:
+        return {
+            "capabilities": {
+                "textDocumentSync": {"openClose": True, "change": TEXT_DOCUMENT_SYNC_INCREMENTAL},
+                "hoverProvider": True,
+                "documentSymbolProvider": True,
+            },
+            "serverInfo": {"name": "hibiki-lsp"},
+        }
+
+    def hover(self, params: dict) -> dict | None:
+        document = self.documents.get(params["textDocument"]["uri"])
+        if document is None:
+            return None
+
+        stanza = document.validator.stanza_at(params["position"]["line"] + 1)
+        if stanza is None:
+            return None
+
+        try:
+            preview = HibikiRenderer().render([stanza]).rstrip("\n")
+        except HibikiError:
+            return None
+        return {"contents": {"kind": "markdown", "value": f"```\n{preview}\n```"}}
+
+    def document_symbol(self, params: dict) -> list[dict]:
+        document = self.documents.get(params["textDocument"]["uri"])
+        if document is None:
+            return []
+
+        symbols = []
+        lines = document.text.split("\n")
+        for block in document.validator.outline:
+            selection = {
+                "start": {"line": block.start - 1, "character": 0},
+                "end": {"line": block.start - 1, "character": _index_to_utf16(lines[block.start - 1], len(lines[block.start - 1]))},
+            }
+            symbols.append({
+                "name": block.heading,
+                "detail": f"x{block.repeat_count}" if block.repeat_count > 1 else "",
+                "kind": SYMBOL_KIND_NAMESPACE,
+                "range": {
+                    "start": selection["start"],
+                    "end": {"line": block.end - 1, "character": _index_to_utf16(lines[block.end - 1], len(lines[block.end - 1]))},
+                },
+                "selectionRange": selection,
+            })
+        return symbols
+
+    def handle(self, message: dict) -> list[dict]:
+        """
+        Handle a single JSON-RPC message from the client.
+
+        Parameters
+        ----------
+        message: dict
+            The decoded message.
+
+        Returns
+        -------
+        list[dict]
+            The responses and notifications to send back to the client.
+        """
+        method = message.get("method")
+        params = message.get("params") or {}
+        is_request = "id" in message
+        out: list[dict] = []
+
+        result: t.Any = None
+        if method == "initialize":
+            result = self.initialize(params)
+        elif method == "shutdown":
+            self.shutdown_requested = True
+        elif method == "exit":
+            self.exited = True
+        elif method == "textDocument/didOpen":
+            item = params["textDocument"]
+            document = Document(item["uri"], item["text"], item.get("version", 0))
+            self.documents[document.uri] = document
+            out.append(self._publish(document))
+        elif method == "textDocument/didChange":
+            document = self.documents.get(params["textDocument"]["uri"])
+            if document is not None:
+                for change in params["contentChanges"]:
+                    document.apply_change(change)
+                document.version = params["textDocument"].get("version", document.version)
+                out.append(self._publish(document))
+        elif method == "textDocument/didClose":
+            self.documents.pop(params["textDocument"]["uri"], None)
+        elif method == "textDocument/hover":
+            result = self.hover(params)
+        elif method == "textDocument/documentSymbol":
+            result = self.document_symbol(params)
+        elif is_request:
+            out.append({
+                "jsonrpc": "2.0",
+                "id": message["id"],
+                "error": {"code": ERROR_METHOD_NOT_FOUND, "message": f"Method not found: {method}"},
+            })
+            return out
+
+        if is_request:
+            out.insert(0, {"jsonrpc": "2.0", "id": message["id"], "result": result})
+        return out
+
+    def _internal_error(self, message: dict, error: Exception) -> dict:
+        """
+        Build the reply to a message which couldn't be handled.
+
+        Requests get an error response. Notifications can't be responded to,
+        so the error is logged to the client instead.
+        """
+        reason = f"Error handling {message.get('method')}: {type(error).__name__}: {error}"
+        if "id" in message:
+            return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": ERROR_INTERNAL, "message": reason}}
+        return {"jsonrpc": "2.0", "method": "window/logMessage", "params": {"type": MESSAGE_TYPE_ERROR, "message": reason}}
+
+    def serve(self, stdin: t.BinaryIO, stdout: t.BinaryIO) -> int:
+        """
+        Serve requests read from stdin, writing responses to stdout.
+
+        Parameters
+        ----------
+        stdin: t.BinaryIO
+            The stream to read messages from.
+        stdout: t.BinaryIO
+            The stream to write messages to.
+
+        Returns
+        -------
+        int
+            The exit code, per the protocol: 0 if the client asked for a
+            shutdown before exiting, 1 otherwise.
+        """
+        while not self.exited:
+            message = read_message(stdin)
+            if message is None:
+                break
+
+            try:
+                replies = self.handle(message)
+            except Exception as e:
+                # One bad message shouldn't take the whole server down.
+                traceback.print_exc(file=sys.stderr)
+                replies = [self._internal_error(message, e)]
+
+            for reply in replies:
+                write_message(stdout, reply)
+
+        return 0 if self.shutdown_requested else 1
+
+
+def read_message(stream: t.BinaryIO) -> dict | None:
+    """Read a single Content-Length framed message, or None at EOF."""
+    length: int | None = None
+
+    while True:
+        header = stream.readline()
+        if not header:
+            return None
+
+        header = header.strip()
+        if not header:
+            break
+
+        name, _, value = header.decode("ascii").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+
+    if length is None:
+        raise ValueError("Message is missing a Content-Length header.")
+    return json.loads(stream.read(length).decode("utf-8"))
+
+
+def write_message(stream: t.BinaryIO, message: dict) -> None:
+    """Write a single Content-Length framed message."""
+    body = json.dumps(message).encode("utf-8")
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii"))
+    stream.write(body)
+    stream.flush()
+
+
+def main() -> int:
+    return HibikiLanguageServer().serve(sys.stdin.buffer, sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
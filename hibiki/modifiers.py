@@ -0,0 +1,275 @@
+"""
+Chord modifiers.
+
+Modifiers are the marks around a chord which change how it's played, ex the
+parentheses of a sustained chord, {(C)}, or the bar of a chucked one, {C|}.
+Each modifier declares its syntax as a regular expression, and its effect on
+the chord it's applied to. More can be registered:
+
+    @hibiki.register_modifier
+    class StrumUp(hibiki.Modifier):
+        name = "strum_up"
+        pattern = r".+\\^\\Z"
+
+        def apply(self, chord):
+            chord.symbol = f"{chord.text[:-1]}↑"
+
+        def note(self, chord):
+            return chord.text[:-1]
+
+The registered modifiers are compiled into a single regular expression, with
+an optional lookahead for each of them, and a table of which modifier each
+lookahead belongs to. Working out which modifiers a chord has is then one
+match, however many modifiers there are. What modifiers do to a chord only
+depends on its text, so the result is cached by text, and chords seen before
+are set up without matching anything at all.
+"""
+from __future__ import annotations
+import re
+import typing as t
+
+if t.TYPE_CHECKING:
+    from .chord import Chord
+
+
+# How many distinct chord texts to remember the modifiers of.
+CACHE_SIZE = 4096
+
+
+class Modifier:
+    """
+    Base class for chord modifiers.
+
+    Subclasses set `name` and `pattern`, and implement `apply`. Modifiers are
+    applied in the order they're registered, so a modifier's symbol replaces
+    those of modifiers registered before it, while the note comes from the
+    first modifier with one.
+
+    Attributes
+    ----------
+    name: str
+        The name of the modifier, as it's listed in `Chord.modifiers`.
+    pattern: str
+        A regular expression which matches the text of chords the modifier
+        applies to. It's matched from the start of the text, and needs to be
+        anchored with \\Z to match up to the end. Dots match newlines. It
+        shouldn't define any named groups.
+    """
+    name: str = ""
+    pattern: str = ""
+
+    def apply(self, chord: Chord) -> None:
+        """
+        Apply the modifier to a chord its pattern matched.
+
+        This sets whatever attributes of the chord the modifier affects, ex
+        its `symbol`, which is what's displayed.
+        """
+        raise NotImplementedError
+
+    def note(self, chord: Chord) -> str | None:
+        """
+        Get a modified chord's note, once every modifier has been applied.
+
+        Returns None to leave it to the modifiers after this one.
+        """
+        return None
+
+
+class Chucked(Modifier):
+    """A chucked chord, ex {C|}."""
+    name = "chucked"
+    pattern = r".*\|\Z"
+
+    def apply(self, chord: Chord) -> None:
+        chord.chucked = True
+        chord.symbol = f"{chord.text[:-1]}|"
+
+    def note(self, chord: Chord) -> str | None:
+        return chord.symbol[:-1]
+
+
+class PalmMuted(Modifier):
+    """A palm muted chord, ex {C_}."""
+    name = "palm_muted"
+    pattern = r".*_\Z"
+
+    def apply(self, chord: Chord) -> None:
+        chord.palm_muted = True
+        chord.symbol = f"{chord.text[:-1]}_"
+
+    def note(self, chord: Chord) -> str | None:
+        return chord.symbol[:-1]
+
+
+class Sustained(Modifier):
+    """A sustained chord, ex {(C)}."""
+    name = "sustained"
+    pattern = r"\(.*\)\Z"
+
+    def apply(self, chord: Chord) -> None:
+        chord.sustained = True
+        chord.symbol = f"({chord.text[1:-1]})"
+
+    def note(self, chord: Chord) -> str | None:
+        return chord.symbol[1:-1]
+
+
+class NonChord(Modifier):
+    """A non-chord, ex {NC} or {N.C.}."""
+    name = "non_chord"
+    pattern = r"\.*N\.*C\.*\Z"
+
+    def apply(self, chord: Chord) -> None:
+        chord.non_chord = True
+        chord.symbol = "N.C."
+
+    def note(self, chord: Chord) -> str | None:
+        return "N.C."
+
+
+class Hammer(Modifier):
+    """A chord hammered into another, ex {ChD}."""
+    name = "hammer"
+    pattern = r".*h"
+
+    def apply(self, chord: Chord) -> None:
+        pre, post = tuple(chord.text.split("h"))
+        chord.hammer_into = type(chord)(post)
+        chord.symbol = f"{pre}h{chord.hammer_into.symbol}"
+
+    def note(self, chord: Chord) -> str | None:
+        return chord.symbol.split("h")[0]
+
+
+class CompiledModifiers:
+    """
+    A set of modifiers, compiled into a single regular expression.
+
+    Attributes
+    ----------
+    modifiers: list[Modifier]
+        The modifiers, in the order they're applied.
+    regex: re.Pattern[str]
+        A regular expression with an optional lookahead for each modifier,
+        each capturing in a group named after the modifier's index.
+    cache: dict[str, dict[str, t.Any]]
+        The attributes modifiers gave chords, by the chords' text.
+    """
+    def __init__(self, modifiers: t.Sequence[Modifier]):
+        self.modifiers = list(modifiers)
+        self.regex = re.compile(
+            "".join(f"(?:(?=(?P<m{i}>{modifier.pattern})))?" for i, modifier in enumerate(self.modifiers)),
+            re.DOTALL
+        )
+        # Which modifier each group belongs to, by the group's name.
+        self._dispatch = {f"m{i}": modifier for i, modifier in enumerate(self.modifiers)}
+        self.cache: dict[str, dict[str, t.Any]] = {}
+
+    def __repr__(self) -> str:
+        return f"<CompiledModifiers: {', '.join(modifier.name for modifier in self.modifiers)}>"
+
+    def matching(self, text: str) -> list[Modifier]:
+        """Find the modifiers a chord's text has, in the order they're applied."""
+        match = self.regex.match(text)
+        if match is None:
+            return []
+        return [self._dispatch[group] for group, value in match.groupdict().items() if value is not None]
+
+    def apply(self, chord: Chord) -> None:
+        """Apply every modifier a chord has, reusing the result for the same text."""
+        state = self.cache.get(chord.text)
+        if state is None:
+            applied = self.matching(chord.text)
+            for modifier in applied:
+                modifier.apply(chord)
+            chord.modifiers = tuple(modifier.name for modifier in applied)
+            for modifier in applied:
+                chord._note = modifier.note(chord)
+                if chord._note is not None:
+                    break
+
+            if len(self.cache) >= CACHE_SIZE:
+                self.cache.clear()
+            # Chords aren't modified once they're made, so chords with the
+            # same text can share whatever the modifiers set, ex the chord
+            # a chord is hammered into.
+            self.cache[chord.text] = dict(vars(chord))
+        else:
+            chord.__dict__.update(state)
+
+
+# Modifiers by name, in the order they're applied.
+MODIFIERS: dict[str, type[Modifier]] = {}
+
+_compiled: CompiledModifiers | None = None
+
+# Called whenever the registered modifiers change, to clear caches of
+# anything built from chords under the old ones.
+_on_change: list[t.Callable[[], None]] = []
+
+
+def on_modifiers_changed(callback: t.Callable[[], None]) -> t.Callable[[], None]:
+    """
+    Call a function whenever the registered modifiers change.
+
+    Modules which cache chords, or anything worked out from them, use this to
+    clear those caches. Can be used as a decorator.
+    """
+    _on_change.append(callback)
+    return callback
+
+
+def _changed() -> None:
+    global _compiled
+    _compiled = None
+    for callback in _on_change:
+        callback()
+
+
+def register_modifier(modifier: type[Modifier]) -> type[Modifier]:
+    """
+    Register a modifier, to be applied after those already registered.
+
+    Registering a modifier with the same name as another replaces it. Can be
+    used as a class decorator. Registered modifiers are passed on to worker
+    processes by reference, so to render with more than one job, they have
+    to be defined at the top level of a module.
+    """
+    MODIFIERS[modifier.name] = modifier
+    _changed()
+    return modifier
+
+
+def unregister_modifier(name: str) -> None:
+    """Stop applying a registered modifier."""
+    del MODIFIERS[name]
+    _changed()
+
+
+def restore_modifiers(modifiers: t.Sequence[type[Modifier]]) -> None:
+    """
+    Register exactly the given modifiers, in order, replacing any others.
+
+    This is the initializer for worker processes, which only start out with
+    the built in modifiers unless they're forked from their parent.
+    """
+    MODIFIERS.clear()
+    for modifier in modifiers:
+        MODIFIERS[modifier.name] = modifier
+    _changed()
+
+
+def compile_modifiers() -> CompiledModifiers:
+    """Get the registered modifiers, compiling them if they've changed."""
+    global _compiled
+    if _compiled is None:
+        _compiled = CompiledModifiers([modifier() for modifier in MODIFIERS.values()])
+    return _compiled
+
+
+# The order matters, and keeps chords as they always were: sustained,
+# chucked and palm muted chords are exclusive, and hammers are last so their
+# symbol wins, while notes come from the first of them.
+for _modifier in (Chucked, PalmMuted, Sustained, NonChord, Hammer):
+    register_modifier(_modifier)
@@ -0,0 +1,258 @@
+"""
+Outlines of Hibiki source.
+
+An outline lists the stanzas of a document, where they are, and what each of
+them depends on, without laying out a single line. Stanzas are found exactly
+where the parser finds them, and that's enough to render any one stanza, or
+any run of them, without the rest of the document.
+
+A stanza depends on the line recalls it uses, the earlier lines those recalls
+were saved on (and whatever those lines use in turn), and, if it's a heading
+recall, the stanza it recalls. Rendering part of a document only parses the
+requested stanzas and the lines they depend on. Every other line is blanked,
+so line numbers in errors stay the same as they are in the full document.
+"""
+from __future__ import annotations
+import bisect
+import typing as t
+
+from .diagnostics import split_blocks
+from .parser import SAVE_REGEX, RECALL_REGEX
+from .include import INCLUDE_REGEX
+from .source import SourceIndex
+
+
+class OutlineEntry:
+    """
+    A stanza as it's written in the source.
+
+    Attributes
+    ----------
+    index: int
+        The position of the stanza within the outline.
+    heading: str
+        The stanza's heading.
+    repeat_count: int
+        The stanza's repeat count.
+    line: int
+        The line the stanza's heading is on. (1 indexed)
+    end_line: int
+        The last line of the stanza. (1 indexed)
+    span: tuple[int, int]
+        The start and end offsets of the stanza in the source.
+    recalls: list[str]
+        The line recalls the stanza uses, in the order they're first used.
+    is_recall: bool
+        Whether the stanza is a heading recall, with nothing but a heading.
+    definition: int | None
+        For heading recalls, the index of the stanza being recalled. This is
+        None if the stanza is defined in an included library, or nowhere.
+    """
+    def __init__(self, index: int, heading: str, repeat_count: int, line: int, end_line: int, span: tuple[int, int]):
+        self.index = index
+        self.heading = heading
+        self.repeat_count = repeat_count
+        self.line = line
+        self.end_line = end_line
+        self.span = span
+        self.recalls: list[str] = []
+        self.definition: int | None = None
+        self.is_recall: bool = False
+
+    def __repr__(self) -> str:
+        return f"<OutlineEntry: {self.name} on line {self.line}>"
+
+    @property
+    def name(self) -> str:
+        """The name of the stanza, as it's rendered."""
+        return self.heading.strip()
+
+
+class Outline:
+    """
+    The stanzas of a document, and what they depend on.
+
+    Attributes
+    ----------
+    text: str
+        The source the outline was made from.
+    path: str | None
+        The path of the source, if it has one. Includes are resolved
+        relative to it.
+    entries: list[OutlineEntry]
+        The stanzas, in the order they're written.
+    """
+    def __init__(self, text: str, path: str | None=None):
+        self.text = text
+        self.path = path
+        self.entries: list[OutlineEntry] = []
+        self._lines = text.split("\n")
+        # The lines each recall is saved on, and the recalls used on each line.
+        self._saves: dict[str, list[int]] = {}
+        self._uses: dict[int, list[str]] = {}
+        self._includes: list[int] = []
+        self._build()
+
+    def __repr__(self) -> str:
+        return f"<Outline: {len(self.entries)} stanzas>"
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> t.Iterator[OutlineEntry]:
+        return iter(self.entries)
+
+    def __getitem__(self, index: int) -> OutlineEntry:
+        return self.entries[index]
+
+    def _build(self) -> None:
+        index = SourceIndex(self.text)
+        definitions: dict[str, int] = {}
+
+        for line_no, line in enumerate(self._lines, start=1):
+            if INCLUDE_REGEX.match(line):
+                self._includes.append(line_no)
+                continue
+
+            save_match = SAVE_REGEX.search(line)
+            if save_match:
+                self._saves.setdefault(save_match.group()[2:-1], []).append(line_no)
+                line = line[:save_match.start()]
+
+            uses = [match.group()[2:-1] for match in RECALL_REGEX.finditer(line)]
+            if uses:
+                self._uses[line_no] = uses
+
+        for block in split_blocks(self.text, self.path):
+            entry = OutlineEntry(
+                len(self.entries),
+                block.heading,
+                block.repeat_count,
+                block.start,
+                block.end,
+                (index.line_start(block.start), index.line_end(min(block.end, len(index))))
+            )
+            for line_no in range(block.start + 1, block.end + 1):
+                for name in self._uses.get(line_no, []):
+                    if name not in entry.recalls:
+                        entry.recalls.append(name)
+
+            # Only the first definition of a heading can be recalled. Any
+            # later one is a redefinition.
+            if block.is_empty:
+                entry.is_recall = True
+                entry.definition = definitions.get(block.heading)
+            else:
+                definitions.setdefault(block.heading, entry.index)
+            self.entries.append(entry)
+
+    @property
+    def headings(self) -> list[str]:
+        """The heading of every stanza, in order."""
+        return [entry.heading for entry in self.entries]
+
+    def find(self, name: str) -> int:
+        """
+        Get the index of the first stanza with a given name.
+
+        Parameters
+        ----------
+        name: str
+            The name of the stanza, ex "Chorus".
+
+        Returns
+        -------
+        int
+            The index of the stanza.
+
+        Raises
+        ------
+        KeyError
+            If no stanza has that name.
+        """
+        for entry in self.entries:
+            if entry.name == name.strip():
+                return entry.index
+        raise KeyError(name)
+
+    def dependencies(self, indices: t.Iterable[int]) -> set[int]:
+        """
+        Get every line needed to render some of the stanzas.
+
+        Parameters
+        ----------
+        indices: t.Iterable[int]
+            The indices of the stanzas to render.
+
+        Returns
+        -------
+        set[int]
+            The line numbers needed. (1 indexed)
+        """
+        entries = [self.entries[i] for i in indices]
+        entries += [self.entries[entry.definition] for entry in entries if entry.definition is not None]
+
+        needed: set[int] = set()
+        pending: list[tuple[str, int]] = []
+        for entry in entries:
+            needed.update(range(entry.line, entry.end_line + 1))
+            for line_no in range(entry.line, entry.end_line + 1):
+                pending.extend((name, line_no) for name in self._uses.get(line_no, []))
+
+        # A recall used on a line comes from the last line before it that
+        # saved it. Those lines can use recalls of their own.
+        while pending:
+            name, line_no = pending.pop()
+            saves = self._saves.get(name, [])
+            i = bisect.bisect_left(saves, line_no)
+            if i == 0:
+                # Included from a library, or undefined.
+                continue
+            save = saves[i - 1]
+            if save not in needed:
+                needed.add(save)
+                pending.extend((used, save) for used in self._uses.get(save, []))
+
+        if needed:
+            last = max(needed)
+            needed.update(line_no for line_no in self._includes if line_no < last)
+        return needed
+
+    def source_for(self, indices: t.Iterable[int]) -> str:
+        """
+        Get the source needed to render some of the stanzas.
+
+        Every line that isn't needed is blanked, so the source has the same
+        line numbers as the original.
+
+        Parameters
+        ----------
+        indices: t.Iterable[int]
+            The indices of the stanzas to render.
+
+        Returns
+        -------
+        str
+            The reduced source.
+        """
+        needed = self.dependencies(indices)
+        return "\n".join(line if i in needed else "" for i, line in enumerate(self._lines, start=1))
+
+
+def outline(text: str, path: str | None=None) -> Outline:
+    """
+    Outline Hibiki source.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code to outline.
+    path: str | None
+        The path of the file the source came from, if any.
+
+    Returns
+    -------
+    Outline
+        The outline of the source.
+    """
+    return Outline(text, path=path)
@@ -5,33 +5,237 @@ Exposes both a `HibikiParser` class and a `parse` function for convenience.
 """
 
 from __future__ import annotations
+
+import os
 import re
+import typing as t
+
+from hibiki.errors import HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall, ChordSyntaxError, IncludeError, RecallCycle, RecallTooLarge
+from .stanza import Stanza, RecalledStanza, SpanStanza
+from .lexer import hibiki_lexer, LexerError
+from .source import SourceIndex
+from .limits import Limits, Budget, DEFAULT_LIMITS
+from .include import INCLUDE_REGEX, NOT_ALLOWED, Library, default_root, include
+from .modifiers import compile_modifiers
+from .song import Song
+
 
-from hibiki.errors import EmptyStanza, RedefinedStanza, UndefinedRecall, ChordSyntaxError
-from .stanza import Stanza
-from .lexer import hibiki_lexer
+# A line which consists of nothing but a heading, ex "[Chorus] (x2)"
+HEADING_REGEX = re.compile(r'^\[[^\]]+\](?:\s*\(\s*x\s*\d+\s*\))?[ \t]*$')
+
+# Recall saves (=name) and recall calls (*name).
+SAVE_REGEX = re.compile(r'\(=\w+\)$')
+RECALL_REGEX = re.compile(r'\(\*\w+\)')
 
 
 class HibikiParser:
-    def __init__(self):
+    """
+    A parser for Hibiki source code.
+
+    Attributes
+    ----------
+    path: str | None
+        The path of the file being parsed, if it came from one. Includes are
+        resolved relative to it, or to the working directory without one.
+    allow_includes: bool
+        Whether the source may include libraries. Includes read files off
+        the local disk, so by default they're only allowed when parsing a
+        file, ie with a `path`.
+    include_root: str
+        The directory includes have to stay within. Defaults to the
+        directory of `path`, or the working directory without one.
+    including: tuple[str, ...]
+        The paths of the files in the middle of including this one.
+    libraries: list[Library]
+        The libraries included by the source, in the order they're included.
+    included_stanzas: dict[str, Stanza]
+        Stanzas from included libraries which can be recalled by heading.
+    limits: Limits
+        The limits on how far the source is allowed to expand.
+    compact: bool
+        Whether stanzas are made as `SpanStanza`s, which refer to spans of a
+        single shared buffer instead of holding copies of their text. This
+        keeps memory use down for large documents, or for many documents
+        kept in memory, at the cost of building text when it's used.
+    """
+    def __init__(
+            self,
+            path: str | None=None,
+            including: tuple[str, ...]=(),
+            limits: Limits | None=None,
+            compact: bool=False,
+            allow_includes: bool | None=None,
+            include_root: str | None=None
+        ):
+        self.path = path
+        self.allow_includes = path is not None if allow_includes is None else allow_includes
+        self.include_root = os.path.abspath(include_root) if include_root is not None else default_root(path)
+        self.including = including
+        self.limits = limits or DEFAULT_LIMITS
+        self.compact = compact
+        self.buffer: str = ""
+        self.current_body_start: int = 0
+        self.budget: Budget = self.limits.budget()
+        self.libraries: list[Library] = []
+        self.included_stanzas: dict[str, Stanza] = {}
         self.stanzas: list[Stanza] = []
         self.current_heading: str | None = None
         self.current_stanza_text: str = ""
         self.current_stanza_line: int = 0
+        self.current_stanza_offset: int = 0
         self.current_repeat_count: int = 1
-        self.line_num = 1
         self.recalls: dict[str, str] = {}
+        self.source: SourceIndex | None = None
+
+        # Any modifiers registered since the last parser was built are
+        # compiled now, rather than by the first chord.
+        compile_modifiers()
+
+
+    def _error(self, error: HibikiError, line_no: int, column: int=1, end_column: int | None=None) -> None:
+        """
+        Report an error in the source.
+
+        The parser stops at the first error, but subclasses can collect them
+        and carry on instead, like `hibiki.diagnostics.Validator` does.
+
+        Parameters
+        ----------
+        error: HibikiError
+            The error.
+        line_no: int
+            The line the error is on.
+        column: int
+            The column the error starts in, within the line as written.
+        end_column: int | None
+            The column just past the end of the error, or None if the error
+            is with the whole line.
+        """
+        raise error
+
+    def _append(self, text: str) -> None:
+        """Adds text to the stanza being built."""
+        if self.compact:
+            # Compact stanzas don't keep their text, and only the end of it
+            # is needed to spot the blank line that ends the stanza.
+            self.current_stanza_text = (self.current_stanza_text + text)[-2:]
+        else:
+            self.current_stanza_text += text
+
+    def _finish_stanza(self, end: int) -> None:
+        """
+        Completes the existing stanza and adds it to the list.
+
+        Parameters
+        ----------
+        end: int
+            The offset into the buffer where the stanza's body ends.
+        """
+        if self.current_heading is None:
+            return
 
+        if self.compact and "\n" in self.current_heading:
+            # Only the first line of a heading spanning lines is its name,
+            # the rest being the start of its body, which a span can't hold.
+            self.current_stanza_text = f"[{self.current_heading}]\n{self.buffer[self.current_body_start:end]}"
+        elif self.compact:
+            self.stanzas.append(SpanStanza(
+                self.current_heading,
+                self.buffer,
+                self.current_body_start,
+                end,
+                self.current_stanza_line,
+                repeat_count=self.current_repeat_count,
+                offset=self.current_stanza_offset,
+                source=self.source
+            ))
+            return
 
-    def _finish_stanza(self) -> None:
-        """Completes the existing stanza and adds it to the list."""
-        if self.current_heading is None or not self.current_stanza_text.strip():
+        if not self.current_stanza_text.strip():
             return
 
-        stanza = Stanza(self.current_heading, self.current_stanza_text, self.current_stanza_line, repeat_count=self.current_repeat_count)
+        stanza = Stanza(
+            self.current_heading,
+            self.current_stanza_text,
+            self.current_stanza_line,
+            repeat_count=self.current_repeat_count,
+            offset=self.current_stanza_offset,
+            source=self.source
+        )
         self.stanzas.append(stanza)
 
 
+    def _include(self, line_no: int, target: str, in_stanza: bool=False) -> None:
+        """
+        Include a library, making its recalls and stanzas available.
+
+        Parameters
+        ----------
+        line_no: int
+            The line the include is on.
+        target: str
+            The path being included, as written.
+        in_stanza: bool
+            Whether the include is inside a stanza, where it isn't allowed.
+        """
+        if in_stanza:
+            return self._error(IncludeError(line_no, target, "Includes can't appear inside a stanza."), line_no)
+        if not self.allow_includes:
+            return self._error(IncludeError(line_no, target, NOT_ALLOWED), line_no)
+        try:
+            library = include(line_no, target, self.path, self.including, self.include_root)
+        except IncludeError as e:
+            return self._error(e, line_no)
+        self.libraries.append(library)
+        self.recalls.update(library.recalls)
+        self.included_stanzas.update(library.stanzas)
+
+    def _expand_recalls(self, line: str, line_no: int, saving: str | None=None) -> str:
+        """
+        Substitute the recalls within a line.
+
+        Parameters
+        ----------
+        line: str
+            The line to expand.
+        line_no: int
+            The line number, for errors.
+        saving: str | None
+            The name the line is being saved as, if it is.
+
+        Returns
+        -------
+        str
+            The line with recalls substituted.
+        """
+        matches = list(RECALL_REGEX.finditer(line)) if "(*" in line else []
+        if not matches:
+            self.budget.add_expanded(len(line) + 1)
+            return line
+
+        # Work out how big the line will be before building it.
+        size = len(line)
+        for match in matches:
+            var_name = match.group()[2:-1]  # Extract name from (*name)
+            if var_name not in self.recalls:
+                # Carrying on past an error leaves the recall as it is.
+                error = RecallCycle if var_name == saving else UndefinedRecall
+                self._error(error(line_no, var_name), line_no, match.start() + 1, match.end() + 1)
+                continue
+            size += len(self.recalls[var_name]) - len(match.group())
+
+        if size > self.limits.max_recall_size:
+            self._error(RecallTooLarge(line_no, size, self.limits.max_recall_size), line_no)
+            size = len(line)
+            matches = []
+
+        # Counted before the line is built, so the document as a whole never
+        # grows past its limit either.
+        self.budget.add_expanded(size + 1)
+        if not matches:
+            return line
+        return RECALL_REGEX.sub(lambda match: self.recalls.get(match.group()[2:-1], match.group()), line)
+
     def _preprocess_recalls(self, text: str) -> str:
         """
         Extract recall saves and substitute recall calls.
@@ -48,24 +252,40 @@ class HibikiParser:
         """
         lines = text.split('\n')
         out = []
+        in_stanza = False
 
         for i, line in enumerate(lines):
-            # Check for recall save (=name)
-            save_match = re.search(r'\(=\w+\)$', line)
+            # Includes are only allowed outside of stanzas. They're replaced
+            # by a blank line, so line numbers stay the same.
+            include_match = INCLUDE_REGEX.match(line)
+            if include_match:
+                self._include(i+1, include_match.group(1), in_stanza)
+                out.append("")
+                continue
+
+            if HEADING_REGEX.match(line):
+                in_stanza = True
+            elif line == "":
+                in_stanza = False
+
+            # Check for recall save (=name). Most lines don't have one, and
+            # looking for the brackets first is much quicker than the regex.
+            save_match = SAVE_REGEX.search(line) if "(=" in line else None
+            var_name = None
             if save_match:
                 var_name = save_match.group()[2:-1]  # Extract name from (=name)
-                line_without_save = line[:save_match.start()]
-                self.recalls[var_name] = line_without_save
-                line = line_without_save
-
-            # Check for recall recall (@name)
-            for match in re.finditer(r'\(\*\w+\)', line):
-                var_name = match.group()[2:-1]  # Extract name from (@name)
-                if var_name in self.recalls:
-                    line = line.replace(match.group(), self.recalls[var_name])
-                else:
-                    raise UndefinedRecall(i+1, var_name)
-
+                line = line[:save_match.start()]
+
+            # Substitute recall calls (*name). Saved lines are stored with
+            # their own recalls already substituted, so a recall containing
+            # other recalls expands fully without expanding anything twice.
+            line = self._expand_recalls(line, i+1, var_name)
+            if var_name is not None:
+                self.recalls[var_name] = line
+
+            # Recalls can make the source much larger than it started out.
+            self.budget.add_output(line)
+            self.budget.check_time()
             out.append(line)
 
         return '\n'.join(out)
@@ -110,18 +330,26 @@ class HibikiParser:
         # Iterate through stanzas and save empty ones by heading
         for i, stanza in enumerate(stanzas):
             if stanza.is_empty:
-                try:
-                    saved_stanza = saved[stanza.heading]
-                    stanzas[i] = Stanza(saved_stanza.heading, saved_stanza.text, saved_stanza.starting_line, repeat_count=stanza.repeat_count)
-                except KeyError:
+                definition = saved.get(stanza.heading) or self.included_stanzas.get(stanza.heading)
+                if definition is None:
                     # If we get here, it means no saved stanza was found for this heading.
-                    raise EmptyStanza(stanza)
+                    self._error(EmptyStanza(stanza), stanza.starting_line)
+                    continue
+
+                # Recalls share the definition's body rather than copying it.
+                stanzas[i] = RecalledStanza(
+                    definition,
+                    repeat_count=stanza.repeat_count,
+                    recall_line=stanza.starting_line,
+                    recall_offset=stanza.offset,
+                    recall_source=stanza.source
+                )
             else:
                 existing = saved.get(stanza.heading, None)
                 if existing is not None and existing is not stanza:
                     # If we get here, it means a saved stanza was found for this heading, but it's not the same stanza.
                     # This indicates a redefinition of the stanza, so we raise an error.
-                    raise RedefinedStanza(stanza, existing)
+                    self._error(RedefinedStanza(stanza, existing), stanza.starting_line)
                 else:
                     saved[stanza.heading] = stanza
         return stanzas
@@ -143,14 +371,17 @@ class HibikiParser:
         # Buffer to hold the postprocessed stanzas
         out = []
 
-        # Repeat each stanza based on its repeat count
+        # Lines only need to be built to count them if they're limited.
+        count_lines = self.limits.max_lines is not None
+
+        # Repeat each stanza based on its repeat count, one at a time, so
+        # that huge repeat counts hit the limits before the list gets big.
         for stanza in stanzas:
-            out.append(stanza)
-            # Repeat the stanza if its repeat count is greater than 1
-            if stanza.repeat_count > 1:
-                # Append the stanza to the output buffer for each repeat
-                for _ in range(stanza.repeat_count-1):
-                    out.append(stanza)
+            for _ in range(max(stanza.repeat_count, 1)):
+                self.budget.add_stanzas()
+                if count_lines:
+                    self.budget.add_lines(len(stanza.lines))
+                out.append(stanza)
         return out
 
     def _postprocess(self, stanzas: list[Stanza]) -> list[Stanza]:
@@ -174,89 +405,164 @@ class HibikiParser:
         stanzas = self._postprocess_heading_repeats(stanzas)
         return stanzas
 
-    def parse(self, text: str) -> list[Stanza]:
+    def _prepare(self, text: str) -> tuple[str, SourceIndex]:
         """
-        Parse Hibiki source code into Stanza objects.
+        Get source ready to be lexed.
+
+        Starts a new budget, then substitutes recalls and follows includes.
 
         Parameters
         ----------
         text: str
-            The Hibiki source code to parse.
+            The Hibiki source code to prepare.
 
         Returns
         -------
-        list[Stanza]
-            A list of parsed Stanza objects.
+        tuple[str, SourceIndex]
+            The processed text, and an index of where its lines start.
         """
+        # Limits apply to each parse separately.
+        self.budget = self.limits.budget()
+
         # Hibiki files need to end with a newline.
         if not text.endswith("\n\n"):
             text += "\n\n"
 
+        # Index where each line starts, so positions can be worked out from
+        # offsets instead of counting lines as tokens go by.
+        self.source = SourceIndex(text, self.path)
+
         # Preprocess to extract and handle recalls
-        text = self._preprocess(text)
+        processed = self._preprocess(text)
+
+        # Substituting recalls never adds or removes lines, so line numbers
+        # in the processed text are line numbers in the source too. Only
+        # offsets within a line can differ.
+        index = self.source if processed == text else SourceIndex(processed)
+
+        # Compact stanzas refer to spans of the processed text. When there
+        # were no recalls, that's the source itself, so only one copy is kept.
+        self.buffer = text if processed == text else processed
+        return processed, index
+
+    def _read_token(self, kind: str, value: t.Any, start: int, end: int, index: SourceIndex) -> None:
+        """
+        Add a token from the lexer to the stanzas being built.
 
-        # Tokenize the input
-        hibiki_lexer.input(text)
+        Parameters
+        ----------
+        kind: str
+            The type of the token, ex 'HEADING'.
+        value: t.Any
+            The value of the token, as the lexer made it.
+        start: int
+            The offset of the token in the processed text.
+        end: int
+            The offset just past the end of the token.
+        index: SourceIndex
+            The index of the processed text.
+        """
+        if kind == 'HEADING':
+            # Finish previous stanza if it exists
+            if self.current_heading is not None:
+                self._finish_stanza(start)
+
+            # Start new stanza
+            heading, repeat_count = value
+            self.current_heading = heading
+            self.current_repeat_count = repeat_count
+            self.current_stanza_text = ""
+            self._append(f"[{heading}]\n")
+            self.current_body_start = end
+            self.current_stanza_line = index.line_of(start)
+            self.current_stanza_offset = self.source.line_start(self.current_stanza_line)
+
+        elif kind == 'NEWLINE':
+            # Handle line breaks
+            num_breaks = len(value)
+            for i in range(num_breaks):
+                if self.current_heading is not None:
+                    self._append("\n")
+                    # Double newline ends a stanza
+                    if self.current_stanza_text.endswith("\n\n"):
+                        self._finish_stanza(start + i + 1)
+                        self.current_heading = None
+                        self.current_stanza_text = ""
+
+        elif kind == 'CHORD':
+            # Add chord with braces restored
+            if self.current_heading is not None:
+                self._append(f"{{{value}}}")
+
+        else:
+            # Add other token content (FRAGMENT)
+            if self.current_heading is not None:
+                self._append(value)
+
+    def parse(self, text: str) -> list[Stanza]:
+        """
+        Parse Hibiki source code into Stanza objects.
+
+        Parameters
+        ----------
+        text: str
+            The Hibiki source code to parse.
+
+        Returns
+        -------
+        list[Stanza]
+            A list of parsed Stanza objects.
+        """
+        processed, index = self._prepare(text)
+
+        # Tokenize the input. Each parse gets its own lexer, so nothing
+        # (like the lexer's line count) carries over between parses.
+        lexer = hibiki_lexer.clone()
+        lexer.lineno = 1
+        lexer.input(processed)
 
         # Process tokens
         try:
             while True:
-                tok = hibiki_lexer.token()
+                tok = lexer.token()
                 if not tok:
                     break
+                self._read_token(tok.type, tok.value, tok.lexpos, lexer.lexpos, index)
+        except LexerError as e:
+            line_num, column = index.position(e.lexpos)
+            reason = f"Illegal character '{e.char}' in column {column}"
 
-                if tok.type == 'HEADING':
-                    # Finish previous stanza if it exists
-                    if self.current_heading is not None:
-                        self._finish_stanza()
-
-                    # Start new stanza
-                    heading, repeat_count = tok.value
-                    self.current_heading = heading
-                    self.current_repeat_count = repeat_count
-                    self.current_stanza_text = f"[{heading}]\n"
-                    self.current_stanza_line = self.line_num
-                    # HEADING includes a newline, so next token is on the next line
-                    self.line_num += 1
-
-                elif tok.type == 'NEWLINE':
-                    # Handle line breaks
-                    num_breaks = len(tok.value)
-                    for _ in range(num_breaks):
-                        if self.current_heading is not None:
-                            self.current_stanza_text += "\n"
-                            # Double newline ends a stanza
-                            if self.current_stanza_text.endswith("\n\n"):
-                                self._finish_stanza()
-                                self.current_heading = None
-                                self.current_stanza_text = ""
-                    self.line_num += num_breaks
-
-                elif tok.type == 'CHORD':
-                    # Add chord with braces restored
-                    if self.current_heading is not None:
-                        self.current_stanza_text += f"{{{tok.value}}}"
-
-                else:
-                    # Add other token content (FRAGMENT)
-                    if self.current_heading is not None:
-                        self.current_stanza_text += tok.value
-        except SyntaxError as e:
             # Convert chord-related syntax errors to ChordSyntaxError
-            if '{' in str(e) or '}' in str(e):
+            if e.char in "{}":
                 stanza_name = self.current_heading or "unknown"
-                raise ChordSyntaxError(line_num=self.line_num, stanza_name=stanza_name, reason=str(e))
-            raise
+                raise ChordSyntaxError(line_num=line_num, stanza_name=stanza_name, reason=reason)
+            raise SyntaxError(f"Line #{line_num}: {reason}") from e
 
         # Finish any remaining stanza
         if self.current_heading is not None:
-            self._finish_stanza()
+            self._finish_stanza(len(processed))
 
         self.stanzas = self._postprocess(self.stanzas)
         return self.stanzas
 
+    def parse_song(self, text: str) -> Song:
+        """
+        Parse Hibiki source code into a Song.
+
+        Parameters
+        ----------
+        text: str
+            The Hibiki source code to parse.
+
+        Returns
+        -------
+        Song
+            The parsed song.
+        """
+        return Song(self.parse(text))
+
 
-def parse(text: str) -> list[Stanza]:
+def parse(text: str, path: str | None=None) -> list[Stanza]:
     """
     Shortcut to parsing Hibiki source code.
 
@@ -266,10 +572,13 @@ def parse(text: str) -> list[Stanza]:
     ----------
     text: str
         The Hibiki source code to parse.
+    path: str | None
+        The path of the file the source came from, if any. Includes are
+        resolved relative to it, and are only allowed with one.
 
     Returns
     -------
     list[Stanza]
         A list of parsed Stanza objects.
     """
-    return HibikiParser().parse(text)
+    return HibikiParser(path=path).parse(text)
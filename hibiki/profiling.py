@@ -0,0 +1,279 @@
+"""
+Profiling parsing and rendering.
+
+When a song is slow to render, run it under `profile`:
+
+    with hibiki.profile("slow_song") as report:
+        hibiki.render_file("slow_song.hb")
+
+or from the command line with `hibiki slow_song.hb --profile`. Either way,
+two files are written:
+
+- `slow_song.pstats`, the raw profile, for `python -m pstats` or snakeviz.
+- `slow_song.collapsed`, one line per call stack with the microseconds spent
+  in it, in the collapsed format flamegraph.pl, speedscope and inferno read.
+
+A summary of the functions within Hibiki which took the most time is printed
+too. Functions are named by their module and qualified name, ex
+`hibiki.parser.HibikiParser._preprocess_recalls`, so parser internals are
+easy to tell apart.
+
+cProfile only records which function called which, not whole call stacks.
+Stacks are rebuilt from those calls, splitting the time of a function
+between the callers it was called from in proportion to the time each
+caller spent in it. That's exact for functions only ever reached one way.
+"""
+from __future__ import annotations
+import contextlib
+import cProfile
+import inspect
+import os
+import pstats
+import sys
+import typing as t
+
+# A function as cProfile knows it: (filename, first line, name).
+FunctionKey = t.Tuple[str, int, str]
+
+# Stacks deeper than this are cut off, and stacks with less than this many
+# seconds in them are left out, to keep the collapsed output a sane size.
+MAX_DEPTH = 128
+MIN_STACK_TIME = 1e-6
+
+
+class ProfileEntry:
+    """
+    The time spent in a single function.
+
+    Attributes
+    ----------
+    name: str
+        The function's module and qualified name.
+    calls: int
+        The number of times it was called.
+    self_time: float
+        Seconds spent in the function itself.
+    total_time: float
+        Seconds spent in the function and everything it called.
+    """
+    def __init__(self, name: str, calls: int, self_time: float, total_time: float):
+        self.name = name
+        self.calls = calls
+        self.self_time = self_time
+        self.total_time = total_time
+
+    def __repr__(self) -> str:
+        return f"<ProfileEntry: {self.name} {self.self_time:.4f}s>"
+
+
+class ProfileReport:
+    """
+    The outcome of profiling.
+
+    Everything but `prefix` is filled in once profiling is over.
+
+    Attributes
+    ----------
+    prefix: str
+        The path the output files are written to, without extensions.
+    stats: pstats.Stats | None
+        The raw profile.
+    entries: list[ProfileEntry]
+        The functions within Hibiki, slowest first by their own time.
+    total_time: float
+        The total seconds profiled.
+    """
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.stats: pstats.Stats | None = None
+        self.entries: list[ProfileEntry] = []
+        self.total_time: float = 0.0
+
+    def __repr__(self) -> str:
+        return f"<ProfileReport: {self.prefix}>"
+
+    @property
+    def pstats_path(self) -> str:
+        return f"{self.prefix}.pstats"
+
+    @property
+    def collapsed_path(self) -> str:
+        return f"{self.prefix}.collapsed"
+
+    def summary(self, top: int=10) -> str:
+        """Describe the functions within Hibiki which took the most time."""
+        width = max([len(entry.name) for entry in self.entries[:top]] + [8])
+        lines = [
+            f"Profiled {self.total_time * 1000:.1f} ms. Wrote {self.pstats_path} and {self.collapsed_path}.",
+            f"{'function':<{width}}  {'calls':>8}  {'self ms':>9}  {'total ms':>9}",
+        ]
+        for entry in self.entries[:top]:
+            lines.append(f"{entry.name:<{width}}  {entry.calls:>8}  {entry.self_time * 1000:>9.2f}  {entry.total_time * 1000:>9.2f}")
+        return "\n".join(lines)
+
+
+def _qualified_names() -> dict[tuple[str, int], str]:
+    """Map where each function in Hibiki is defined to its qualified name."""
+    names: dict[tuple[str, int], str] = {}
+    for module_name, module in list(sys.modules.items()):
+        if module is None or not (module_name == "hibiki" or module_name.startswith("hibiki.")):
+            continue
+
+        pending: list[t.Any] = list(vars(module).values())
+        while pending:
+            obj = pending.pop()
+            if inspect.isclass(obj) and obj.__module__ == module_name:
+                pending.extend(vars(obj).values())
+                continue
+            if isinstance(obj, property):
+                pending.extend(func for func in (obj.fget, obj.fset, obj.fdel) if func is not None)
+                continue
+            if isinstance(obj, (staticmethod, classmethod)):
+                obj = obj.__func__
+            # Decorated functions, ex lru_cache, keep the original here.
+            obj = getattr(obj, "__wrapped__", obj)
+            code = getattr(obj, "__code__", None)
+            if code is not None and getattr(obj, "__module__", None) == module_name:
+                names[(code.co_filename, code.co_firstlineno)] = f"{module_name}.{obj.__qualname__}"
+    return names
+
+
+def _module_names() -> dict[str, str]:
+    """Map the file each loaded module was loaded from to its name."""
+    out: dict[str, str] = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename:
+            out[filename] = name
+    return out
+
+
+def _label(key: FunctionKey, qualified: dict[tuple[str, int], str], modules: dict[str, str]) -> str:
+    """Name a function by its module and qualified name, as best we can."""
+    filename, line, name = key
+    if (filename, line) in qualified:
+        label = qualified[(filename, line)]
+    elif filename == "~":
+        # Built in functions, ex "<built-in method builtins.len>".
+        label = name
+    elif filename in modules:
+        label = f"{modules[filename]}.{name}"
+        if name.startswith("<"):
+            label += f":{line}"
+    else:
+        label = f"{os.path.basename(filename)}:{line}:{name}"
+    # Semicolons separate frames in the collapsed format.
+    return label.replace(";", ",")
+
+
+def collapse(stats: pstats.Stats, labels: dict[FunctionKey, str]) -> dict[str, float]:
+    """
+    Rebuild call stacks from a profile.
+
+    Parameters
+    ----------
+    stats: pstats.Stats
+        The profile.
+    labels: dict[FunctionKey, str]
+        The name to give each function in a stack.
+
+    Returns
+    -------
+    dict[str, float]
+        Seconds spent in each stack, by the stack's frames joined with ";".
+    """
+    raw: dict[FunctionKey, tuple[int, int, float, float, dict[FunctionKey, tuple[int, int, float, float]]]] = stats.stats  # type: ignore[attr-defined]
+
+    callees: dict[FunctionKey, list[tuple[FunctionKey, float]]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((func, cumulative))
+
+    roots = [func for func, (_, _, _, _, callers) in raw.items() if not any(caller in raw for caller in callers)]
+
+    out: dict[str, float] = {}
+    # (function, the stack above it, the share of the function's time on this stack)
+    pending: list[tuple[FunctionKey, tuple[FunctionKey, ...], float]] = [(root, (), 1.0) for root in roots]
+    while pending:
+        func, above, share = pending.pop()
+        stack = above + (func,)
+        _, _, self_time, total_time, _ = raw[func]
+
+        if self_time * share >= MIN_STACK_TIME:
+            path = ";".join(labels[frame] for frame in stack)
+            out[path] = out.get(path, 0.0) + self_time * share
+
+        if len(stack) >= MAX_DEPTH or total_time * share < MIN_STACK_TIME:
+            continue
+        for callee, cumulative in callees.get(func, []):
+            # Recursive calls are already counted in the outermost call.
+            if callee in stack:
+                continue
+            callee_total = raw[callee][3]
+            if callee_total > 0:
+                pending.append((callee, stack, share * cumulative / callee_total))
+    return out
+
+
+def write_collapsed(stacks: dict[str, float], path: str) -> None:
+    """Write stacks in the collapsed format, weighted in microseconds."""
+    with open(path, "w", encoding="utf-8") as outfile:
+        for stack, seconds in sorted(stacks.items()):
+            micros = round(seconds * 1e6)
+            if micros > 0:
+                outfile.write(f"{stack} {micros}\n")
+
+
+@contextlib.contextmanager
+def profile(prefix: str="hibiki", top: int=10, stream: t.TextIO | None=None) -> t.Iterator[ProfileReport]:
+    """
+    Profile whatever runs within the context.
+
+    Parameters
+    ----------
+    prefix: str
+        The path to write the profile to, without an extension. Writes
+        `{prefix}.pstats` and `{prefix}.collapsed`.
+    top: int
+        The number of functions to print in the summary. With 0, no summary
+        is printed.
+    stream: t.TextIO | None
+        Where to print the summary. Defaults to stderr, so as not to get
+        mixed up with rendered output.
+
+    Yields
+    ------
+    ProfileReport
+        The report, which is filled in once the context exits.
+    """
+    report = ProfileReport(prefix)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield report
+    finally:
+        profiler.disable()
+
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(report.pstats_path)
+        raw = stats.stats  # type: ignore[attr-defined]
+
+        qualified = _qualified_names()
+        modules = _module_names()
+        labels = {func: _label(func, qualified, modules) for func in raw}
+        write_collapsed(collapse(stats, labels), report.collapsed_path)
+
+        package = os.path.dirname(os.path.abspath(__file__)) + os.sep
+        report.stats = stats
+        report.total_time = stats.total_tt  # type: ignore[attr-defined]
+        report.entries = sorted(
+            (
+                ProfileEntry(labels[func], calls, self_time, total_time)
+                for func, (_, calls, self_time, total_time, _) in raw.items()
+                if os.path.abspath(func[0]).startswith(package)
+            ),
+            key=lambda entry: (-entry.self_time, entry.name)
+        )
+
+        if top:
+            print(report.summary(top), file=stream or sys.stderr)
@@ -1,8 +1,56 @@
 from __future__ import annotations
+import collections
+import itertools
+import os
+import typing as t
+from concurrent.futures import Future, ProcessPoolExecutor
 from typing import overload
 
-from .stanza import Stanza
-from .parser import parse
+from .stanza import Line, Stanza, document_source
+from .parser import HibikiParser
+from .errors import ResourceLimitExceeded
+from .limits import Limits, Budget, DEFAULT_LIMITS
+from .layout import SongLayout, layout_line, layout_stanzas
+from .transpose import Transposer
+from .source import SourceMap
+from .emitters import Emitter, TextEmitter, emit
+from .outline import Outline
+from .song import Song
+from .modifiers import MODIFIERS, restore_modifiers
+
+
+# Documents with fewer distinct lines than this are always rendered serially,
+# since starting worker processes would take longer than rendering them.
+MIN_PARALLEL_LINES = 2000
+
+
+def _render_line(line: Line, transposer: Transposer | None) -> str:
+    """Render a line as a chord line and a lyric line."""
+    if transposer is None:
+        return line.render()
+    layout = layout_line(line, transposer)
+    return f"{layout.chord_line()}\n{layout.lyric_line()}\n"
+
+
+def _render_chunk(chunk: list[list[tuple[str, int]]], transposer: Transposer | None) -> list[list[str | None]]:
+    """
+    Render the lines of some stanza bodies in a worker process.
+
+    Lines which fail are left as None. They're rendered again by the parent
+    in order, so their errors are raised exactly where a serial render would
+    raise them.
+    """
+    holder = Stanza("", "[]\n", 0)
+    out = []
+    for body in chunk:
+        rendered: list[str | None] = []
+        for text, line_num in body:
+            try:
+                rendered.append(_render_line(Line(holder, text, line_num), transposer))
+            except Exception:
+                rendered.append(None)
+        out.append(rendered)
+    return out
 
 
 class HibikiRenderer:
@@ -10,10 +58,55 @@ class HibikiRenderer:
     A renderer for Hibiki tablature.
 
     Renderers work to take a list of stanzas from the Hibiki parser and render them into a string.
+
+    Chords can be transposed as they're rendered. Since only the alignment of
+    chords has to be redone, rendering an already parsed song in several keys
+    is cheap.
+
+    Attributes
+    ----------
+    breaks_between_sections: int
+        The number of blank lines between stanzas.
+    transpose: int
+        The number of semitones to transpose chords by.
+    prefer_flats: bool
+        Whether transposed chords are spelled with flats instead of sharps.
+    capo: int
+        The fret a capo sits on. Chords are transposed down to the shapes
+        played with the capo on.
+    limits: Limits
+        The limits on how large the output can get, and how long it can take
+        to produce. These are also passed on when parsing source.
+    jobs: int | None
+        The number of worker processes to lay out lines with. Recalls are
+        still resolved in one pass, after which the distinct stanza bodies are
+        laid out in parallel and stitched back together in order. The output
+        is identical either way. Defaults to 1, rendering serially, and None
+        uses every CPU.
     """
-    def __init__(self, breaks_between_sections: int=2):
+    def __init__(self, breaks_between_sections: int=2, transpose: int=0, prefer_flats: bool=False, capo: int=0, limits: Limits | None=None, jobs: int | None=1):
         self.breaks_between_sections = breaks_between_sections
+        self.transpose = transpose
+        self.prefer_flats = prefer_flats
+        self.capo = capo
+        self.limits = limits or DEFAULT_LIMITS
+        self.jobs = jobs
+
+    @property
+    def transposer(self) -> Transposer | None:
+        """The transposer to apply to chords, or None if they stay as is."""
+        semitones = (self.transpose - self.capo) % 12
+        if semitones == 0:
+            return None
+        return Transposer(semitones, prefer_flats=self.prefer_flats)
 
+    def _parse(self, input: str | list[Stanza] | Song) -> list[Stanza]:
+        """Parse source with the renderer's limits, if it isn't parsed already."""
+        if isinstance(input, str):
+            return HibikiParser(limits=self.limits).parse(input)
+        if isinstance(input, Song):
+            return list(input.stanzas)
+        return input
 
     @overload
     def render(self, input: str) -> str:
@@ -49,35 +142,276 @@ class HibikiRenderer:
         """
         ...
 
-    def render(self, input: str | list[Stanza]) -> str:
+    @overload
+    def render(self, input: Song) -> str:
+        """
+        Render a tab sheet from a parsed song.
+
+        Parameters
+        ----------
+        input: Song
+            The song to render.
+
+        Returns
+        -------
+        str
+            The rendered tab sheet.
+        """
+        ...
+
+    def render(self, input: str | list[Stanza] | Song) -> str:
         """
         Render Hibiki source code into a tab sheet.
 
         Parameters
         ----------
-        input: str | list[Stanza]
-            The source code or list of stanzas to render.
+        input: str | list[Stanza] | Song
+            The source code, list of stanzas or song to render.
 
         Returns
         -------
         str
             The rendered tab sheet.
         """
-        if isinstance(input, str):
-            stanzas = parse(input)
-        else:
-            stanzas = input
+        budget = self.limits.budget()
+        return self._render(self._parse(input), budget=budget)
+
+    def render_with_source_map(self, input: str | list[Stanza] | Song) -> tuple[str, SourceMap]:
+        """
+        Render Hibiki source code, keeping track of where each line came from.
+
+        Parameters
+        ----------
+        input: str | list[Stanza] | Song
+            The source code, list of stanzas or song to render.
+
+        Returns
+        -------
+        tuple[str, SourceMap]
+            The rendered tab sheet, and a map from each of its lines back to
+            the span of source it was rendered from.
+        """
+        budget = self.limits.budget()
+        stanzas = self._parse(input)
+        source_map = SourceMap(document_source(stanzas))
+        return self._render(stanzas, source_map, budget), source_map
+
+    def _render_parallel(self, stanzas: list[Stanza], transposer: Transposer | None, budget: Budget) -> dict[int, str | None]:
+        """
+        Render every distinct line of some stanzas across worker processes.
+
+        Repeats and heading recalls share the lines of the stanza they repeat,
+        so each body is only rendered once. Chunks are handed out a few at a
+        time and counted against the limits as they come back, and no more
+        are handed out once a limit is hit.
 
+        Returns
+        -------
+        dict[int, str | None]
+            The rendered lines by their id, which may be only some of them, or
+            an empty dict if there are too few lines to be worth rendering in
+            parallel.
+        """
+        seen: set[int] = set()
+        bodies: list[list[Line]] = []
+        for stanza in stanzas:
+            lines = stanza.lines
+            if id(lines) not in seen:
+                seen.add(id(lines))
+                bodies.append(lines)
+
+        total = sum(map(len, bodies))
+        if total < MIN_PARALLEL_LINES:
+            return {}
+
+        # Bodies are grouped into chunks of roughly equal numbers of lines, a
+        # few per worker so that one slow chunk doesn't hold the rest up.
+        jobs = self.jobs or os.cpu_count() or 1
+        size = max(1, total // (jobs * 4))
+        chunks: list[list[list[Line]]] = [[]]
+        count = 0
+        for body in bodies:
+            if count >= size:
+                chunks.append([])
+                count = 0
+            chunks[-1].append(body)
+            count += len(body)
+
+        # Distinct lines are never more than the lines in the output, so once
+        # they go over a limit the serial pass is bound to as well, and will
+        # raise at the same point it would have without this one. Counting
+        # them against a budget of their own keeps the serial pass's count
+        # right, while sharing its deadline.
+        counted = self.limits.budget()
+        counted.deadline = budget.deadline
+        counted.check_time()
+
+        rendered: dict[int, str | None] = {}
+        pending: collections.deque[tuple[list[list[Line]], Future[list[list[str | None]]]]] = collections.deque()
+        remaining = iter(chunks)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=restore_modifiers, initargs=(list(MODIFIERS.values()),)) as pool:
+            def submit(count: int) -> None:
+                for chunk in itertools.islice(remaining, count):
+                    work = [[(line.text, line.line_num) for line in body] for body in chunk]
+                    pending.append((chunk, pool.submit(_render_chunk, work, transposer)))
+
+            submit(jobs * 2)
+            try:
+                while pending:
+                    chunk, future = pending.popleft()
+                    for body, lines in zip(chunk, future.result()):
+                        rendered.update(zip(map(id, body), lines))
+                        counted.add_lines(len(body))
+                        for text in lines:
+                            if text is not None:
+                                counted.add_output(text)
+                    submit(1)
+            except ResourceLimitExceeded:
+                pool.shutdown(cancel_futures=True)
+        return rendered
+
+    def _render(self, stanzas: list[Stanza], source_map: SourceMap | None=None, budget: Budget | None=None) -> str:
         output: str = ""
+        transposer = self.transposer
+        budget = budget or self.limits.budget()
+        breaks = "\n" * self.breaks_between_sections
+        rendered = {} if self.jobs == 1 else self._render_parallel(stanzas, transposer, budget)
 
         for stanza in stanzas:
-            output += f"[{stanza.name}]\n"
+            budget.add_stanzas()
+
+            heading = f"[{stanza.name}]\n"
+            budget.add_output(heading)
+            output += heading
+            # Stanzas recalled from included libraries were defined in another
+            # file, so they have no span in this one.
+            mapped = source_map is not None and stanza.source is not None and stanza.source is source_map.source
+            if source_map is not None:
+                source_map.add(stanza.source.line_span(stanza.starting_line) if mapped else None)
+
             for line in stanza.lines:
-                output += line.render()
-            output += "\n" * self.breaks_between_sections
+                budget.add_lines()
+                text = rendered.get(id(line))
+                if text is None:
+                    text = _render_line(line, transposer)
+                budget.add_output(text)
+                output += text
+
+                # Each line renders as a chord line and a lyric line.
+                if source_map is not None:
+                    source_map.add(line.span if mapped else None, 2)
+
+            budget.add_output(breaks)
+            output += breaks
+            if source_map is not None:
+                source_map.add(None, self.breaks_between_sections)
 
         return output
 
+    def render_range(self, doc: str | Outline, start: int, stop: int | None=None) -> str:
+        """
+        Render a run of stanzas from a document, without the rest of it.
+
+        Only the requested stanzas, and the lines they depend on, are parsed
+        and laid out. The output is exactly the part of the full render those
+        stanzas make up, repeats included.
+
+        Parameters
+        ----------
+        doc: str | Outline
+            The source code, or its outline. Keeping the outline around saves
+            working it out again for every range.
+        start: int
+            The index of the first stanza to render.
+        stop: int | None
+            The index just past the last stanza to render. Defaults to just
+            past `start`.
+
+        Returns
+        -------
+        str
+            The rendered stanzas.
+        """
+        if isinstance(doc, str):
+            doc = Outline(doc)
+
+        indices = range(len(doc))[start:start + 1 if stop is None else stop]
+        if stop is None and not indices:
+            raise IndexError(f"No stanza at index {start}.")
+
+        # Stanzas are picked out of the parse by the line they're written on,
+        # which leaves out the definitions of any heading recalls.
+        wanted = {doc[i].line for i in indices}
+        stanzas = HibikiParser(path=doc.path, limits=self.limits).parse(doc.source_for(indices))
+        stanzas = [stanza for stanza in stanzas if getattr(stanza, "recall_line", stanza.starting_line) in wanted]
+
+        return self._render(stanzas, budget=self.limits.budget())
+
+    def render_stanza(self, doc: str | Outline, name_or_index: str | int) -> str:
+        """
+        Render a single stanza from a document, without the rest of it.
+
+        Parameters
+        ----------
+        doc: str | Outline
+            The source code, or its outline.
+        name_or_index: str | int
+            The index of the stanza, or its name. With a name, the first
+            stanza by that name is rendered.
+
+        Returns
+        -------
+        str
+            The rendered stanza.
+        """
+        if isinstance(doc, str):
+            doc = Outline(doc)
+
+        index = doc.find(name_or_index) if isinstance(name_or_index, str) else name_or_index
+        return self.render_range(doc, index)
+
+    def layout(self, input: str | list[Stanza] | Song) -> SongLayout:
+        """
+        Compute the format-neutral layout of Hibiki source code.
+
+        Parameters
+        ----------
+        input: str | list[Stanza] | Song
+            The source code, list of stanzas or song to lay out.
+
+        Returns
+        -------
+        SongLayout
+            The layout, ready to be written by any emitter.
+        """
+        budget = self.limits.budget()
+        return layout_stanzas(self._parse(input), self.transposer, budget=budget)
+
+    def render_formats(self, input: str | list[Stanza] | Song, formats: t.Iterable[str | Emitter]) -> dict[str, str]:
+        """
+        Render Hibiki source code into several formats at once.
+
+        The source is only parsed and laid out once, no matter how many
+        formats are requested.
+
+        Parameters
+        ----------
+        input: str | list[Stanza] | Song
+            The source code, list of stanzas or song to render.
+        formats: t.Iterable[str | Emitter]
+            The formats to render, ex ["text", "html", "json"], or emitters.
+
+        Returns
+        -------
+        dict[str, str]
+            The output of each format, by the format's name.
+        """
+        formats = [TextEmitter(self.breaks_between_sections) if format == "text" else format for format in formats]
+
+        # Output is counted as each emitter writes it, so a format which would
+        # go over max_output_bytes stops as soon as it does.
+        return emit(self.layout(input), formats, budget=self.limits.budget())
+
 
 def render(input: str, renderer: type[HibikiRenderer]=HibikiRenderer) -> str:
     return renderer().render(input)
@@ -87,4 +421,19 @@ def render_file(path: str, renderer: type[HibikiRenderer]=HibikiRenderer) -> str
     with open(path, "r") as infile:
         src = infile.read()
 
-    return render(src, renderer=renderer)
+    # Parsed with the path, so includes are found relative to the file, and
+    # with the renderer's limits, so they apply to the parse as well.
+    instance = renderer()
+    return instance.render(HibikiParser(path=path, limits=instance.limits).parse(src))
+
+
+def render_stanza(doc: str | Outline, name_or_index: str | int, renderer: type[HibikiRenderer]=HibikiRenderer) -> str:
+    return renderer().render_stanza(doc, name_or_index)
+
+
+def render_range(doc: str | Outline, start: int, stop: int | None=None, renderer: type[HibikiRenderer]=HibikiRenderer) -> str:
+    return renderer().render_range(doc, start, stop)
+
+
+def render_formats(input: str, formats: t.Iterable[str | Emitter], renderer: type[HibikiRenderer]=HibikiRenderer) -> dict[str, str]:
+    return renderer().render_formats(input, formats)
@@ -0,0 +1,450 @@
+"""
+Searching a corpus of songs by chord and by lyric.
+
+Songs are indexed once into an SQLite database, so searching them doesn't
+mean parsing them. Every line of every song is stored with the chords it uses
+and the lyrics it's sung to. Chords are stored normalized: modifiers are
+dropped, leaving `Chord.note`, and roots are spelled with sharps, so a search
+for Bbm7 finds A#m7 as well. Lyrics go in a full text index.
+
+Indexing is incremental. Songs whose modification time and size haven't
+changed are skipped, and songs which have been touched but hash the same,
+along with the libraries they include, are only noted as seen.
+
+    hibiki index songs.db songs/
+    hibiki search songs.db --chord F#m --chord Bm7
+    hibiki search songs.db --lyric "anywhere"
+"""
+from __future__ import annotations
+import argparse
+import functools
+import os
+import re
+import sqlite3
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+from .check import find_sources
+from .chord import Chord
+from .errors import HibikiError
+from .events import iter_events
+from .include import source_fingerprint
+from .transpose import PITCH_CLASSES, SHARP_NAMES
+from .modifiers import MODIFIERS, on_modifiers_changed, restore_modifiers
+
+
+# Roots within a chord's note: at the start, and after a slash.
+NOTE_ROOT_REGEX = re.compile(r'(^|/)([A-G][#b]?)')
+
+# A normalized chord: its root, its quality, and its bass note.
+NORMALIZED_REGEX = re.compile(r'^([A-G]#?)(.*?)(?:/([A-G]#?))?$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    includes INTEGER NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS chords (
+    song INTEGER NOT NULL,
+    stanza TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    chord TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chords_by_song ON chords (song);
+CREATE TABLE IF NOT EXISTS song_chords (
+    chord TEXT NOT NULL,
+    song INTEGER NOT NULL,
+    PRIMARY KEY (chord, song)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS song_chords_by_song ON song_chords (song);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    song INTEGER NOT NULL,
+    stanza TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lines_by_song ON lines (song);
+CREATE VIRTUAL TABLE IF NOT EXISTS lyrics USING fts5 (text, content='lines', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS lines_insert AFTER INSERT ON lines BEGIN
+    INSERT INTO lyrics (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_delete AFTER DELETE ON lines BEGIN
+    INSERT INTO lyrics (lyrics, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def normalize_chord(chord: Chord | str) -> str | None:
+    """
+    Normalize a chord for searching.
+
+    Parameters
+    ----------
+    chord: Chord | str
+        The chord, or its text.
+
+    Returns
+    -------
+    str | None
+        The chord's note, with its roots spelled with sharps, or None if it
+        isn't a chord at all, like N.C.
+    """
+    return _normalize_text(chord if isinstance(chord, str) else chord.text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_text(text: str) -> str | None:
+    chord = Chord(text)
+    if chord.non_chord:
+        return None
+    return NOTE_ROOT_REGEX.sub(lambda match: match.group(1) + SHARP_NAMES[PITCH_CLASSES[match.group(2)]], chord.note)
+
+
+on_modifiers_changed(_normalize_text.cache_clear)
+
+
+class SearchHit:
+    """
+    A line which matched a search.
+
+    Attributes
+    ----------
+    path: str
+        The path of the song.
+    stanza: str
+        The heading of the stanza the line is in.
+    line: int
+        The line number within the song. (1 indexed)
+    text: str
+        The lyrics of the line.
+    """
+    def __init__(self, path: str, stanza: str, line: int, text: str):
+        self.path = path
+        self.stanza = stanza
+        self.line = line
+        self.text = text
+
+    def __repr__(self) -> str:
+        return f"<SearchHit: {self.path}:{self.line}>"
+
+    def __str__(self) -> str:
+        return f"{self.path}:{self.line} [{self.stanza}] {self.text}"
+
+
+class IndexUpdate:
+    """
+    What changed when updating an index.
+
+    Attributes
+    ----------
+    indexed: list[str]
+        Songs which were added or indexed again.
+    unchanged: int
+        The number of songs which were already up to date.
+    removed: list[str]
+        Songs which no longer exist, and were removed.
+    failed: list[tuple[str, str]]
+        Pairs of (song path, reason) for songs which couldn't be indexed.
+    """
+    def __init__(self):
+        self.indexed: list[str] = []
+        self.unchanged: int = 0
+        self.removed: list[str] = []
+        self.failed: list[tuple[str, str]] = []
+
+    def __repr__(self) -> str:
+        return f"<IndexUpdate: {len(self.indexed)} indexed, {self.unchanged} unchanged, {len(self.removed)} removed>"
+
+
+def _extract(path: str) -> tuple[str, list[tuple[str, int, str, list[str]]] | None, str | None]:
+    """
+    Pull the lines out of a song.
+
+    Returns the path, each line as (stanza, line number, lyrics, chords), and
+    why the song couldn't be read if it couldn't. Lines recalled by heading
+    are only included once. Line numbers of stanzas recalled from a library
+    are within that library.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as infile:
+            src = infile.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return path, None, str(e)
+
+    lines: list[tuple[str, int, str, list[str]]] = []
+    seen: set[tuple[str | None, int]] = set()
+    stanza = ""
+    lyrics: list[str] = []
+    chords: list[str] = []
+
+    try:
+        for event in iter_events(src, path=path):
+            kind = event[0]
+            if kind == "stanza_start":
+                stanza = event[1]
+            elif kind == "chord":
+                normalized = normalize_chord(event[1])
+                if normalized is not None:
+                    chords.append(normalized)
+            elif kind == "lyric":
+                lyrics.append(event[1])
+            elif kind == "line_end":
+                # Included stanzas are numbered within their own library, so
+                # their lines can share numbers with the song's.
+                key = (event[3], event[1])
+                if key not in seen:
+                    seen.add(key)
+                    lines.append((stanza, event[1], "".join(lyrics).strip(), chords))
+                lyrics, chords = [], []
+    except (HibikiError, SyntaxError) as e:
+        return path, None, str(e)
+    return path, lines, None
+
+
+class SearchIndex:
+    """
+    An on-disk index of songs, searchable by chord and by lyric.
+
+    Attributes
+    ----------
+    path: str
+        The path of the database.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"<SearchIndex: {self.path}>"
+
+    def __enter__(self) -> SearchIndex:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM songs WHERE error IS NULL").fetchone()[0]
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _forget(self, song: int) -> None:
+        self.db.execute("DELETE FROM chords WHERE song = ?", (song,))
+        self.db.execute("DELETE FROM song_chords WHERE song = ?", (song,))
+        self.db.execute("DELETE FROM lines WHERE song = ?", (song,))
+
+    def update(self, paths: t.Iterable[str], jobs: int | None=None) -> IndexUpdate:
+        """
+        Bring the index up to date with a set of songs.
+
+        Parameters
+        ----------
+        paths: t.Iterable[str]
+            Songs and directories of songs. Directories are searched for .hb
+            files recursively.
+        jobs: int | None
+            The number of worker processes to read songs with. Defaults to
+            the number of CPUs. With 1, songs are read in this process.
+
+        Returns
+        -------
+        IndexUpdate
+            What changed.
+        """
+        update = IndexUpdate()
+        known = {path: row for path, *row in self.db.execute("SELECT path, id, mtime_ns, size, digest, includes FROM songs")}
+
+        # Work out which songs actually need to be read.
+        changed: list[tuple[str, int, int, str, bool]] = []
+        for path in map(os.path.abspath, find_sources(paths)):
+            try:
+                stat = os.stat(path)
+                row = known.get(path)
+                if row is not None and not row[4] and (row[1], row[2]) == (stat.st_mtime_ns, stat.st_size):
+                    update.unchanged += 1
+                    continue
+
+                with open(path, "rb") as infile:
+                    digest, includes = source_fingerprint(infile.read(), path)
+            except (OSError, UnicodeDecodeError) as e:
+                update.failed.append((path, str(e)))
+                continue
+
+            if row is not None and row[3] == digest:
+                self.db.execute("UPDATE songs SET mtime_ns = ?, size = ? WHERE id = ?", (stat.st_mtime_ns, stat.st_size, row[0]))
+                update.unchanged += 1
+                continue
+            changed.append((path, stat.st_mtime_ns, stat.st_size, digest, includes))
+
+        work = [path for path, *_ in changed]
+        if jobs == 1 or len(work) < 2:
+            results = [_extract(path) for path in work]
+        else:
+            jobs = jobs or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=jobs, initializer=restore_modifiers, initargs=(list(MODIFIERS.values()),)) as pool:
+                results = list(pool.map(_extract, work, chunksize=max(1, len(work) // (jobs * 4))))
+
+        with self.db:
+            for (path, mtime_ns, size, digest, includes), (_, lines, error) in zip(changed, results):
+                row = known.get(path)
+                if row is not None:
+                    self._forget(row[0])
+                    self.db.execute(
+                        "UPDATE songs SET mtime_ns = ?, size = ?, digest = ?, includes = ?, error = ? WHERE id = ?",
+                        (mtime_ns, size, digest, includes, error, row[0])
+                    )
+                    song = row[0]
+                else:
+                    song = t.cast(int, self.db.execute(
+                        "INSERT INTO songs (path, mtime_ns, size, digest, includes, error) VALUES (?, ?, ?, ?, ?, ?)",
+                        (path, mtime_ns, size, digest, includes, error)
+                    ).lastrowid)
+
+                if error is not None:
+                    update.failed.append((path, error))
+                    continue
+
+                update.indexed.append(path)
+                self.db.executemany(
+                    "INSERT INTO lines (text, song, stanza, line) VALUES (?, ?, ?, ?)",
+                    ((text, song, stanza, line) for stanza, line, text, _ in t.cast(list, lines))
+                )
+                self.db.executemany(
+                    "INSERT INTO chords (song, stanza, line, chord) VALUES (?, ?, ?, ?)",
+                    ((song, stanza, line, chord) for stanza, line, _, chords in t.cast(list, lines) for chord in chords)
+                )
+                # Each chord a song uses, once, so searching by chord only
+                # has to look at one row per song.
+                self.db.executemany(
+                    "INSERT INTO song_chords (chord, song) VALUES (?, ?)",
+                    ((chord, song) for chord in {chord for *_, chords in t.cast(list, lines) for chord in chords})
+                )
+
+            for path, (song, *_) in known.items():
+                if not os.path.exists(path):
+                    self._forget(song)
+                    self.db.execute("DELETE FROM songs WHERE id = ?", (song,))
+                    update.removed.append(path)
+
+        return update
+
+    def find_chords(self, chords: t.Iterable[Chord | str]) -> list[str]:
+        """
+        Find the songs which use every one of a set of chords.
+
+        Parameters
+        ----------
+        chords: t.Iterable[Chord | str]
+            The chords to look for. They're normalized the same way indexed
+            chords are, so "Gbm" finds songs using F#m.
+
+        Returns
+        -------
+        list[str]
+            The paths of the songs, sorted.
+        """
+        normalized = {normalize_chord(chord) for chord in chords} - {None}
+        if not normalized:
+            return []
+
+        query = " INTERSECT ".join("SELECT song FROM song_chords WHERE chord = ?" for _ in normalized)
+        rows = self.db.execute(f"SELECT path FROM songs WHERE id IN ({query}) ORDER BY path", tuple(normalized))
+        return [path for path, in rows]
+
+    def find_lyrics(self, phrase: str, limit: int | None=None) -> list[SearchHit]:
+        """
+        Find the lines containing a phrase.
+
+        Parameters
+        ----------
+        phrase: str
+            The words to look for, in order. Case and punctuation are ignored.
+        limit: int | None
+            The most lines to return.
+
+        Returns
+        -------
+        list[SearchHit]
+            The lines, ordered by song and line.
+        """
+        # Quoted, so the phrase is matched as written rather than as a query.
+        query = '"' + phrase.replace('"', '""') + '"'
+        rows = self.db.execute(
+            "SELECT songs.path, lines.stanza, lines.line, lines.text FROM lyrics "
+            "JOIN lines ON lines.id = lyrics.rowid JOIN songs ON songs.id = lines.song "
+            "WHERE lyrics MATCH ? ORDER BY songs.path, lines.line LIMIT ?",
+            (query, -1 if limit is None else limit)
+        )
+        return [SearchHit(*row) for row in rows]
+
+    def search(self, chords: t.Iterable[Chord | str]=(), phrase: str | None=None) -> list[str]:
+        """
+        Find the songs which use every one of a set of chords and contain a phrase.
+
+        Parameters
+        ----------
+        chords: t.Iterable[Chord | str]
+            The chords to look for.
+        phrase: str | None
+            The words to look for, if any.
+
+        Returns
+        -------
+        list[str]
+            The paths of the songs, sorted.
+        """
+        chords = list(chords)
+        songs: set[str] | None = set(self.find_chords(chords)) if chords else None
+        if phrase is not None:
+            found = {hit.path for hit in self.find_lyrics(phrase)}
+            songs = found if songs is None else songs & found
+        return sorted(songs or ())
+
+
+def index_main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki index`."""
+    parser = argparse.ArgumentParser(prog="hibiki index", description="Index Hibiki files for searching by chord and lyric.")
+    parser.add_argument("database", help="The index to create or update.")
+    parser.add_argument("paths", nargs="+", help="Files or directories to index.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args(argv)
+
+    with SearchIndex(args.database) as index:
+        update = index.update(args.paths, jobs=args.jobs)
+
+    for path, reason in update.failed:
+        print(f"{path}: {reason}")
+    print(f"{len(update.indexed)} indexed, {update.unchanged} unchanged, {len(update.removed)} removed, {len(update.failed)} failed.")
+    return 1 if update.failed else 0
+
+
+def main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki search`."""
+    parser = argparse.ArgumentParser(prog="hibiki search", description="Search indexed Hibiki files by chord and lyric.")
+    parser.add_argument("database", help="The index to search.")
+    parser.add_argument("-c", "--chord", action="append", default=[], help="A chord songs must use. May be given more than once.")
+    parser.add_argument("-l", "--lyric", default=None, help="A phrase lines must contain.")
+    args = parser.parse_args(argv)
+
+    if not args.chord and args.lyric is None:
+        parser.error("give at least one --chord or a --lyric")
+    if not os.path.exists(args.database):
+        print(f"'{args.database}' file does not exist.")
+        return 2
+
+    with SearchIndex(args.database) as index:
+        if args.chord:
+            for path in index.search(args.chord, args.lyric):
+                print(path)
+        else:
+            for hit in index.find_lyrics(args.lyric):
+                print(hit)
+    return 0
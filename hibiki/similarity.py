@@ -0,0 +1,543 @@
+"""
+Finding near-duplicate songs.
+
+Two arrangements of the same song rarely match exactly, but they share most
+of their chord progressions and most of their lyrics. Each song is reduced
+to two sets of shingles: runs of consecutive chords, and runs of consecutive
+words. Chord shingles are written as intervals between roots rather than as
+the chords themselves, so an arrangement in another key still matches.
+
+Comparing every pair of songs doesn't scale, so each set is summarized by a
+MinHash signature, whose rows agree between two songs about as often as
+their sets overlap. Signatures are split into bands and stored in an SQLite
+index by the hash of each band. Songs sharing any band are candidates, and
+only candidates are ever compared, so looking up a song doesn't depend on
+the size of the index.
+
+    hibiki similar songs.db songs/
+    hibiki similar songs.db songs/ --song new_arrangement.hb
+"""
+from __future__ import annotations
+import argparse
+import array
+import functools
+import hashlib
+import os
+import random
+import re
+import sqlite3
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+from .check import find_sources
+from .errors import HibikiError
+from .events import iter_events
+from .include import source_fingerprint
+from .search import NORMALIZED_REGEX, IndexUpdate, normalize_chord
+from .transpose import PITCH_CLASSES
+from .modifiers import MODIFIERS, restore_modifiers
+
+
+# The number of chords and words in each shingle.
+CHORD_SHINGLE = 4
+WORD_SHINGLE = 3
+
+# The number of rows in each signature, and how many bands they're split into.
+# Songs become candidates once they're roughly (1 / BANDS) ** (BANDS / NUM_PERM)
+# similar, which is about 0.42 with these.
+NUM_PERM = 128
+BANDS = 32
+
+# Rows are hashed with (a * x + b) % MERSENNE_PRIME, a Mersenne prime.
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = MERSENNE_PRIME - 1
+
+WORD_REGEX = re.compile(r"[\w']+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS songs (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    includes INTEGER NOT NULL,
+    chords BLOB,
+    lyrics BLOB,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS bands (
+    bucket INTEGER NOT NULL,
+    song INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_by_bucket ON bands (bucket);
+CREATE INDEX IF NOT EXISTS bands_by_song ON bands (song);
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _permutations(num_perm: int) -> list[tuple[int, int]]:
+    # Seeded, so signatures made by different processes and runs agree.
+    rng = random.Random(0x4869)
+    return [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+
+
+def _hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def minhash(shingles: t.Iterable[str], num_perm: int=NUM_PERM) -> tuple[int, ...] | None:
+    """
+    Work out the MinHash signature of a set of shingles.
+
+    Parameters
+    ----------
+    shingles: t.Iterable[str]
+        The shingles.
+    num_perm: int
+        The number of rows in the signature.
+
+    Returns
+    -------
+    tuple[int, ...] | None
+        The signature, or None if there are no shingles.
+    """
+    hashes = {_hash(shingle) for shingle in shingles}
+    if not hashes:
+        return None
+    return tuple(min((a * x + b) % MERSENNE_PRIME for x in hashes) for a, b in _permutations(num_perm))
+
+
+def estimate_similarity(first: t.Sequence[int] | None, second: t.Sequence[int] | None) -> float:
+    """Estimate how much the sets behind two signatures overlap, from 0 to 1."""
+    if first is None or second is None:
+        return 0.0
+    return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+def _interval(chord: str, previous: int | None) -> tuple[str, int | None]:
+    """Write a chord relative to the root of the one before it."""
+    match = NORMALIZED_REGEX.match(chord)
+    if match is None:
+        return chord, None
+
+    root, quality, bass = match.groups()
+    pc = PITCH_CLASSES[root]
+    step = "?" if previous is None else str((pc - previous) % 12)
+    slash = "" if bass is None else f"/{(PITCH_CLASSES[bass] - pc) % 12}"
+    return f"{step}{quality}{slash}", pc
+
+
+def shingles(text: str, path: str | None=None) -> tuple[set[str], set[str]]:
+    """
+    Get the chord and lyric shingles of a song.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code of the song.
+    path: str | None
+        The path of the file the source came from, if any.
+
+    Returns
+    -------
+    tuple[set[str], set[str]]
+        The chord shingles and the lyric shingles.
+    """
+    chords: list[str | None] = []
+    words: list[str] = []
+
+    for event in iter_events(text, path=path):
+        if event[0] == "chord":
+            chords.append(normalize_chord(event[1]))
+        elif event[0] == "lyric":
+            words.extend(word.lower() for word in WORD_REGEX.findall(event[1]))
+
+    # Progressions are broken by N.C., and the first chord after a break
+    # isn't relative to anything.
+    steps: list[str | None] = []
+    previous: int | None = None
+    for chord in chords:
+        if chord is None:
+            steps.append(None)
+            previous = None
+            continue
+        step, previous = _interval(chord, previous)
+        steps.append(step)
+
+    chord_shingles = {
+        " ".join(t.cast(list[str], steps[i:i + CHORD_SHINGLE]))
+        for i in range(len(steps) - CHORD_SHINGLE + 1)
+        if None not in steps[i:i + CHORD_SHINGLE]
+    }
+    word_shingles = {" ".join(words[i:i + WORD_SHINGLE]) for i in range(len(words) - WORD_SHINGLE + 1)}
+
+    # Songs too short for a single full shingle still get one.
+    if not chord_shingles and any(step is not None for step in steps):
+        chord_shingles = {" ".join(step for step in steps if step is not None)}
+    if not word_shingles and words:
+        word_shingles = {" ".join(words)}
+    return chord_shingles, word_shingles
+
+
+class Signature:
+    """
+    The MinHash signatures of a song.
+
+    Attributes
+    ----------
+    chords: tuple[int, ...] | None
+        The signature of the song's chord shingles, if it has any.
+    lyrics: tuple[int, ...] | None
+        The signature of the song's lyric shingles, if it has any.
+    """
+    def __init__(self, chords: tuple[int, ...] | None, lyrics: tuple[int, ...] | None):
+        self.chords = chords
+        self.lyrics = lyrics
+
+    def __repr__(self) -> str:
+        return f"<Signature: chords={self.chords is not None} lyrics={self.lyrics is not None}>"
+
+    def similarity(self, other: Signature) -> tuple[float, float]:
+        """Estimate how similar the chords and lyrics of two songs are."""
+        return estimate_similarity(self.chords, other.chords), estimate_similarity(self.lyrics, other.lyrics)
+
+    def buckets(self, bands: int) -> list[int]:
+        """
+        Hash each band of the signatures.
+
+        Chord and lyric bands hash differently, so they never share a bucket.
+        """
+        out: list[int] = []
+        for kind, signature in ((b"c", self.chords), (b"l", self.lyrics)):
+            if signature is None:
+                continue
+            rows = len(signature) // bands
+            for band in range(bands):
+                data = kind + band.to_bytes(2, "little") + array.array("Q", signature[band * rows:(band + 1) * rows]).tobytes()
+                out.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True))
+        return out
+
+
+def signature(text: str, path: str | None=None, num_perm: int=NUM_PERM) -> Signature:
+    """
+    Work out the signatures of a song.
+
+    Parameters
+    ----------
+    text: str
+        The Hibiki source code of the song.
+    path: str | None
+        The path of the file the source came from, if any.
+    num_perm: int
+        The number of rows in each signature.
+
+    Returns
+    -------
+    Signature
+        The song's signatures.
+    """
+    chords, lyrics = shingles(text, path)
+    return Signature(minhash(chords, num_perm), minhash(lyrics, num_perm))
+
+
+def _pack(signature: tuple[int, ...] | None) -> bytes | None:
+    return None if signature is None else array.array("Q", signature).tobytes()
+
+
+def _unpack(data: bytes | None) -> tuple[int, ...] | None:
+    return None if data is None else tuple(array.array("Q", data))
+
+
+def _extract(job: tuple[str, int]) -> tuple[str, Signature | None, str | None]:
+    """Work out the signatures of a song file, or why it couldn't be read."""
+    path, num_perm = job
+    try:
+        with open(path, "r", encoding="utf-8") as infile:
+            return path, signature(infile.read(), path, num_perm), None
+    except (OSError, UnicodeDecodeError, HibikiError, SyntaxError) as e:
+        return path, None, str(e)
+
+
+class Match:
+    """
+    A song found to be similar to another.
+
+    Attributes
+    ----------
+    path: str
+        The path of the similar song.
+    chords: float
+        The estimated similarity of the two songs' chord progressions.
+    lyrics: float
+        The estimated similarity of the two songs' lyrics.
+    """
+    def __init__(self, path: str, chords: float, lyrics: float):
+        self.path = path
+        self.chords = chords
+        self.lyrics = lyrics
+
+    def __repr__(self) -> str:
+        return f"<Match: {self.path} ({self.score:.2f})>"
+
+    @property
+    def score(self) -> float:
+        """How similar the songs are overall: the better of the two estimates."""
+        return max(self.chords, self.lyrics)
+
+
+class SimilarityIndex:
+    """
+    A persistent locality sensitive hashing index of song signatures.
+
+    Attributes
+    ----------
+    path: str
+        The path of the database.
+    num_perm: int
+        The number of rows in each signature.
+    bands: int
+        The number of bands each signature is split into. More bands find
+        less similar songs, at the cost of more candidates to check.
+    """
+    def __init__(self, path: str, num_perm: int=NUM_PERM, bands: int=BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm has to be a multiple of bands.")
+
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+        # An existing index keeps the parameters it was built with.
+        with self.db:
+            for key, value in (("num_perm", num_perm), ("bands", bands)):
+                self.db.execute("INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        meta = dict(self.db.execute("SELECT key, value FROM meta"))
+        self.num_perm: int = meta["num_perm"]
+        self.bands: int = meta["bands"]
+
+    def __repr__(self) -> str:
+        return f"<SimilarityIndex: {self.path}>"
+
+    def __enter__(self) -> SimilarityIndex:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM songs WHERE error IS NULL").fetchone()[0]
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _forget(self, song: int) -> None:
+        self.db.execute("DELETE FROM bands WHERE song = ?", (song,))
+        self.db.execute("DELETE FROM songs WHERE id = ?", (song,))
+
+    def update(self, paths: t.Iterable[str], jobs: int | None=None) -> IndexUpdate:
+        """
+        Add new and changed songs to the index, and remove deleted ones.
+
+        Parameters
+        ----------
+        paths: t.Iterable[str]
+            Songs and directories of songs. Directories are searched for .hb
+            files recursively.
+        jobs: int | None
+            The number of worker processes to work out signatures with.
+            Defaults to the number of CPUs. With 1, signatures are worked out
+            in this process.
+
+        Returns
+        -------
+        IndexUpdate
+            What changed.
+        """
+        update = IndexUpdate()
+        known = {path: row for path, *row in self.db.execute("SELECT path, id, mtime_ns, size, digest, includes FROM songs")}
+
+        changed: list[tuple[str, int, int, str, bool]] = []
+        for path in map(os.path.abspath, find_sources(paths)):
+            try:
+                stat = os.stat(path)
+                row = known.get(path)
+                if row is not None and not row[4] and (row[1], row[2]) == (stat.st_mtime_ns, stat.st_size):
+                    update.unchanged += 1
+                    continue
+
+                with open(path, "rb") as infile:
+                    digest, includes = source_fingerprint(infile.read(), path)
+            except (OSError, UnicodeDecodeError) as e:
+                update.failed.append((path, str(e)))
+                continue
+
+            if row is not None and row[3] == digest:
+                self.db.execute("UPDATE songs SET mtime_ns = ?, size = ? WHERE id = ?", (stat.st_mtime_ns, stat.st_size, row[0]))
+                update.unchanged += 1
+                continue
+            changed.append((path, stat.st_mtime_ns, stat.st_size, digest, includes))
+
+        work = [(path, self.num_perm) for path, *_ in changed]
+        if jobs == 1 or len(work) < 2:
+            results = [_extract(job) for job in work]
+        else:
+            jobs = jobs or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=jobs, initializer=restore_modifiers, initargs=(list(MODIFIERS.values()),)) as pool:
+                results = list(pool.map(_extract, work, chunksize=max(1, len(work) // (jobs * 4))))
+
+        with self.db:
+            for (path, mtime_ns, size, digest, includes), (_, signature, error) in zip(changed, results):
+                if path in known:
+                    self._forget(known[path][0])
+
+                # Songs which fail are stored too, with their error, so they
+                # aren't read again until they change.
+                chords, lyrics = (_pack(signature.chords), _pack(signature.lyrics)) if signature is not None else (None, None)
+                song = self.db.execute(
+                    "INSERT INTO songs (path, mtime_ns, size, digest, includes, chords, lyrics, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (path, mtime_ns, size, digest, includes, chords, lyrics, error)
+                ).lastrowid
+                if signature is None:
+                    update.failed.append((path, t.cast(str, error)))
+                    continue
+
+                self.db.executemany("INSERT INTO bands (bucket, song) VALUES (?, ?)", ((bucket, song) for bucket in signature.buckets(self.bands)))
+                update.indexed.append(path)
+
+            for path, (song, *_) in known.items():
+                if not os.path.exists(path):
+                    self._forget(song)
+                    update.removed.append(path)
+
+        return update
+
+    def _signature_of(self, song: int) -> Signature:
+        chords, lyrics = self.db.execute("SELECT chords, lyrics FROM songs WHERE id = ?", (song,)).fetchone()
+        return Signature(_unpack(chords), _unpack(lyrics))
+
+    def similar(self, song: str | Signature, threshold: float=0.5, limit: int | None=None) -> list[Match]:
+        """
+        Find the songs in the index similar to a song.
+
+        Only songs sharing a band with the song are compared, so this takes
+        about as long however many songs there are.
+
+        Parameters
+        ----------
+        song: str | Signature
+            The path of a song, or its signature. An indexed song isn't
+            matched against itself.
+        threshold: float
+            How similar songs have to be, from 0 to 1, by their chords or by
+            their lyrics.
+        limit: int | None
+            The most songs to return.
+
+        Returns
+        -------
+        list[Match]
+            The similar songs, most similar first.
+        """
+        exclude = None
+        if isinstance(song, str):
+            path = os.path.abspath(song)
+            row = self.db.execute("SELECT id FROM songs WHERE path = ? AND error IS NULL", (path,)).fetchone()
+            if row is not None:
+                exclude = row[0]
+                song = self._signature_of(exclude)
+            else:
+                with open(path, "r", encoding="utf-8") as infile:
+                    song = signature(infile.read(), path, self.num_perm)
+
+        buckets = song.buckets(self.bands)
+        if not buckets:
+            return []
+
+        placeholders = ", ".join("?" * len(buckets))
+        rows = self.db.execute(
+            f"SELECT songs.id, songs.path, songs.chords, songs.lyrics FROM songs WHERE songs.id IN "
+            f"(SELECT DISTINCT song FROM bands WHERE bucket IN ({placeholders}))",
+            buckets
+        )
+
+        matches = []
+        for id, path, chords, lyrics in rows:
+            if id == exclude:
+                continue
+            match = Match(path, *song.similarity(Signature(_unpack(chords), _unpack(lyrics))))
+            if match.score >= threshold:
+                matches.append(match)
+
+        matches.sort(key=lambda match: (-match.score, match.path))
+        return matches[:limit]
+
+    def duplicates(self, threshold: float=0.5) -> list[tuple[str, Match]]:
+        """
+        Find every pair of similar songs in the index.
+
+        Parameters
+        ----------
+        threshold: float
+            How similar songs have to be, from 0 to 1.
+
+        Returns
+        -------
+        list[tuple[str, Match]]
+            Pairs of a song and a song similar to it, each pair once, most
+            similar first.
+        """
+        # Only buckets with more than one song in them hold any candidates.
+        rows = self.db.execute(
+            "SELECT DISTINCT a.song, b.song FROM bands a JOIN bands b ON a.bucket = b.bucket AND a.song < b.song"
+        ).fetchall()
+
+        paths: dict[int, str] = {}
+        signatures: dict[int, Signature] = {}
+        for song in {song for pair in rows for song in pair}:
+            path, chords, lyrics = self.db.execute("SELECT path, chords, lyrics FROM songs WHERE id = ?", (song,)).fetchone()
+            paths[song] = path
+            signatures[song] = Signature(_unpack(chords), _unpack(lyrics))
+
+        pairs = []
+        for first, second in rows:
+            match = Match(paths[second], *signatures[first].similarity(signatures[second]))
+            if match.score >= threshold:
+                pairs.append((paths[first], match))
+
+        pairs.sort(key=lambda pair: (-pair[1].score, pair[0], pair[1].path))
+        return pairs
+
+
+def main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki similar`."""
+    parser = argparse.ArgumentParser(prog="hibiki similar", description="Find near-duplicate Hibiki songs.")
+    parser.add_argument("database", help="The index to create or update.")
+    parser.add_argument("paths", nargs="*", help="Files or directories to add to the index first.")
+    parser.add_argument("-s", "--song", default=None, help="Only find songs similar to this one.")
+    parser.add_argument("-t", "--threshold", type=float, default=0.5, help="How similar songs have to be, from 0 to 1.")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args(argv)
+
+    with SimilarityIndex(args.database) as index:
+        if args.paths:
+            update = index.update(args.paths, jobs=args.jobs)
+            for path, reason in update.failed:
+                print(f"{path}: {reason}")
+
+        if args.song is not None:
+            try:
+                matches = index.similar(args.song, args.threshold)
+            except FileNotFoundError:
+                print(f"'{args.song}' file does not exist.")
+                return 2
+            for match in matches:
+                print(f"{match.score:.2f}  {match.path}  (chords {match.chords:.2f}, lyrics {match.lyrics:.2f})")
+        else:
+            for path, match in index.duplicates(args.threshold):
+                print(f"{match.score:.2f}  {path}  {match.path}  (chords {match.chords:.2f}, lyrics {match.lyrics:.2f})")
+    return 0
@@ -0,0 +1,197 @@
+"""
+An immutable model of a parsed song.
+
+The parser hands back the stanzas of a song as a list, in the order they're
+rendered, where repeats are the same stanza appearing again and heading
+recalls are `RecalledStanza`s. A `Song` wraps that list with what can be
+worked out from it: the definition of each heading, which stanzas are
+definitions, repeats or recalls of which, and a hash of the song's content.
+
+Songs can't be changed once they're made, and compare equal whenever their
+content does, so they're safe to use as keys for caches of anything worked
+out from them:
+
+    song = hibiki.HibikiParser().parse_song(src)
+    print(song["Chorus"].lines)
+    print([occurrence.kind for occurrence in song.occurrences])
+"""
+from __future__ import annotations
+import hashlib
+import types
+import typing as t
+
+from .stanza import Stanza, RecalledStanza
+
+
+# The kinds of occurrence.
+DEFINITION = "definition"
+REPEAT = "repeat"
+RECALL = "recall"
+
+
+class _Immutable:
+    """Refuses to have its attributes set once it's been made."""
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+
+class Occurrence(_Immutable):
+    """
+    A single place a stanza is rendered in a song.
+
+    Attributes
+    ----------
+    index: int
+        Where the occurrence falls in the order stanzas are rendered.
+    kind: str
+        "definition" for where a stanza is defined, "recall" for a heading
+        recalling a stanza defined elsewhere, or "repeat" for the extra times
+        either of those are rendered because of a (xN).
+    heading: str
+        The heading of the stanza.
+    line: int
+        The line number the occurrence's heading is on. Repeats share the
+        line of what they repeat.
+    stanza: Stanza
+        The stanza rendered, which is a `RecalledStanza` for recalls.
+    definition: Stanza
+        The stanza's definition, which may come from an included library.
+    """
+    __slots__ = ("index", "kind", "heading", "line", "stanza", "definition")
+
+    index: int
+    kind: str
+    heading: str
+    line: int
+    stanza: Stanza
+    definition: Stanza
+
+    def __init__(self, index: int, kind: str, heading: str, line: int, stanza: Stanza, definition: Stanza):
+        for name, value in (("index", index), ("kind", kind), ("heading", heading), ("line", line), ("stanza", stanza), ("definition", definition)):
+            object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return f"<Occurrence: {self.kind} of {self.heading} @ {self.index}>"
+
+
+class Song(_Immutable):
+    """
+    A parsed song.
+
+    Iterating over a song gives its stanzas in the order they're rendered,
+    so songs can be passed anywhere a list of stanzas can. Indexing a song
+    by heading gets the stanza defined with that heading.
+
+    Attributes
+    ----------
+    stanzas: tuple[Stanza, ...]
+        The stanzas, in the order they're rendered.
+    occurrences: tuple[Occurrence, ...]
+        What each of the stanzas is, in the same order.
+    definitions: t.Mapping[str, Stanza]
+        The definition of every heading in the song, by heading, in the
+        order they're first rendered.
+    fingerprint: str
+        A hash of the song's content: the text of every definition, and the
+        order they're rendered in. Songs which render the same have the
+        same fingerprint, whatever lines they were written on.
+    """
+    __slots__ = ("stanzas", "occurrences", "definitions", "fingerprint", "_by_heading")
+
+    stanzas: tuple[Stanza, ...]
+    occurrences: tuple[Occurrence, ...]
+    definitions: t.Mapping[str, Stanza]
+    fingerprint: str
+    _by_heading: dict[str, tuple[Occurrence, ...]]
+
+    def __init__(self, stanzas: t.Iterable[Stanza]):
+        stanzas = tuple(stanzas)
+        occurrences: list[Occurrence] = []
+        definitions: dict[str, Stanza] = {}
+        by_heading: dict[str, list[Occurrence]] = {}
+
+        previous: Stanza | None = None
+        for index, stanza in enumerate(stanzas):
+            if stanza is previous:
+                # Repeats are the same stanza appearing again straight away.
+                last = occurrences[-1]
+                occurrence = Occurrence(index, REPEAT, last.heading, last.line, stanza, last.definition)
+            elif isinstance(stanza, RecalledStanza):
+                occurrence = Occurrence(index, RECALL, stanza.heading, stanza.recall_line, stanza, stanza.definition)
+            else:
+                occurrence = Occurrence(index, DEFINITION, stanza.heading, stanza.starting_line, stanza, stanza)
+            definitions.setdefault(occurrence.heading, occurrence.definition)
+            by_heading.setdefault(occurrence.heading, []).append(occurrence)
+            occurrences.append(occurrence)
+            previous = stanza
+
+        digest = hashlib.blake2b(digest_size=16)
+        for heading, definition in definitions.items():
+            digest.update(f"D{len(heading)}:{heading}{len(definition.text)}:{definition.text}".encode("utf-8", "surrogatepass"))
+        for occurrence in occurrences:
+            digest.update(f"O{occurrence.kind[0]}{len(occurrence.heading)}:{occurrence.heading}".encode("utf-8", "surrogatepass"))
+
+        object.__setattr__(self, "stanzas", stanzas)
+        object.__setattr__(self, "occurrences", tuple(occurrences))
+        object.__setattr__(self, "definitions", types.MappingProxyType(definitions))
+        object.__setattr__(self, "fingerprint", digest.hexdigest())
+        object.__setattr__(self, "_by_heading", {heading: tuple(found) for heading, found in by_heading.items()})
+
+    def __repr__(self) -> str:
+        return f"<Song: {len(self.definitions)} stanzas, {self.fingerprint[:12]}>"
+
+    def __len__(self) -> int:
+        return len(self.stanzas)
+
+    def __iter__(self) -> t.Iterator[Stanza]:
+        return iter(self.stanzas)
+
+    def __contains__(self, heading: object) -> bool:
+        return heading in self.definitions
+
+    @t.overload
+    def __getitem__(self, key: str) -> Stanza: ...
+
+    @t.overload
+    def __getitem__(self, key: int) -> Stanza: ...
+
+    def __getitem__(self, key: str | int) -> Stanza:
+        """Get the definition of a heading, or the stanza rendered at an index."""
+        if isinstance(key, str):
+            return self.definitions[key]
+        return self.stanzas[key]
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Song):
+            return NotImplemented
+        return self.fingerprint == other.fingerprint
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint)
+
+    @property
+    def headings(self) -> tuple[str, ...]:
+        """The headings of the song's stanzas, in the order they're first rendered."""
+        return tuple(self.definitions)
+
+    def occurrences_of(self, heading: str) -> tuple[Occurrence, ...]:
+        """
+        Find everywhere a stanza is rendered.
+
+        Parameters
+        ----------
+        heading: str
+            The heading of the stanza.
+
+        Returns
+        -------
+        tuple[Occurrence, ...]
+            The stanza's definition, recalls and repeats, in the order
+            they're rendered. Empty if no stanza has the heading.
+        """
+        return self._by_heading.get(heading, ())
@@ -0,0 +1,145 @@
+"""
+Source positions for the Hibiki Language.
+
+Positions in Hibiki source are tracked as offsets into the text. A
+`SourceIndex` is built once per document and turns offsets into line and
+column numbers with a binary search, while a `SourceMap` links the lines of
+rendered output back to the source they came from.
+"""
+from __future__ import annotations
+import bisect
+import itertools
+import typing as t
+
+
+class SourceIndex:
+    """
+    An index of where every line starts in a piece of source.
+
+    Attributes
+    ----------
+    text: str
+        The indexed source.
+    line_starts: list[int]
+        The offset each line starts at. Line 1 is at index 0.
+    path: str | None
+        The path of the file the source came from, if any.
+    """
+    def __init__(self, text: str, path: str | None=None):
+        self.text = text
+        self.path = path
+        self.line_starts: list[int] = [0, *itertools.accumulate(len(line) + 1 for line in text.split("\n")[:-1])]
+
+    def __repr__(self) -> str:
+        return f"<SourceIndex: {len(self)} lines>"
+
+    def __len__(self) -> int:
+        return len(self.line_starts)
+
+    def line_of(self, offset: int) -> int:
+        """Get the line number an offset falls on. (1 indexed)"""
+        return bisect.bisect_right(self.line_starts, offset)
+
+    def position(self, offset: int) -> tuple[int, int]:
+        """
+        Get the line and column an offset falls on.
+
+        Parameters
+        ----------
+        offset: int
+            The offset into the source.
+
+        Returns
+        -------
+        tuple[int, int]
+            The line and column. (Both 1 indexed)
+        """
+        line = self.line_of(offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def line_start(self, line: int) -> int:
+        """Get the offset a line starts at."""
+        return self.line_starts[line - 1]
+
+    def line_end(self, line: int) -> int:
+        """Get the offset a line ends at, not including its newline."""
+        if line < len(self.line_starts):
+            return self.line_starts[line] - 1
+        return len(self.text)
+
+    def line_span(self, line: int) -> tuple[int, int]:
+        """Get the start and end offsets of a line."""
+        return self.line_start(line), self.line_end(line)
+
+
+class SourceMap:
+    """
+    Links lines of rendered output back to spans of source.
+
+    Attributes
+    ----------
+    source: SourceIndex | None
+        The index of the source which was rendered.
+    spans: list[tuple[int, int] | None]
+        The source span of each output line, in order. Lines which don't come
+        from anywhere in particular, like the blank lines between stanzas,
+        have no span.
+    """
+    def __init__(self, source: SourceIndex | None=None):
+        self.source = source
+        self.spans: list[tuple[int, int] | None] = []
+
+    def __repr__(self) -> str:
+        return f"<SourceMap: {len(self.spans)} lines>"
+
+    def add(self, span: tuple[int, int] | None, count: int=1) -> None:
+        """Record the span of the next `count` output lines."""
+        self.spans.extend(itertools.repeat(span, count))
+
+    def span_of(self, output_line: int) -> tuple[int, int] | None:
+        """
+        Get the source span an output line came from.
+
+        Parameters
+        ----------
+        output_line: int
+            The line of output. (1 indexed)
+
+        Returns
+        -------
+        tuple[int, int] | None
+            The start and end offsets in the source, or None.
+        """
+        if 1 <= output_line <= len(self.spans):
+            return self.spans[output_line - 1]
+        return None
+
+    def position_of(self, output_line: int) -> tuple[int, int] | None:
+        """Get the source line and column an output line came from."""
+        span = self.span_of(output_line)
+        if span is None or self.source is None:
+            return None
+        return self.source.position(span[0])
+
+    def output_lines(self, offset: int) -> list[int]:
+        """
+        Get every line of output produced from a given source offset.
+
+        Parameters
+        ----------
+        offset: int
+            The offset into the source.
+
+        Returns
+        -------
+        list[int]
+            The lines of output. (1 indexed)
+        """
+        return [
+            i for i, span in enumerate(self.spans, start=1)
+            if span is not None and span[0] <= offset <= span[1]
+        ]
+
+    def to_list(self) -> list[t.Any]:
+        """The spans as plain lists, ex for serializing to JSON."""
+        return [list(span) if span is not None else None for span in self.spans]
@@ -5,6 +5,10 @@ import typing as t
 from .utils import replace_all
 from .chord import Chord
 from .errors import ChordSyntaxError
+from .layout import LineLayout, align
+
+if t.TYPE_CHECKING:
+    from .source import SourceIndex
 
 
 class Stanza:
@@ -21,16 +25,34 @@ class Stanza:
         The text making up the stanza.
     starting_line: int
         The line number where the stanza begins.
+    offset: int | None
+        The offset into the source where the stanza begins.
+    source: SourceIndex | None
+        The index of the source the stanza was parsed from.
     """
 
     # Regex denoting what a multiplier (ex (x2)) looks like.
     MULTIPLIER_REGEX = r"\(x\d\)\n"
 
-    def __init__(self, heading: str, text: str, starting_line: int, repeat_count: int=1):
+    def __init__(self, heading: str, text: str, starting_line: int, repeat_count: int=1, offset: int | None=None, source: SourceIndex | None=None):
         self.heading: str = heading
         self.text: str = text
         self.starting_line: int = starting_line
         self.repeat_count: int = repeat_count
+        self.offset: int | None = offset
+        self.source: SourceIndex | None = source
+        self._lines: t.List[Line] | None = None
+
+    @property
+    def span(self) -> t.Tuple[int, int] | None:
+        """
+        The start and end offsets of the stanza in the source, if known.
+
+        This covers the heading and every line of the body.
+        """
+        if self.offset is None or self.source is None:
+            return None
+        return self.offset, self.source.line_end(self.starting_line + self.text.count("\n", 0, len(self.text.rstrip("\n"))))
 
     @property
     def is_empty(self) -> bool:
@@ -55,20 +77,30 @@ class Stanza:
         """
         A list of Line objects which can be found in the stanza.
 
-        This forms the core function of the stanza class.
+        This forms the core function of the stanza class. Lines are only
+        built the first time they're asked for, and the same list is handed
+        out from then on.
         """
+        if self._lines is None:
+            self._lines = self._build_lines()
+        return self._lines
+
+    def _build_lines(self) -> t.List[Line]:
         # Buffer to hold lines.
         out: t.List[Line] = []
 
-        # Keep track of the line number.
-        # We add 1 because the first line appears after the
-        # first line of the stanza.
-        line_num = self.starting_line + 1
-
-        for line in filter(lambda e: e != "", self.text.split("\n")[1:]):
+        # Each line's number comes from where it sits in the text, so blank
+        # lines are skipped without throwing off the lines after them. We
+        # start from 1 after because the first line is the heading.
+        for line_num, line in enumerate(self.text.split("\n")[1:], self.starting_line + 1):
+            if line == "":
+                continue
             line = line.strip()
             line += "\n"
 
+            # Where the line starts in the source, if we know the source.
+            offset = self.source.line_start(line_num) if self.source is not None else None
+
             # Try to find a multiplier in the line
             match: t.Match[str] | None = re.search(self.MULTIPLIER_REGEX, line)
 
@@ -80,17 +112,90 @@ class Stanza:
                 multiplier: int = int(replace_all(match.group(), "(x)", ""))
 
                 for _ in range(0, multiplier):
-                    out.append(Line(self, f"{line}\n", line_num))
+                    out.append(Line(self, f"{line}\n", line_num, offset=offset))
 
             # Otherwise, we just append the line
             else:
-                out.append(Line(self, line, line_num))
-
-            # Finally, increment the line number
-            line_num += 1
+                out.append(Line(self, line, line_num, offset=offset))
         return out
 
 
+class RecalledStanza(Stanza):
+    """
+    A stanza recalled by a heading with no body.
+
+    Recalls are views of the stanza they recall rather than copies of it. The
+    body, and the lines parsed from it, belong to the original, so a chorus
+    recalled twenty times is only ever split into lines once. Only the repeat
+    count and where the recall itself sits in the source are its own.
+
+    Attributes
+    ----------
+    definition: Stanza
+        The stanza being recalled.
+    repeat_count: int
+        The number of times the recall repeats.
+    recall_line: int
+        The line number of the recalling heading.
+    recall_offset: int | None
+        The offset into the source of the recalling heading.
+    recall_source: SourceIndex | None
+        The index of the source the recall appears in. This can differ from
+        `source` when the recalled stanza comes from an included library.
+    """
+    def __init__(self, definition: Stanza, repeat_count: int=1, recall_line: int=0, recall_offset: int | None=None, recall_source: SourceIndex | None=None):
+        # Stanza.__init__ isn't called, as everything it would set up comes
+        # from the definition instead.
+        if isinstance(definition, RecalledStanza):
+            definition = definition.definition
+        self.definition: Stanza = definition
+        self.repeat_count = repeat_count
+        self.recall_line = recall_line
+        self.recall_offset = recall_offset
+        self.recall_source = recall_source
+
+    def __repr__(self) -> str:
+        return f"<RecalledStanza: {self.name} from line {self.starting_line}>"
+
+    @property
+    def heading(self) -> str:  # type: ignore[override]
+        return self.definition.heading
+
+    @property
+    def text(self) -> str:  # type: ignore[override]
+        return self.definition.text
+
+    @property
+    def starting_line(self) -> int:  # type: ignore[override]
+        return self.definition.starting_line
+
+    @property
+    def offset(self) -> int | None:  # type: ignore[override]
+        return self.definition.offset
+
+    @property
+    def source(self) -> SourceIndex | None:  # type: ignore[override]
+        return self.definition.source
+
+    @property
+    def lines(self) -> t.List[Line]:
+        return self.definition.lines
+
+
+def document_source(stanzas: t.Iterable[Stanza]) -> SourceIndex | None:
+    """
+    Get the index of the source a list of parsed stanzas came from.
+
+    Recalled stanzas can come from other files, so this is where the first
+    stanza appears, rather than where its body was defined.
+    """
+    for stanza in stanzas:
+        if isinstance(stanza, RecalledStanza):
+            return stanza.recall_source
+        return stanza.source
+    return None
+
+
 class Space:
     """
     A space or set of spaces found in the chord line.
@@ -133,15 +238,29 @@ class Line:
         The text making up the line.
     line_num: int
         The line number where the line can be found.
+    offset: int | None
+        The offset into the source where the line begins.
     """
-    def __init__(self, stanza: Stanza, text: str, line_num: int):
+    # Whether the split into chords and lyrics is kept once it's worked out.
+    _keep_split: bool = True
+
+    def __init__(self, stanza: Stanza, text: str, line_num: int, offset: int | None=None):
         self.stanza = stanza
         self.text: str = text
         self.line_num = line_num
+        self.offset = offset
+        self._split: t.Tuple[t.Tuple[t.Union[Chord, Space], ...], t.Tuple[str, ...]] | None = None
 
     def __repr__(self) -> str:
         return f"<Line: {repr(self.text)}>"
 
+    @property
+    def span(self) -> t.Tuple[int, int] | None:
+        """The start and end offsets of the line in the source, if known."""
+        if self.offset is None or self.stanza.source is None:
+            return None
+        return self.offset, self.stanza.source.line_end(self.line_num)
+
     def split_chords_and_lyrics(self) -> t.Tuple[t.List[t.Union[Chord, Space]], t.List[str]]:
         """
         Split a line into chords and lyric segments.
@@ -168,6 +287,14 @@ class Line:
         Anyway, there's a bunch of edge cases involved in doing this
         too, which I'll detail in comments below.
         """
+        # Lines don't change once they're made, so the split is only ever
+        # worked out once. Copies are handed out in case they're modified.
+        if self._split is not None:
+            return list(self._split[0]), list(self._split[1])
+
+        # Looked up once, as some lines only build their text when asked.
+        text = self.text
+
         # Buffers to store Chord objects and lyric segments.
         chords: t.List[t.Union[Chord, Space]] = []
         lyrics: t.List[str] = []
@@ -178,8 +305,8 @@ class Line:
         # many spaces there are before the beginning of the first chord. We
         # do that by adding a "Space" object which contains information about
         # how many spaces were there. We'll deal with this later.
-        for i in range(0, len(self.text)):
-            if self.text[i] == "{":
+        for i in range(0, len(text)):
+            if text[i] == "{":
                 if i > 0:
                     chords.append(Space(i))
                 break
@@ -194,7 +321,7 @@ class Line:
         # Our column position in the current line. (1 indexed, not 0)
         pos = 1
 
-        for char in self.text:
+        for char in text:
             if in_chord is True:
                 # If we're in a chord and see a {, that shouldn't be possible.
                 # This, this is a syntax error.
@@ -274,61 +401,147 @@ class Line:
         # This must be true.
         assert len(lyrics) == len(chords)
 
+        if self._keep_split:
+            self._split = (tuple(chords), tuple(lyrics))
         return chords, lyrics
 
     def render_split(self) -> t.Tuple[str, str]:
         """
         Render a single line given its lyrics and chords.
 
-        After separating the chords from lyrics, we can now render the line.
-        Again, there's a few edge cases to deal with. Which will be noted.
+        After separating the chords from lyrics, the pairs are aligned (see
+        `hibiki.layout.align`) and then laid out as a chord line and a lyric
+        line.
         """
-        chords, lyrics = self.split_chords_and_lyrics()
-
-        # Buffers to store the final chord and lyric line
-        chord_line: str = ""
-        lyric_line: str = ""
-
-        # Remember when we added "Space" objects if the chord appears after
-        # the first lyrics? Now we have to deal with that. If the first chord
-        # is a Space object, we remove it and add the spaces onto the chord
-        # line, adding the corresponding lyric segment as well.
-        if isinstance(chords[0], Space):
-            chord_line += chords.pop(0).tab_repr
-            lyric_line += lyrics.pop(0)
-
-        # Loop through chords, but also lyrics too.
-        # Because we ensured they must be the same length, it doesn't really
-        # matter which one we use.
-        for i in range(0, len(chords)):
-            # Three conditions must be observed. First, if the chord's symbol is
-            # longer than the lyrical segment. If it is, we append the chord,
-            # but then also append the number of missing spaces to the lyrics.
-            if len(chords[i].tab_repr) > len(lyrics[i]):
-                chord_line += chords[i].tab_repr
-                lyric_line += lyrics[i]
-                offset = len(chords[i].tab_repr) - len(lyrics[i])
-                lyric_line += " " * offset
-
-            # Second, if the lyrical segment is longer than the chord's symbol,
-            # we basically do the opposite, instead appending spaces to the
-            # chord line.
-            elif len(lyrics[i]) > len(chords[i].tab_repr):
-                lyric_line += lyrics[i]
-                chord_line += chords[i].tab_repr
-                offset = len(lyrics[i]) - len(chords[i].tab_repr)
-                chord_line += " " * offset
-
-            # The only remaining case is that they are equal. In which case,
-            # all is good in the world. :)
-            else:
-                chord_line += chords[i].tab_repr
-                lyric_line += lyrics[i]
-
-        return chord_line.rstrip(), lyric_line.rstrip()
+        layout = LineLayout(align(*self.split_chords_and_lyrics()), self.line_num)
+        return layout.chord_line(), layout.lyric_line()
 
     def render(self) -> str:
         # This function mainly serves as a shortcut to render chords and lines
         # together.
         chords, lyrics = self.render_split()
         return f"{chords}\n{lyrics}\n"
+
+
+class SpanStanza(Stanza):
+    """
+    A stanza whose body is a span of the parsed source.
+
+    Made by `HibikiParser(compact=True)`. Instead of a copy of its text, the
+    stanza keeps a reference to the single source buffer shared by the whole
+    document, along with where its body starts and ends. Its text, and the
+    text of its lines, are only built when they're asked for.
+
+    Attributes
+    ----------
+    buffer: str
+        The source the stanza was parsed from, with recalls substituted.
+    start: int
+        The offset into the buffer where the stanza's body starts.
+    end: int
+        The offset into the buffer where the stanza's body ends.
+    """
+    # A multiplier at the very end of a stripped line, ex "(x2)"
+    MULTIPLIER_SPAN_REGEX = re.compile(r"\(x\d\)")
+
+    def __init__(self, heading: str, buffer: str, start: int, end: int, starting_line: int, repeat_count: int=1, offset: int | None=None, source: SourceIndex | None=None):
+        # Stanza.__init__ isn't called, as it would store text.
+        self.heading = heading
+        self.buffer = buffer
+        self.start = start
+        self.end = end
+        self.starting_line = starting_line
+        self.repeat_count = repeat_count
+        self.offset = offset
+        self.source = source
+        self._lines = None
+
+    def __repr__(self) -> str:
+        return f"<SpanStanza: {self.name} [{self.start}:{self.end}]>"
+
+    @property
+    def text(self) -> str:  # type: ignore[override]
+        return f"[{self.heading}]\n{self.buffer[self.start:self.end]}"
+
+    @property
+    def name(self) -> str:
+        return replace_all(f"[{self.heading}]", "[]", "").strip()
+
+    @property
+    def span(self) -> t.Tuple[int, int] | None:
+        if self.offset is None or self.source is None:
+            return None
+
+        # The same as counting the newlines in the text without its trailing
+        # newlines, without building the text.
+        end = self.end
+        while end > self.start and self.buffer[end - 1] == "\n":
+            end -= 1
+        lines = 1 + self.buffer.count("\n", self.start, end) if end > self.start else 0
+        return self.offset, self.source.line_end(self.starting_line + lines)
+
+    def _build_lines(self) -> t.List[Line]:
+        # Mirrors Stanza._build_lines, working with offsets into the buffer
+        # instead of splitting and stripping copies of the text.
+        out: t.List[Line] = []
+        buffer = self.buffer
+        line_num = self.starting_line
+        pos = self.start
+
+        while pos < self.end:
+            newline = buffer.find("\n", pos, self.end)
+            if newline == -1:
+                newline = self.end
+            start, end = pos, newline
+            pos = newline + 1
+
+            # Counted before blank lines are skipped, so the number always
+            # matches the line of the buffer the span is on.
+            line_num += 1
+            if start == end:
+                continue
+            while start < end and buffer[start].isspace():
+                start += 1
+            while end > start and buffer[end - 1].isspace():
+                end -= 1
+
+            offset = self.source.line_start(line_num) if self.source is not None else None
+
+            match = self.MULTIPLIER_SPAN_REGEX.match(buffer, end - 4, end) if end - start >= 4 else None
+            if match:
+                for _ in range(0, int(buffer[end - 2])):
+                    out.append(SpanLine(self, start, end - 4, line_num, offset=offset))
+            else:
+                out.append(SpanLine(self, start, end, line_num, offset=offset))
+        return out
+
+
+class SpanLine(Line):
+    """
+    A line whose text is a span of the parsed source.
+
+    Made by a `SpanStanza`. The line's text is built whenever it's asked for,
+    and neither it nor the line's split into chords and lyrics are kept.
+
+    Attributes
+    ----------
+    start: int
+        The offset into the stanza's buffer where the line starts.
+    end: int
+        The offset into the stanza's buffer where the line ends, not
+        including its newline.
+    """
+    _keep_split = False
+
+    def __init__(self, stanza: SpanStanza, start: int, end: int, line_num: int, offset: int | None=None):
+        # Line.__init__ isn't called, as it would store text.
+        self.stanza = stanza
+        self.start = start
+        self.end = end
+        self.line_num = line_num
+        self.offset = offset
+        self._split = None
+
+    @property
+    def text(self) -> str:  # type: ignore[override]
+        return f"{self.stanza.buffer[self.start:self.end]}\n"  # type: ignore[attr-defined]
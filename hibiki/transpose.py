@@ -0,0 +1,110 @@
+"""
+Transposition of chords.
+
+Chords are transposed by their root, along with any slash bass note and the
+chord being hammered into, using precomputed pitch class tables. Everything
+else about the chord, including its modifiers, is left alone. Hibiki doesn't
+care whether chords are "real", so anything without a recognizable root, like
+N.C., passes through untouched.
+"""
+from __future__ import annotations
+import functools
+import re
+import typing as t
+
+from .chord import Chord
+from .modifiers import on_modifiers_changed
+
+if t.TYPE_CHECKING:
+    from .stanza import Space
+
+
+# Note names for each pitch class, spelled with sharps and with flats.
+SHARP_NAMES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+FLAT_NAMES = ("C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B")
+
+# The pitch class of every spelling of a root Hibiki recognizes.
+PITCH_CLASSES: dict[str, int] = {
+    **{name: pc for pc, name in enumerate(SHARP_NAMES)},
+    **{name: pc for pc, name in enumerate(FLAT_NAMES)},
+    "B#": 0, "Cb": 11, "E#": 5, "Fb": 4,
+}
+
+# Every root transposed by every interval, in both spellings.
+# (root, semitones, prefer_flats) -> transposed root
+ROOT_TABLE: dict[tuple[str, int, bool], str] = {
+    (root, semitones, flats): (FLAT_NAMES if flats else SHARP_NAMES)[(pc + semitones) % 12]
+    for root, pc in PITCH_CLASSES.items()
+    for semitones in range(12)
+    for flats in (False, True)
+}
+
+# Where roots can appear in a chord's text: at the start (or just inside the
+# parentheses of a sustained chord), after a slash, or after a hammer-on.
+ROOT_REGEX = re.compile(r'(^\(?|/|h)([A-G][#b]?)')
+
+
+@functools.lru_cache(maxsize=4096)
+def _transpose_text(text: str, semitones: int, prefer_flats: bool) -> str:
+    return ROOT_REGEX.sub(
+        lambda match: match.group(1) + ROOT_TABLE[(match.group(2), semitones, prefer_flats)],
+        text
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _transpose_chord(text: str, semitones: int, prefer_flats: bool) -> Chord:
+    return Chord(_transpose_text(text, semitones, prefer_flats))
+
+
+on_modifiers_changed(_transpose_chord.cache_clear)
+
+
+def transpose_chord(chord: Chord | str, semitones: int, prefer_flats: bool=False) -> Chord:
+    """
+    Transpose a chord.
+
+    Transposed chords are cached, so transposing the same chord again is
+    just a lookup. The returned chord may be shared, and shouldn't be modified.
+
+    Parameters
+    ----------
+    chord: Chord | str
+        The chord, or the text of the chord, to transpose.
+    semitones: int
+        The number of semitones to transpose by. May be negative.
+    prefer_flats: bool
+        Whether to spell accidentals with flats instead of sharps.
+
+    Returns
+    -------
+    Chord
+        The transposed chord.
+    """
+    text = chord if isinstance(chord, str) else chord.text
+    return _transpose_chord(text, semitones % 12, prefer_flats)
+
+
+class Transposer:
+    """
+    Transposes chords by a fixed interval.
+
+    Attributes
+    ----------
+    semitones: int
+        The number of semitones to transpose by.
+    prefer_flats: bool
+        Whether to spell accidentals with flats instead of sharps.
+    """
+    def __init__(self, semitones: int, prefer_flats: bool=False):
+        self.semitones = semitones % 12
+        self.prefer_flats = prefer_flats
+
+    def __repr__(self) -> str:
+        return f"<Transposer: {self.semitones:+d}>"
+
+    def __call__(self, chord: Chord | Space) -> Chord | Space:
+        # Spaces from the chord line pass straight through.
+        if not isinstance(chord, Chord):
+            return chord
+        return _transpose_chord(chord.text, self.semitones, self.prefer_flats)
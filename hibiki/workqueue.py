@@ -0,0 +1,572 @@
+"""
+Distributing renders across worker processes and hosts.
+
+A coordinator adds render jobs to a queue, and any number of workers take
+jobs off of it, render them, and write the results. The queue is an SQLite
+file, so it needs nothing more than a volume every worker can see:
+
+    hibiki queue jobs.db songs/ --output rendered/ --format html
+    hibiki worker jobs.db --exit-when-empty
+
+Workers claim jobs with a lease, which they keep renewing for as long as
+they're rendering. A worker which dies mid-job stops renewing it, so its
+lease runs out and another worker claims the job again. Jobs are given a
+fixed number of attempts before they're marked as failed. Errors in a song
+fail its job immediately, since rendering it again won't help.
+
+Outputs are written to a temporary file and moved into place, so a job
+which ends up rendered twice never leaves a half-written file behind.
+Queueing the same song with the same options again does nothing unless the
+song has changed since, so rerunning a coordinator only renders what's new.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import typing as t
+
+from .check import find_sources
+from .emitters import EMITTERS
+from .errors import HibikiError
+from .include import source_fingerprint
+from .parser import HibikiParser
+from .renderer import HibikiRenderer
+
+
+# File extensions for the formats built into Hibiki. Any other format uses
+# its name as its extension.
+EXTENSIONS = {"text": "txt", "chordpro": "cho", "html": "html", "json": "json"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    output TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    error TEXT,
+    UNIQUE (source, digest, output, options)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, id);
+"""
+
+
+class Job:
+    """
+    A render job claimed from a queue.
+
+    Attributes
+    ----------
+    id: int
+        The job's ID within the queue.
+    source: str
+        The path of the song to render.
+    output: str
+        Where to write the rendered song.
+    options: dict[str, t.Any]
+        Options passed to HibikiRenderer, along with the `format` to render.
+    attempts: int
+        The number of times the job has been claimed, including this one.
+    owner: str
+        The name of the worker holding the job's lease.
+    """
+    def __init__(self, id: int, source: str, output: str, options: dict[str, t.Any], attempts: int, owner: str):
+        self.id = id
+        self.source = source
+        self.output = output
+        self.options = options
+        self.attempts = attempts
+        self.owner = owner
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id}: {self.source}>"
+
+
+class QueueProgress:
+    """
+    How far along the jobs in a queue are.
+
+    Attributes
+    ----------
+    pending: int
+        Jobs waiting to be claimed, including those being retried.
+    leased: int
+        Jobs being worked on. Some of these may have expired leases.
+    done: int
+        Jobs which were rendered.
+    failed: int
+        Jobs which failed for good.
+    """
+    def __init__(self, pending: int=0, leased: int=0, done: int=0, failed: int=0):
+        self.pending = pending
+        self.leased = leased
+        self.done = done
+        self.failed = failed
+
+    def __repr__(self) -> str:
+        return f"<QueueProgress: {self}>"
+
+    def __str__(self) -> str:
+        return f"{self.done}/{self.total} done, {self.leased} in progress, {self.pending} pending, {self.failed} failed"
+
+    @property
+    def total(self) -> int:
+        return self.pending + self.leased + self.done + self.failed
+
+    @property
+    def finished(self) -> bool:
+        """Whether every job is either done or has failed."""
+        return self.pending == 0 and self.leased == 0
+
+
+class WorkQueue:
+    """
+    A durable queue of render jobs, kept in an SQLite file.
+
+    Attributes
+    ----------
+    path: str
+        The path of the database.
+    """
+    def __init__(self, path: str, timeout: float=30.0):
+        self.path = path
+        # Transactions are managed by hand, so that claiming a job can take
+        # the write lock before looking for one.
+        self.db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"<WorkQueue: {self.path}>"
+
+    def __enter__(self) -> WorkQueue:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def enqueue(self, paths: t.Iterable[str], output_dir: str, format: str="text", max_attempts: int=3, **options: t.Any) -> int:
+        """
+        Add render jobs for some songs.
+
+        Songs which are already queued with the same options, and haven't
+        changed since, aren't queued again.
+
+        Parameters
+        ----------
+        paths: t.Iterable[str]
+            Songs and directories of songs. Directories are searched for .hb
+            files recursively.
+        output_dir: str
+            The directory to write rendered songs to. Songs found in a
+            directory keep their path relative to it.
+        format: str
+            The format to render, ex "text" or "html".
+        max_attempts: int
+            How many times a job can be claimed before it's marked as failed.
+        **options: t.Any
+            Options passed to HibikiRenderer, ex `transpose=2`.
+
+        Returns
+        -------
+        int
+            The number of jobs added.
+
+        Raises
+        ------
+        ValueError
+            If the format isn't a known one.
+        """
+        if format not in EMITTERS:
+            raise ValueError(f"Unknown output format '{format}'.")
+
+        encoded = json.dumps(dict(options, format=format), sort_keys=True)
+        extension = EXTENSIONS.get(format, format)
+
+        jobs = []
+        for path in paths:
+            base = path if os.path.isdir(path) else os.path.dirname(path)
+            for source in find_sources([path]):
+                with open(source, "rb") as infile:
+                    digest, _ = source_fingerprint(infile.read(), source)
+                output = os.path.join(output_dir, os.path.splitext(os.path.relpath(source, base))[0] + f".{extension}")
+                jobs.append((os.path.abspath(source), digest, os.path.abspath(output), encoded, max_attempts))
+
+        before = self.db.total_changes
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (source, digest, output, options, max_attempts) VALUES (?, ?, ?, ?, ?)",
+                jobs
+            )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return self.db.total_changes - before
+
+    def claim(self, owner: str, lease: float=60.0) -> Job | None:
+        """
+        Claim the next job.
+
+        Parameters
+        ----------
+        owner: str
+            The name of the worker claiming the job.
+        lease: float
+            How many seconds the worker has to finish the job before it can
+            be claimed by another.
+
+        Returns
+        -------
+        Job | None
+            The claimed job, or None if there are no jobs to claim.
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose last attempt ran out of time give up here, rather
+            # than being claimed once too often.
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', owner = NULL, error = 'Lease expired on the last attempt.' "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now,)
+            )
+            row = self.db.execute(
+                "SELECT id, source, output, options, attempts FROM jobs "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                    (owner, now + lease, row[0])
+                )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        id, source, output, options, attempts = row
+        return Job(id, source, output, json.loads(options), attempts + 1, owner)
+
+    def renew(self, job: Job, lease: float=60.0) -> bool:
+        """
+        Extend the lease on a job which is taking a while.
+
+        Returns
+        -------
+        bool
+            Whether the lease was still held, and so was extended.
+        """
+        cursor = self.db.execute(
+            "UPDATE jobs SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (time.time() + lease, job.id, job.owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job: Job) -> bool:
+        """
+        Mark a job as done.
+
+        Returns
+        -------
+        bool
+            Whether the lease was still held. If it wasn't, another worker has
+            claimed the job again, and will finish it instead.
+        """
+        cursor = self.db.execute(
+            "UPDATE jobs SET status = 'done', owner = NULL, lease_expires = NULL, error = NULL "
+            "WHERE id = ? AND owner = ? AND status = 'leased'",
+            (job.id, job.owner)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job: Job, error: str, retry: bool=True) -> bool:
+        """
+        Give up on a job.
+
+        Parameters
+        ----------
+        job: Job
+            The job which failed.
+        error: str
+            Why it failed.
+        retry: bool
+            Whether the job can be tried again, if it has attempts left.
+
+        Returns
+        -------
+        bool
+            Whether the lease was still held.
+        """
+        cursor = self.db.execute(
+            "UPDATE jobs SET status = CASE WHEN ? AND attempts < max_attempts THEN 'pending' ELSE 'failed' END, "
+            "owner = NULL, lease_expires = NULL, error = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (retry, error, job.id, job.owner)
+        )
+        return cursor.rowcount == 1
+
+    def retry_failed(self) -> int:
+        """
+        Queue every failed job again, with its attempts reset.
+
+        Returns
+        -------
+        int
+            The number of jobs queued again.
+        """
+        cursor = self.db.execute("UPDATE jobs SET status = 'pending', attempts = 0, error = NULL WHERE status = 'failed'")
+        return cursor.rowcount
+
+    def progress(self) -> QueueProgress:
+        """Count the jobs in each state."""
+        return QueueProgress(**dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")))
+
+    def failures(self) -> list[tuple[str, str]]:
+        """Get pairs of (song path, reason) for every failed job."""
+        return self.db.execute("SELECT source, error FROM jobs WHERE status = 'failed' ORDER BY id").fetchall()
+
+
+def render_job(job: Job) -> None:
+    """
+    Render a job's song and write it to the job's output.
+
+    Raises
+    ------
+    OSError
+        If the song couldn't be read, or the output couldn't be written.
+    HibikiError | SyntaxError | UnicodeDecodeError
+        If the song itself is broken.
+    """
+    options = dict(job.options)
+    format = options.pop("format", "text")
+
+    with open(job.source, "r", encoding="utf-8") as infile:
+        src = infile.read()
+    renderer = HibikiRenderer(**options)
+    stanzas = HibikiParser(path=job.source, limits=renderer.limits).parse(src)
+    output = renderer.render_formats(stanzas, [format])[format]
+
+    directory = os.path.dirname(job.output)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as outfile:
+        outfile.write(output)
+    os.replace(temp, job.output)
+
+
+@contextlib.contextmanager
+def keep_leased(path: str, job: Job, lease: float=60.0) -> t.Iterator[None]:
+    """
+    Keep renewing a job's lease for as long as it's being worked on.
+
+    Leases are renewed every third of the lease from a thread of its own,
+    with its own connection to the queue, so a render which takes longer
+    than the lease isn't claimed again by another worker.
+
+    Parameters
+    ----------
+    path: str
+        The path of the queue.
+    job: Job
+        The job being worked on.
+    lease: float
+        The lease the job was claimed with, in seconds.
+    """
+    stop = threading.Event()
+    # However short the lease, the queue isn't hammered with renewals.
+    interval = max(lease / 3, 0.01)
+
+    def renew() -> None:
+        # Most jobs are done well within their lease, and never need to
+        # connect at all.
+        if stop.wait(interval):
+            return
+        with WorkQueue(path) as queue:
+            while True:
+                try:
+                    if not queue.renew(job, lease):
+                        # Another worker has the job now.
+                        return
+                except sqlite3.Error:
+                    # The queue is busy, so try again next time around.
+                    pass
+                if stop.wait(interval):
+                    return
+
+    thread = threading.Thread(target=renew, name=f"lease-{job.id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_worker(
+        path: str,
+        name: str | None=None,
+        lease: float=60.0,
+        poll: float=1.0,
+        exit_when_empty: bool=False,
+        max_jobs: int | None=None,
+        report: t.Callable[[Job, str | None], None] | None=None
+    ) -> int:
+    """
+    Claim and render jobs from a queue.
+
+    Parameters
+    ----------
+    path: str
+        The path of the queue.
+    name: str | None
+        The name the worker claims jobs under. Defaults to the host name
+        and process ID.
+    lease: float
+        The lease to claim jobs with, in seconds.
+    poll: float
+        How long to wait before looking again when there are no jobs to
+        claim, in seconds.
+    exit_when_empty: bool
+        Whether to stop once every job is done or has failed, instead of
+        waiting for more.
+    max_jobs: int | None
+        The most jobs to work on before stopping.
+    report: t.Callable[[Job, str | None], None] | None
+        Called after each job, with the reason it failed if it did.
+
+    Returns
+    -------
+    int
+        The number of jobs rendered.
+    """
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    rendered = 0
+    attempted = 0
+
+    with WorkQueue(path) as queue:
+        while max_jobs is None or attempted < max_jobs:
+            job = queue.claim(name, lease)
+            if job is None:
+                # Jobs still leased by other workers may yet come back, if
+                # those workers die.
+                if exit_when_empty and queue.progress().finished:
+                    break
+                time.sleep(poll)
+                continue
+
+            attempted += 1
+            error: str | None = None
+            try:
+                with keep_leased(path, job, lease):
+                    render_job(job)
+            except (HibikiError, SyntaxError, UnicodeDecodeError) as e:
+                error = str(e)
+                queue.fail(job, error, retry=False)
+            except OSError as e:
+                error = str(e)
+                queue.fail(job, error)
+            except Exception as e:
+                # Anything else is a bug somewhere, which would only happen
+                # again, ex a chord the modifiers can't make sense of.
+                error = f"{type(e).__name__}: {e}"
+                queue.fail(job, error, retry=False)
+            else:
+                queue.complete(job)
+                rendered += 1
+
+            if report is not None:
+                report(job, error)
+    return rendered
+
+
+def main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki queue`."""
+    parser = argparse.ArgumentParser(prog="hibiki queue", description="Queue Hibiki songs to be rendered by workers.")
+    parser.add_argument("queue", help="The queue to add jobs to.")
+    parser.add_argument("paths", nargs="*", help="Files or directories to render. With none, progress is shown.")
+    parser.add_argument("-o", "--output", default="rendered", help="The directory to write rendered songs to.")
+    parser.add_argument("-f", "--format", default="text", help="The format to render, ex text, html or chordpro.")
+    parser.add_argument("--transpose", type=int, default=0, help="Semitones to transpose by.")
+    parser.add_argument("--capo", type=int, default=0, help="The fret a capo sits on.")
+    parser.add_argument("--prefer-flats", action="store_true", help="Spell accidentals with flats.")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts before a job is marked as failed.")
+    parser.add_argument("--retry-failed", action="store_true", help="Queue failed jobs again.")
+    parser.add_argument("--wait", action="store_true", help="Show progress until every job is finished.")
+    args = parser.parse_args(argv)
+
+    with WorkQueue(args.queue) as queue:
+        if args.retry_failed:
+            print(f"Queued {queue.retry_failed()} failed job(s) again.")
+
+        if args.paths:
+            try:
+                added = queue.enqueue(
+                    args.paths,
+                    args.output,
+                    format=args.format,
+                    max_attempts=args.max_attempts,
+                    transpose=args.transpose,
+                    capo=args.capo,
+                    prefer_flats=args.prefer_flats,
+                )
+            except FileNotFoundError as e:
+                print(f"'{e.filename}' file does not exist.")
+                return 2
+            except ValueError as e:
+                print(e)
+                return 2
+            print(f"Queued {added} job(s).")
+
+        progress = queue.progress()
+        while args.wait and not progress.finished:
+            print(progress)
+            time.sleep(1.0)
+            progress = queue.progress()
+        print(progress)
+
+        for source, error in queue.failures():
+            print(f"{source}: {error}")
+        return 1 if progress.failed else 0
+
+
+def worker_main(argv: t.Sequence[str]) -> int:
+    """Entry point for `hibiki worker`."""
+    parser = argparse.ArgumentParser(prog="hibiki worker", description="Render jobs from a Hibiki queue.")
+    parser.add_argument("queue", help="The queue to take jobs from.")
+    parser.add_argument("--name", default=None, help="The name to claim jobs under.")
+    parser.add_argument("--lease", type=float, default=60.0, help="Seconds to finish a job in before it's retried.")
+    parser.add_argument("--poll", type=float, default=1.0, help="Seconds to wait when there are no jobs.")
+    parser.add_argument("--exit-when-empty", action="store_true", help="Stop once every job is finished.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Don't report each job.")
+    args = parser.parse_args(argv)
+
+    def report(job: Job, error: str | None) -> None:
+        print(f"{job.source}: {error}" if error is not None else f"{job.source} -> {job.output}", flush=True)
+
+    rendered = run_worker(
+        args.queue,
+        name=args.name,
+        lease=args.lease,
+        poll=args.poll,
+        exit_when_empty=args.exit_when_empty,
+        report=None if args.quiet else report,
+    )
+    print(f"Rendered {rendered} job(s).")
+    return 0
@@ -0,0 +1,328 @@
+"""
+Differential fuzzing against the reference implementation.
+
+Random documents are generated from Hibiki's grammar, and rendered by both
+the frozen reference implementation in tests/reference and every code path
+the current implementation has for rendering. Each path has to produce the
+same output as the reference, or raise the same error.
+
+When a path doesn't, the document is shrunk to the smallest one which still
+shows the difference, first by dropping stanzas, then lines, then pieces of
+lines, then single characters.
+
+    python -m tests.fuzz --cases 5000
+    python -m tests.fuzz --seed 1234 --cases 1
+
+Some of the reference's behavior has changed on purpose since it was
+released. Those differences are accounted for here, rather than by changing
+the reference:
+
+- Recalls used within a saved line were left in its text as is. They're now
+  expanded, so the generator never uses a recall within a saved line.
+- The reference's lexer is shared between parses, so the line numbers in its
+  lexer errors drifted from one parse to the next. Its line count is reset
+  before each parse.
+- Lexer errors used to give the line an illegal character was on, and now
+  give its column. Only the type of those errors is compared.
+- Line numbers after a heading or chord spanning lines, ex "[Verse\n1]" or
+  "[Verse]\n(x2)", were off by the lines within it, and are now counted from
+  where they are in the source. They aren't compared for such documents.
+- Chords used to be aligned over lyrics by the number of characters in them,
+  and are now aligned by display width. For documents with wide or zero
+  width characters, only the text of each output line is compared, ignoring
+  the spaces which align it.
+"""
+from __future__ import annotations
+import argparse
+import random
+import re
+import sys
+import typing as t
+
+import hibiki
+from hibiki import HibikiParser, HibikiRenderer, renderer
+from hibiki.width import display_width
+
+from tests import reference
+from tests.reference import lexer as reference_lexer
+
+
+ROOTS = ["C", "D", "E", "F", "G", "A", "B", "Bb", "F#", "Eb", "C#"]
+QUALITIES = ["", "m", "7", "m7", "maj7", "sus4", "add9", "dim", "/G", "m7b5"]
+WORDS = ["hello", "world", "la", "midnight train", "ア", "x", "going ", "  ", "don't", "é", "🎸"]
+
+# Text which looks a little like a recall, a save or a multiplier, but isn't one.
+PHANTOMS = ["(*)", "(* hook)", "(*hook", "(=)", "(x)", "(x12)", "( x2)", "*hook", "(=hook) ", "(ok)", "(*-x)"]
+
+# Text which the lexer or line splitter should reject.
+MALFORMED = ["{C", "C}", "{{C}", "{C{D}}", "[", "]", "{}"]
+
+# A heading or chord which spans lines, as the lexer sees it.
+SPANNING_TOKEN_REGEX = re.compile(r"\[[^\]\n]*\n[^\]]*\]|\][ \t]*\n\s*\(\s*x\s*\d|\{[^}\n]*\n[^}]*\}")
+
+Result = t.Tuple[str, ...]
+
+
+def chord(rng: random.Random) -> str:
+    """Generate a chord, with any of the modifiers."""
+    text = rng.choice(ROOTS) + rng.choice(QUALITIES)
+    roll = rng.random()
+    if roll < 0.08:
+        return rng.choice(["NC", "N.C.", "N.C", "NC."])
+    if roll < 0.16:
+        text = f"({text})"
+    elif roll < 0.24:
+        text += "|"
+    elif roll < 0.32:
+        text += "_"
+    elif roll < 0.42:
+        text += "h" + rng.choice(ROOTS) + rng.choice(["", "m", "7", "|", "_"])
+    elif roll < 0.45:
+        # Combinations of modifiers, some of them nonsense.
+        text = rng.choice([f"({text}|)", f"({text})_", f"{text}h{text}h{text}", f"{text}|_", "h", "(", "|"])
+    return "{" + text + "}"
+
+
+def line(rng: random.Random, saves: list[str], malformed: float) -> str:
+    """Generate a line of chords and lyrics, without any save."""
+    parts = []
+    if rng.random() < 0.1:
+        parts.append(" " * rng.randint(1, 4))
+    for _ in range(rng.randint(1, 7)):
+        roll = rng.random()
+        if roll < 0.45:
+            parts.append(chord(rng))
+        elif roll < 0.85:
+            parts.append(rng.choice(WORDS))
+        elif roll < 0.93:
+            # A recall, sometimes of a name which was never saved.
+            name = rng.choice(saves) if saves and rng.random() < 0.85 else f"nope{rng.randint(0, 3)}"
+            parts.append(f"(*{name})")
+        elif roll < 0.98:
+            parts.append(rng.choice(PHANTOMS))
+        if rng.random() < malformed:
+            parts.append(rng.choice(MALFORMED))
+    text = "".join(parts) or "word"
+    if rng.random() < 0.1:
+        text += rng.choice([" (x2)", "(x3)", " (x1)", " (x9)", "  (x2)"])
+    if rng.random() < 0.05:
+        text += rng.choice([" ", "\t"])
+    return text
+
+
+def document(rng: random.Random, malformed: float=0.01) -> str:
+    """Generate a document."""
+    out: list[str] = []
+    saves: list[str] = []
+    defined: list[str] = []
+
+    def save(text: str) -> str:
+        # Saved lines never use recalls; see the module's docstring.
+        name = f"hook{rng.randint(0, 4)}"
+        saves.append(name)
+        return f"{re.sub(r'[(][*]', '(', text)}(={name})"
+
+    # Lines saved before any stanza.
+    for _ in range(rng.choice([0, 0, 1, 2])):
+        out.extend([save(line(rng, [], malformed)), ""])
+
+    for i in range(rng.randint(1, 6)):
+        roll = rng.random()
+        if defined and roll < 0.25:
+            # A heading recall, occasionally of a stanza which was never defined.
+            name = rng.choice(defined) if rng.random() < 0.9 else "Missing"
+            repeat = rng.choice(["", "", " (x2)", "(x3)"])
+            out.extend([f"[{name}]{repeat}", ""])
+            continue
+
+        name = rng.choice(["Verse", "Chorus", "Bridge", "Intro", "Outro"]) + ("" if rng.random() < 0.7 else f" {i}")
+        if name in defined and rng.random() < 0.8:
+            # Mostly avoid redefinitions, but not entirely.
+            name = f"{name} {i}"
+        defined.append(name)
+        repeat = rng.choice(["", "", "", " (x2)", "(x3)", " ( x 2 )", " (x1)"])
+        out.append(f"[{name}]{repeat}" + rng.choice(["", "", " ", "\t"]))
+
+        for _ in range(rng.randint(1, 5)):
+            text = line(rng, saves, malformed)
+            if rng.random() < 0.15:
+                text = save(text)
+            out.append(text)
+        out.append("")
+        if rng.random() < 0.1:
+            out.append("")
+
+    text = "\n".join(out)
+    return rng.choice([text, text + "\n", text.rstrip("\n")])
+
+
+def _run(render: t.Callable[[str], str], text: str) -> Result:
+    try:
+        return ("output", render(text))
+    except Exception as e:
+        return ("error", type(e).__name__, str(e))
+
+
+def _reference(text: str) -> str:
+    reference_lexer.hibiki_lexer.lineno = 1
+    return reference.HibikiRenderer().render(reference.HibikiParser().parse(text))
+
+
+def _cached(text: str) -> str:
+    # Rendered twice from the same parse, the second time from cached splits.
+    stanzas = HibikiParser().parse(text)
+    HibikiRenderer().render(stanzas)
+    return HibikiRenderer().render(stanzas)
+
+
+def _parallel(text: str) -> str:
+    # Every line is rendered by the worker processes, however few there are.
+    minimum = renderer.MIN_PARALLEL_LINES
+    renderer.MIN_PARALLEL_LINES = 0
+    try:
+        return HibikiRenderer(jobs=2).render(text)
+    finally:
+        renderer.MIN_PARALLEL_LINES = minimum
+
+
+# Every way the current implementation renders text, by name.
+PATHS: dict[str, t.Callable[[str], str]] = {
+    "render": hibiki.render,
+    "compact": lambda text: HibikiRenderer().render(HibikiParser(compact=True).parse(text)),
+    "cached": _cached,
+    "layout": lambda text: hibiki.render_formats(text, ["text"])["text"],
+    "parallel": _parallel,
+}
+
+
+def _same(text: str, expected: Result, actual: Result) -> bool:
+    if expected[0] != actual[0]:
+        return False
+    if expected[0] == "output":
+        if display_width(text) != len(text):
+            return expected[1].replace(" ", "") == actual[1].replace(" ", "")
+        return expected == actual
+    if expected[1] != actual[1]:
+        return False
+    # Lexer errors report columns instead of lines now.
+    if "Illegal character" in expected[2]:
+        return True
+    if SPANNING_TOKEN_REGEX.search(text):
+        return re.sub(r"#\d+", "#", expected[2]) == re.sub(r"#\d+", "#", actual[2])
+    return expected[2] == actual[2]
+
+
+def check(text: str, paths: t.Iterable[str] | None=None) -> dict[str, tuple[Result, Result]]:
+    """
+    Compare the current implementation with the reference on a document.
+
+    Parameters
+    ----------
+    text: str
+        The document.
+    paths: t.Iterable[str] | None
+        The names of the paths to check. Defaults to every one.
+
+    Returns
+    -------
+    dict[str, tuple[Result, Result]]
+        The expected and actual result of every path which differed from the
+        reference, by the path's name.
+    """
+    expected = _run(_reference, text)
+    out = {}
+    for name in paths or PATHS:
+        actual = _run(PATHS[name], text)
+        if not _same(text, expected, actual):
+            out[name] = (expected, actual)
+    return out
+
+
+def _chunks(text: str, level: int) -> list[str]:
+    """Split a document into pieces, finer at each level."""
+    if level == 0:
+        return re.split(r"(?<=\n\n)", text)
+    if level == 1:
+        return text.splitlines(keepends=True)
+    if level == 2:
+        return [piece for piece in re.split(r"(\{[^{}\n]*\}|\([^()\n]*\)|\s+)", text) if piece]
+    return list(text)
+
+
+def shrink(text: str, fails: t.Callable[[str], bool]) -> str:
+    """
+    Shrink a document while it still fails.
+
+    Parameters
+    ----------
+    text: str
+        A document which fails.
+    fails: t.Callable[[str], bool]
+        Whether a document fails.
+
+    Returns
+    -------
+    str
+        The smallest failing document found. Removing any single piece of it
+        at the finest level makes it pass.
+    """
+    for level in range(4):
+        chunks = _chunks(text, level)
+        # Try removing runs of pieces, halving the run length each time.
+        size = max(1, len(chunks) // 2)
+        while True:
+            i = 0
+            while i < len(chunks):
+                candidate = "".join(chunks[:i] + chunks[i + size:])
+                if candidate != text and fails(candidate):
+                    text = candidate
+                    chunks = chunks[:i] + chunks[i + size:]
+                else:
+                    i += size
+            if size == 1:
+                break
+            size //= 2
+    return text
+
+
+def fuzz(seeds: t.Iterable[int], paths: t.Iterable[str] | None=None, malformed: float=0.01) -> t.Iterator[tuple[int, str, dict[str, tuple[Result, Result]]]]:
+    """
+    Check the documents generated from some seeds.
+
+    Yields
+    ------
+    tuple[int, str, dict[str, tuple[Result, Result]]]
+        The seed, the shrunk document, and its differences, for each seed
+        whose document differs from the reference.
+    """
+    paths = list(paths or PATHS)
+    for seed in seeds:
+        text = document(random.Random(seed), malformed)
+        differences = check(text, paths)
+        if differences:
+            failing = sorted(differences)
+            minimal = shrink(text, lambda candidate: sorted(check(candidate, failing)) == failing)
+            yield seed, minimal, check(minimal, failing)
+
+
+def main(argv: t.Sequence[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.fuzz", description="Fuzz Hibiki against its reference implementation.")
+    parser.add_argument("--cases", type=int, default=2000, help="The number of documents to check.")
+    parser.add_argument("--seed", type=int, default=0, help="The seed of the first document.")
+    parser.add_argument("--path", action="append", choices=sorted(PATHS), help="Only check these paths.")
+    parser.add_argument("--malformed", type=float, default=0.01, help="How often to insert malformed text.")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for seed, text, differences in fuzz(range(args.seed, args.seed + args.cases), args.path, args.malformed):
+        failures += 1
+        print(f"Seed {seed} differs, shrunk to {text!r}")
+        for name, (expected, actual) in differences.items():
+            print(f"  {name}: expected {expected!r}")
+            print(f"  {' ' * len(name)}  actual   {actual!r}")
+    print(f"{failures} of {args.cases} documents differed.")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
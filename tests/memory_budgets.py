@@ -0,0 +1,189 @@
+"""
+Memory budgets for parsing and rendering.
+
+Each scenario parses and renders a synthetic document under tracemalloc, and
+measures, per KB of source:
+
+- peak: the most bytes allocated at once while parsing and rendering.
+- retained: the bytes still held by the parsed document afterwards.
+- blocks: the number of allocations still held by the parsed document.
+
+tracemalloc only sees allocations which are still alive, so blocks count
+what a parsed document holds on to, which is where regressions like extra
+copies of lines show up. The budgets are stored in memory_budgets.json, and
+test_memory_budgets.py fails if a measurement goes over its budget by more
+than the tolerance. When an increase is intentional, regenerate them with:
+
+    python -m tests.memory_budgets --update
+"""
+from __future__ import annotations
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tracemalloc
+import typing as t
+
+from hibiki import HibikiParser, HibikiRenderer
+
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "memory_budgets.json")
+
+# How far over budget a measurement can go before it fails.
+DEFAULT_TOLERANCE = 0.15
+
+CHORDS = ["C", "Am", "G7", "F#m", "Bbadd9", "Csus4", "D/F#", "Em", "(A)", "E|"]
+WORDS = ["midnight", "train", "going", "anywhere", "just a", "small town", "girl", "living in a", "lonely world"]
+
+
+def _line(rng: random.Random) -> str:
+    return " ".join(f"{{{rng.choice(CHORDS)}}}{rng.choice(WORDS)}" for _ in range(rng.randint(2, 6)))
+
+
+def plain_document(stanzas: int=200, seed: int=0) -> str:
+    """Stanzas of chords and lyrics, with no recalls or repeats."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(stanzas):
+        out.append(f"[Verse {i}]")
+        out.extend(_line(rng) for _ in range(rng.randint(2, 8)))
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+def recall_document(stanzas: int=200, seed: int=0) -> str:
+    """Stanzas using line recalls, repeats, line multipliers and heading recalls."""
+    rng = random.Random(seed)
+    out = [f"{_line(rng)} (=hook{i})" for i in range(8)] + [""]
+    defined: list[int] = []
+    for i in range(stanzas):
+        if i and i % 4 == 0:
+            # Recalls one of the earlier stanzas by its heading.
+            out.extend([f"[Verse {rng.choice(defined)}]", ""])
+            continue
+        defined.append(i)
+        out.append(f"[Verse {i}]" + (" (x2)" if i % 5 == 0 else ""))
+        for _ in range(rng.randint(2, 8)):
+            line = _line(rng)
+            if rng.random() < 0.3:
+                line += f" (*hook{rng.randrange(8)})"
+            if rng.random() < 0.1:
+                line += " (x2)"
+            out.append(line)
+        out.append("")
+    return "\n".join(out) + "\n"
+
+
+class Scenario:
+    """
+    A document, and how it's parsed and rendered.
+
+    Attributes
+    ----------
+    name: str
+        The name of the scenario, as it's stored in the budgets.
+    text: str
+        The source of the document.
+    compact: bool
+        Whether the document is parsed compactly.
+    renderer: HibikiRenderer
+        The renderer the document is rendered with.
+    """
+    def __init__(self, name: str, text: str, compact: bool=False, renderer: HibikiRenderer | None=None):
+        self.name = name
+        self.text = text
+        self.compact = compact
+        self.renderer = renderer or HibikiRenderer()
+
+    def __repr__(self) -> str:
+        return f"<Scenario: {self.name}>"
+
+    def run(self) -> t.Any:
+        """Parse and render the document, returning the parsed stanzas."""
+        stanzas = HibikiParser(compact=self.compact).parse(self.text)
+        self.renderer.render(stanzas)
+        return stanzas
+
+    def measure(self) -> dict[str, float]:
+        """Measure the scenario, per KB of source."""
+        # Run once first, so caches filled on first use aren't counted.
+        self.run()
+        gc.collect()
+
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            stanzas = self.run()
+            current, peak = tracemalloc.get_traced_memory()
+            gc.collect()
+            after = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        del stanzas
+
+        kb = len(self.text.encode("utf-8")) / 1024
+        return {
+            "peak": round((peak - start) / kb, 1),
+            "retained": round((current - start) / kb, 1),
+            "blocks": round(blocks / kb, 1),
+        }
+
+
+def scenarios() -> list[Scenario]:
+    """Every scenario with a budget."""
+    return [
+        Scenario("plain", plain_document()),
+        Scenario("recalls", recall_document()),
+        Scenario("compact", plain_document(), compact=True),
+        Scenario("compact_recalls", recall_document(), compact=True),
+        Scenario("transposed", plain_document(), renderer=HibikiRenderer(transpose=3)),
+    ]
+
+
+def load_budgets(path: str=BUDGETS_PATH) -> dict[str, t.Any]:
+    with open(path, "r", encoding="utf-8") as infile:
+        return json.load(infile)
+
+
+def main(argv: t.Sequence[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.memory_budgets", description="Measure parsing and rendering against their memory budgets.")
+    parser.add_argument("--update", action="store_true", help="Write the current measurements as the new budgets.")
+    parser.add_argument("--tolerance", type=float, default=None, help="The tolerance to store with updated budgets.")
+    args = parser.parse_args(argv)
+
+    try:
+        budgets = load_budgets()
+    except FileNotFoundError:
+        budgets = {"tolerance": DEFAULT_TOLERANCE, "scenarios": {}}
+
+    measured = {scenario.name: scenario.measure() for scenario in scenarios()}
+    for name, values in measured.items():
+        old = budgets["scenarios"].get(name, {})
+        print(name)
+        for metric, value in values.items():
+            budget = old.get(metric)
+            change = f" ({(value / budget - 1) * 100:+.1f}%)" if budget else ""
+            print(f"  {metric:<9}{value:>12.1f} per KB{change}")
+
+    if args.update:
+        budgets = {
+            "tolerance": args.tolerance if args.tolerance is not None else budgets.get("tolerance", DEFAULT_TOLERANCE),
+            "python": platform.python_version(),
+            "scenarios": measured,
+        }
+        with open(BUDGETS_PATH, "w", encoding="utf-8") as outfile:
+            json.dump(budgets, outfile, indent=4, sort_keys=True)
+            outfile.write("\n")
+        print(f"Wrote {BUDGETS_PATH}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,29 @@
+"""
+Hibiki 1.0.3, frozen as the reference implementation for differential fuzzing.
+
+This is the parser, lexer and renderer exactly as they were released, with
+only their imports made relative. Don't change it to match new behavior.
+Intentional differences from it are accounted for in tests/fuzz.py instead.
+"""
+from .chord import Chord
+from .errors import HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall
+from .stanza import Stanza, Space, Line
+from .lexer import hibiki_lexer
+from .parser import HibikiParser
+from .renderer import HibikiRenderer, render, render_file
+
+
+__VERSION__ = "1.0.3"
+__AUTHOR__ = "taira"
+
+
+__all__ = [
+    Chord,
+    HibikiError, EmptyStanza, RedefinedStanza, UndefinedRecall,
+    Stanza, Space, Line,
+    HibikiRenderer, render, render_file,
+    HibikiParser,
+    hibiki_lexer,
+    __VERSION__,
+    __AUTHOR__
+] # type: ignore
@@ -0,0 +1,109 @@
+"""Tests for corpus chord analytics."""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from hibiki.analytics import FeatureCache, analyze, chord_pitch_classes, song_chords  # noqa: E402
+
+
+SONGS = {
+    "pop": "[Verse] (x2)\n{C}One {G}two {Am}three {F}four\n\n[Outro]\n{NC}Stop {C}now\n\n",
+    "ballad": "[Verse]\n{Em}Slow {Bm}song (x2)\n{ChD}Hammer\n\n",
+}
+
+
+class TestSongChords:
+    """Tests for reading the chords of a song."""
+
+    def test_chords_in_play_order(self):
+        """Test that repeats are played out, and N.C. breaks the progression."""
+        assert song_chords(SONGS["pop"]) == ["C", "G", "Am", "F"] * 2 + [None, "C"]
+
+    def test_line_multipliers_and_hammer_ons(self):
+        """Test that multiplied lines repeat, and hammer-ons land on their target."""
+        assert song_chords(SONGS["ballad"]) == ["Em", "Bm", "Em", "Bm", "C", "D"]
+
+    def test_enharmonics_normalized(self):
+        assert song_chords("[Verse]\n{Gbm}a {Bb7/Ab}b\n") == ["F#m", "A#7/G#"]
+
+    @pytest.mark.parametrize("chord, expected", [
+        ("C", (0, 4, 7)),
+        ("Am", (9, 0, 4)),
+        ("A#7/G#", (10, 2, 5, 8)),
+        ("F#m7b5", (6, 9, 0, 4)),
+        ("Csus4", (0, 5, 7)),
+        ("Q#m", ()),
+    ])
+    def test_pitch_classes(self, chord, expected):
+        assert chord_pitch_classes(chord) == expected
+
+
+class TestCorpusAnalysis:
+    """Tests for statistics over a corpus."""
+
+    def test_counts(self):
+        analysis = analyze(SONGS)
+        assert analysis.songs == ["pop", "ballad"]
+        assert analysis.chord_frequency(2) == [("C", 4), ("Am", 2)]
+        assert analysis.counts.shape == (2, len(analysis.vocabulary))
+        assert analysis.counts.sum() == 15
+
+    def test_pitch_classes(self):
+        analysis = analyze(SONGS)
+        # C, G and Am each played twice, plus C once more: C major's tonic
+        # is played the most.
+        assert analysis.pitch_classes[0].argmax() == 0
+        assert analysis.corpus_pitch_classes.sum() == analysis.pitch_classes.sum()
+
+    def test_keys(self):
+        analysis = analyze({
+            "pop": SONGS["pop"],
+            "minor": "[Verse]\n{Am}a {Dm}b {E7}c {Am}d\n",
+            "empty": "[Verse]\nNo chords here\n",
+        })
+        assert analysis.keys == ["C major", "A minor", None]
+        assert analysis.key_scores().shape == (3, 24)
+
+    def test_progressions(self):
+        """Test that progressions don't cross breaks or songs."""
+        analysis = analyze(SONGS)
+        assert analysis.progressions(2, top=1)[0][1] == 2
+        assert analysis.progressions(4, top=None, song=0) == [
+            (("C", "G", "Am", "F"), 2),
+            (("Am", "F", "C", "G"), 1),
+            (("F", "C", "G", "Am"), 1),
+            (("G", "Am", "F", "C"), 1),
+        ]
+        for progression, _ in analysis.progressions(2, top=None):
+            assert progression != ("F", "Em")
+        assert analysis.progressions(9) == []
+
+    def test_features(self):
+        analysis = analyze(SONGS)
+        assert analysis.features.shape == (2, 24)
+        assert np.allclose(analysis.features[:, :12].sum(axis=1), 1)
+
+
+class TestFeatureCache:
+    """Tests for caching song features."""
+
+    def test_memory_cache(self):
+        cache = FeatureCache()
+        assert cache.get(SONGS["pop"]) is cache.get(SONGS["pop"])
+
+    def test_disk_cache(self, tmp_path):
+        first = FeatureCache(str(tmp_path)).get(SONGS["ballad"])
+        assert len(os.listdir(tmp_path)) == 1
+
+        second = FeatureCache(str(tmp_path)).get(SONGS["ballad"])
+        assert second is not first
+        assert second.chords == first.chords
+        assert np.array_equal(second.pitch_classes, first.pitch_classes)
+
+    def test_files(self, tmp_path):
+        path = tmp_path / "pop.hb"
+        path.write_text(SONGS["pop"])
+        assert analyze([str(path)]).songs == [str(path)]
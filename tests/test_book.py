@@ -0,0 +1,114 @@
+"""Tests for songbook compilation."""
+
+import os
+
+import pytest
+from hibiki import Limits, render
+from hibiki.book import BookError, build_book, read_manifest
+from hibiki.include import clear_cache
+
+
+SONGS = {
+    "one.hb": "[Verse]\n{C}Hello {G}world\n\n",
+    "two.hb": "[Chorus] (x2)\n{Am}La la\n\n",
+    "three.hb": "[Intro]\n{E} {B}\n\n[Intro]\n\n",
+}
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    for name, src in SONGS.items():
+        (tmp_path / name).write_text(src)
+    path = tmp_path / "book.txt"
+    path.write_text("# Setlist\ntwo.hb | Song Two\n\none.hb\nthree.hb\n")
+    return path
+
+
+class TestManifest:
+    """Tests for reading manifests."""
+
+    def test_read_manifest(self, manifest, tmp_path):
+        entries = read_manifest(str(manifest))
+        assert [e.title for e in entries] == ["Song Two", "one", "three"]
+        assert entries[0].path == str(tmp_path / "two.hb")
+
+    def test_non_ascii_titles(self, manifest):
+        """Test that manifests are read as UTF-8."""
+        manifest.write_bytes("one.hb | ふるさと\n".encode("utf-8"))
+        assert [e.title for e in read_manifest(str(manifest))] == ["ふるさと"]
+
+
+class TestBuildBook:
+    """Tests for building books."""
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_book_in_manifest_order(self, manifest, tmp_path, jobs):
+        out = tmp_path / "book.out"
+        entries = build_book(read_manifest(str(manifest)), str(out), str(tmp_path / "cache"), jobs=jobs)
+        text = out.read_text()
+        lines = text.split("\n")
+
+        assert lines[0] == "Songbook"
+        assert lines[1] == "1. Song Two (line 6, page 1)"
+        for entry, name in zip(entries, ["two.hb", "one.hb", "three.hb"]):
+            assert lines[entry.line - 1] == f"== {entry.title} =="
+            body = "\n".join(lines[entry.line:entry.line - 1 + entry.length])
+            assert body == render(SONGS[name])
+
+    def test_page_numbers(self, manifest, tmp_path):
+        entries = build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(tmp_path / "cache"), lines_per_page=10, jobs=1)
+        assert [e.page for e in entries] == [(e.line - 1) // 10 + 1 for e in entries]
+        assert entries[-1].page > 1
+
+    def test_unchanged_songs_reuse_cache(self, manifest, tmp_path):
+        """Test that rebuilding only renders songs which changed."""
+        cache = tmp_path / "cache"
+        build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(cache), jobs=1)
+        before = {name: os.stat(cache / name).st_mtime_ns for name in os.listdir(cache)}
+        assert len(before) == 3
+
+        (tmp_path / "one.hb").write_text("[Verse]\n{D}Changed\n\n")
+        build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(cache), jobs=1)
+        after = {name: os.stat(cache / name).st_mtime_ns for name in os.listdir(cache)}
+        assert len(after) == 4
+        assert all(after[name] == mtime for name, mtime in before.items())
+        assert "Changed" in (tmp_path / "book.out").read_text()
+
+    def test_library_changes_rerender(self, manifest, tmp_path):
+        """Test that songs are rendered again when a library they include changes."""
+        (tmp_path / "lib.hb").write_text("[Chorus]\n{G}Old chorus\n\n")
+        (tmp_path / "two.hb").write_text("(+lib.hb)\n\n[Chorus] (x2)\n\n")
+        build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(tmp_path / "cache"), jobs=1)
+        assert "Old chorus" in (tmp_path / "book.out").read_text()
+
+        clear_cache()
+        (tmp_path / "lib.hb").write_text("[Chorus]\n{G}New chorus\n\n")
+        build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(tmp_path / "cache"), jobs=1)
+        assert "New chorus" in (tmp_path / "book.out").read_text()
+
+    def test_limits(self, manifest, tmp_path):
+        """Test that songs are parsed within the renderer's limits."""
+        (tmp_path / "one.hb").write_text("Hook (=h)\n\n[Verse]\n{C}(*h) (*h)\n\n")
+        with pytest.raises(BookError) as exc_info:
+            build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(tmp_path / "cache"), jobs=1, limits=Limits(max_recall_size=10))
+        [(path, reason)] = exc_info.value.failures
+        assert path.endswith("one.hb") and "more than the limit of 10" in reason
+
+    def test_renderer_options(self, manifest, tmp_path):
+        out = tmp_path / "book.out"
+        build_book(read_manifest(str(manifest)), str(out), str(tmp_path / "cache"), jobs=1, transpose=2)
+        assert "D     A\nHello world" in out.read_text()
+
+    def test_failures(self, manifest, tmp_path):
+        (tmp_path / "one.hb").write_text("[Verse]\n\n")
+        with pytest.raises(BookError) as exc_info:
+            build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(tmp_path / "cache"), jobs=1)
+        assert exc_info.value.failures[0][0].endswith("one.hb")
+
+    def test_undecodable_song(self, manifest, tmp_path):
+        """Test that songs which aren't UTF-8 are reported as failures."""
+        (tmp_path / "two.hb").write_bytes(b"[Chorus]\n\xff\n\n")
+        with pytest.raises(BookError) as exc_info:
+            build_book(read_manifest(str(manifest)), str(tmp_path / "book.out"), str(tmp_path / "cache"), jobs=1)
+        [(path, reason)] = exc_info.value.failures
+        assert path.endswith("two.hb") and "UTF-8" in reason
@@ -0,0 +1,130 @@
+"""Tests for songbook bundles."""
+
+import pytest
+from hibiki import HibikiRenderer, Limits, ResourceLimitExceeded, render
+from hibiki.renderer import render_file
+from hibiki.bundle import Bundle, BundleError, pack_directory
+
+
+SONGS = {
+    "a.hb": "[Verse]\n{C}Hello {G}world\n\n[Verse] (x2)\n\n",
+    "sub/b.hb": "Refrain(=r)\n\n[Chorus]\n{Am}La (*r)\n\n",
+    "sub/c.hb": "[Intro]\n{E} {B} ア\n\n",
+}
+
+
+@pytest.fixture
+def songs(tmp_path):
+    for name, src in SONGS.items():
+        path = tmp_path / "songs" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(src, encoding="utf-8")
+    return tmp_path / "songs"
+
+
+class TestBundle:
+    """Tests for packing and reading bundles."""
+
+    def test_pack_and_read_sources(self, songs, tmp_path):
+        out = str(tmp_path / "songs.hbb")
+        assert pack_directory(str(songs), out) == 3
+
+        with Bundle(out) as bundle:
+            assert sorted(bundle) == sorted(SONGS)
+            for name, src in SONGS.items():
+                assert bundle.source(name) == src
+
+    @pytest.mark.parametrize("cache_parse", [False, True])
+    def test_render(self, songs, tmp_path, cache_parse):
+        """Test that songs render the same with or without cached parses."""
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out, cache_parse=cache_parse)
+
+        with Bundle(out) as bundle:
+            for name, src in SONGS.items():
+                assert bundle.render(name) == render(src)
+
+    def test_cached_parse_keeps_repeats_shared(self, songs, tmp_path):
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out, cache_parse=True)
+
+        with Bundle(out) as bundle:
+            stanzas = bundle.parse("a.hb")
+            assert len(stanzas) == 3
+            assert stanzas[1] is stanzas[2]
+            assert stanzas[0].lines[0].offset == 8
+            # The recall shares the lines of the stanza it recalls.
+            assert stanzas[1].lines is stanzas[0].lines
+            assert stanzas[1].recall_line == 4
+
+    def test_iter_render(self, songs, tmp_path):
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out)
+
+        with Bundle(out) as bundle:
+            rendered = dict(bundle.iter_render())
+        assert rendered == {name: render(src) for name, src in SONGS.items()}
+
+    def test_invalid_song_is_stored(self, songs, tmp_path):
+        """Test that songs which don't parse still pack, and fail on render."""
+        (songs / "bad.hb").write_text("[Verse]\n\n")
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out, cache_parse=True)
+
+        with Bundle(out) as bundle:
+            assert bundle.source("bad.hb") == "[Verse]\n\n"
+            with pytest.raises(Exception):
+                bundle.render("bad.hb")
+
+    @pytest.mark.parametrize("cache_parse", [False, True])
+    def test_includes(self, songs, tmp_path, cache_parse):
+        """Test that songs resolve includes relative to where they were packed from."""
+        (songs / "sub" / "lib.hb").write_text("[Chorus]\n{G}From the library\n\n")
+        (songs / "sub" / "d.hb").write_text("(+lib.hb)\n\n[Chorus] (x2)\n\n")
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out, cache_parse=cache_parse)
+
+        with Bundle(out) as bundle:
+            assert bundle.render("sub/d.hb") == render_file(str(songs / "sub" / "d.hb"))
+
+    def test_undecodable_song(self, songs, tmp_path):
+        """Test that packing names a song which isn't valid UTF-8."""
+        (songs / "bad.hb").write_bytes(b"[Verse]\n\xff\n\n")
+        out = str(tmp_path / "songs.hbb")
+        with pytest.raises(BundleError, match="bad.hb' is not valid UTF-8"):
+            pack_directory(str(songs), out, cache_parse=True)
+
+    @pytest.mark.parametrize("cache_parse", [False, True])
+    @pytest.mark.parametrize("limits, limit", [
+        (Limits(max_stanzas=2), "max_stanzas"),
+        (Limits(max_lines=2), "max_lines"),
+        (Limits(max_expanded_size=20), "max_expanded_size"),
+        (Limits(max_recall_size=10), "max_recall_size"),
+        (Limits(max_output_bytes=20), "max_output_bytes"),
+    ])
+    def test_limits(self, songs, tmp_path, cache_parse, limits, limit):
+        """Test that songs are held to the renderer's limits, cached parse or not."""
+        (songs / "big.hb").write_text("Refrain line(=r)\n\n[Chorus] (x3)\n{Am}La (*r)\n\n")
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out, cache_parse=cache_parse)
+
+        with Bundle(out) as bundle:
+            assert bundle.render("big.hb") == render("Refrain line(=r)\n\n[Chorus] (x3)\n{Am}La (*r)\n\n")
+            with pytest.raises(ResourceLimitExceeded) as exc_info:
+                bundle.parse("big.hb", limits)
+            assert exc_info.value.limit == limit
+            with pytest.raises(ResourceLimitExceeded):
+                bundle.render("big.hb", HibikiRenderer(limits=limits))
+
+    def test_missing_song(self, songs, tmp_path):
+        out = str(tmp_path / "songs.hbb")
+        pack_directory(str(songs), out)
+        with Bundle(out) as bundle:
+            with pytest.raises(KeyError):
+                bundle.source("nope.hb")
+
+    def test_not_a_bundle(self, tmp_path):
+        path = tmp_path / "fake.hbb"
+        path.write_bytes(b"x" * 64)
+        with pytest.raises(BundleError):
+            Bundle(str(path))
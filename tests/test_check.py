@@ -0,0 +1,125 @@
+"""Tests for validate-only checking."""
+
+import json
+import pickle
+
+import pytest
+from hibiki import render
+from hibiki.check import check, check_file, check_files, find_sources, format_human, format_json
+from hibiki.errors import UndefinedRecall
+
+
+INVALID = "[Verse]\nUses (*missing)\n{C unclosed\n\n[Chorus]\n\n"
+VALID = "[Verse]\n{C}Hello\n\n[Verse]\n\n"
+
+
+class TestCheck:
+    """Tests for checking source and files."""
+
+    def test_reports_all_errors(self):
+        """Test that every error in a file is reported."""
+        diagnostics = check(INVALID)
+        assert [d.kind for d in diagnostics] == ["UndefinedRecall", "ChordSyntaxError", "EmptyStanza"]
+        assert [d.line for d in diagnostics] == [2, 3, 5]
+
+    def test_valid_source(self):
+        """Test that valid source has no errors."""
+        assert check(VALID) == []
+
+    @pytest.mark.parametrize(("src", "kind", "line", "column"), [
+        ("[Verse]\nfoo ] bar\n\n", "StanzaSyntaxError", 2, 5),
+        ("[Verse] hi\nfoo\n\n", "StanzaSyntaxError", 1, 1),
+        ("[V]\n{ChDhE}x\n\n", "ChordSyntaxError", 2, 1),
+        ("{C}Hook ](=hook)\n\n[V]\n(*hook)\n\n", "StanzaSyntaxError", 1, 9),
+        ("[V]\n{ChDhE}(=hook)\n\n[W]\nLa (*hook)\n\n", "ChordSyntaxError", 2, 1),
+    ])
+    def test_errors_which_stop_rendering(self, src, kind, line, column):
+        """Test that anything which stops a document from rendering is reported."""
+        with pytest.raises((SyntaxError, ValueError)):
+            render(src)
+        first = check(src)[0]
+        assert (first.kind, first.line, first.column) == (kind, line, column)
+
+    def test_brackets_within_chords(self):
+        """Test that brackets the lexer takes as part of a chord are fine."""
+        assert check("[V]\n{C]}x\n\n") == []
+        render("[V]\n{C]}x\n\n")
+
+    def test_missing_file(self, tmp_path):
+        """Test that missing files are reported rather than raised."""
+        result = check_file(str(tmp_path / "missing.hb"))
+        assert not result.ok
+        assert "does not exist" in result.failure
+
+    def test_unreadable_files(self, tmp_path):
+        """Test that files which can't be decoded or read are reported rather than raised."""
+        binary = tmp_path / "binary.hb"
+        binary.write_bytes(b"[Verse]\n\xff\xfe\n\n")
+        result = check_file(str(binary))
+        assert not result.ok
+        assert "UTF-8" in result.failure
+
+        result = check_file(str(tmp_path))
+        assert not result.ok
+        assert "Could not read" in result.failure
+
+        valid = tmp_path / "valid.hb"
+        valid.write_text(VALID)
+        results = check_files([str(binary), str(valid)], jobs=2)
+        assert [result.ok for result in results] == [False, True]
+
+    def test_check_files_in_parallel_keeps_order(self, tmp_path):
+        """Test that parallel checking returns results in order."""
+        paths = []
+        for i in range(6):
+            path = tmp_path / f"song{i}.hb"
+            path.write_text(INVALID if i % 2 else VALID)
+            paths.append(str(path))
+
+        results = check_files(paths, jobs=2)
+        assert [r.path for r in results] == paths
+        assert [r.ok for r in results] == [True, False] * 3
+        assert isinstance(results[1].diagnostics[0].error, UndefinedRecall)
+
+    def test_find_sources(self, tmp_path):
+        """Test that directories are searched for .hb files."""
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b.hb").write_text(VALID)
+        (tmp_path / "a.hb").write_text(VALID)
+        (tmp_path / "notes.txt").write_text("")
+        found = find_sources([str(tmp_path)])
+        assert [p.rsplit("/", 1)[-1] for p in found] == ["a.hb", "b.hb"]
+
+
+class TestOutput:
+    """Tests for formatting check results."""
+
+    def test_json_output(self, tmp_path):
+        path = tmp_path / "song.hb"
+        path.write_text(INVALID)
+        data = json.loads(format_json([check_file(str(path))]))
+        assert data[0]["valid"] is False
+        assert data[0]["errors"][0] == {
+            "type": "UndefinedRecall",
+            "line": 2,
+            "column": 6,
+            "end_column": 16,
+            "message": "Line #2: Undefined recall variable 'missing'.",
+        }
+
+    def test_human_output(self, tmp_path):
+        path = tmp_path / "song.hb"
+        path.write_text(INVALID)
+        output = format_human([check_file(str(path))])
+        assert f"{path}: Line #2: Undefined recall variable 'missing'." in output
+        assert output.endswith("1 file(s) checked, 1 invalid, 3 error(s).")
+
+
+class TestErrorPickling:
+    """Tests that errors survive being sent between processes."""
+
+    def test_errors_pickle(self):
+        error = pickle.loads(pickle.dumps(UndefinedRecall(3, "name")))
+        assert error.line_no == 3
+        assert error.var_name == "name"
+        assert str(error) == "Line #3: Undefined recall variable 'name'."
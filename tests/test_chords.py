@@ -1,8 +1,15 @@
 """Tests for chord parsing, modifiers, and syntax error handling."""
 
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
 import pytest
-from hibiki import HibikiParser, HibikiRenderer, Chord
+from hibiki import HibikiParser, HibikiRenderer, Chord, Modifier, register_modifier
+from hibiki import modifiers, renderer
 from hibiki.errors import ChordSyntaxError
+from hibiki.search import normalize_chord
+from hibiki.transpose import Transposer
 
 
 class TestChords:
@@ -90,6 +97,106 @@ class TestChordModifiers:
         assert chord.hammer_into is not None
         assert chord.hammer_into.symbol == "G"
 
+    def test_notes(self):
+        """Test that notes leave out modifiers, including combined ones."""
+        assert [Chord(text).note for text in ["C", "(C)", "C|", "C_", "N.C", "ChG", "ChG|", "(ChG)"]] == [
+            "C", "C", "C", "C", "N.C.", "C", "ChG", "ChG"
+        ]
+
+    def test_modifier_names(self):
+        """Test that chords list the modifiers applied to them."""
+        assert Chord("C").modifiers == ()
+        assert Chord("ChG|").modifiers == ("chucked", "hammer")
+
+    def test_hammer_into_two_chords(self):
+        """Test that hammering into more than one chord is still an error."""
+        with pytest.raises(ValueError):
+            Chord("ChDhE")
+
+
+# Defined at the top level, so worker processes can find it.
+class StrumUp(Modifier):
+    name = "strum_up"
+    pattern = r".+\^\Z"
+
+    def apply(self, chord):
+        chord.symbol = f"{chord.text[:-1]}↑"
+
+    def note(self, chord):
+        return chord.text[:-1]
+
+
+@pytest.fixture
+def strum_up():
+    register_modifier(StrumUp)
+    yield StrumUp
+    modifiers.unregister_modifier("strum_up")
+
+
+class TestModifierRegistry:
+    """Tests for registering chord modifiers."""
+
+    def test_custom_modifier(self, strum_up):
+        """Test that registered modifiers apply to chords."""
+        chord = Chord("Am^")
+        assert chord.modifiers == ("strum_up",)
+        assert (chord.symbol, chord.note) == ("Am↑", "Am")
+        assert HibikiRenderer().render("[Verse]\n{Am^}Up {C}down\n\n") == "[Verse]\nAm↑ C\nUp  down\n\n\n"
+
+    def test_applied_in_order(self, strum_up):
+        """Test that later modifiers' symbols win, while notes come from the first."""
+        chord = Chord("Ch(G)^")
+        assert chord.modifiers == ("hammer", "strum_up")
+        assert chord.symbol == "Ch(G)↑"
+        assert chord.note == "C"
+
+    def test_worker_processes(self, strum_up, monkeypatch):
+        """Test that worker processes which aren't forked apply registered modifiers too."""
+        monkeypatch.setattr(renderer, "MIN_PARALLEL_LINES", 0)
+        monkeypatch.setattr(renderer, "ProcessPoolExecutor", functools.partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context("forkserver")))
+        src = "[Verse]\n{Am^}Up {C}down\n\n[Chorus]\n{G^}Up {(C)}held\n\n"
+        serial = HibikiRenderer().render(src)
+        assert "Am↑" in serial
+        assert HibikiRenderer(jobs=2).render(src) == serial
+
+    def test_unregistered(self, strum_up):
+        """Test that unregistered modifiers stop applying."""
+        modifiers.unregister_modifier("strum_up")
+        try:
+            assert Chord("Am^").symbol == "Am^"
+        finally:
+            register_modifier(strum_up)
+
+    def test_caches_cleared(self):
+        """Test that chords cached under the old modifiers aren't reused once they change."""
+        assert Transposer(2)(Chord("C^")).symbol == "D^"
+        assert normalize_chord("C^") == "C^"
+
+        register_modifier(StrumUp)
+        try:
+            assert Transposer(2)(Chord("C^")).symbol == "D↑"
+            assert normalize_chord("C^") == "C"
+        finally:
+            modifiers.unregister_modifier("strum_up")
+        assert Transposer(2)(Chord("C^")).symbol == "D^"
+
+    def test_compiled_once(self, strum_up):
+        """Test that modifiers are compiled into one regex when a parser is built."""
+        assert modifiers._compiled is None
+        HibikiParser()
+        compiled = modifiers.compile_modifiers()
+        assert compiled.regex.groups == len(modifiers.MODIFIERS) == 6
+        assert [modifier.name for modifier in compiled.matching("ChG^")] == ["hammer", "strum_up"]
+        assert modifiers.compile_modifiers() is compiled
+
+    def test_cached_by_text(self):
+        """Test that chords with the same text share the work of applying modifiers."""
+        compiled = modifiers.compile_modifiers()
+        first, second = Chord("ChG|"), Chord("ChG|")
+        assert "ChG|" in compiled.cache
+        assert first.hammer_into is second.hammer_into
+        assert vars(first) == vars(second)
+
 
 class TestChordSyntax:
     """Tests for chord syntax error handling."""
@@ -0,0 +1,146 @@
+"""Tests for collecting diagnostics without rendering."""
+
+import pytest
+from hibiki import HibikiError, render
+from hibiki.diagnostics import Validator, split_blocks
+from hibiki.limits import Limits
+
+
+class TestBlocks:
+    """Tests for splitting source into blocks."""
+
+    def test_blocks_are_stanzas(self):
+        """Test that blocks are the stanzas, wherever the parser finds them."""
+        text = "Phantom(=p)\n[Verse]\nLine 1\n\n[Chorus] (x2)\nLine 2\n\n"
+        blocks = split_blocks(text)
+        assert [b.heading for b in blocks] == ["Verse", "Chorus"]
+        assert [(b.start, b.end) for b in blocks] == [(2, 3), (5, 6)]
+        assert blocks[1].repeat_count == 2
+
+    def test_empty_heading_block(self):
+        """Test that a heading with no body is an empty block."""
+        blocks = split_blocks("[Chorus]\n\n")
+        assert blocks[0].is_empty
+
+    def test_repeat_count_on_next_line(self):
+        """Test that a repeat count on the line after a heading belongs to it."""
+        blocks = split_blocks("[Verse]\n{C}la\n\n[Chorus] \n(x2)\n\n")
+        assert [(b.heading, b.repeat_count, b.start, b.end) for b in blocks] == [("Verse", 1, 1, 2), ("Chorus", 2, 4, 5)]
+        assert blocks[1].is_empty
+
+
+class TestValidator:
+    """Tests for the Validator."""
+
+    def test_valid_source_has_no_diagnostics(self):
+        """Test that valid source produces no diagnostics."""
+        text = "Refrain(=r)\n\n[Verse]\n{C}Hello (*r)\n\n[Verse]\n\n"
+        assert Validator().validate(text) == []
+
+    def test_collects_every_error(self):
+        """Test that errors don't stop validation."""
+        text = (
+            "[Verse]\n"
+            "Uses (*missing)\n"
+            "{C unclosed\n"
+            "\n"
+            "[Chorus]\n"
+            "\n"
+            "[Verse]\n"
+            "Again\n"
+            "\n"
+        )
+        diagnostics = Validator().validate(text)
+        assert [(d.kind, d.line) for d in diagnostics] == [
+            ("UndefinedRecall", 2),
+            ("ChordSyntaxError", 3),
+            ("EmptyStanza", 5),
+            ("RedefinedStanza", 7),
+        ]
+        assert "Line #2" in str(diagnostics[0])
+
+    def test_undefined_recall_column(self):
+        """Test that undefined recalls point at the recall itself."""
+        diagnostics = Validator().validate("[Verse]\nUses (*missing)\n\n")
+        assert diagnostics[0].column == 6
+        assert diagnostics[0].end_column == 16
+
+    def test_only_changed_blocks_revalidated(self):
+        """Test that unchanged blocks reuse their cached results."""
+        verses = "".join(f"[Verse {i}]\n{{C}}Line {i}\n\n" for i in range(20))
+        validator = Validator()
+        validator.validate(verses)
+        assert validator.revalidated == 20
+
+        validator.validate(verses.replace("Line 5", "Line five"))
+        assert validator.revalidated == 1
+
+    def test_moved_blocks_keep_line_numbers_correct(self):
+        """Test that cached results are repositioned when blocks move."""
+        text = "[Verse]\nUses (*missing)\n\n"
+        validator = Validator()
+        validator.validate(text)
+
+        diagnostics = validator.validate("[Intro]\nIntro\n\n" + text)
+        assert validator.revalidated == 1
+        assert diagnostics[0].line == 5
+
+    def test_recall_dependents_revalidated(self):
+        """Test that changing a recall revalidates the blocks using it."""
+        text = "Fine(=r)\n\n[Verse]\n(*r)\n\n[Chorus]\nNo recalls\n\n"
+        validator = Validator()
+        assert validator.validate(text) == []
+
+        diagnostics = validator.validate(text.replace("Fine", "{Broken"))
+        assert validator.revalidated == 1
+        assert [(d.kind, d.line) for d in diagnostics] == [("ChordSyntaxError", 1), ("ChordSyntaxError", 4)]
+
+    def test_nested_recalls(self):
+        """Test that nested recalls are expanded, and cycles and oversized lines reported."""
+        validator = Validator()
+        assert validator.validate("{C}(=a)\n(*a) {G}(=b)\n\n[Verse]\n(*b)\n\n") == []
+        assert validator.stanza_at(5).lines[0].text == "{C} {G}\n"
+
+        diagnostics = Validator().validate("Loop (*r)(=r)\n\n")
+        assert [(d.kind, d.line) for d in diagnostics] == [("RecallCycle", 1)]
+
+        text = "aaaaaaaaaa(=l0)\n" + "".join(f"(*l{i})(*l{i})(=l{i + 1})\n" for i in range(5)) + "\n"
+        diagnostics = Validator(limits=Limits(max_recall_size=100)).validate(text)
+        assert [(d.kind, d.line) for d in diagnostics] == [("RecallTooLarge", 5)]
+
+    def test_stanza_at_resolves_heading_recalls(self):
+        """Test that a heading recall resolves to the stanza it recalls."""
+        text = "Hi(=r)\n\n[Chorus]\n{C}(*r)\n\n[Chorus]\n\n"
+        validator = Validator()
+        validator.validate(text)
+        stanza = validator.stanza_at(6)
+        assert stanza is not None
+        assert stanza.lines[0].text == "{C}Hi\n"
+        assert validator.stanza_at(1) is None
+
+    @pytest.mark.parametrize("text, kind, line", [
+        ("[Verse]\n{C}la\n\n[Chorus] \n(x2)\n\n", "EmptyStanza", 4),
+        ("[Verse]\nA [stray bracket\n\n", "StanzaSyntaxError", 2),
+        ("{C(=hook2)\n\n[Verse]\n{C}la\n\n", None, None),
+    ])
+    def test_agrees_with_render(self, text, kind, line):
+        """Test that source is only reported where rendering it would fail."""
+        diagnostics = Validator().validate(text)
+        if kind is None:
+            render(text)
+            assert diagnostics == []
+            return
+
+        with pytest.raises((HibikiError, SyntaxError)):
+            render(text)
+        assert [(d.kind, d.line) for d in diagnostics] == [(kind, line)]
+
+    def test_only_edited_text_relexed(self):
+        """Test that an edit only lexes the text around it again."""
+        verses = "".join(f"[Verse {i}]\n{{C}}Line [{i}]\n\n" for i in range(200))
+        validator = Validator()
+        validator.validate(verses)
+        assert validator.lexed == len(verses)
+
+        validator.validate(verses.replace("Line [50]", "Line [fifty]"))
+        assert 0 < validator.lexed < 100
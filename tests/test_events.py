@@ -0,0 +1,112 @@
+"""Tests for event-driven parsing."""
+
+import pytest
+from hibiki import Chord, EmptyStanza, RedefinedStanza, ResourceLimitExceeded, Limits
+from hibiki.events import EventHandler, iter_events, walk
+
+
+SRC = """riff {C}x (=r)
+
+[Verse] (x2)
+  {C}Hello {G}there (*r)
+{Am}Again (x3)
+
+[Verse]
+"""
+
+
+def kinds(text):
+    return [event[0] for event in iter_events(text)]
+
+
+class TestEvents:
+    """Tests for the events a document produces."""
+
+    def test_stanza_events(self):
+        """Test that stanzas start and end, with their repeat count and line."""
+        events = list(iter_events(SRC))
+        assert events[0] == ("stanza_start", "Verse", 2, 3)
+        assert events[-1] == ("stanza_end", "Verse")
+        assert kinds(SRC).count("stanza_start") == 2
+
+    def test_chords(self):
+        """Test that chords are Chord objects with their line and column."""
+        chords = [event for event in iter_events("[Verse]\n{C}Hi {G7}there\n") if event[0] == "chord"]
+        assert all(isinstance(event[1], Chord) for event in chords)
+        assert [(event[1].symbol, event[2], event[3]) for event in chords] == [("C", 2, 1), ("G7", 2, 7)]
+
+    def test_lyrics_are_stripped(self):
+        """Test that lines lose their surrounding whitespace, like lines do."""
+        lyrics = [event[1:] for event in iter_events(SRC) if event[0] == "lyric"][:2]
+        assert lyrics == [("Hello ", 4, 6), ("there riff ", 4, 15)]
+
+    def test_recalls_substituted(self):
+        """Test that line recalls are substituted, chords included."""
+        chords = [event[1].symbol for event in iter_events(SRC) if event[0] == "chord"]
+        assert chords[:3] == ["C", "G", "C"]
+
+    def test_line_multiplier(self):
+        """Test that line multipliers are reported instead of repeated."""
+        events = list(iter_events(SRC))
+        assert ("line_end", 5, 3, None) in events
+        assert ("lyric", "Again ", 5, 5) in events
+
+    def test_heading_recall_replays_definition(self):
+        """Test that a heading recall produces the events of its definition."""
+        events = [tuple(getattr(arg, "symbol", arg) for arg in event) for event in iter_events(SRC)]
+        first, second = events.index(("stanza_end", "Verse")), len(events) - 1
+        assert events[second - (first - 1):second] == events[1:first]
+        assert events[first + 1] == ("stanza_start", "Verse", 1, 7)
+
+    def test_included_lines_have_source(self, tmp_path):
+        """Test that lines of stanzas recalled from a library say which library."""
+        library = tmp_path / "lib.hb"
+        library.write_text("[Chorus]\nLa\n\n")
+        song = tmp_path / "song.hb"
+        events = list(iter_events("(+lib.hb)\n\n[Verse]\nHi\n\n[Chorus]\n\n", path=str(song)))
+        assert [event for event in events if event[0] == "line_end"] == [
+            ("line_end", 4, 1, None),
+            ("line_end", 2, 1, str(library)),
+        ]
+
+    def test_text_outside_stanzas_ignored(self):
+        """Test that lines outside of stanzas produce no events."""
+        assert kinds("{C}Loose\n\n[Verse]\nHi\n") == ["stanza_start", "lyric", "line_end", "stanza_end"]
+
+
+class TestEventErrors:
+    """Tests for errors while producing events."""
+
+    def test_empty_stanza(self):
+        with pytest.raises(EmptyStanza):
+            list(iter_events("[Verse]\n\n"))
+
+    def test_redefined_stanza(self):
+        with pytest.raises(RedefinedStanza):
+            list(iter_events("[Verse]\nA\n\n[Verse]\nB\n"))
+
+    def test_limits(self):
+        with pytest.raises(ResourceLimitExceeded):
+            list(iter_events("[Verse] (x9)\nA\n", limits=Limits(max_stanzas=5)))
+
+
+class TestWalk:
+    """Tests for handing events to a handler."""
+
+    def test_handler_methods_called(self):
+        """Test that only the methods a handler implements need to exist."""
+        class Counter(EventHandler):
+            def __init__(self):
+                self.chords = []
+                self.lines = 0
+
+            def chord(self, chord, line, column):
+                self.chords.append(chord.symbol)
+
+            def line_end(self, line, repeat_count, source):
+                self.lines += repeat_count
+
+        counter = Counter()
+        walk(SRC, counter)
+        assert counter.chords == ["C", "G", "C", "Am"] * 2
+        assert counter.lines == 8
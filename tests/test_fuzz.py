@@ -0,0 +1,71 @@
+"""Tests for differential fuzzing against the reference implementation."""
+
+import random
+
+import hibiki
+from tests import fuzz
+
+
+class TestGenerator:
+    """Test the random document generator."""
+    def test_deterministic(self):
+        """Test that a seed always generates the same document."""
+        assert fuzz.document(random.Random(42)) == fuzz.document(random.Random(42))
+
+    def test_coverage(self):
+        """Test that the grammar's features all turn up."""
+        text = "\n".join(fuzz.document(random.Random(seed)) for seed in range(200))
+        for feature in ["(*hook", "(=hook", "(*nope", "(x2)", "( x 2 )", "{(", "|}", "_}", "N.C.", "(*)"]:
+            assert feature in text
+        assert any(f"{{{root}h" in text for root in fuzz.ROOTS)
+
+    def test_outputs_and_errors(self):
+        """Test that documents both render and fail, in several ways."""
+        kinds = set()
+        for seed in range(300):
+            result = fuzz._run(fuzz._reference, fuzz.document(random.Random(seed)))
+            kinds.add(result[0] if result[0] == "output" else result[1])
+        assert {"output", "UndefinedRecall", "ChordSyntaxError", "EmptyStanza", "RedefinedStanza"} <= kinds
+
+
+class TestDifferential:
+    """Test the current implementation against the reference."""
+    def test_seeded_documents(self):
+        """Test that every path matches the reference on seeded documents."""
+        assert list(fuzz.fuzz(range(300))) == []
+
+    def test_malformed_documents(self):
+        """Test that every path matches the reference on mostly malformed documents."""
+        assert list(fuzz.fuzz(range(1000, 1200), malformed=0.2)) == []
+
+    def test_compact_spanning_heading(self):
+        """Test that compact parsing of a heading spanning lines matches the reference."""
+        assert fuzz.check("[Verse\n1]") == {}
+        assert fuzz.check("[Verse\n1] (x2)\n{C}Line\n\n[Verse]\n\n") == {}
+
+    def test_differences_found(self, monkeypatch):
+        """Test that a path which renders differently is caught."""
+        monkeypatch.setitem(fuzz.PATHS, "broken", lambda text: hibiki.render(text).replace("|", ""))
+        differences = fuzz.check("[Verse]\n{C|}Line\n\n", ["broken"])
+        assert list(differences) == ["broken"]
+        expected, actual = differences["broken"]
+        assert expected == ("output", "[Verse]\nC|\nLine\n\n\n")
+        assert actual == ("output", "[Verse]\nC\nLine\n\n\n")
+
+
+class TestShrink:
+    """Test shrinking failing documents."""
+    def test_minimal(self):
+        """Test that a document is shrunk to just what makes it fail."""
+        text = fuzz.document(random.Random(3)) + "\n{Am}Recalls (*nope) here\n"
+        assert fuzz.shrink(text, lambda candidate: "(*nope)" in candidate) == "(*nope)"
+
+    def test_shrinks_real_failures(self, monkeypatch):
+        """Test that fuzzing reports small reproductions of real differences."""
+        monkeypatch.setitem(fuzz.PATHS, "broken", lambda text: hibiki.render(text).replace("|", ""))
+        seed, text, differences = next(fuzz.fuzz(range(100), ["broken"]))
+        assert list(differences) == ["broken"]
+        assert len(text) < len(fuzz.document(random.Random(seed)))
+        # Removing any character gets rid of the difference.
+        for i in range(len(text)):
+            assert fuzz.check(text[:i] + text[i + 1:], ["broken"]) == {}
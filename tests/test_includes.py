@@ -0,0 +1,224 @@
+"""Tests for including libraries with (+path)."""
+
+import os
+
+import pytest
+from hibiki import HibikiParser, IncludeError, IncludeCycle, EmptyStanza, render, render_file
+from hibiki.check import check, check_file
+from hibiki.include import clear_cache
+
+
+LIBRARY = "{E}Da da {A}dum(=riff)\n\n[Intro]\n{C}Common {G}intro\n\n"
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "lib").mkdir()
+    path = tmp_path / "lib" / "common.hb"
+    path.write_text(LIBRARY)
+    return path
+
+
+def write(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+class TestIncludes:
+    """Tests for what including a library makes available."""
+
+    def test_line_recalls_from_library(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Verse]\n(*riff)\n\n")
+        stanzas = HibikiParser(path=song).parse(open(song).read())
+        assert stanzas[0].lines[0].text == "{E}Da da {A}dum\n"
+
+    def test_stanza_recall_from_library(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Intro]\n\n[Verse]\nWords\n\n")
+        stanzas = HibikiParser(path=song).parse(open(song).read())
+        assert [stanza.name for stanza in stanzas] == ["Intro", "Verse"]
+        assert stanzas[0].lines[0].text == "{C}Common {G}intro\n"
+
+    def test_library_stanzas_are_not_rendered(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Verse]\nWords\n\n")
+        assert "Common" not in render_file(song)
+
+    def test_local_definition_takes_priority(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Intro]\nMy own\n\n[Intro]\n\n")
+        stanzas = HibikiParser(path=song).parse(open(song).read())
+        assert all(stanza.lines[0].text == "My own\n" for stanza in stanzas)
+
+    def test_line_numbers_unchanged(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Verse]\nWords\n\n")
+        stanzas = HibikiParser(path=song).parse(open(song).read())
+        assert stanzas[0].starting_line == 3
+
+    def test_nested_includes(self, tmp_path, library):
+        write(tmp_path / "lib" / "outer.hb", "(+common.hb)\n")
+        song = write(tmp_path / "song.hb", "(+lib/outer.hb)\n\n[Intro]\n\n[Verse]\n(*riff)\n\n")
+        stanzas = HibikiParser(path=song).parse(open(song).read())
+        assert stanzas[0].lines[0].text == "{C}Common {G}intro\n"
+        assert stanzas[1].lines[0].text == "{E}Da da {A}dum\n"
+
+    def test_without_library_stanza_is_empty(self, tmp_path):
+        with pytest.raises(EmptyStanza):
+            HibikiParser().parse("[Intro]\n\n")
+
+
+class TestLibraryCache:
+    """Tests for the per-process library cache."""
+
+    def test_library_parsed_once(self, tmp_path, library):
+        libraries = []
+        for i in range(5):
+            song = write(tmp_path / f"song{i}.hb", "(+lib/common.hb)\n\n[Intro]\n\n")
+            parser = HibikiParser(path=song)
+            parser.parse(open(song).read())
+            libraries.extend(parser.libraries)
+        assert all(library is libraries[0] for library in libraries)
+
+    def test_changed_library_reloaded(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Intro]\n\n")
+        assert "Common" in render_file(song)
+
+        library.write_text(LIBRARY.replace("Common", "Changed") + "\n")
+        assert "Changed" in render_file(song)
+
+    def test_changed_nested_library_reloaded(self, tmp_path, library):
+        write(tmp_path / "lib" / "outer.hb", "(+common.hb)\n")
+        song = write(tmp_path / "song.hb", "(+lib/outer.hb)\n\n[Intro]\n\n")
+        assert "Common" in render_file(song)
+
+        library.write_text(LIBRARY.replace("Common", "Changed") + "\n")
+        assert "Changed" in render_file(song)
+
+    def test_touched_library_reused(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Intro]\n\n")
+        first = HibikiParser(path=song)
+        first.parse(open(song).read())
+
+        os.utime(library, ns=(0, 0))
+        second = HibikiParser(path=song)
+        second.parse(open(song).read())
+        assert second.libraries[0] is first.libraries[0]
+
+
+class TestIncludeErrors:
+    """Tests for errors involving includes."""
+
+    def test_missing_library(self, tmp_path):
+        song = write(tmp_path / "song.hb", "(+missing.hb)\n\n")
+        with pytest.raises(IncludeError) as exc_info:
+            render_file(song)
+        assert exc_info.value.line_no == 1
+
+    def test_error_points_into_library(self, tmp_path):
+        write(tmp_path / "broken.hb", "[Verse]\nFine\n\n[Chorus]\n(*nope)\n\n")
+        song = write(tmp_path / "song.hb", "\n\n(+broken.hb)\n\n")
+        with pytest.raises(IncludeError) as exc_info:
+            render_file(song)
+        assert exc_info.value.line_no == 3
+        assert "Line #5: Undefined recall variable 'nope'" in str(exc_info.value)
+
+    def test_self_include(self, tmp_path):
+        song = write(tmp_path / "song.hb", "(+song.hb)\n\n")
+        with pytest.raises(IncludeCycle):
+            render_file(song)
+
+    def test_include_cycle(self, tmp_path):
+        write(tmp_path / "a.hb", "(+b.hb)\n")
+        write(tmp_path / "b.hb", "(+a.hb)\n")
+        song = write(tmp_path / "song.hb", "(+a.hb)\n\n")
+        with pytest.raises(IncludeError) as exc_info:
+            render_file(song)
+
+        cause = exc_info.value
+        while not isinstance(cause, IncludeCycle):
+            cause = cause.__cause__
+        assert [os.path.basename(path) for path in cause.chain] == ["a.hb", "b.hb", "a.hb"]
+
+    def test_include_inside_stanza(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "[Verse]\n(+lib/common.hb)\n\n")
+        with pytest.raises(IncludeError):
+            render_file(song)
+
+    def test_check_follows_includes(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Intro]\n\n[Verse]\n(*riff)\n\n")
+        assert check_file(song).ok
+
+        bad = write(tmp_path / "bad.hb", "(+lib/missing.hb)\n\n[Verse]\nWords\n\n")
+        result = check_file(bad)
+        assert [d.kind for d in result.diagnostics] == ["IncludeError"]
+
+
+class TestIncludeSafety:
+    """Tests for keeping includes from reading files they shouldn't."""
+
+    def test_strings_cannot_include(self, tmp_path):
+        secret = write(tmp_path / "secret.hb", "[Secret]\npassword\n\n")
+        with pytest.raises(IncludeError) as exc_info:
+            render(f"(+{secret})\n\n[Secret]\n\n")
+        assert "password" not in str(exc_info.value)
+        assert [d.kind for d in check(f"(+{secret})\n\n[Verse]\nWords\n\n")] == ["IncludeError"]
+
+    def test_strings_can_opt_in(self, tmp_path, library):
+        stanzas = HibikiParser(allow_includes=True, include_root=str(tmp_path)).parse("(+lib/common.hb)\n\n[Intro]\n\n")
+        assert stanzas[0].lines[0].text == "{C}Common {G}intro\n"
+
+    def test_files_can_opt_out(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", "(+lib/common.hb)\n\n[Intro]\n\n")
+        with pytest.raises(IncludeError):
+            HibikiParser(path=song, allow_includes=False).parse(open(song).read())
+
+    def test_absolute_path(self, tmp_path, library):
+        song = write(tmp_path / "song.hb", f"(+{library})\n\n[Intro]\n\n")
+        with pytest.raises(IncludeError) as exc_info:
+            render_file(song)
+        assert "absolute" in str(exc_info.value)
+
+    def test_parent_directory(self, tmp_path):
+        write(tmp_path / "secret.hb", "[Secret]\npassword\n\n")
+        (tmp_path / "songs").mkdir()
+        song = write(tmp_path / "songs" / "song.hb", "(+../secret.hb)\n\n[Secret]\n\n")
+        with pytest.raises(IncludeError) as exc_info:
+            render_file(song)
+        assert "outside" in str(exc_info.value)
+
+    def test_nested_parent_directory(self, tmp_path):
+        """Test that libraries can't lead out of the root of the file including them."""
+        write(tmp_path / "secret.hb", "[Secret]\npassword\n\n")
+        (tmp_path / "songs" / "lib").mkdir(parents=True)
+        write(tmp_path / "songs" / "lib" / "sneaky.hb", "(+../../secret.hb)\n")
+        write(tmp_path / "songs" / "lib" / "fine.hb", "(+../shared.hb)\n")
+        write(tmp_path / "songs" / "shared.hb", "[Shared]\nWithin the root\n\n")
+
+        song = write(tmp_path / "songs" / "song.hb", "(+lib/sneaky.hb)\n\n[Secret]\n\n")
+        with pytest.raises(IncludeError):
+            render_file(song)
+        song = write(tmp_path / "songs" / "song.hb", "(+lib/fine.hb)\n\n[Shared]\n\n")
+        assert "Within the root" in render_file(song)
+
+    def test_cached_library_outside_root(self, tmp_path):
+        """Test that a library cached from a wider root isn't trusted within a narrower one."""
+        write(tmp_path / "secret.hb", "[Secret]\npassword\n\n")
+        (tmp_path / "lib").mkdir()
+        write(tmp_path / "lib" / "sneaky.hb", "(+../secret.hb)\n")
+        wide = write(tmp_path / "wide.hb", "(+lib/sneaky.hb)\n\n[Secret]\n\n")
+        assert "password" in render_file(wide)
+
+        with pytest.raises(IncludeError):
+            HibikiParser(path=wide, include_root=str(tmp_path / "lib")).parse(open(wide).read())
+
+    def test_symlink_out_of_root(self, tmp_path):
+        write(tmp_path / "secret.hb", "[Secret]\npassword\n\n")
+        (tmp_path / "songs").mkdir()
+        os.symlink(tmp_path / "secret.hb", tmp_path / "songs" / "link.hb")
+        song = write(tmp_path / "songs" / "song.hb", "(+link.hb)\n\n[Secret]\n\n")
+        with pytest.raises(IncludeError):
+            render_file(song)
@@ -0,0 +1,107 @@
+"""Tests for the layout IR and emitters."""
+
+import json
+
+import pytest
+from hibiki import HibikiParser, HibikiRenderer, render_formats
+from hibiki.emitters import Emitter, EMITTERS, emit, register_emitter
+from hibiki.layout import layout_stanzas
+
+
+SONG = """Refrain(=ref)
+
+[Verse 1]
+{E}  Just a {B}small town girl, {C#m} livin' in a {A}lonely world
+{C}{NC}hello
+Ending with {C}
+{C}{F}{G}
+
+[Chorus] (x2)
+No e{A#}scape from <reality> (*ref)
+
+[Verse 1]
+
+"""
+
+
+class TestLayout:
+    """Tests for computing layouts."""
+
+    def test_segments_have_columns(self):
+        """Test that segments record where their chord and lyrics start."""
+        layout = HibikiRenderer().layout("[Verse]\n{C}I like {F}potatoes\n\n")
+        segments = layout.stanzas[0].lines[0].segments
+        assert [(s.chord.symbol, s.lyric, s.column) for s in segments] == [("C", "I like ", 0), ("F", "potatoes", 7)]
+
+    def test_lyrics_before_first_chord(self):
+        """Test that lyrics before the first chord have no chord."""
+        layout = HibikiRenderer().layout("[Verse]\nNo e{A#}scape\n\n")
+        segments = layout.stanzas[0].lines[0].segments
+        assert segments[0].chord is None
+        assert segments[0].lyric == "No e"
+        assert segments[1].column == 4
+
+    def test_repeats_share_layouts(self):
+        """Test that repeated stanzas are only laid out once."""
+        layout = layout_stanzas(HibikiParser().parse(SONG))
+        assert layout.stanzas[1] is layout.stanzas[2]
+
+
+class TestEmitters:
+    """Tests for writing layouts in different formats."""
+
+    def test_text_matches_renderer(self):
+        """Test that the text emitter matches the renderer exactly."""
+        for breaks in (0, 1, 2):
+            renderer = HibikiRenderer(breaks_between_sections=breaks)
+            assert renderer.render_formats(SONG, ["text"])["text"] == renderer.render(SONG)
+
+    def test_several_formats_at_once(self):
+        """Test that one call produces every requested format."""
+        out = render_formats(SONG, ["text", "html", "json", "chordpro"])
+        assert set(out) == {"text", "html", "json", "chordpro"}
+
+    def test_json(self):
+        data = json.loads(render_formats("[Verse]\nNo e{A#m_}scape\n\n", ["json"])["json"])
+        segments = data["stanzas"][0]["lines"][0]["segments"]
+        assert segments[0] == {"chord": None, "note": None, "lyric": "No e", "column": 0}
+        assert segments[1] == {"chord": "A#m_", "note": "A#m", "lyric": "scape", "column": 4}
+
+    def test_html_is_escaped(self):
+        html = render_formats(SONG, ["html"])["html"]
+        assert "&lt;reality&gt;" in html
+        assert '<span class="chord">A#</span>' in html
+
+    def test_chordpro(self):
+        chordpro = render_formats("[Verse]\n{C}Hello {G}world\n\n", ["chordpro"])["chordpro"]
+        assert chordpro == "{comment: Verse}\n[C]Hello [G]world\n\n"
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            render_formats(SONG, ["pdf"])
+
+    def test_emitter_without_output(self):
+        """Test that an emitter implementing neither write nor emit says so."""
+        class Nothing(Emitter):
+            name = "nothing"
+
+        layout = HibikiRenderer().layout("[Verse]\n{C}Hello\n\n")
+        with pytest.raises(NotImplementedError):
+            Nothing().emit(layout)
+        with pytest.raises(NotImplementedError):
+            emit(layout, [Nothing()])
+
+    def test_custom_emitter(self):
+        """Test registering a custom emitter."""
+        class ChordsOnly(Emitter):
+            name = "chords-only"
+
+            def emit(self, layout):
+                return " ".join(c.symbol for s in layout.stanzas for l in s.lines for c in l.chords)
+
+        register_emitter(ChordsOnly)
+        try:
+            layout = HibikiRenderer().layout("[Verse]\n{C}Hello {G}world\n\n")
+            assert emit(layout, ["chords-only"]) == {"chords-only": "C G"}
+        finally:
+            del EMITTERS["chords-only"]
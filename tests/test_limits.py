@@ -0,0 +1,141 @@
+"""Tests for resource limits on untrusted input."""
+
+import time
+
+import pytest
+from hibiki import Emitter, HibikiParser, HibikiRenderer, Limits, ResourceLimitExceeded, RecallTooLarge, render_file
+from hibiki.limits import MAX_EXPANDED_SIZE, MAX_RECALL_SIZE, Budget
+
+
+SONG = "[Verse]\n{C}One\n{G}Two\n\n[Chorus] (x3)\n{Am}La\n\n[Verse]\n\n"
+
+
+class TestLimits:
+    """Tests for each limit."""
+
+    def test_no_limits_by_default(self):
+        stanzas = HibikiParser().parse("[Chorus] (x500)\nLa\n\n")
+        assert len(stanzas) == 500
+
+    def test_max_stanzas_parser(self):
+        HibikiParser(limits=Limits(max_stanzas=5)).parse(SONG)
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            HibikiParser(limits=Limits(max_stanzas=4)).parse(SONG)
+        assert exc_info.value.limit == "max_stanzas"
+        assert exc_info.value.maximum == 4
+
+    def test_huge_repeat_stops_early(self):
+        """Test that a huge repeat count fails without building the whole list."""
+        start = time.monotonic()
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiParser(limits=Limits(max_stanzas=100)).parse("[Chorus] (x999999999)\nLa\n\n")
+        assert time.monotonic() - start < 1
+
+    def test_max_lines_parser(self):
+        # 2 + 1 * 3 + 2
+        HibikiParser(limits=Limits(max_lines=7)).parse(SONG)
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            HibikiParser(limits=Limits(max_lines=6)).parse(SONG)
+        assert exc_info.value.limit == "max_lines"
+
+    def test_max_lines_counts_multipliers(self):
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiParser(limits=Limits(max_lines=8)).parse("[Verse]\nLa (x9)\n\n")
+
+    def test_renderer_checks_parsed_stanzas(self):
+        """Test that stanzas parsed without limits are still held to the renderer's."""
+        stanzas = HibikiParser().parse(SONG)
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiRenderer(limits=Limits(max_stanzas=4)).render(stanzas)
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiRenderer(limits=Limits(max_lines=6)).layout(stanzas)
+
+    def test_max_output_bytes(self):
+        output = HibikiRenderer().render(SONG)
+        size = len(output.encode("utf-8"))
+        assert HibikiRenderer(limits=Limits(max_output_bytes=size)).render(SONG) == output
+
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            HibikiRenderer(limits=Limits(max_output_bytes=size - 1)).render(SONG)
+        assert exc_info.value.limit == "max_output_bytes"
+
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiRenderer(limits=Limits(max_output_bytes=size - 1)).render_formats(SONG, ["text"])
+
+    def test_max_output_bytes_while_emitting(self):
+        """Test that emitters stop writing as soon as the output is too large."""
+        written = []
+
+        class Endless(Emitter):
+            name = "endless"
+
+            def write(self, layout):
+                for i in range(1000):
+                    written.append(i)
+                    yield "x" * 100
+
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiRenderer(limits=Limits(max_output_bytes=1000)).render_formats(SONG, [Endless()])
+        assert len(written) == 11
+
+    def test_render_file(self, tmp_path):
+        """Test that files are parsed with the renderer's limits."""
+        class Limited(HibikiRenderer):
+            def __init__(self):
+                super().__init__(limits=Limits(max_expanded_size=10))
+
+        path = tmp_path / "song.hb"
+        path.write_text(SONG)
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            render_file(str(path), Limited)
+        assert exc_info.value.limit == "max_expanded_size"
+
+    def test_max_output_bytes_counts_expanded_source(self):
+        text = "a" * 100 + "(=a)\n" + "".join(f"(*a)(*a)(=a)\n" for _ in range(5)) + "\n"
+        HibikiParser(limits=Limits(max_output_bytes=10000)).parse(text)
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiParser(limits=Limits(max_output_bytes=5000)).parse(text)
+
+    def test_time_budget(self):
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            HibikiRenderer(limits=Limits(time_budget=0)).render(SONG)
+        assert exc_info.value.limit == "time_budget"
+
+    @pytest.mark.parametrize("method", ["render", "layout"])
+    def test_time_checked_per_line(self, monkeypatch, method):
+        """Test that the clock is checked within a stanza, not just between them."""
+        stanzas = HibikiParser().parse("[Verse]\n" + "{C}La\n" * 50 + "\n")
+        checks = []
+        monkeypatch.setattr(Budget, "check_time", lambda self: checks.append(self))
+        getattr(HibikiRenderer(limits=Limits(time_budget=60)), method)(stanzas)
+        assert len(checks) >= 50
+
+    def test_recall_size_is_a_resource_limit(self):
+        text = "aaaa(=a)\n(*a)(*a)(*a)(=b)\n\n"
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            HibikiRenderer(limits=Limits(max_recall_size=10)).render(text)
+        assert isinstance(exc_info.value, RecallTooLarge)
+        assert exc_info.value.limit == "max_recall_size"
+        assert exc_info.value.maximum == 10
+
+    def test_max_expanded_size_by_default(self):
+        """Test that many lines each recalling a large line can't add up without limit."""
+        line = "a" * (MAX_RECALL_SIZE - 10)
+        text = f"{line}(=big)\n\n[Verse]\n" + "(*big)\n" * (MAX_EXPANDED_SIZE // len(line) + 10) + "\n"
+        parser = HibikiParser()
+        with pytest.raises(ResourceLimitExceeded) as exc_info:
+            parser.parse(text)
+        assert exc_info.value.limit == "max_expanded_size"
+        # Stopped at the line which went over, before building it.
+        assert MAX_EXPANDED_SIZE < parser.budget.expanded <= MAX_EXPANDED_SIZE + len(line) + 1
+
+    def test_max_expanded_size(self):
+        text = "a" * 100 + "(=a)\n\n[Verse]\n" + "(*a)\n" * 10 + "\n"
+        HibikiParser(limits=Limits(max_expanded_size=2000)).parse(text)
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiParser(limits=Limits(max_expanded_size=500)).parse(text)
+        HibikiParser(limits=Limits(max_expanded_size=None)).parse(text.replace("(*a)\n", "(*a)\n" * 10))
+
+    def test_within_limits_matches_unlimited(self):
+        limits = Limits(max_stanzas=100, max_lines=100, max_output_bytes=1 << 20, time_budget=60)
+        assert HibikiRenderer(limits=limits).render(SONG) == HibikiRenderer().render(SONG)
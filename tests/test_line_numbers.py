@@ -1,7 +1,8 @@
 """Tests for line number accuracy in error reporting and parsed stanzas."""
 
 import pytest
-from hibiki import HibikiParser
+from hibiki import HibikiParser, SpanStanza, Stanza
+from hibiki.source import SourceIndex
 from hibiki.errors import (
     ChordSyntaxError,
     EmptyStanza,
@@ -271,3 +272,16 @@ class TestParsedStanzaLineNumbers:
         # Second line appears twice due to (x2) but both instances have same line_num
         assert stanzas[0].lines[1].line_num == 3
         assert stanzas[0].lines[2].line_num == 3
+
+    @pytest.mark.parametrize("compact", [False, True])
+    def test_blank_lines_within_stanza(self, compact):
+        """Test that blank lines within a stanza's text don't shift the lines after them."""
+        text = "[Verse]\nLine one\n\nLine two\n"
+        source = SourceIndex(text)
+        if compact:
+            stanza = SpanStanza("Verse", text, text.index("\n") + 1, len(text), 1, offset=0, source=source)
+        else:
+            stanza = Stanza("Verse", text, 1, offset=0, source=source)
+
+        assert [line.line_num for line in stanza.lines] == [2, 4]
+        assert [text[line.offset:].split("\n")[0] for line in stanza.lines] == ["Line one", "Line two"]
@@ -0,0 +1,159 @@
+"""Tests for the Hibiki language server."""
+
+import io
+
+from hibiki.lsp import HibikiLanguageServer, read_message, write_message
+
+
+URI = "file:///song.hb"
+
+
+def open_document(server, text):
+    return server.handle({
+        "jsonrpc": "2.0",
+        "method": "textDocument/didOpen",
+        "params": {"textDocument": {"uri": URI, "languageId": "hibiki", "version": 1, "text": text}},
+    })
+
+
+class TestLanguageServer:
+    """Tests for handling LSP messages."""
+
+    def test_initialize_advertises_incremental_sync(self):
+        """Test that the server asks for incremental document sync."""
+        server = HibikiLanguageServer()
+        response = server.handle({"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}})
+        assert response[0]["result"]["capabilities"]["textDocumentSync"]["change"] == 2
+
+    def test_did_open_publishes_diagnostics(self):
+        """Test that opening a document publishes its diagnostics."""
+        server = HibikiLanguageServer()
+        out = open_document(server, "[Verse]\nUses (*missing)\n\n")
+        diagnostics = out[0]["params"]["diagnostics"]
+        assert len(diagnostics) == 1
+        assert diagnostics[0]["code"] == "UndefinedRecall"
+        assert diagnostics[0]["range"]["start"] == {"line": 1, "character": 5}
+
+    def test_incremental_change(self):
+        """Test that an incremental edit is applied and revalidated."""
+        server = HibikiLanguageServer()
+        open_document(server, "[Verse]\n{C}Hello\n\n[Chorus]\nWorld\n\n")
+        out = server.handle({
+            "jsonrpc": "2.0",
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": URI, "version": 2},
+                "contentChanges": [{
+                    "range": {"start": {"line": 1, "character": 2}, "end": {"line": 1, "character": 3}},
+                    "text": "",
+                }],
+            },
+        })
+        document = server.documents[URI]
+        assert document.text == "[Verse]\n{CHello\n\n[Chorus]\nWorld\n\n"
+        assert document.validator.revalidated == 1
+        assert out[0]["params"]["diagnostics"][0]["code"] == "ChordSyntaxError"
+
+    def test_hover_previews_stanza(self):
+        """Test that hovering over a stanza shows its rendered output."""
+        server = HibikiLanguageServer()
+        open_document(server, "[Verse]\n{C}Hello {G}world\n\n")
+        response = server.handle({
+            "jsonrpc": "2.0", "id": 2, "method": "textDocument/hover",
+            "params": {"textDocument": {"uri": URI}, "position": {"line": 1, "character": 0}},
+        })
+        value = response[0]["result"]["contents"]["value"]
+        assert "C     G" in value
+        assert "Hello world" in value
+
+    def test_document_symbols(self):
+        """Test that stanza headings are reported as symbols."""
+        server = HibikiLanguageServer()
+        open_document(server, "[Verse]\nHello\nWorld\n\n[Chorus] (x2)\nLa\n\n")
+        response = server.handle({
+            "jsonrpc": "2.0", "id": 3, "method": "textDocument/documentSymbol",
+            "params": {"textDocument": {"uri": URI}},
+        })
+        symbols = response[0]["result"]
+        assert [s["name"] for s in symbols] == ["Verse", "Chorus"]
+        assert symbols[0]["range"]["end"]["line"] == 2
+        assert symbols[1]["detail"] == "x2"
+
+    def test_repeat_count_on_next_line(self):
+        """Test that symbols follow the stanzas the parser finds, and a repeat count can be on its own line."""
+        server = HibikiLanguageServer()
+        open_document(server, "[Verse]\n{C}la\n\n[Chorus]\n(x2)\nLa\n\n")
+        response = server.handle({
+            "jsonrpc": "2.0", "id": 3, "method": "textDocument/documentSymbol",
+            "params": {"textDocument": {"uri": URI}},
+        })
+        symbols = response[0]["result"]
+        assert [(s["name"], s.get("detail")) for s in symbols] == [("Verse", ""), ("Chorus", "x2")]
+        assert symbols[1]["range"]["start"]["line"] == 3
+        assert symbols[1]["range"]["end"]["line"] == 5
+
+    def test_source_index_reused(self):
+        """Test that positions in the same version of a document share one index."""
+        server = HibikiLanguageServer()
+        open_document(server, "[Verse]\n{C}Hello\n\n")
+        document = server.documents[URI]
+        index = document.index
+        assert document._offset({"line": 1, "character": 3}) == 11
+        assert document.index is index
+
+        document.apply_change({"range": {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 3}}, "text": ""})
+        assert document.text == "[Verse]\nHello\n\n"
+        assert document.index is not index
+        assert document.index.text is document.text
+
+    def test_unknown_request(self):
+        """Test that unknown requests get an error response."""
+        server = HibikiLanguageServer()
+        response = server.handle({"jsonrpc": "2.0", "id": 4, "method": "textDocument/rename", "params": {}})
+        assert response[0]["error"]["code"] == -32601
+
+
+class TestFraming:
+    """Tests for reading and writing framed messages."""
+
+    def test_serve_round_trip(self):
+        """Test a full session over streams."""
+        stdin = io.BytesIO()
+        for message in [
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+            {"jsonrpc": "2.0", "method": "initialized", "params": {}},
+            {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+            {"jsonrpc": "2.0", "method": "exit"},
+        ]:
+            write_message(stdin, message)
+        stdin.seek(0)
+
+        stdout = io.BytesIO()
+        assert HibikiLanguageServer().serve(stdin, stdout) == 0
+
+        stdout.seek(0)
+        assert read_message(stdout)["id"] == 1
+        assert read_message(stdout)["id"] == 2
+        assert read_message(stdout) is None
+
+    def test_errors_dont_stop_the_server(self):
+        """Test that a message which can't be handled gets an error, and the server carries on."""
+        stdin = io.BytesIO()
+        for message in [
+            {"jsonrpc": "2.0", "id": 1, "method": "textDocument/hover", "params": {}},
+            {"jsonrpc": "2.0", "method": "textDocument/didOpen", "params": {}},
+            {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+            {"jsonrpc": "2.0", "method": "exit"},
+        ]:
+            write_message(stdin, message)
+        stdin.seek(0)
+
+        stdout = io.BytesIO()
+        assert HibikiLanguageServer().serve(stdin, stdout) == 0
+
+        stdout.seek(0)
+        response = read_message(stdout)
+        assert (response["id"], response["error"]["code"]) == (1, -32603)
+        log = read_message(stdout)
+        assert log["method"] == "window/logMessage" and "didOpen" in log["params"]["message"]
+        assert read_message(stdout) == {"jsonrpc": "2.0", "id": 2, "result": None}
@@ -0,0 +1,43 @@
+"""Tests holding parsing and rendering to their memory budgets."""
+
+import platform
+import sys
+import tracemalloc
+
+import pytest
+from tests.memory_budgets import load_budgets, scenarios
+
+
+BUDGETS = load_budgets()
+
+
+def python_matches():
+    # Objects are different sizes in other versions and implementations.
+    recorded = BUDGETS["python"].split(".")[:2]
+    return platform.python_implementation() == "CPython" and platform.python_version_tuple()[:2] == tuple(recorded)
+
+
+@pytest.mark.skipif(not python_matches(), reason=f"Budgets were recorded on CPython {BUDGETS['python']}.")
+@pytest.mark.skipif(tracemalloc.is_tracing(), reason="tracemalloc is already tracing.")
+class TestMemoryBudgets:
+    """Test that parsing and rendering stay within their memory budgets."""
+    @pytest.mark.parametrize("scenario", scenarios(), ids=lambda scenario: scenario.name)
+    def test_within_budget(self, scenario):
+        """Test each measurement against its budget, plus the tolerance."""
+        budget = BUDGETS["scenarios"][scenario.name]
+        tolerance = BUDGETS["tolerance"]
+        measured = scenario.measure()
+
+        over = {
+            metric: f"{value:.1f} per KB, budget {budget[metric]:.1f}"
+            for metric, value in measured.items()
+            if value > budget[metric] * (1 + tolerance)
+        }
+        assert not over, (
+            f"'{scenario.name}' is over its memory budget: {over}. If this is intentional, "
+            f"regenerate the budgets with `{sys.executable} -m tests.memory_budgets --update`."
+        )
+
+    def test_every_scenario_has_a_budget(self):
+        """Test that the budgets haven't fallen behind the scenarios."""
+        assert sorted(scenario.name for scenario in scenarios()) == sorted(BUDGETS["scenarios"])
@@ -0,0 +1,106 @@
+"""Tests for outlines and rendering single stanzas."""
+
+import pytest
+from hibiki import HibikiRenderer, UndefinedRecall, outline, render, render_stanza, render_range
+
+
+SRC = """intro (=i)
+
+[Verse]
+{C}Hello (*i) (=v)
+{F}there
+
+[Chorus] (x2)
+{G}La (*v)
+
+[Verse]
+
+[Bridge]
+{Am}Bridge
+"""
+
+
+class TestOutline:
+    """Tests for outlining source."""
+
+    def test_entries(self):
+        """Test that every stanza is listed as it's written."""
+        doc = outline(SRC)
+        assert doc.headings == ["Verse", "Chorus", "Verse", "Bridge"]
+        assert [entry.line for entry in doc] == [3, 7, 10, 12]
+        assert [entry.end_line for entry in doc] == [5, 8, 10, 13]
+        assert doc[1].repeat_count == 2
+
+    def test_spans(self):
+        """Test that spans cover the stanza in the source."""
+        doc = outline(SRC)
+        start, end = doc[0].span
+        assert SRC[start:end] == "[Verse]\n{C}Hello (*i) (=v)\n{F}there"
+
+    def test_recall_dependencies(self):
+        """Test that recalls and heading recalls are recorded."""
+        doc = outline(SRC)
+        assert doc[0].recalls == ["i"]
+        assert doc[1].recalls == ["v"]
+        assert doc[2].is_recall
+        assert doc[2].definition == 0
+        assert doc[3].definition is None
+
+    def test_find(self):
+        """Test finding stanzas by name."""
+        doc = outline(SRC)
+        assert doc.find("Verse") == 0
+        assert doc.find("Bridge") == 3
+        with pytest.raises(KeyError):
+            doc.find("Outro")
+
+    def test_dependencies_follow_recall_chains(self):
+        """Test that the lines a recall was built from are needed too."""
+        doc = outline(SRC)
+        assert doc.dependencies([1]) == {1, 4, 7, 8}
+        assert doc.dependencies([3]) == {12, 13}
+
+
+class TestRenderStanza:
+    """Tests for rendering parts of a document."""
+
+    def test_stanzas_add_up_to_full_render(self):
+        """Test that rendering each stanza separately matches rendering them all."""
+        doc = outline(SRC)
+        assert "".join(render_stanza(doc, i) for i in range(len(doc))) == render(SRC)
+
+    def test_render_by_name(self):
+        """Test rendering a stanza by its name, repeats included."""
+        assert render_stanza(SRC, "Chorus") == "[Chorus]\nG  C\nLa Hello intro\n\n\n" * 2
+
+    def test_heading_recall_leaves_out_definition(self):
+        """Test that a recalled stanza renders without the stanza it recalls."""
+        assert render_stanza(SRC, 2) == render_stanza(SRC, 0)
+
+    def test_range(self):
+        """Test rendering a run of stanzas."""
+        doc = outline(SRC)
+        assert render_range(doc, 1, 3) == render_stanza(doc, 1) + render_stanza(doc, 2)
+        assert render_range(doc, 0, len(doc)) == render(SRC)
+        assert render_range(doc, 2, 2) == ""
+
+    def test_uses_renderer_options(self):
+        """Test that the renderer's options apply."""
+        assert HibikiRenderer(transpose=2).render_stanza(SRC, "Bridge") == "[Bridge]\nBm\nBridge\n\n\n"
+
+    def test_bad_index(self):
+        """Test that stanzas which don't exist raise IndexError."""
+        with pytest.raises(IndexError):
+            render_stanza(SRC, 4)
+
+    def test_errors_keep_line_numbers(self):
+        """Test that errors in a stanza report its line in the full document."""
+        src = "[Verse]\nFine\n\n[Chorus]\nBad (*nope)\n"
+        with pytest.raises(UndefinedRecall) as e:
+            render_stanza(src, "Chorus")
+        assert "Line #5" in str(e.value)
+
+    def test_other_stanzas_not_parsed(self):
+        """Test that errors elsewhere in the document don't get in the way."""
+        src = "[Verse]\nBad (*nope)\n\n[Chorus]\nFine\n"
+        assert render_stanza(src, "Chorus") == "[Chorus]\n\nFine\n\n\n"
@@ -0,0 +1,91 @@
+"""Tests for profiling parsing and rendering."""
+
+import io
+import pstats
+import sys
+
+import pytest
+import hibiki
+from hibiki.__main__ import main
+from hibiki.profiling import collapse, profile
+
+
+SRC = "{C}Saved line (=hook)\n\n[Verse]\n{G}First (*hook)\n{Am}Second {F}line\n\n[Verse]\n\n"
+
+
+def read_collapsed(path):
+    stacks = {}
+    for line in path.read_text().splitlines():
+        stack, _, micros = line.rpartition(" ")
+        stacks[stack] = int(micros)
+    return stacks
+
+
+class TestProfile:
+    """Test the profiling context manager."""
+    def test_writes_files(self, tmp_path):
+        """Test that both the pstats and collapsed stacks are written."""
+        with profile(str(tmp_path / "song"), stream=io.StringIO()) as report:
+            hibiki.render(SRC)
+
+        stats = pstats.Stats(report.pstats_path)
+        assert stats.total_tt > 0
+        stacks = read_collapsed(tmp_path / "song.collapsed")
+        assert stacks and all(micros > 0 for micros in stacks.values())
+
+    def test_internals_are_named(self, tmp_path):
+        """Test that Hibiki's functions are named by module and qualified name."""
+        with profile(str(tmp_path / "song"), stream=io.StringIO()) as report:
+            hibiki.render(SRC)
+
+        names = {entry.name for entry in report.entries}
+        assert "hibiki.parser.HibikiParser._preprocess_recalls" in names
+        assert "hibiki.stanza.Line.split_chords_and_lyrics" in names
+        assert all(name.startswith("hibiki.") for name in names)
+
+        stacks = read_collapsed(tmp_path / "song.collapsed")
+        assert any(stack.endswith(";hibiki.stanza.Line.split_chords_and_lyrics") for stack in stacks)
+
+    def test_stacks_account_for_all_time(self, tmp_path):
+        """Test that the stacks add up to the time profiled."""
+        with profile(str(tmp_path / "song"), top=0) as report:
+            for _ in range(20):
+                hibiki.render(SRC)
+
+        labels = {func: repr(func) for func in report.stats.stats}
+        assert sum(collapse(report.stats, labels).values()) == pytest.approx(report.total_time, rel=0.01)
+
+    def test_summary(self, tmp_path):
+        """Test that a summary of the slowest functions is printed."""
+        stream = io.StringIO()
+        with profile(str(tmp_path / "song"), top=3, stream=stream):
+            hibiki.render(SRC)
+
+        lines = stream.getvalue().splitlines()
+        assert lines[0].startswith("Profiled") and str(tmp_path / "song.pstats") in lines[0]
+        assert len(lines) == 5
+
+
+class TestProfileCommand:
+    """Test `--profile` on the command line."""
+    def test_profile_flag(self, tmp_path, monkeypatch, capsys):
+        """Test that rendering with --profile still prints the song."""
+        song = tmp_path / "song.hb"
+        song.write_text(SRC)
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(sys, "argv", ["hibiki", str(song), "--profile"])
+
+        assert main() == 0
+        out, err = capsys.readouterr()
+        assert out == hibiki.render(SRC) + "\n"
+        assert "Profiled" in err
+        assert (tmp_path / "song.pstats").exists() and (tmp_path / "song.collapsed").exists()
+
+    def test_profile_path(self, tmp_path, monkeypatch, capsys):
+        """Test that the profile can be written elsewhere."""
+        song = tmp_path / "song.hb"
+        song.write_text(SRC)
+        monkeypatch.setattr(sys, "argv", ["hibiki", f"--profile={tmp_path / 'out'}", str(song)])
+
+        assert main() == 0
+        assert (tmp_path / "out.pstats").exists()
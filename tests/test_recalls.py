@@ -1,7 +1,8 @@
 """Tests for line recalls and phantom recalls."""
 
 import pytest
-from hibiki import HibikiParser, HibikiRenderer, UndefinedRecall
+from hibiki import HibikiParser, HibikiRenderer, UndefinedRecall, RecallCycle, RecallTooLarge
+from hibiki.limits import Limits
 
 
 class TestLineRecalls:
@@ -93,3 +94,46 @@ Recall: (*var)
         stanzas = parser.parse(text)
         # Should use the latest definition
         assert "Text 2" in stanzas[0].lines[0].text
+
+
+class TestNestedRecalls:
+    """Tests for recalls which contain other recalls."""
+
+    def test_nested_recall_expands(self):
+        """Test that a saved line's own recalls are substituted when it's recalled."""
+        text = "{C}Inner(=inner)\n{G}Outer (*inner)(=outer)\n\n[Verse]\n(*outer)\n\n"
+        stanzas = HibikiParser().parse(text)
+        assert stanzas[0].lines[0].text == "{G}Outer {C}Inner\n"
+
+    def test_deeply_nested_recalls(self):
+        """Test several levels of nesting."""
+        text = "a(=l0)\n" + "".join(f"(*l{i}) (*l{i})(=l{i + 1})\n" for i in range(5)) + "\n[Verse]\n(*l5)\n\n"
+        stanzas = HibikiParser().parse(text)
+        assert stanzas[0].lines[0].text == " ".join(["a"] * 32) + "\n"
+
+    def test_extending_a_recall(self):
+        """Test that a recall can be saved in terms of its previous value."""
+        text = "{C}One(=r)\n(*r) {G}two(=r)\n\n[Verse]\n(*r)\n\n"
+        stanzas = HibikiParser().parse(text)
+        assert stanzas[0].lines[0].text == "{C}One {G}two\n"
+
+    def test_self_reference_raises_error(self):
+        """Test that saving a recall in terms of itself, with no earlier value, raises RecallCycle."""
+        with pytest.raises(RecallCycle) as exc_info:
+            HibikiParser().parse("Loop (*r)(=r)\n\n[Verse]\n(*r)\n\n")
+        assert exc_info.value.line_no == 1
+
+    def test_exponential_expansion_is_limited(self):
+        """Test that doubling recalls stop at the size limit before being built."""
+        text = "aaaaaaaa(=l0)\n" + "".join(f"(*l{i})(*l{i})(=l{i + 1})\n" for i in range(64)) + "\n"
+        with pytest.raises(RecallTooLarge) as exc_info:
+            HibikiParser().parse(text)
+        assert exc_info.value.line_no == 15
+        assert exc_info.value.size == 8 * 2 ** 14
+
+    def test_configurable_limit(self):
+        """Test that the limit can be changed."""
+        text = "{C}Twelve chars(=r)\n\n[Verse]\n(*r) (*r)\n\n"
+        HibikiParser().parse(text)
+        with pytest.raises(RecallTooLarge):
+            HibikiParser(limits=Limits(max_recall_size=20)).parse(text)
@@ -1,6 +1,10 @@
 """Tests for output rendering and line rendering with chords."""
 
-from hibiki import HibikiParser, HibikiRenderer
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from hibiki import HibikiParser, HibikiRenderer, Limits, ResourceLimitExceeded, renderer
+from hibiki.errors import ChordSyntaxError
 
 
 class TestRendering:
@@ -83,3 +87,71 @@ class TestLineRendering:
         chord_line, lyric_line = line.render_split()
         # Should handle length difference
         assert len(chord_line) >= len(lyric_line.replace(" ", ""))
+
+
+class TestParallelRendering:
+    """Test rendering with worker processes."""
+    SRC = (
+        "{G}Saved line (=hook)\n\n"
+        "[Verse] (x2)\n{C}First {G}line\n{Am}Repeated (x2)\n(*hook) and more\n\n"
+        "[Chorus]\n{F}Sing {C}along\n\n"
+        "[Verse]\n\n"
+        "[Bridge]\n    {Dm7b5}Indented {E7}line\n\n"
+    )
+
+    @pytest.fixture(autouse=True)
+    def always_parallel(self, monkeypatch):
+        monkeypatch.setattr(renderer, "MIN_PARALLEL_LINES", 0)
+
+    @pytest.mark.parametrize("options", [{}, {"transpose": 3}, {"transpose": 5, "prefer_flats": True, "capo": 2}])
+    def test_identical_output(self, options):
+        """Test that rendering in parallel gives exactly the serial output."""
+        serial = HibikiRenderer(**options).render(self.SRC)
+        assert HibikiRenderer(jobs=2, **options).render(self.SRC) == serial
+
+    def test_source_map(self):
+        """Test that source maps are the same in parallel."""
+        serial = HibikiRenderer().render_with_source_map(self.SRC)
+        parallel = HibikiRenderer(jobs=2).render_with_source_map(self.SRC)
+        assert parallel[0] == serial[0]
+        assert parallel[1].spans == serial[1].spans
+
+    def test_errors_raised_in_order(self):
+        """Test that the first error in the document is the one raised."""
+        src = "[A]\n{C}fine\n{C}x {b{ad}\n\n[B]\n{D}x {q{q}\n\n"
+        with pytest.raises(ChordSyntaxError) as serial:
+            HibikiRenderer().render(src)
+        with pytest.raises(ChordSyntaxError) as parallel:
+            HibikiRenderer(jobs=2).render(src)
+        assert str(parallel.value) == str(serial.value)
+
+    @pytest.mark.parametrize("limits", [Limits(max_lines=9), Limits(max_output_bytes=100), Limits(time_budget=0)])
+    def test_limits(self, limits):
+        """Test that limits are hit exactly as they are serially."""
+        with pytest.raises(ResourceLimitExceeded) as serial:
+            HibikiRenderer(limits=limits).render(self.SRC)
+        with pytest.raises(ResourceLimitExceeded) as parallel:
+            HibikiRenderer(jobs=2, limits=limits).render(self.SRC)
+        assert str(parallel.value) == str(serial.value)
+
+    def test_stops_once_over_budget(self, monkeypatch):
+        """Test that no more work is handed out once a limit is hit."""
+        submitted = []
+
+        class Counting(ProcessPoolExecutor):
+            def submit(self, *args, **kwargs):
+                submitted.append(args)
+                return super().submit(*args, **kwargs)
+
+        monkeypatch.setattr(renderer, "ProcessPoolExecutor", Counting)
+        stanzas = HibikiParser().parse("".join(f"[S{i}]\n{{C}}Line {i}\n\n" for i in range(100)))
+        with pytest.raises(ResourceLimitExceeded):
+            HibikiRenderer(jobs=2, limits=Limits(max_lines=10)).render(stanzas)
+        # 100 lines split into 9 chunks, of which only the first 4 are handed out.
+        assert len(submitted) == 4
+
+    def test_small_documents_stay_serial(self, monkeypatch):
+        """Test that small documents don't start any workers."""
+        monkeypatch.setattr(renderer, "MIN_PARALLEL_LINES", 2000)
+        monkeypatch.setattr(renderer, "ProcessPoolExecutor", None)
+        assert HibikiRenderer(jobs=2).render(self.SRC) == HibikiRenderer().render(self.SRC)
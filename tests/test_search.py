@@ -0,0 +1,136 @@
+"""Tests for the chord and lyric search index."""
+
+import os
+
+import pytest
+from hibiki.include import clear_cache
+from hibiki.search import SearchIndex, normalize_chord
+
+
+SONGS = {
+    "one.hb": "[Verse]\n{F#m}Just a small town {Bm7}girl\n{D}Living in a lonely world\n\n",
+    "two.hb": "[Chorus] (x2)\n{Gbm}Midnight {A}train\n\n[Chorus]\n\n",
+    "sub/three.hb": "[Intro]\n{Bm7|}Going {E}anywhere (x2)\n\n",
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_libraries():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "songs"
+    for name, src in SONGS.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(src)
+    return root
+
+
+@pytest.fixture
+def index(tmp_path, corpus):
+    with SearchIndex(str(tmp_path / "songs.db")) as index:
+        index.update([str(corpus)], jobs=1)
+        yield index
+
+
+class TestNormalizeChord:
+    """Tests for normalizing chords."""
+
+    @pytest.mark.parametrize("text, expected", [
+        ("F#m", "F#m"),
+        ("Gbm", "F#m"),
+        ("Bb7/Ab", "A#7/G#"),
+        ("(Cadd9)", "Cadd9"),
+        ("Bm7|", "Bm7"),
+        ("E_", "E"),
+        ("N.C.", None),
+    ])
+    def test_normalize(self, text, expected):
+        assert normalize_chord(text) == expected
+
+
+class TestSearchIndex:
+    """Tests for indexing and searching songs."""
+
+    def test_find_chords(self, index, corpus):
+        """Test that songs must use every chord, enharmonics included."""
+        assert index.find_chords(["F#m", "Bm7"]) == [str(corpus / "one.hb")]
+        assert index.find_chords(["F#m"]) == [str(corpus / "one.hb"), str(corpus / "two.hb")]
+        assert index.find_chords(["Bm7"]) == [str(corpus / "one.hb"), str(corpus / "sub" / "three.hb")]
+        assert index.find_chords(["C"]) == []
+
+    def test_find_lyrics(self, index, corpus):
+        """Test that phrases are found line by line."""
+        hits = index.find_lyrics("lonely world")
+        assert [(hit.path, hit.stanza, hit.line, hit.text) for hit in hits] == [
+            (str(corpus / "one.hb"), "Verse", 3, "Living in a lonely world")
+        ]
+        assert index.find_lyrics("world lonely") == []
+
+    def test_recalls_indexed_once(self, index):
+        """Test that lines recalled by heading aren't indexed twice."""
+        assert len(index.find_lyrics("midnight")) == 1
+
+    def test_included_lines_indexed(self, index, corpus):
+        """Test that included lines aren't mistaken for song lines with the same number."""
+        (corpus / "lib.txt").write_text("[Chorus]\n{E}Shared chorus\n\n")
+        (corpus / "four.hb").write_text("[Verse]\n{C}Own verse\n\n(+lib.txt)\n\n[Chorus]\n\n")
+        index.update([str(corpus)], jobs=1)
+        assert [(hit.stanza, hit.line) for hit in index.find_lyrics("verse")] == [("Verse", 2)]
+        assert [(hit.stanza, hit.line) for hit in index.find_lyrics("shared chorus")] == [("Chorus", 2)]
+
+    def test_search(self, index, corpus):
+        """Test searching by chord and lyric together."""
+        assert index.search(["Bm7"], "anywhere") == [str(corpus / "sub" / "three.hb")]
+        assert index.search(["D"], "anywhere") == []
+
+    def test_unchanged_songs_skipped(self, index, corpus):
+        """Test that updating again only looks at what changed."""
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [] and update.unchanged == 3
+
+        # Touched but not changed.
+        os.utime(corpus / "one.hb", ns=(1, 1))
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [] and update.unchanged == 3
+
+    def test_changed_and_removed_songs(self, index, corpus):
+        """Test that changed songs are reindexed and removed ones dropped."""
+        (corpus / "one.hb").write_text("[Verse]\n{C}Something else entirely\n\n")
+        (corpus / "two.hb").unlink()
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [str(corpus / "one.hb")]
+        assert update.removed == [str(corpus / "two.hb")]
+        assert index.find_chords(["F#m"]) == []
+        assert index.find_lyrics("lonely") == []
+        assert index.find_chords(["C"]) == [str(corpus / "one.hb")]
+        assert len(index) == 2
+
+    def test_library_changes_reindex(self, index, corpus):
+        """Test that changing an included library reindexes songs using it."""
+        (corpus / "lib.txt").write_text("{Eb}Hook line (=hook)\n")
+        (corpus / "four.hb").write_text("(+lib.txt)\n\n[Verse]\n(*hook)\n\n")
+        index.update([str(corpus)], jobs=1)
+        assert index.find_chords(["D#"]) == [str(corpus / "four.hb")]
+
+        (corpus / "lib.txt").write_text("{Ab}Hook line changed (=hook)\n")
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [str(corpus / "four.hb")]
+        assert index.find_chords(["G#"]) == [str(corpus / "four.hb")]
+
+    def test_failures_reported(self, index, corpus):
+        """Test that songs with errors are reported, not indexed."""
+        (corpus / "bad.hb").write_text("[Verse]\n(*nope)\n\n")
+        update = index.update([str(corpus)], jobs=1)
+        assert [path for path, _ in update.failed] == [str(corpus / "bad.hb")]
+
+    def test_parallel_update(self, tmp_path, corpus):
+        """Test that songs can be read by worker processes."""
+        with SearchIndex(str(tmp_path / "parallel.db")) as index:
+            index.update([str(corpus)], jobs=2)
+            assert index.find_chords(["F#m", "Bm7"]) == [str(corpus / "one.hb")]
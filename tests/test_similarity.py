@@ -0,0 +1,177 @@
+"""Tests for near-duplicate song detection."""
+
+import pytest
+from hibiki.include import clear_cache
+from hibiki.similarity import SimilarityIndex, estimate_similarity, minhash, shingles, signature
+
+
+ORIGINAL = """[Verse]
+{G}Take me home, {D}country roads, to the {Em}place I be{C}long
+{G}West Virginia, {D}mountain mama, take me {C}home, country {G}roads
+
+[Chorus]
+{Em}All my memories {D}gather round her
+{C}Miner's lady, {G}stranger to blue water
+
+[Verse]
+
+"""
+
+# The same song a tone higher, with slightly different lyrics.
+ARRANGEMENT = """[Verse]
+{A}Take me home, {E}country roads, to the {F#m}place I be{D}long
+{A}West Virginia, {E}mountain mama, take me {D}home, country {A}roads
+
+[Chorus]
+{F#m}All my memories {E}gather round her
+{D}Miner's lady, {A}stranger to the blue water
+
+[Verse]
+
+"""
+
+UNRELATED = """[Verse]
+{Am}Is this the real {Bb}life, is this {F}just fantasy
+{Am7}Caught in a {Dm}landslide, {Gm}no escape from re{C7}ality
+
+"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_libraries():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "songs"
+    root.mkdir()
+    (root / "original.hb").write_text(ORIGINAL)
+    (root / "arrangement.hb").write_text(ARRANGEMENT)
+    (root / "unrelated.hb").write_text(UNRELATED)
+    return root
+
+
+@pytest.fixture
+def index(tmp_path, corpus):
+    with SimilarityIndex(str(tmp_path / "similar.db")) as index:
+        index.update([str(corpus)], jobs=1)
+        yield index
+
+
+class TestSignatures:
+    """Test shingling and MinHash signatures."""
+    def test_chords_are_transposition_invariant(self):
+        """Test that transposed progressions have the same chord shingles."""
+        assert shingles(ORIGINAL)[0] == shingles(ARRANGEMENT)[0]
+
+    def test_lyric_shingles(self):
+        """Test that lyrics are shingled into lowercase runs of words."""
+        _, lyrics = shingles("[Verse]\n{C}Hello, {G}Big world out there\n\n")
+        assert lyrics == {"hello big world", "big world out", "world out there"}
+
+    def test_recalled_stanzas_are_included(self):
+        """Test that heading recalls contribute their lines."""
+        chords, _ = shingles("[A]\n{C}x {G}y {Am}z {F}w\n\n[B]\n{D}q\n\n[A]\n\n")
+        assert len(chords) == 6
+
+    def test_short_songs(self):
+        """Test that songs shorter than a shingle still get one."""
+        chords, lyrics = shingles("[Verse]\n{C}Hi\n\n")
+        assert chords == {"?"} and lyrics == {"hi"}
+
+    def test_no_chord_breaks_progressions(self):
+        """Test that shingles don't run across an N.C."""
+        chords, _ = shingles("[Verse]\n{C}a {G}b {N.C.}c {Am}d {F}e {C}f {G}g\n\n")
+        assert chords == {"?m 8 7 7"}
+
+    def test_estimates(self):
+        """Test that estimates track the overlap of the sets."""
+        first = minhash(str(i) for i in range(100))
+        second = minhash(str(i) for i in range(50, 150))
+        assert estimate_similarity(first, first) == 1.0
+        assert 0.15 < estimate_similarity(first, second) < 0.55
+        assert estimate_similarity(first, minhash([])) == 0.0
+
+    def test_signature(self):
+        """Test that songs without lyrics have no lyric signature."""
+        sig = signature("[Intro]\n{C}{G}{Am}{F}\n\n")
+        assert sig.chords is not None and sig.lyrics is None
+
+
+class TestSimilarityIndex:
+    """Test the persistent similarity index."""
+    def test_similar(self, index, corpus):
+        """Test finding songs similar to an indexed song."""
+        matches = index.similar(str(corpus / "original.hb"))
+        assert [match.path for match in matches] == [str(corpus / "arrangement.hb")]
+        assert matches[0].chords == 1.0
+        assert 0.5 < matches[0].lyrics < 1.0
+
+    def test_similar_unindexed(self, index, corpus, tmp_path):
+        """Test finding songs similar to a song outside of the index."""
+        path = tmp_path / "new.hb"
+        path.write_text(ORIGINAL)
+        matches = index.similar(str(path), threshold=0.9)
+        assert sorted(match.path for match in matches) == [str(corpus / "arrangement.hb"), str(corpus / "original.hb")]
+
+    def test_unrelated(self, index, corpus):
+        """Test that unrelated songs aren't matched."""
+        assert index.similar(str(corpus / "unrelated.hb")) == []
+
+    def test_duplicates(self, index, corpus):
+        """Test finding every pair of similar songs."""
+        pairs = index.duplicates()
+        assert [sorted((first, match.path)) for first, match in pairs] == [
+            [str(corpus / "arrangement.hb"), str(corpus / "original.hb")]
+        ]
+
+    def test_incremental_update(self, index, corpus):
+        """Test that only changed songs are reindexed."""
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [] and update.unchanged == 3
+
+        (corpus / "unrelated.hb").write_text(ARRANGEMENT)
+        (corpus / "arrangement.hb").unlink()
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [str(corpus / "unrelated.hb")]
+        assert update.removed == [str(corpus / "arrangement.hb")]
+        assert [match.path for match in index.similar(str(corpus / "original.hb"))] == [str(corpus / "unrelated.hb")]
+        assert len(index) == 2
+
+    def test_parameters_persist(self, index):
+        """Test that an existing index keeps its parameters."""
+        with SimilarityIndex(index.path, num_perm=64, bands=8) as reopened:
+            assert (reopened.num_perm, reopened.bands) == (index.num_perm, index.bands)
+
+    def test_bad_parameters(self, tmp_path):
+        """Test that signatures have to split evenly into bands."""
+        with pytest.raises(ValueError):
+            SimilarityIndex(str(tmp_path / "bad.db"), num_perm=100, bands=32)
+
+    def test_failures_reported(self, index, corpus):
+        """Test that songs with errors are reported, not indexed."""
+        (corpus / "bad.hb").write_text("[Verse]\n(*nope)\n\n")
+        update = index.update([str(corpus)], jobs=1)
+        assert [path for path, _ in update.failed] == [str(corpus / "bad.hb")]
+        assert len(index) == 3
+
+    def test_failures_not_read_again(self, index, corpus):
+        """Test that a song which failed isn't read again until it changes."""
+        (corpus / "bad.hb").write_text("[Verse]\n(*nope)\n\n")
+        index.update([str(corpus)], jobs=1)
+        update = index.update([str(corpus)], jobs=1)
+        assert update.failed == [] and update.indexed == [] and update.unchanged == 4
+
+        (corpus / "bad.hb").write_text("[Verse]\n{C}Fixed\n\n")
+        update = index.update([str(corpus)], jobs=1)
+        assert update.indexed == [str(corpus / "bad.hb")]
+        assert len(index) == 4
+
+    def test_parallel_update(self, tmp_path, corpus):
+        """Test that signatures can be worked out by worker processes."""
+        with SimilarityIndex(str(tmp_path / "parallel.db")) as index:
+            index.update([str(corpus)], jobs=2)
+            assert len(index.duplicates()) == 1
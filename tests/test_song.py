@@ -0,0 +1,122 @@
+"""Tests for the Song document model."""
+
+import pytest
+from hibiki import HibikiParser, HibikiRenderer, Song, render
+from hibiki.include import clear_cache
+
+
+SRC = """Hook line (=hook)
+
+[Verse]
+{C}One (*hook)
+
+[Chorus] (x2)
+{G}La la
+
+[Verse]
+
+[Chorus]
+
+"""
+
+
+def parse_song(text, **kwargs):
+    return HibikiParser(**kwargs).parse_song(text)
+
+
+class TestSong:
+    """Test the structure of parsed songs."""
+    def test_stanzas_in_order(self):
+        """Test that a song holds its stanzas in the order they're rendered."""
+        song = parse_song(SRC)
+        assert [stanza.heading for stanza in song] == ["Verse", "Chorus", "Chorus", "Verse", "Chorus"]
+        assert len(song) == 5
+        assert song[3].heading == "Verse"
+
+    def test_definitions(self):
+        """Test that headings map to their definitions."""
+        song = parse_song(SRC)
+        assert song.headings == ("Verse", "Chorus")
+        assert "Chorus" in song and "Bridge" not in song
+        assert song["Chorus"] is song[1]
+        assert song["Chorus"].lines[0].text == "{G}La la\n"
+        with pytest.raises(KeyError):
+            song["Bridge"]
+
+    def test_occurrences(self):
+        """Test that occurrences record what's a definition, repeat or recall of what."""
+        song = parse_song(SRC)
+        assert [(o.kind, o.heading, o.line) for o in song.occurrences] == [
+            ("definition", "Verse", 3),
+            ("definition", "Chorus", 6),
+            ("repeat", "Chorus", 6),
+            ("recall", "Verse", 9),
+            ("recall", "Chorus", 11),
+        ]
+        assert all(o.definition is song[o.heading] for o in song.occurrences)
+        assert [o.index for o in song.occurrences_of("Chorus")] == [1, 2, 4]
+        assert song.occurrences_of("Bridge") == ()
+
+    def test_included_definitions(self, tmp_path):
+        """Test that stanzas recalled from libraries are found by heading."""
+        clear_cache()
+        (tmp_path / "lib.hb").write_text("[Chorus]\n{G}From the library\n\n")
+        song_path = tmp_path / "song.hb"
+        song = parse_song("(+lib.hb)\n\n[Chorus] (x2)\n\n", path=str(song_path))
+        assert [o.kind for o in song.occurrences] == ["recall", "repeat"]
+        assert song["Chorus"].lines[0].text == "{G}From the library\n"
+        clear_cache()
+
+    def test_immutable(self):
+        """Test that songs and occurrences can't be changed."""
+        song = parse_song(SRC)
+        with pytest.raises(AttributeError):
+            song.stanzas = ()
+        with pytest.raises(AttributeError):
+            del song.fingerprint
+        with pytest.raises(TypeError):
+            song.definitions["Verse"] = song[0]
+        with pytest.raises(AttributeError):
+            song.occurrences[0].kind = "recall"
+
+    def test_render(self):
+        """Test that songs render the same as their source."""
+        song = parse_song(SRC)
+        renderer = HibikiRenderer()
+        assert renderer.render(song) == render(SRC)
+        assert renderer.render_formats(song, ["text"])["text"] == render(SRC)
+
+
+class TestFingerprint:
+    """Test comparing and hashing songs."""
+    def test_same_content(self):
+        """Test that songs with the same content are equal, wherever they're written."""
+        first, second = parse_song(SRC), parse_song("\n\n" + SRC)
+        assert first == second
+        assert hash(first) == hash(second)
+        assert {first: "cached"}[second] == "cached"
+
+    def test_stable(self):
+        """Test that the fingerprint is the same from one process to the next."""
+        assert parse_song("[Verse]\n{C}Hello\n\n").fingerprint == "1b6301acf87d04a94962297472ec8a90"
+
+    def test_compact(self):
+        """Test that compact parsing makes the same song."""
+        assert parse_song(SRC, compact=True) == parse_song(SRC)
+
+    @pytest.mark.parametrize("changed", [
+        SRC.replace("La la", "La da"),
+        SRC.replace("(x2)", "(x3)"),
+        SRC.replace("[Verse]\n\n[Chorus]\n\n", "[Chorus]\n\n[Verse]\n\n"),
+        SRC.replace("Hook line", "Other hook"),
+        SRC + "[Bridge]\n{D}New\n\n",
+    ])
+    def test_different_content(self, changed):
+        """Test that any change to what's rendered changes the fingerprint."""
+        assert parse_song(changed) != parse_song(SRC)
+
+    def test_not_equal_to_lists(self):
+        """Test that songs are only equal to other songs."""
+        song = parse_song(SRC)
+        assert song != list(song)
+        assert Song(list(song)) == song
@@ -0,0 +1,87 @@
+"""Tests for offset-indexed source positions and source maps."""
+
+import pytest
+from hibiki import HibikiParser, HibikiRenderer
+from hibiki.errors import ChordSyntaxError
+from hibiki.source import SourceIndex
+
+
+class TestSourceIndex:
+    """Tests for looking up positions from offsets."""
+
+    def test_line_of(self):
+        index = SourceIndex("ab\ncde\n\nf")
+        assert [index.line_of(i) for i in range(9)] == [1, 1, 1, 2, 2, 2, 2, 3, 4]
+
+    def test_position(self):
+        index = SourceIndex("ab\ncde\n")
+        assert index.position(4) == (2, 2)
+
+    def test_line_span(self):
+        index = SourceIndex("ab\ncde\nf")
+        assert index.line_span(2) == (3, 6)
+        assert index.line_span(3) == (7, 8)
+        assert len(index) == 3
+
+
+class TestNodePositions:
+    """Tests that parsed stanzas and lines know where they came from."""
+
+    def test_stanza_and_line_offsets(self):
+        text = "[Verse 1]\nLine A\n\n[Verse 2]\n{C}Line B\nLine C\n\n"
+        stanzas = HibikiParser().parse(text)
+        assert stanzas[1].offset == text.index("[Verse 2]")
+        assert stanzas[1].lines[1].offset == text.index("Line C")
+        start, end = stanzas[1].lines[0].span
+        assert text[start:end] == "{C}Line B"
+        start, end = stanzas[1].span
+        assert text[start:end] == "[Verse 2]\n{C}Line B\nLine C"
+
+    def test_offsets_point_at_original_source(self):
+        """Test that offsets refer to the source, not the recall-substituted text."""
+        text = "A long recalled line(=x)\n\n[Verse]\n(*x)\nAfter\n\n"
+        stanzas = HibikiParser().parse(text)
+        assert stanzas[0].lines[1].offset == text.index("After")
+
+
+class TestErrorPositions:
+    """Tests that errors report positions worked out from offsets."""
+
+    def test_lexer_line_numbers_do_not_drift(self):
+        """Test that parsing repeatedly doesn't skew line numbers."""
+        for _ in range(3):
+            with pytest.raises(ChordSyntaxError) as exc_info:
+                HibikiParser().parse("[Verse]\nFine\nBad {}\n\n")
+            assert str(exc_info.value) == "Line #3, Syntax Error in 'Verse': Illegal character '{' in column 5"
+
+    def test_stray_bracket(self):
+        with pytest.raises(SyntaxError) as exc_info:
+            HibikiParser().parse("[Verse]\nFine\nBad ] bracket\n\n")
+        assert "Line #3" in str(exc_info.value)
+
+
+class TestSourceMap:
+    """Tests for mapping rendered output back to the source."""
+
+    def test_output_lines_map_to_source(self):
+        text = "[Verse]\n{C}Hello\nWorld\n\n"
+        output, source_map = HibikiRenderer().render_with_source_map(text)
+        lines = output.split("\n")
+        assert lines[1] == "C"
+        assert source_map.position_of(1) == (1, 1)
+        assert source_map.position_of(2) == (2, 1)
+        assert source_map.position_of(3) == (2, 1)
+        assert source_map.position_of(5) == (3, 1)
+        assert source_map.span_of(6) is None
+
+    def test_output_matches_render(self):
+        text = "[Verse]\n{C}Hello\n\n[Verse]\n\n"
+        output, source_map = HibikiRenderer().render_with_source_map(text)
+        assert output == HibikiRenderer().render(text)
+        assert len(source_map.spans) == output.count("\n")
+
+    def test_output_lines_for_offset(self):
+        """Test finding every output line rendered from a source offset."""
+        text = "[Chorus] (x2)\n{C}La la\n\n"
+        _, source_map = HibikiRenderer().render_with_source_map(text)
+        assert source_map.output_lines(text.index("La")) == [2, 3, 7, 8]
@@ -1,7 +1,9 @@
 """Tests for stanza creation, parsing, and properties."""
 
+import tracemalloc
+
 import pytest
-from hibiki import HibikiParser, EmptyStanza, RedefinedStanza
+from hibiki import HibikiParser, HibikiRenderer, EmptyStanza, RedefinedStanza, RecalledStanza, SpanStanza
 
 
 class TestStanzaBasics:
@@ -126,3 +128,93 @@ class TestStanzaProperties:
         parser = HibikiParser()
         stanzas = parser.parse(text)
         assert stanzas[0].heading == "Test Heading"
+
+
+class TestRecalledStanzas:
+    """Tests for stanzas recalled by an empty heading."""
+
+    def test_recall_shares_lines(self):
+        """Test that a recall uses the lines of the stanza it recalls."""
+        text = "[Chorus]\n{C}La la\n{G}La\n\n[Verse]\nWords\n\n[Chorus] (x2)\n\n"
+        stanzas = HibikiParser().parse(text)
+        chorus, recall = stanzas[0], stanzas[2]
+        assert isinstance(recall, RecalledStanza)
+        assert recall.definition is chorus
+        assert recall.lines is chorus.lines
+        assert recall.lines[0].stanza is chorus
+
+    def test_recall_keeps_its_own_position_and_repeats(self):
+        text = "[Chorus]\nLa\n\n[Chorus] (x2)\n\n"
+        stanzas = HibikiParser().parse(text)
+        recall = stanzas[1]
+        assert recall.repeat_count == 2
+        assert recall.recall_line == 4
+        assert recall.starting_line == 1
+        assert recall.name == "Chorus"
+        assert stanzas[0].repeat_count == 1
+
+    def test_memory_flat_as_recalls_grow(self):
+        """Test that each extra recall costs a small, fixed amount of memory."""
+        body = "".join(f"{{C}}Line number {{G}}{i} of the chorus\n" for i in range(20))
+
+        def measure(recalls):
+            text = f"[Chorus]\n{body}\n" + "[Chorus]\n\n" * recalls
+            tracemalloc.start()
+            try:
+                stanzas = HibikiParser().parse(text)
+                for stanza in stanzas:
+                    for line in stanza.lines:
+                        line.split_chords_and_lyrics()
+                size, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            assert len(stanzas) == 1 + recalls
+            return size
+
+        small, large = measure(10), measure(210)
+        # Copying the chorus would cost several kilobytes per recall.
+        per_recall = (large - small) / 200
+        assert per_recall < 1000
+
+
+class TestCompactStanzas:
+    """Tests for stanzas parsed with compact=True."""
+
+    SRC = (
+        "Notes before the song\n"
+        "[Intro]\n{Gm7}Is this the real life (x2)\n{C7}Is this just fantasy\n\n"
+        "[Verse]\n  {F7}Caught in a {Cm7}land{F7}slide  \n\nNo escape\n\n"
+        "[Intro] (x2)\n\n"
+        "[Outro]\nAny way the wind blows"
+    )
+
+    def test_matches_regular_parse(self):
+        """Test that compact stanzas look exactly like regular ones."""
+        regular = HibikiParser().parse(self.SRC)
+        compact = HibikiParser(compact=True).parse(self.SRC)
+        assert len(compact) == len(regular)
+        for a, b in zip(regular, compact):
+            assert b.text == a.text
+            assert b.name == a.name
+            assert b.span == a.span
+            assert b.repeat_count == a.repeat_count
+            assert [line.text for line in b.lines] == [line.text for line in a.lines]
+            assert [line.line_num for line in b.lines] == [line.line_num for line in a.lines]
+            assert [line.offset for line in b.lines] == [line.offset for line in a.lines]
+        assert HibikiRenderer().render(compact) == HibikiRenderer().render(regular)
+
+    def test_stanzas_share_one_buffer(self):
+        """Test that stanzas point into the source instead of copying it."""
+        src = self.SRC + "\n\n"
+        stanzas = HibikiParser(compact=True).parse(src)
+        defined = [stanza for stanza in stanzas if isinstance(stanza, SpanStanza)]
+        assert len(defined) == 3
+        assert all(stanza.buffer is src for stanza in defined)
+        assert isinstance(stanzas[2], RecalledStanza)
+        assert stanzas[2].definition is stanzas[0]
+
+    def test_lines_are_not_cached(self):
+        """Test that compact lines work out their chords each time."""
+        line = HibikiParser(compact=True).parse(self.SRC)[0].lines[0]
+        assert line.split_chords_and_lyrics() is not line.split_chords_and_lyrics()
+        assert line.render() == HibikiParser().parse(self.SRC)[0].lines[0].render()
@@ -0,0 +1,95 @@
+"""Tests for transposition and capo rendering."""
+
+from hibiki import HibikiParser, HibikiRenderer
+from hibiki.transpose import transpose_chord, Transposer, PITCH_CLASSES
+
+
+class TestTransposeChord:
+    """Tests for transposing individual chords."""
+
+    def test_simple(self):
+        assert transpose_chord("C", 2).symbol == "D"
+        assert transpose_chord("Am7", 3).symbol == "Cm7"
+
+    def test_wraps_around(self):
+        assert transpose_chord("B", 1).symbol == "C"
+        assert transpose_chord("C", -1).symbol == "B"
+
+    def test_prefer_flats(self):
+        assert transpose_chord("C", 1).symbol == "C#"
+        assert transpose_chord("C", 1, prefer_flats=True).symbol == "Db"
+
+    def test_enharmonic_roots(self):
+        """Test that flats, sharps and odd spellings are all recognized."""
+        assert transpose_chord("Bb", 2).symbol == "C"
+        assert transpose_chord("A#", 2).symbol == "C"
+        assert transpose_chord("E#", 0).symbol == "F"
+        assert PITCH_CLASSES["Cb"] == PITCH_CLASSES["B"]
+
+    def test_slash_chord(self):
+        assert transpose_chord("F/A", 2).symbol == "G/B"
+
+    def test_modifiers_are_kept(self):
+        """Test that modifiers survive transposition."""
+        sustained = transpose_chord("(C)", 2)
+        assert sustained.sustained is True
+        assert sustained.symbol == "(D)"
+        assert sustained.note == "D"
+
+        assert transpose_chord("Am|", 2).chucked is True
+        assert transpose_chord("Am|", 2).note == "Bm"
+        assert transpose_chord("E_", 1).palm_muted is True
+        assert transpose_chord("E_", 1).symbol == "F_"
+
+    def test_hammer_on(self):
+        """Test that the chord being hammered into is transposed too."""
+        chord = transpose_chord("ChG", 2)
+        assert chord.note == "D"
+        assert chord.hammer_into.symbol == "A"
+
+    def test_non_chord_untouched(self):
+        assert transpose_chord("NC", 5).symbol == "N.C."
+        assert transpose_chord("N.C.", 5).non_chord is True
+
+    def test_cached(self):
+        assert transpose_chord("G7", 4) is transpose_chord("G7", 4)
+
+
+class TestTransposedRendering:
+    """Tests for transposing while rendering."""
+
+    def test_render_transposed(self):
+        output = HibikiRenderer(transpose=2).render("[Verse]\n{C}I like {F}potatoes\n\n")
+        assert output == "[Verse]\nD      G\nI like potatoes\n\n\n"
+
+    def test_realigns_longer_chords(self):
+        """Test that chords which change length are realigned."""
+        output = HibikiRenderer(transpose=1, prefer_flats=True).render("[Verse]\n{C}a{D}b\n\n")
+        assert output == "[Verse]\nDb Eb\na  b\n\n\n"
+
+    def test_capo(self):
+        """Test that a capo transposes chords down to the shapes played."""
+        output = HibikiRenderer(capo=2).render("[Verse]\n{D}Hello\n\n")
+        assert output.split("\n")[1] == "C"
+
+    def test_zero_transpose_matches_plain_render(self):
+        text = "[Verse]\n{C}I like {F#m}potatoes\n\n"
+        assert HibikiRenderer(transpose=12).render(text) == HibikiRenderer().render(text)
+
+    def test_many_keys_from_one_parse(self):
+        """Test that one parse can be rendered in every key."""
+        stanzas = HibikiParser().parse("[Verse]\n{C}I like {F}potatoes\n\n[Verse]\n\n")
+        lines = stanzas[0].lines
+        outputs = [HibikiRenderer(transpose=k).render(stanzas) for k in range(12)]
+        assert len(set(outputs)) == 12
+        # The parsed lines are reused rather than rebuilt for each key.
+        assert stanzas[0].lines is lines
+
+    def test_layout_transposed(self):
+        layout = HibikiRenderer(transpose=5).layout("[Verse]\n{C}Hi\n\n")
+        assert layout.stanzas[0].lines[0].chords[0].symbol == "F"
+
+    def test_transposer_passes_spaces_through(self):
+        stanzas = HibikiParser().parse("[Verse]\nHi {C}there\n\n")
+        chords, _ = stanzas[0].lines[0].split_chords_and_lyrics()
+        assert Transposer(3)(chords[0]) is chords[0]
@@ -0,0 +1,85 @@
+"""Tests for display widths."""
+
+import unicodedata
+
+import pytest
+from hibiki import render
+from hibiki import width
+from hibiki.width import char_width, display_width, pad
+
+
+class TestWidths:
+    """Test the widths of characters and text."""
+    def test_characters(self):
+        """Test narrow, wide and zero width characters."""
+        assert char_width("a") == 1
+        assert char_width("é") == 1
+        assert char_width("ア") == 2
+        assert char_width("字") == 2
+        assert char_width("Ａ") == 2
+        assert char_width("🎸") == 2
+        assert char_width("́") == 0
+        assert char_width("‍") == 0
+        assert char_width("ｱ") == 1
+
+    def test_unassigned(self):
+        """Test that unassigned code points aren't counted as wide."""
+        assert char_width("\u0378") == 1
+        assert char_width("\u0590") == 1
+        assert char_width("\U0001FBFA") == 1
+        assert display_width("\u0378字") == 3
+
+    def test_text(self):
+        """Test that text is as wide as its characters."""
+        assert display_width("") == 0
+        assert display_width("small town girl\n") == 16
+        assert display_width("ふるさと") == 8
+        assert display_width("Café") == 4
+        assert display_width("한국어") == 6
+        assert display_width("각") == 2
+
+    def test_ascii_skips_table(self, monkeypatch):
+        """Test that ASCII text never looks up the table."""
+        monkeypatch.setattr(width, "_text_width", None)
+        assert display_width("Just a small town girl") == 22
+        assert pad("girl", 6) == "girl  "
+
+    def test_cached(self):
+        """Test that the widths of non-ASCII segments are cached."""
+        width._text_width.cache_clear()
+        for _ in range(3):
+            display_width("真夜中の列車")
+        info = width._text_width.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
+
+    def test_pad(self):
+        """Test padding text out to a number of columns."""
+        assert pad("ふる", 6) == "ふる  "
+        assert pad("é", 3) == "é  "
+        assert pad("ふるさと", 4) == "ふるさと"
+
+    @pytest.mark.skipif(unicodedata.unidata_version != width.UNICODE_VERSION, reason="Table is for another version of Unicode.")
+    def test_table_up_to_date(self):
+        """Test that the table matches the Unicode database it was generated from."""
+        assert width.generate_table().startswith(f'UNICODE_VERSION = "{width.UNICODE_VERSION}"')
+        assert width._ranges(width._is_wide) == list(width.WIDE)
+        assert width._ranges(width._is_zero_width) == list(width.ZERO_WIDTH)
+
+
+class TestAlignment:
+    """Test aligning chords over lyrics with wide and combining characters."""
+    def test_wide_lyrics(self):
+        """Test that chords line up over the syllables of Japanese lyrics."""
+        assert render("[Verse]\n{C}ふる{G}さと{Am}は\n\n") == "[Verse]\nC   G   Am\nふるさとは\n\n\n"
+
+    def test_wide_chord_padding(self):
+        """Test that chords longer than wide lyrics still pad the lyrics."""
+        assert render("[Verse]\n{Cmaj7}ア{G}イ\n\n") == "[Verse]\nCmaj7 G\nア    イ\n\n\n"
+
+    def test_combining_characters(self):
+        """Test that combining characters don't push chords along."""
+        assert render("[Verse]\n{C}Café{D}x\n\n") == "[Verse]\nC   D\nCaféx\n\n\n"
+
+    def test_lyrics_before_chords(self):
+        """Test that wide lyrics before the first chord are accounted for."""
+        assert render("[Verse]\n夜の{Am}列車\n\n") == "[Verse]\n    Am\n夜の列車\n\n\n"
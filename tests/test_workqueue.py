@@ -0,0 +1,190 @@
+"""Tests for the render work queue."""
+
+import multiprocessing
+import time
+
+import pytest
+from hibiki import HibikiRenderer, render_file
+from hibiki.include import clear_cache
+from hibiki import workqueue
+from hibiki.workqueue import WorkQueue, render_job, run_worker
+
+
+SONGS = {
+    "one.hb": "[Verse]\n{F#m}Just a small town {Bm7}girl\n\n",
+    "two.hb": "[Chorus] (x2)\n{Gbm}Midnight {A}train\n\n[Chorus]\n\n",
+    "sub/three.hb": "[Intro]\n{Bm7|}Going {E}anywhere (x2)\n\n",
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_libraries():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    root = tmp_path / "songs"
+    for name, src in SONGS.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(src)
+    return root
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with WorkQueue(str(tmp_path / "jobs.db")) as queue:
+        yield queue
+
+
+class TestWorkQueue:
+    """Test queueing, claiming and finishing jobs."""
+    def test_enqueue(self, queue, corpus, tmp_path):
+        """Test that songs are queued once, with outputs mirroring the source tree."""
+        assert queue.enqueue([str(corpus)], str(tmp_path / "out")) == 3
+        assert queue.enqueue([str(corpus)], str(tmp_path / "out")) == 0
+        assert queue.progress().pending == 3
+
+        job = queue.claim("worker")
+        assert job.output == str(tmp_path / "out" / "one.txt")
+        assert job.options == {"format": "text"}
+
+    def test_changed_songs_queued_again(self, queue, corpus, tmp_path):
+        """Test that a song is queued again once it changes."""
+        queue.enqueue([str(corpus)], str(tmp_path / "out"))
+        (corpus / "one.hb").write_text("[Verse]\n{C}Changed\n\n")
+        assert queue.enqueue([str(corpus)], str(tmp_path / "out")) == 1
+
+    def test_unknown_format(self, queue, corpus, tmp_path):
+        """Test that unknown formats are refused up front."""
+        with pytest.raises(ValueError):
+            queue.enqueue([str(corpus)], str(tmp_path / "out"), format="pdf")
+
+    def test_claims_are_exclusive(self, queue, corpus, tmp_path):
+        """Test that a claimed job isn't handed out again while leased."""
+        queue.enqueue([str(corpus)], str(tmp_path / "out"))
+        claimed = [queue.claim(f"worker{i}") for i in range(4)]
+        assert len({job.id for job in claimed[:3]}) == 3
+        assert claimed[3] is None
+        assert queue.progress().leased == 3
+
+    def test_expired_leases_are_retried(self, queue, corpus, tmp_path):
+        """Test that a job whose lease runs out is claimed by another worker."""
+        queue.enqueue([str(corpus / "one.hb")], str(tmp_path / "out"))
+        first = queue.claim("slow", lease=0)
+        time.sleep(0.01)
+        second = queue.claim("fast")
+        assert second.id == first.id and second.attempts == 2
+
+        # The first worker has lost its lease.
+        assert not queue.complete(first)
+        assert queue.complete(second)
+        assert queue.progress().done == 1
+
+    def test_renew(self, queue, corpus, tmp_path):
+        """Test that renewing a lease keeps a job from being retried."""
+        queue.enqueue([str(corpus / "one.hb")], str(tmp_path / "out"))
+        job = queue.claim("worker", lease=0)
+        assert queue.renew(job, lease=60)
+        assert queue.claim("other") is None
+
+    def test_attempts_run_out(self, queue, corpus, tmp_path):
+        """Test that jobs fail for good after their last attempt."""
+        queue.enqueue([str(corpus / "one.hb")], str(tmp_path / "out"), max_attempts=2)
+        assert queue.fail(queue.claim("worker"), "disk full")
+        queue.claim("worker", lease=0)
+        time.sleep(0.01)
+        assert queue.claim("worker") is None
+
+        progress = queue.progress()
+        assert progress.failed == 1 and progress.finished
+        assert queue.failures() == [(str(corpus / "one.hb"), "Lease expired on the last attempt.")]
+
+    def test_permanent_failures(self, queue, corpus, tmp_path):
+        """Test that failures which can't be retried fail straight away."""
+        queue.enqueue([str(corpus / "one.hb")], str(tmp_path / "out"))
+        queue.fail(queue.claim("worker"), "broken", retry=False)
+        assert queue.progress().failed == 1
+
+        assert queue.retry_failed() == 1
+        assert queue.claim("worker").attempts == 1
+
+
+class TestWorkers:
+    """Test rendering jobs with workers."""
+    def test_render_job(self, queue, corpus, tmp_path):
+        """Test that jobs render exactly what rendering the file does."""
+        queue.enqueue([str(corpus)], str(tmp_path / "out"), transpose=2)
+        job = queue.claim("worker")
+        render_job(job)
+        assert (tmp_path / "out" / "one.txt").read_text() == HibikiRenderer(transpose=2).render(SONGS["one.hb"])
+
+    def test_formats(self, queue, corpus, tmp_path):
+        """Test that jobs can be rendered to other formats."""
+        queue.enqueue([str(corpus)], str(tmp_path / "out"), format="html")
+        assert run_worker(queue.path, exit_when_empty=True) == 3
+        assert (tmp_path / "out" / "sub" / "three.html").read_text().startswith("<")
+
+    def test_run_worker(self, queue, corpus, tmp_path):
+        """Test that a worker renders every job, and reports broken songs."""
+        (corpus / "bad.hb").write_text("[Verse]\n(*nope)\n\n")
+        queue.enqueue([str(corpus)], str(tmp_path / "out"))
+
+        reports = []
+        assert run_worker(queue.path, exit_when_empty=True, report=lambda job, error: reports.append(error)) == 3
+        assert len(reports) == 4
+
+        progress = queue.progress()
+        assert (progress.done, progress.failed) == (3, 1)
+        assert [source for source, _ in queue.failures()] == [str(corpus / "bad.hb")]
+        for name in SONGS:
+            output = (tmp_path / "out" / name).with_suffix(".txt")
+            assert output.read_text() == render_file(str(corpus / name))
+
+    def test_unexpected_errors(self, queue, corpus, tmp_path):
+        """Test that errors which aren't Hibiki's fail the job, and the worker carries on."""
+        (corpus / "bad.hb").write_text("[Verse]\n{ChDhE}x\n\n")
+        queue.enqueue([str(corpus)], str(tmp_path / "out"))
+
+        assert run_worker(queue.path, exit_when_empty=True) == 3
+        progress = queue.progress()
+        assert (progress.done, progress.failed, progress.leased) == (3, 1, 0)
+        [(source, error)] = queue.failures()
+        assert source == str(corpus / "bad.hb") and error.startswith("ValueError")
+
+    def test_leases_renewed_while_rendering(self, queue, corpus, tmp_path, monkeypatch):
+        """Test that a render which outlasts its lease isn't claimed by another worker."""
+        queue.enqueue([str(corpus / "one.hb")], str(tmp_path / "out"))
+        claims = []
+
+        def slow_render(job):
+            time.sleep(0.5)
+            with WorkQueue(queue.path) as other:
+                claims.append(other.claim("other"))
+
+        monkeypatch.setattr(workqueue, "render_job", slow_render)
+        assert run_worker(queue.path, lease=0.15, max_jobs=1) == 1
+        assert claims == [None]
+        assert queue.progress().done == 1
+
+    def test_max_jobs(self, queue, corpus, tmp_path):
+        """Test that a worker can stop after a number of jobs."""
+        queue.enqueue([str(corpus)], str(tmp_path / "out"))
+        assert run_worker(queue.path, max_jobs=2) == 2
+        assert queue.progress().pending == 1
+
+    def test_many_workers(self, queue, corpus, tmp_path):
+        """Test that several worker processes render every job exactly once."""
+        for i in range(20):
+            (corpus / f"extra{i}.hb").write_text(f"[Verse]\n{{C}}Song number {i}\n\n")
+        queue.enqueue([str(corpus)], str(tmp_path / "out"))
+
+        with multiprocessing.get_context("spawn").Pool(3) as pool:
+            rendered = pool.starmap(run_worker, [(queue.path, f"worker{i}", 60.0, 0.01, True) for i in range(3)])
+
+        assert sum(rendered) == 23
+        progress = queue.progress()
+        assert progress.done == 23 and progress.finished